@@ -0,0 +1,114 @@
+"""Database connection settings sized per worker process, and the numbers to tune them with.
+
+Each gunicorn worker process serves at most ``threads`` requests at once, so that is all the
+connections it can use. With ``DB_POOL`` (PostgreSQL + psycopg 3) every process keeps a
+``psycopg_pool`` of that size; otherwise each request thread keeps a persistent connection
+(``CONN_MAX_AGE``) checked with ``CONN_HEALTH_CHECKS``. ``DB_MAX_CONNECTIONS`` is the share of the
+server's ``max_connections`` this service may use; it caps ``workers * pool max``.
+"""
+
+import threading
+import time
+
+from django.core.signals import request_finished
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+def connections_per_worker(*, workers: int, threads: int, worker_class: str, budget: int = 0) -> int:
+    """Connections one worker process can use at most."""
+
+    if worker_class.startswith('uvicorn'):
+        # async 워커의 동기 ORM 호출은 sync_to_async(thread_sensitive) 로 한 스레드에서 직렬 실행
+        wanted = 2
+    else:
+        wanted = max(threads, 1)
+    if budget:
+        wanted = min(wanted, max(budget // max(workers, 1), 1))
+    return wanted
+
+
+def configure_database(database: dict, env) -> dict:
+    """Add pooling / persistent connection options to ``env.db()``'s settings dict."""
+
+    if 'postgresql' not in database.get('ENGINE', ''):
+        database['CONN_MAX_AGE'] = env.int('CONN_MAX_AGE', default=0)
+        return database
+
+    size = connections_per_worker(
+        workers=env.int('WEB_CONCURRENCY', default=2),
+        threads=env.int('GUNICORN_THREADS', default=4),
+        worker_class=env('GUNICORN_WORKER_CLASS', default='gthread'),
+        budget=env.int('DB_MAX_CONNECTIONS', default=0),
+    )
+    options = database.setdefault('OPTIONS', {})
+    if env.bool('DB_POOL', default=False):
+        options['pool'] = {
+            'min_size': env.int('DB_POOL_MIN_SIZE', default=min(2, size)),
+            'max_size': env.int('DB_POOL_MAX_SIZE', default=size),
+            # 풀이 가득 찼을 때 커넥션을 기다리는 최대 시간 (초과하면 PoolTimeout)
+            'timeout': env.float('DB_POOL_TIMEOUT', default=10.0),
+            'max_idle': env.float('DB_POOL_MAX_IDLE', default=300.0),
+            'max_lifetime': env.float('DB_POOL_MAX_LIFETIME', default=1800.0),
+        }
+        # 풀을 쓰면 Django 가 요청마다 커넥션을 풀에 반납해야 함
+        database['CONN_MAX_AGE'] = 0
+    else:
+        database['CONN_MAX_AGE'] = env.int('CONN_MAX_AGE', default=60)
+        database['CONN_HEALTH_CHECKS'] = True
+    options.setdefault('connect_timeout', env.int('DB_CONNECT_TIMEOUT', default=5))
+    return database
+
+
+class ConnectionStats:
+    """Per-process counters for the persistent-connection mode (pools report their own stats)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.connections_opened = 0
+        self.requests = 0
+
+    def _on_connection_created(self, sender, connection, **kwargs):
+        with self._lock:
+            self.connections_opened += 1
+
+    def _on_request_finished(self, sender, **kwargs):
+        with self._lock:
+            self.requests += 1
+
+    def connect(self):
+        connection_created.connect(self._on_connection_created, dispatch_uid='config.db.connection_created')
+        request_finished.connect(self._on_request_finished, dispatch_uid='config.db.request_finished')
+
+    def snapshot(self, alias: str = 'default') -> dict:
+        wrapper = connections[alias]
+        settings_dict = wrapper.settings_dict
+        data = {
+            'alias': alias,
+            'vendor': wrapper.vendor,
+            'conn_max_age': settings_dict.get('CONN_MAX_AGE'),
+            'health_checks': settings_dict.get('CONN_HEALTH_CHECKS', False),
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'requests': self.requests,
+            'connections_opened': self.connections_opened,
+            'requests_per_connection': round(self.requests / self.connections_opened, 2) if self.connections_opened else None,
+        }
+        pool = getattr(wrapper, 'pool', None)
+        if pool is not None:
+            stats = pool.get_stats()
+            waits = stats.get('requests_waiting', 0)
+            size = stats.get('pool_size', 0)
+            available = stats.get('pool_available', 0)
+            served = stats.get('requests_num', 0)
+            data['pool'] = {
+                **stats,
+                'in_use': size - available,
+                'utilization': round((size - available) / stats['pool_max'], 3) if stats.get('pool_max') else None,
+                'avg_wait_ms': round(stats.get('requests_wait_ms', 0) / served, 2) if served else 0.0,
+                'waiting_now': waits,
+            }
+        return data
+
+
+connection_stats = ConnectionStats()
@@ -0,0 +1,245 @@
+"""Opt-in per-request profiling: CPU (cProfile + stack sampling) and memory (tracemalloc).
+
+A request is captured when a staff user sends the ``X-Profile: 1`` header, or by chance at
+``REQUEST_PROFILING['sample_rate']`` on the ``paths`` prefixes (the generate endpoints). A capture
+stores, under ``dir``:
+
+- ``<id>.json``: path, status, duration, RSS before/after, tracemalloc peak and top allocations,
+  and the functions with the most cumulative time
+- ``<id>.prof``: the ``pstats`` dump (``snakeviz``, ``python -m pstats``)
+- ``<id>.collapsed``: stacks of the request thread sampled every ``sample_interval_ms``, in
+  collapsed-stack format for ``flamegraph.pl`` or speedscope
+
+Staff download them from ``/api/ops/profiles/``; a profiled response carries ``X-Profile-Id``.
+With ``REQUEST_PROFILING=0`` (the default) the middleware removes itself at startup, so requests
+pay nothing. Only one request per process is captured at a time: cProfile and tracemalloc are
+process-wide, and tracemalloc's numbers include other threads' allocations during the request.
+The response body of streaming responses is produced after the capture ends.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+CAPTURE_ID = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$')
+CAPTURE_FILES = {'json': 'application/json', 'prof': 'application/octet-stream', 'collapsed': 'text/plain'}
+
+
+def current_rss_kb() -> int:
+    try:
+        with open('/proc/self/statm') as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        return 0
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's stack, from the frame running ``stop_code`` down, into collapsed stacks."""
+
+    def __init__(self, thread_id: int, interval: float, stop_code=None):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stop_code = stop_code
+        self.stacks: Counter = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{frame.f_globals.get("__name__", "?")}.{code.co_qualname}')
+                if code is self.stop_code:
+                    break
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self) -> str:
+        self._done.set()
+        self.join()
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    @property
+    def config(self) -> dict:
+        return settings.REQUEST_PROFILING
+
+    def path(self, capture_id: str, kind: str) -> str:
+        if not CAPTURE_ID.match(capture_id) or kind not in CAPTURE_FILES:
+            raise FileNotFoundError(capture_id)
+        return os.path.join(self.config['dir'], f'{capture_id}.{kind}')
+
+    def save(self, capture_id: str, meta: dict, profile: cProfile.Profile, collapsed: str):
+        directory = self.config['dir']
+        os.makedirs(directory, exist_ok=True)
+        profile.dump_stats(self.path(capture_id, 'prof'))
+        with open(self.path(capture_id, 'collapsed'), 'w', encoding='utf-8') as fh:
+            fh.write(collapsed)
+        # json 을 마지막에 써서 목록에는 완성된 캡처만 보이게
+        with open(self.path(capture_id, 'json'), 'w', encoding='utf-8') as fh:
+            json.dump(meta, fh, indent=2)
+        self.prune()
+
+    def list(self) -> list[dict]:
+        directory = self.config['dir']
+        try:
+            names = sorted((name for name in os.listdir(directory) if name.endswith('.json')), reverse=True)
+        except FileNotFoundError:
+            return []
+        captures = []
+        for name in names:
+            try:
+                with open(os.path.join(directory, name), encoding='utf-8') as fh:
+                    meta = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            captures.append({key: meta.get(key) for key in (
+                'id', 'method', 'path', 'status', 'duration_ms', 'tracemalloc_peak_kb', 'rss_delta_kb', 'reason',
+            )})
+        return captures
+
+    def prune(self):
+        # 오래된 캡처부터 삭제 (id 가 시각순)
+        directory = self.config['dir']
+        ids = sorted({name.split('.', 1)[0] for name in os.listdir(directory) if CAPTURE_ID.match(name.split('.', 1)[0])})
+        for capture_id in ids[:max(len(ids) - self.config['max_captures'], 0)]:
+            for kind in CAPTURE_FILES:
+                try:
+                    os.remove(self.path(capture_id, kind))
+                except FileNotFoundError:
+                    pass
+
+
+profile_store = ProfileStore()
+
+
+def _is_staff(request) -> bool:
+    # 헤더가 있을 때만 인증 (JWT 는 DRF 뷰에서 처리되므로 여기서 직접 확인)
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+    from users.tokens import MembershipClaimsJWTAuthentication
+
+    try:
+        result = MembershipClaimsJWTAuthentication().authenticate(request)
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return False
+    return bool(result and result[0].is_staff)
+
+
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING['enabled']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self._lock = threading.Lock()
+
+    @property
+    def config(self) -> dict:
+        return settings.REQUEST_PROFILING
+
+    def _reason(self, request) -> Optional[str]:
+        config = self.config
+        if request.headers.get(config['header']) == '1' and _is_staff(request):
+            return 'header'
+        rate = config['sample_rate']
+        if rate and request.path.startswith(tuple(config['paths'])) and random.random() < rate:
+            return 'sampled'
+        return None
+
+    def __call__(self, request):
+        reason = self._reason(request)
+        if reason is None or not self._lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self._capture(request, reason)
+        finally:
+            self._lock.release()
+
+    def _capture(self, request, reason: str):
+        config = self.config
+        capture_id = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}'
+        sampler = StackSampler(
+            threading.get_ident(), config['sample_interval_ms'] / 1000, RequestProfilingMiddleware._capture.__code__,
+        )
+        profile = cProfile.Profile()
+        rss_before = current_rss_kb()
+        # PYTHONTRACEMALLOC 등으로 이미 추적 중이면 그대로 두고 최고치만 초기화
+        was_tracing = tracemalloc.is_tracing()
+        if was_tracing:
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start(config['tracemalloc_frames'])
+        sampler.start()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+            duration_ms = (time.perf_counter() - started) * 1000
+            collapsed = sampler.stop()
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            if not was_tracing:
+                tracemalloc.stop()
+
+        stats = pstats.Stats(profile)
+        top_functions = []
+        for (filename, line, name), (_, calls, total, cumulative, _) in sorted(
+            stats.stats.items(), key=lambda item: item[1][3], reverse=True,
+        )[:config['top']]:
+            top_functions.append({
+                'function': f'{filename}:{line}({name})',
+                'calls': calls,
+                'tottime_ms': round(total * 1000, 2),
+                'cumtime_ms': round(cumulative * 1000, 2),
+            })
+        top_allocations = [
+            {
+                'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+                'size_kb': round(stat.size / 1024, 1),
+                'count': stat.count,
+            }
+            for stat in snapshot.statistics('lineno')[:config['top']]
+        ]
+        rss_after = current_rss_kb()
+        meta = {
+            'id': capture_id,
+            'reason': reason,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 1),
+            'rss_before_kb': rss_before,
+            'rss_after_kb': rss_after,
+            'rss_delta_kb': rss_after - rss_before,
+            'tracemalloc_peak_kb': round(peak / 1024, 1),
+            'top_allocations': top_allocations,
+            'top_functions': top_functions,
+            'samples': sampler.stacks.total(),
+        }
+        profile_store.save(capture_id, meta, profile, collapsed)
+        response['X-Profile-Id'] = capture_id
+        return response
@@ -0,0 +1,96 @@
+"""Read-replica routing.
+
+Nothing goes to the replica by default: reads are routed there only inside ``use_replica()``
+(report, history and listing endpoints, admin changelists). Writes always go to ``default``,
+and once a block writes, its later reads go to ``default`` too so they see their own write.
+Quota checks and the generate path never enter ``use_replica()`` and stay on the primary.
+Without ``REPLICA_DATABASE_URL`` the ``replica`` alias does not exist and everything uses
+``default``.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+# 로그인 직후 세션이 레플리카에 아직 없을 수 있음
+PRIMARY_ONLY_APPS = {'sessions'}
+
+
+class _ReadState:
+    __slots__ = ('alias', 'wrote')
+
+    def __init__(self, alias: Optional[str]):
+        self.alias = alias
+        self.wrote = False
+
+
+_state: ContextVar[Optional[_ReadState]] = ContextVar('replica_read_state', default=None)
+
+
+def replica_configured() -> bool:
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def use_replica():
+    """Route reads in this block (and this thread/task) to the replica, if one is configured."""
+
+    token = _state.set(_ReadState(REPLICA if replica_configured() else None))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def pin_primary():
+    """Force reads to the primary, e.g. for a read-after-write inside a ``use_replica()`` block."""
+
+    token = _state.set(_ReadState(None))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.wrote or state.alias is None:
+            return None
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {PRIMARY, REPLICA, None}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 레플리카는 primary 를 복제하므로 스키마 변경은 primary 에만 (테스트의 독립 레플리카 DB 는 예외)
+        return db != REPLICA or settings.REPLICA_MIGRATE
+
+
+class ReplicaReadMixin:
+    """For DRF views: run ``replica_actions`` (viewset actions or lowercase HTTP methods) under ``use_replica()``."""
+
+    replica_actions: tuple[str, ...] = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        action = getattr(self, 'action_map', {}).get(method, method)
+        if action in self.replica_actions:
+            with use_replica():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
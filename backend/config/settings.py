@@ -13,8 +13,13 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import environ
 import os
+import tempfile
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+
+from .db import configure_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -66,6 +71,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # REQUEST_PROFILING=0 이면 시작 시 스스로 빠짐 (요청당 비용 없음)
+    'config.profiling.RequestProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -103,10 +110,25 @@ REST_FRAMEWORK = {
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connections are pooled (DB_POOL=1, psycopg 3) or persistent with health checks,
+# sized from WEB_CONCURRENCY / GUNICORN_THREADS; see config/db.py
+
 DATABASES = {
-    'default': env.db(),
+    'default': configure_database(env.db(), env),
 }
 
+# Optional read replica for reports, history and admin browsing (config/routers.py)
+# Here the test runner treats it as a mirror of default; config.settings_test uses a separate replica database.
+
+if env('REPLICA_DATABASE_URL', default=''):
+    DATABASES['replica'] = configure_database(env.db('REPLICA_DATABASE_URL'), env)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+# True only where the replica is a separate database that needs its own schema (test settings)
+REPLICA_MIGRATE = False
+
+DATABASE_ROUTERS = ['config.routers.ReplicaRouter']
+
 # Use custom user model
 
 AUTH_USER_MODEL = 'users.CustomUser'
@@ -155,9 +177,245 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # JWT configuration
 
+# JWT_MEMBERSHIP_CLAIMS: login embeds active shop ids/roles so shop authorization needs no DB query.
+# Claim tokens are short-lived; membership, is_staff and is_active changes bump CustomUser.membership_version
+# and invalidate them. Outside DEBUG this needs a shared CACHE_URL (the version check is cached).
+JWT_MEMBERSHIP_CLAIMS = env.bool('JWT_MEMBERSHIP_CLAIMS', default=False)
+JWT_MEMBERSHIP_VERSION_CACHE_SECONDS = env.int('JWT_MEMBERSHIP_VERSION_CACHE_SECONDS', default=30)
+
 SIMPLE_JWT = {
-    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
+    'ACCESS_TOKEN_LIFETIME': (
+        timedelta(minutes=env.int('JWT_CLAIMS_ACCESS_MINUTES', default=5))
+        if JWT_MEMBERSHIP_CLAIMS else timedelta(minutes=60)
+    ),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_OBTAIN_SERIALIZER': 'users.tokens.MembershipTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.tokens.MembershipTokenRefreshSerializer',
+}
+
+# Cache (shared across workers when CACHE_URL points at Redis/Memcached)
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# 멤버십/권한 변경 시 버전 캐시를 지우는데, 프로세스 로컬 캐시면 다른 워커는 캐시 만료까지 이전 토큰을 받아들임
+if JWT_MEMBERSHIP_CLAIMS and not DEBUG and CACHES['default']['BACKEND'].endswith(('LocMemCache', 'DummyCache')):
+    raise ImproperlyConfigured(
+        'JWT_MEMBERSHIP_CLAIMS needs a shared cache (CACHE_URL=redis://... or memcached) so that '
+        'membership and staff changes revoke tokens in every worker.'
+    )
+
+# Gemini model routing
+# Per-tier overrides go in GEMINI_ROUTING_TIERS as JSON, e.g. {"enterprise": {"edit": ["model-a", "model-b"]}}
+
+GEMINI_MODEL_ROUTING = {
+    'classify': env.list('GEMINI_CLASSIFY_MODELS', default=['gemini-2.5-flash', 'gemini-2.5-flash-lite']),
+    'edit': env.list('GEMINI_EDIT_MODELS', default=['gemini-2.5-flash-image']),
+    'tiers': env.json('GEMINI_ROUTING_TIERS', default={}),
+    'timeouts_ms': {
+        'classify': env.int('GEMINI_CLASSIFY_TIMEOUT_MS', default=15000),
+        'edit': env.int('GEMINI_EDIT_TIMEOUT_MS', default=90000),
+    },
+    'prior_latency_ms': {
+        'classify': 1500,
+        'edit': 10000,
+    },
+    'max_in_flight': {
+        'classify': env.int('GEMINI_CLASSIFY_MAX_IN_FLIGHT', default=0),
+        'edit': env.int('GEMINI_EDIT_MAX_IN_FLIGHT', default=0),
+    },
+    'max_error_rate': 0.5,
+    # 오류율 반감기: 오류로 밀려난 모델도 호출 없이 이 주기마다 오류율이 절반이 되어 다시 시도됨
+    'error_half_life_seconds': env.float('GEMINI_ERROR_HALF_LIFE_SECONDS', default=30.0),
+    'ewma_alpha': 0.2,
+    'position_penalty': 0.5,
+}
+
+# Gemini API keys: GEMINI_KEYS="label=key,label=key" (one per project) spreads calls over several keys
+# rpm/tpm: per-key limits used to find headroom (0 = unknown); a 429 cools the key off and the call moves on
+
+GEMINI_KEY_POOL = {
+    'rpm': env.int('GEMINI_KEY_RPM', default=0),
+    'tpm': env.int('GEMINI_KEY_TPM', default=0),
+    'window_seconds': 60,
+    'cooldown_seconds': env.float('GEMINI_KEY_COOLDOWN_SECONDS', default=15.0),
+    'max_cooldown_seconds': 300,
+}
+
+# Gemini context caching of the static system instructions (prompts stay inline, after the images)
+# min_tokens: upstream minimum size of cached content; shorter instructions are always sent inline
+# cached_token_rate: price of a cached input token relative to a normal one (token ledger / budgets)
+
+GEMINI_CONTEXT_CACHE = {
+    'enabled': env.bool('GEMINI_CONTEXT_CACHE', default=False),
+    'min_tokens': env.int('GEMINI_CONTEXT_CACHE_MIN_TOKENS', default=1024),
+    'cached_token_rate': env.float('GEMINI_CACHED_TOKEN_RATE', default=0.25),
+    'ttl_seconds': env.int('GEMINI_CONTEXT_CACHE_TTL', default=3600),
+    'refresh_margin_seconds': 300,
+    'retry_after_seconds': 600,
+}
+
+# Usage counters: every generate/refund adds to one of USAGE_SHARDS rows per shop and period
+# (summed on read), so one busy shop's requests don't queue on a single row lock
+
+USAGE_SHARDS = env.int('USAGE_SHARDS', default=8)
+
+# Token budget: per-tier limits are PLAN_TIER_TOKEN_BUDGETS (users/models.py)
+# Over a limit, inputs are downscaled to the largest downscale_steps size that fits, else the request is rejected
+
+TOKEN_BUDGET = {
+    'enabled': env.bool('TOKEN_BUDGET', default=True),
+    'downscale': env.bool('TOKEN_BUDGET_DOWNSCALE', default=True),
+    'downscale_steps': [1536, 1024, 768, 384],
+}
+
+# Outfit try-on (POST /api/generate/outfit/): product images per request, one edit call for all
+
+OUTFIT_MAX_PRODUCTS = env.int('OUTFIT_MAX_PRODUCTS', default=4)
+
+# Local product classifier (k-NN over past Gemini labels)
+# collect: store Gemini labels + features and reuse labels of identical images
+# enabled: answer from the local model when its confidence is at least min_confidence
+# Check `python manage.py evaluate_classifier` before enabling.
+
+LOCAL_CLASSIFIER = {
+    'collect': env.bool('LOCAL_CLASSIFIER_COLLECT', default=True),
+    'enabled': env.bool('LOCAL_CLASSIFIER', default=False),
+    'min_confidence': env.float('LOCAL_CLASSIFIER_MIN_CONFIDENCE', default=0.9),
+    'min_samples': env.int('LOCAL_CLASSIFIER_MIN_SAMPLES', default=500),
+    'max_samples': 20000,
+    'k': 7,
+    'reload_seconds': 300,
+}
+
+# Near-duplicate product lookup: max Hamming distance between 64-bit dHashes (at most 11)
+
+PHASH_MAX_DISTANCE = env.int('PHASH_MAX_DISTANCE', default=6)
+
+# Idempotency-Key handling for the generate endpoints
+# lease_seconds: how long an in-flight key stays owned after its leader stops renewing it (crashed worker)
+# wait_seconds: how long a duplicate waits for the in-flight original before answering 409
+
+IDEMPOTENCY = {
+    'ttl_seconds': env.int('IDEMPOTENCY_TTL', default=86400),
+    'lease_seconds': 180,
+    'wait_seconds': env.int('IDEMPOTENCY_WAIT', default=120),
+    'poll_interval_seconds': 0.5,
+}
+
+# Content-addressed image storage for generation inputs/results (generations/blobs.py)
+# Point STORAGES[storage] at durable storage in production; gc_blobs removes unreferenced blobs.
+
+BLOB_STORE = {
+    'enabled': env.bool('BLOB_STORE', default=True),
+    'store_inputs': env.bool('BLOB_STORE_INPUTS', default=True),
+    'storage': 'default',
+    'gc_grace_hours': env.int('BLOB_GC_GRACE_HOURS', default=24),
+}
+
+# Generation progress stream (GET /api/shops/<shop_id>/generations/<id>/events/, server-sent events)
+# Events live in the default cache, so streams served by other processes need a shared CACHE_URL
+
+GENERATION_EVENTS = {
+    'ttl_seconds': 900,
+    'poll_interval_seconds': env.float('GENERATION_EVENTS_POLL_SECONDS', default=0.5),
+    'heartbeat_seconds': env.int('GENERATION_EVENTS_HEARTBEAT_SECONDS', default=15),
+    'max_stream_seconds': env.int('GENERATION_EVENTS_MAX_STREAM_SECONDS', default=300),
+    # 캐시에 이벤트가 없을 때 DB 에서 최종 상태를 확인하는 주기
+    'db_check_seconds': 5,
+    # by-key 구독: 이 시간 안에 해당 키의 요청이 시작되지 않으면 not_found
+    'resolve_timeout_seconds': 30,
+    'retry_ms': 3000,
+}
+
+# Adaptive in-flight limit of the generate endpoints, per worker process (AIMD on generation latency)
+# Over the limit: immediate 503 + Retry-After. GET /ready/ answers 503 while saturated
+
+GENERATION_LIMITER = {
+    'enabled': env.bool('GENERATION_LIMITER', default=True),
+    # 워커 스레드 수보다 많이 받아도 실행되지 못하고 gunicorn 에서 대기할 뿐
+    'max_limit': env.int('GENERATION_LIMIT_MAX', default=env.int('GUNICORN_THREADS', default=4)),
+    'min_limit': env.int('GENERATION_LIMIT_MIN', default=1),
+    'initial_limit': env.int('GENERATION_LIMIT_INITIAL', default=0),
+    'latency_target_seconds': env.float('GENERATION_LATENCY_TARGET_SECONDS', default=30.0),
+    'backoff': 0.7,
+    'decrease_interval_seconds': 5,
+    'latency_ewma_alpha': 0.2,
+    'retry_after_max_seconds': 60,
+    'ready_shed_window_seconds': env.int('GENERATION_READY_SHED_WINDOW_SECONDS', default=10),
+}
+
+# Generate request deadline: X-Deadline-Ms header, else the shop's generation_timeout_ms, else default_ms (0 = none)
+# Upstream timeouts are cut to the time left; classification is skipped when it would crowd out the edit
+
+GENERATION_DEADLINE = {
+    'enabled': env.bool('GENERATION_DEADLINE', default=True),
+    'header': 'X-Deadline-Ms',
+    'default_ms': env.int('GENERATION_DEADLINE_MS', default=0),
+    'max_ms': env.int('GENERATION_DEADLINE_MAX_MS', default=120000),
+    # 응답 전송 여유: 클라이언트가 포기하기 전에 504 를 받도록
+    'margin_ms': env.int('GENERATION_DEADLINE_MARGIN_MS', default=300),
+    'classify_max_share': env.float('GENERATION_CLASSIFY_MAX_SHARE', default=0.25),
+    'min_edit_ms': env.int('GENERATION_MIN_EDIT_MS', default=3000),
+}
+
+# Streaming data exports (GET /api/shops/<shop_id>/export/<dataset>/, manage.py export_shop_data)
+# chunk_size: rows per server-side cursor fetch; buffer_bytes: encoded bytes per streamed piece
+
+EXPORT = {
+    'chunk_size': env.int('EXPORT_CHUNK_SIZE', default=2000),
+    'buffer_bytes': 64 * 1024,
+    'gzip_level': 6,
+}
+
+# Opt-in request profiling (cProfile, sampled stacks, tracemalloc); captures listed at /api/ops/profiles/
+# A staff user's "X-Profile: 1" header, or sample_rate of the requests under paths
+
+REQUEST_PROFILING = {
+    'enabled': env.bool('REQUEST_PROFILING', default=False),
+    'header': 'X-Profile',
+    'sample_rate': env.float('REQUEST_PROFILING_SAMPLE_RATE', default=0.0),
+    'paths': env.list('REQUEST_PROFILING_PATHS', default=['/api/generate/']),
+    'dir': env('REQUEST_PROFILING_DIR', default=os.path.join(tempfile.gettempdir(), 'dressroom-profiles')),
+    'max_captures': env.int('REQUEST_PROFILING_MAX_CAPTURES', default=50),
+    'sample_interval_ms': 5,
+    'tracemalloc_frames': 1,
+    'top': 25,
+}
+
+# Result thumbnails (GET /api/shops/<shop_id>/results/<id>/thumbnail/<variant>/)
+# variants: name -> longest side in px; the local disk cache is LRU-evicted down to max_bytes
+
+THUMBNAILS = {
+    'variants': {'sm': 160, 'md': 320, 'lg': 640},
+    'format': 'WEBP',
+    'quality': 80,
+    'cache_dir': env('THUMBNAIL_CACHE_DIR', default=os.path.join(tempfile.gettempdir(), 'dressroom-thumbnails')),
+    'max_bytes': env.int('THUMBNAIL_CACHE_MAX_BYTES', default=256 * 1024 * 1024),
+    'workers': env.int('THUMBNAIL_WORKERS', default=2),
+    'wait_seconds': 15,
+    # 결과 저장 직후 백그라운드에서 미리 만들어 둘 variant
+    'prewarm': env.list('THUMBNAIL_PREWARM', default=['sm']),
+}
+
+# Webhook delivery to ShopProfile.callback_url (python manage.py run_webhook_dispatcher)
+# batch_max_events > 1 sends up to that many events of one shop in a single POST
+
+WEBHOOKS = {
+    'timeout_seconds': env.float('WEBHOOK_TIMEOUT', default=10.0),
+    'max_connections': env.int('WEBHOOK_MAX_CONNECTIONS', default=64),
+    'per_endpoint_concurrency': env.int('WEBHOOK_PER_ENDPOINT_CONCURRENCY', default=4),
+    'batch_max_events': env.int('WEBHOOK_BATCH_MAX_EVENTS', default=1),
+    'workers': env.int('WEBHOOK_WORKERS', default=16),
+    'claim_size': 200,
+    'lease_seconds': 120,
+    'max_attempts': env.int('WEBHOOK_MAX_ATTEMPTS', default=8),
+    'backoff_base_seconds': 5,
+    'backoff_max_seconds': 3600,
+    'poll_interval_seconds': 1.0,
+    # 사설/루프백/링크로컬 주소의 callback_url 허용 (로컬 수신기 테스트용, 운영에서는 끔)
+    'allow_private_hosts': env.bool('WEBHOOK_ALLOW_PRIVATE_HOSTS', default=False),
 }
 
 # CORS configuration
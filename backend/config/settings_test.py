@@ -0,0 +1,57 @@
+"""Settings for ``python manage.py test`` (selected by manage.py for the test command).
+
+Everything runs locally: SQLite files under the temp directory (``replica`` is a second,
+independent database, so tests can tell which one a view read from), an in-process cache, and
+temporary directories for blobs, thumbnails and profiles. Upstream calls go to
+``generations.fakes.FakeGeminiServer``, which each test starts and points the service at.
+"""
+
+import os
+import tempfile
+
+# settings.py 가 요구하는 환경변수 (실제 .env 값이 있으면 그대로 사용)
+os.environ.setdefault('SECRET_KEY', 'test-only-secret-key-not-for-production-use')
+os.environ.setdefault('CSRF_ORIGIN', 'http://localhost')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'dressroom-test.sqlite3'))
+
+from .settings import *  # noqa: E402,F401,F403
+
+TEST_ROOT = os.path.join(tempfile.gettempdir(), 'dressroom-test')
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(TEST_ROOT, 'default.sqlite3'),
+        # 스레드를 쓰는 테스트(동시 요청, 디스패처)가 같은 DB 를 보도록 메모리 대신 파일
+        'TEST': {'NAME': os.path.join(TEST_ROOT, 'test-default.sqlite3')},
+        'OPTIONS': {'timeout': 20},
+    },
+    # 미러가 아닌 별도 DB: 테스트는 필요한 행을 직접 복사 (config/routers.py)
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(TEST_ROOT, 'replica.sqlite3'),
+        'TEST': {'NAME': os.path.join(TEST_ROOT, 'test-replica.sqlite3')},
+        'OPTIONS': {'timeout': 20},
+    },
+}
+REPLICA_MIGRATE = True
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+STORAGES = {
+    **STORAGES,  # noqa: F405
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': os.path.join(TEST_ROOT, 'media')},
+    },
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+THUMBNAILS = {**THUMBNAILS, 'cache_dir': os.path.join(TEST_ROOT, 'thumbnails'), 'prewarm': []}  # noqa: F405
+REQUEST_PROFILING = {**REQUEST_PROFILING, 'enabled': False, 'dir': os.path.join(TEST_ROOT, 'profiles')}  # noqa: F405
+
+os.makedirs(TEST_ROOT, exist_ok=True)
@@ -1,14 +0,0 @@
-from pathlib import Path
-import environ
-import os
-from datetime import timedelta
-
-# Build paths inside the project like this: BASE_DIR / 'subdir'.
-BASE_DIR = Path(__file__).resolve().parent.parent
-
-# Environment variable settings. Do not let it be exposed in production!
-env = environ.Env(DEBUG=(bool, False))
-environ.Env.read_env(os.path.join(BASE_DIR.parent, '.env'))
-
-print(env('DJANGO_KEY'))
-print(env('DEBUG'))
\ No newline at end of file
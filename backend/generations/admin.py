@@ -1,5 +1,96 @@
 from django.contrib import admin
-from .models import GenerationRequest, GenerationErrorLog
 
-admin.site.register(GenerationRequest)
-admin.site.register(GenerationErrorLog)
\ No newline at end of file
+from users.admin_tools import BoundedChangeListMixin
+
+from .models import (
+    Blob,
+    GenerationRequest,
+    GenerationErrorLog,
+    IdempotencyKey,
+    ProductImage,
+    WebhookDeadLetter,
+    WebhookEvent,
+)
+
+
+@admin.register(GenerationRequest)
+class GenerationRequestAdmin(BoundedChangeListMixin, admin.ModelAdmin):
+    list_display = (
+        'created_at',
+        'shop',
+        'status',
+        'customer_reference',
+        'classify_model',
+        'edit_model',
+        'used_tokens',
+        'cached_tokens',
+        'latency_ms',
+    )
+    list_filter = ('status',)
+    list_select_related = ('shop',)
+    raw_id_fields = ('shop', 'requested_by')
+    date_hierarchy = 'created_at'
+    search_fields = ('=shop__shop_id', '=customer_reference')
+
+
+@admin.register(GenerationErrorLog)
+class GenerationErrorLogAdmin(BoundedChangeListMixin, admin.ModelAdmin):
+    list_display = ('timestamp', 'level', 'err_from', 'request', 'gemini_message')
+    list_filter = ('level',)
+    list_select_related = ('request__shop',)
+    raw_id_fields = ('request',)
+    date_hierarchy = 'timestamp'
+    search_fields = ('=err_from',)
+
+
+@admin.register(ProductImage)
+class ProductImageAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'category', 'label_source', 'width', 'height', 'created_at')
+    list_filter = ('category', 'label_source')
+    search_fields = ('=sha256',)
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'shop', 'key', 'status', 'response_status', 'expires_at')
+    list_filter = ('status',)
+    list_select_related = ('shop',)
+    raw_id_fields = ('shop',)
+    search_fields = ('=key', '=shop__shop_id')
+    exclude = ('response_body',)
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'shop', 'event_type', 'attempts', 'next_attempt_at', 'last_error')
+    list_filter = ('event_type',)
+    list_select_related = ('shop',)
+    raw_id_fields = ('shop',)
+    search_fields = ('=shop__shop_id',)
+
+
+@admin.register(WebhookDeadLetter)
+class WebhookDeadLetterAdmin(BoundedChangeListMixin, admin.ModelAdmin):
+    list_display = ('created_at', 'shop', 'event_type', 'attempts', 'last_status', 'last_error')
+    list_filter = ('event_type',)
+    list_select_related = ('shop',)
+    raw_id_fields = ('shop',)
+    date_hierarchy = 'created_at'
+    search_fields = ('=shop__shop_id',)
+    actions = ['requeue']
+
+    @admin.action(description='Requeue selected events')
+    def requeue(self, request, queryset):
+        WebhookEvent.objects.bulk_create([
+            WebhookEvent(shop_id=letter.shop_id, event_type=letter.event_type, payload=letter.payload)
+            for letter in queryset
+        ])
+        count, _ = queryset.delete()
+        self.message_user(request, f'Requeued {count} event(s).')
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'content_type', 'size', 'ref_count', 'last_referenced_at')
+    search_fields = ('=sha256',)
+    readonly_fields = ('sha256', 'size', 'content_type', 'created_at')
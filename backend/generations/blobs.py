@@ -0,0 +1,237 @@
+"""Content-addressed storage for generation inputs and results.
+
+Every image is stored once on ``storages[BLOB_STORE['storage']]`` under its SHA-256
+(``blobs/ab/cd/abcd…``), so a catalog product used in a million try-ons costs one object.
+``GenerationRequest.*_image_path`` columns hold those paths; ``Blob`` rows track size, type
+and references. ``collect_garbage`` is a mark-and-sweep pass: it counts references from the
+request table, fixes ``ref_count`` and deletes unreferenced blobs whose last use is older than
+the grace period (the grace period covers uploads whose request row is not saved yet).
+"""
+
+import hashlib
+from collections import Counter
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import storages
+from django.db.models import F, Q
+from django.utils import timezone
+
+from users.loggers import log_service_err
+from users.models import ErrorLevel
+
+from .models import Blob, GenerationRequest, blob_path
+
+BLOB_PREFIX = 'blobs/'
+_PATH_FIELDS = ('person_image_path', 'product_image_path', 'result_image_path')
+
+
+def _sha256_of(source) -> str:
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(1024 * 1024), b''):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def _size_of(source) -> int:
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    size = getattr(source, 'size', None)
+    if size is not None:
+        return size
+    source.seek(0, 2)
+    size = source.tell()
+    source.seek(0)
+    return size
+
+
+class BlobStore:
+    @property
+    def config(self) -> dict:
+        return settings.BLOB_STORE
+
+    @property
+    def storage(self):
+        return storages[self.config['storage']]
+
+    def put(self, source, content_type: str = '', sha256: Optional[str] = None) -> str:
+        """Store ``source`` (bytes or a file) unless it is already stored; returns its path."""
+
+        sha256 = sha256 or _sha256_of(source)
+        path = blob_path(sha256)
+        # 이미 있는 내용이면 DB 갱신 한 번으로 끝 (스토리지 쓰기 없음)
+        if Blob.objects.filter(sha256=sha256).update(last_referenced_at=timezone.now()):
+            return path
+
+        if not self.storage.exists(path):
+            if isinstance(source, (bytes, bytearray)):
+                content = ContentFile(bytes(source))
+            else:
+                source.seek(0)
+                content = File(source)
+            saved = self.storage.save(path, content)
+            if saved != path:
+                # 동시에 같은 내용을 먼저 저장한 요청이 있음 → 이름이 바뀐 사본은 삭제
+                self.storage.delete(saved)
+            if not isinstance(source, (bytes, bytearray)):
+                source.seek(0)
+        Blob.objects.get_or_create(
+            sha256=sha256,
+            defaults={'size': _size_of(source), 'content_type': content_type},
+        )
+        return path
+
+    def open(self, path: str):
+        return self.storage.open(path, 'rb')
+
+    def attach(
+        self,
+        request: GenerationRequest,
+        *,
+        person=None,
+        product=None,
+        result=None,
+        product_sha256: Optional[str] = None,
+        result_type: str = 'image/png',
+    ) -> None:
+        """Store the request's images and point its path columns at them. Failures are logged, not raised."""
+
+        if not self.config['enabled']:
+            return
+        try:
+            refs: Counter = Counter()
+            update_fields = []
+            if self.config['store_inputs']:
+                if person is not None:
+                    request.person_image_path = self.put(person, getattr(person, 'content_type', '') or '')
+                    refs[request.person_image_path] += 1
+                    update_fields.append('person_image_path')
+                if product is not None:
+                    request.product_image_path = self.put(
+                        product, getattr(product, 'content_type', '') or '', sha256=product_sha256,
+                    )
+                    refs[request.product_image_path] += 1
+                    update_fields.append('product_image_path')
+            if result is not None:
+                request.result_image_path = self.put(result, result_type)
+                refs[request.result_image_path] += 1
+                update_fields.append('result_image_path')
+            if update_fields:
+                request.save(update_fields=update_fields)
+            for path, count in refs.items():
+                Blob.objects.filter(sha256=path.rsplit('/', 1)[-1]).update(ref_count=F('ref_count') + count)
+        except Exception as exc:  # pylint: disable=broad-except
+            log_service_err(
+                level=ErrorLevel.WARN,
+                err_from='BlobStore.attach',
+                shop=request.shop,
+                message=str(exc),
+            )
+
+    # ---------- garbage collection ----------
+    def _mark(self) -> Counter:
+        marks: Counter = Counter()
+        referencing = GenerationRequest.objects.filter(
+            Q(person_image_path__startswith=BLOB_PREFIX)
+            | Q(product_image_path__startswith=BLOB_PREFIX)
+            | Q(result_image_path__startswith=BLOB_PREFIX)
+        ).values_list(*_PATH_FIELDS)
+        for paths in referencing.iterator(chunk_size=5000):
+            for path in paths:
+                if path.startswith(BLOB_PREFIX):
+                    # 메모리 절약을 위해 16진수 문자열 대신 32바이트 digest 로 보관
+                    marks[bytes.fromhex(path.rsplit('/', 1)[-1])] += 1
+        return marks
+
+    def _sweep_orphan_files(self, cutoff, dry_run: bool, stats: dict):
+        """Files under ``blobs/`` without a ``Blob`` row (e.g. the process died between write and insert)."""
+
+        storage = self.storage
+        # listdir() 는 (디렉터리, 파일) 순서
+        shards, _ = storage.listdir(BLOB_PREFIX.rstrip('/'))
+        for shard in shards:
+            subshards, _ = storage.listdir(f'{BLOB_PREFIX}{shard}')
+            for subshard in subshards:
+                directory = f'{BLOB_PREFIX}{shard}/{subshard}'
+                _, names = storage.listdir(directory)
+                known = set(Blob.objects.filter(sha256__in=names).values_list('sha256', flat=True))
+                for name in names:
+                    if name in known:
+                        continue
+                    path = f'{directory}/{name}'
+                    try:
+                        if storage.get_modified_time(path) >= cutoff:
+                            continue
+                    except NotImplementedError:
+                        pass
+                    stats['orphan_files'] += 1
+                    if not dry_run:
+                        storage.delete(path)
+
+    def collect_garbage(
+        self,
+        *,
+        grace: Optional[timedelta] = None,
+        batch_size: int = 1000,
+        dry_run: bool = False,
+        scan_storage: bool = False,
+    ) -> dict:
+        grace = grace if grace is not None else timedelta(hours=self.config['gc_grace_hours'])
+        cutoff = timezone.now() - grace
+        marks = self._mark()
+        stats = {
+            'referenced_blobs': len(marks),
+            'references': sum(marks.values()),
+            'scanned': 0,
+            'recounted': 0,
+            'deleted': 0,
+            'deleted_bytes': 0,
+            'orphan_files': 0,
+            'dry_run': dry_run,
+        }
+
+        last_pk = 0
+        while True:
+            batch = list(
+                Blob.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .only('pk', 'sha256', 'size', 'ref_count', 'last_referenced_at')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            stats['scanned'] += len(batch)
+            recount, sweep = [], []
+            for blob in batch:
+                refs = marks.get(bytes.fromhex(blob.sha256), 0)
+                if refs == 0 and blob.last_referenced_at < cutoff:
+                    sweep.append(blob)
+                elif refs != blob.ref_count:
+                    blob.ref_count = refs
+                    recount.append(blob)
+            stats['recounted'] += len(recount)
+            if dry_run:
+                stats['deleted'] += len(sweep)
+                stats['deleted_bytes'] += sum(blob.size for blob in sweep)
+                continue
+            Blob.objects.bulk_update(recount, ['ref_count'])
+            for blob in sweep:
+                # put() 이 그 사이 다시 참조했다면 last_referenced_at 이 갱신되어 삭제되지 않음
+                deleted, _ = Blob.objects.filter(pk=blob.pk, last_referenced_at__lt=cutoff).delete()
+                if deleted and not Blob.objects.filter(sha256=blob.sha256).exists():
+                    self.storage.delete(blob.path)
+                    stats['deleted'] += 1
+                    stats['deleted_bytes'] += blob.size
+
+        if scan_storage and self.storage.exists(BLOB_PREFIX.rstrip('/')):
+            self._sweep_orphan_files(cutoff, dry_run, stats)
+        return stats
+
+
+blob_store = BlobStore()
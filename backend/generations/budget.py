@@ -0,0 +1,139 @@
+"""Pre-flight token budget check for generate requests.
+
+Before any upstream call, ``TokenBudget.preflight`` estimates the request's tokens from the
+image dimensions and prompts (``GeminiAPIService.estimate_tokens``) and compares the estimate
+with the shop tier's limits (``PLAN_TIER_TOKEN_BUDGETS``): the per-request cap and what is
+left of the monthly budget in the ``ShopUsage.used_tokens`` ledger. A request over a limit is
+downscaled to the largest ``TOKEN_BUDGET['downscale_steps']`` size that fits, or rejected.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from PIL import Image
+
+from users.models import ShopProfile, ShopUsage
+
+from .prompt_cache import upstream_tokens
+from .services import GeminiAPIService
+from .stats import percentile
+
+PER_REQUEST = 'per_request'
+MONTHLY = 'monthly'
+
+
+@dataclass
+class BudgetDecision:
+    allowed: bool
+    estimated_tokens: int
+    max_side: Optional[int] = None
+    # 제한에 걸린 한도 (per_request / monthly), 통과면 ''
+    limited_by: str = ''
+    limit: Optional[int] = None
+
+    @property
+    def downscaled(self) -> bool:
+        return self.max_side is not None
+
+
+def image_size(upload) -> tuple[int, int]:
+    # 헤더만 읽음 (디코딩 없음)
+    upload.seek(0)
+    with Image.open(upload) as img:
+        size = img.size
+    upload.seek(0)
+    return size
+
+
+class TokenBudget:
+    @property
+    def config(self) -> dict:
+        return settings.TOKEN_BUDGET
+
+    def _limit(self, shop: ShopProfile) -> tuple[Optional[int], str]:
+        budget = shop.token_budget
+        limits = []
+        if budget['per_request']:
+            limits.append((budget['per_request'], PER_REQUEST))
+        if budget['monthly']:
+            limits.append((max(budget['monthly'] - ShopUsage.tokens_used(shop), 0), MONTHLY))
+        if not limits:
+            return None, ''
+        return min(limits)
+
+    def preflight(self, shop: ShopProfile, person_image, product_images: list) -> BudgetDecision:
+        person_size = image_size(person_image)
+        product_sizes = [image_size(upload) for upload in product_images]
+        estimate = GeminiAPIService.estimate_tokens(person_size, product_sizes)
+        if not self.config['enabled']:
+            return BudgetDecision(allowed=True, estimated_tokens=estimate)
+
+        limit, limited_by = self._limit(shop)
+        if limit is None or estimate <= limit:
+            return BudgetDecision(allowed=True, estimated_tokens=estimate)
+
+        if self.config['downscale']:
+            longest = max(max(person_size), *(max(size) for size in product_sizes))
+            for max_side in sorted(self.config['downscale_steps'], reverse=True):
+                if max_side >= longest:
+                    continue
+                scaled = GeminiAPIService.estimate_tokens(person_size, product_sizes, max_side=max_side)
+                if scaled <= limit:
+                    return BudgetDecision(
+                        allowed=True, estimated_tokens=scaled, max_side=max_side,
+                        limited_by=limited_by, limit=limit,
+                    )
+        return BudgetDecision(allowed=False, estimated_tokens=estimate, limited_by=limited_by, limit=limit)
+
+
+token_budget = TokenBudget()
+
+
+def _summary(errors: list[float], estimated: int, actual: int) -> dict:
+    absolute = [abs(error) for error in errors]
+    return {
+        'requests': len(errors),
+        'estimated_tokens': estimated,
+        'actual_tokens': actual,
+        # > 1 이면 과대 추정 (예산을 보수적으로 소모)
+        'ratio': round(estimated / actual, 3) if actual else None,
+        'mean_error_pct': round(sum(errors) / len(errors), 2) if errors else 0.0,
+        'mean_abs_error_pct': round(sum(absolute) / len(absolute), 2) if absolute else 0.0,
+        'p50_abs_error_pct': round(percentile(absolute, 50), 2),
+        'p95_abs_error_pct': round(percentile(absolute, 95), 2),
+    }
+
+
+def estimate_accuracy(since) -> dict:
+    """Pre-flight estimates against the upstream token counts of successful requests.
+
+    Grouped by edit model and by whether the product was classified upstream: the estimate
+    always includes a classify call, which the sha256/phash/local classifier paths skip.
+    """
+
+    from .models import GenerationRequest, GenerationStatus
+
+    rows = GenerationRequest.objects.filter(
+        status=GenerationStatus.SUCCESS,
+        created_at__gte=since,
+        estimated_tokens__gt=0,
+    ).values_list('estimated_tokens', 'used_tokens', 'cached_tokens', 'edit_model', 'classify_model')
+
+    groups: dict[str, list] = {}
+    overall = [[], 0, 0]
+    for estimated, used, cached, edit_model, classify_model in rows.iterator(chunk_size=2000):
+        # used_tokens 는 캐시 토큰을 할인 적용해 기록 → 업스트림 총 토큰으로 되돌림
+        actual = upstream_tokens(used, cached)
+        if not actual:
+            continue
+        classified = 'upstream' if classify_model and ':' not in classify_model else 'skipped'
+        error = (estimated - actual) / actual * 100
+        for bucket in (groups.setdefault(f'{edit_model or "-"} / classify {classified}', [[], 0, 0]), overall):
+            bucket[0].append(error)
+            bucket[1] += estimated
+            bucket[2] += actual
+    return {
+        'overall': _summary(*overall),
+        'groups': {name: _summary(*bucket) for name, bucket in sorted(groups.items())},
+    }
@@ -0,0 +1,182 @@
+"""CPU-local product classifier trained from past upstream (Gemini) labels.
+
+Features are cheap NumPy statistics of a downsampled image: an RGB color histogram, a
+gradient-orientation histogram, edge energy per horizontal/vertical band and the aspect
+ratio. A k-NN vote over standardized features gives a label and a confidence; below
+``LOCAL_CLASSIFIER['min_confidence']`` the caller asks Gemini instead and stores its label.
+"""
+
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+FEATURE_SIZE = 64
+COLOR_BINS = 4
+ORIENTATION_BINS = 8
+BANDS = 4
+
+
+def extract_features(img: Image.Image) -> np.ndarray:
+    width, height = img.size
+    small = img.convert('RGB').resize((FEATURE_SIZE, FEATURE_SIZE), Image.BILINEAR)
+    rgb = np.asarray(small, dtype=np.float32) / 255.0
+
+    # color histogram (4x4x4 bins)
+    idx = np.minimum((rgb * COLOR_BINS).astype(np.int32), COLOR_BINS - 1)
+    flat = idx[..., 0] * COLOR_BINS * COLOR_BINS + idx[..., 1] * COLOR_BINS + idx[..., 2]
+    color = np.bincount(flat.ravel(), minlength=COLOR_BINS ** 3).astype(np.float32)
+    color /= color.sum() or 1.0
+
+    # gradient orientation histogram weighted by magnitude
+    gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    gy, gx = np.gradient(gray)
+    magnitude = np.hypot(gx, gy)
+    orientation = (np.arctan2(gy, gx) % np.pi) / np.pi
+    bins = np.minimum((orientation * ORIENTATION_BINS).astype(np.int32), ORIENTATION_BINS - 1)
+    edges = np.bincount(bins.ravel(), weights=magnitude.ravel(), minlength=ORIENTATION_BINS).astype(np.float32)
+    total = magnitude.sum() or 1.0
+    edges /= total
+
+    # where the edges are (garment silhouette: upper vs lower body, narrow vs wide)
+    rows = magnitude.reshape(BANDS, -1).sum(axis=1) / total
+    cols = magnitude.T.reshape(BANDS, -1).sum(axis=1) / total
+
+    aspect = np.array([np.log(max(width, 1) / max(height, 1))], dtype=np.float32)
+    return np.concatenate([color, edges, rows.astype(np.float32), cols.astype(np.float32), aspect])
+
+
+def features_to_bytes(vector: np.ndarray) -> bytes:
+    return vector.astype(np.float32).tobytes()
+
+
+def features_from_bytes(raw: bytes) -> np.ndarray:
+    return np.frombuffer(bytes(raw), dtype=np.float32)
+
+
+class KNNClassifier:
+    def __init__(self, k: int = 7):
+        self.k = k
+        self.labels: list[str] = []
+        self._x = np.empty((0, 0), dtype=np.float32)
+        self._y = np.empty(0, dtype=np.int32)
+        self._mean = None
+        self._std = None
+
+    def __len__(self):
+        return len(self._y)
+
+    def fit(self, x: np.ndarray, y: list[str]) -> 'KNNClassifier':
+        self.labels = sorted(set(y))
+        index = {label: i for i, label in enumerate(self.labels)}
+        x = np.asarray(x, dtype=np.float32)
+        self._mean = x.mean(axis=0) if len(x) else None
+        self._std = (x.std(axis=0) + 1e-6) if len(x) else None
+        self._x = self._scale(x) if len(x) else x
+        self._y = np.array([index[label] for label in y], dtype=np.int32)
+        return self
+
+    def _scale(self, x: np.ndarray) -> np.ndarray:
+        return (x - self._mean) / self._std
+
+    def predict(self, vector: np.ndarray) -> Optional[tuple[str, float]]:
+        """(label, confidence) where confidence is the distance-weighted vote share of the winner."""
+
+        if not len(self._y):
+            return None
+        query = self._scale(np.asarray(vector, dtype=np.float32))
+        distances = np.sqrt(((self._x - query) ** 2).sum(axis=1))
+        k = min(self.k, len(distances))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        weights = 1.0 / (distances[nearest] + 1e-6)
+        votes = np.bincount(self._y[nearest], weights=weights, minlength=len(self.labels))
+        best = int(votes.argmax())
+        return self.labels[best], float(votes[best] / votes.sum())
+
+
+class LocalProductClassifier:
+    """Process-wide k-NN model, rebuilt from ``ProductImage`` rows every ``reload_seconds``.
+
+    Rebuilds run in a background thread and replace the model in one assignment, so requests
+    never wait for one: they use the model they find, or ask Gemini while the first one loads.
+    """
+
+    def __init__(self):
+        self._model: Optional[KNNClassifier] = None
+        self._next_load_at = 0.0
+        self._loading = False
+        self._lock = threading.Lock()
+
+    @property
+    def config(self) -> dict:
+        return settings.LOCAL_CLASSIFIER
+
+    @property
+    def enabled(self) -> bool:
+        return self.config['enabled']
+
+    def _load(self) -> KNNClassifier:
+        from .models import ProductImage, LabelSource
+
+        rows = list(
+            ProductImage.objects.filter(label_source=LabelSource.GEMINI)
+            .order_by('-id')
+            .values_list('features', 'category')[: self.config['max_samples']]
+        )
+        model = KNNClassifier(k=self.config['k'])
+        if rows:
+            model.fit(np.stack([features_from_bytes(raw) for raw, _ in rows]), [label for _, label in rows])
+        return model
+
+    def reload(self) -> KNNClassifier:
+        """Build a new model and swap it in (requests keep using the old one until then)."""
+
+        model = self._load()
+        self._model = model
+        return model
+
+    def start_reload(self) -> None:
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+            self._next_load_at = time.monotonic() + self.config['reload_seconds']
+        threading.Thread(target=self._reload_in_background, name='classifier-reload', daemon=True).start()
+
+    def _reload_in_background(self):
+        from django.db import connection
+
+        try:
+            self.reload()
+        except Exception:  # pylint: disable=broad-except
+            # 실패하면 기존 모델 유지, reload_seconds 뒤 다시 시도
+            pass
+        finally:
+            self._loading = False
+            connection.close()
+
+    def model(self) -> Optional[KNNClassifier]:
+        """Current model (``None`` until the first build finishes); starts a rebuild when it is due."""
+
+        if time.monotonic() >= self._next_load_at:
+            self.start_reload()
+        return self._model
+
+    def predict(self, vector: np.ndarray) -> Optional[tuple[str, float]]:
+        """Confident local answer, or ``None`` when Gemini should be asked."""
+
+        if not self.enabled:
+            return None
+        model = self.model()
+        if model is None or len(model) < self.config['min_samples']:
+            return None
+        result = model.predict(vector)
+        if result is None or result[1] < self.config['min_confidence']:
+            return None
+        return result
+
+
+local_classifier = LocalProductClassifier()
@@ -0,0 +1,77 @@
+"""Request deadlines for the generate endpoints.
+
+A storefront widget stops waiting after its own timeout. The client sends that budget as the
+``X-Deadline-Ms`` header (milliseconds, counted from sending). Without the header, the shop's
+``generation_timeout_ms`` or ``GENERATION_DEADLINE['default_ms']`` applies. The deadline caps
+every upstream call's timeout. The pipeline skips Gemini classification when it would leave
+too little time for the edit, and doesn't start an edit it can't finish. When the deadline
+passes, ``DeadlineExceeded`` ends the request with a ``504`` and the view refunds the quota.
+"""
+
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.http import JsonResponse
+
+# 기한 초과 504 표시 (부하 제한기가 업스트림 장애와 구분)
+DEADLINE_EXCEEDED_HEADER = 'Deadline-Exceeded'
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage: str):
+        super().__init__(f'Deadline exceeded before {stage} finished.')
+        self.stage = stage
+
+
+class Deadline:
+    def __init__(self, timeout_ms: float):
+        self.timeout_ms = timeout_ms
+        self.expires_at = time.monotonic() + timeout_ms / 1000
+
+    def remaining_ms(self) -> float:
+        return max((self.expires_at - time.monotonic()) * 1000, 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def clamp_ms(self, timeout_ms: int) -> int:
+        """``timeout_ms`` cut to the time left (at least 1 ms, so the call fails fast)."""
+
+        return max(min(int(timeout_ms), int(self.remaining_ms())), 1)
+
+    def check(self, stage: str, need_ms: float = 0):
+        if self.remaining_ms() <= need_ms:
+            raise DeadlineExceeded(stage)
+
+    def affords(self, cost_ms: float, reserve_ms: float = 0, max_share: float = 1.0) -> bool:
+        """Whether a step expected to take ``cost_ms`` fits, leaving ``reserve_ms`` for what follows."""
+
+        remaining = self.remaining_ms()
+        return cost_ms <= remaining * max_share and remaining - cost_ms >= reserve_ms
+
+
+def request_deadline(request, shop) -> Optional[Deadline]:
+    # 헤더 → 상점 기본값 → 전역 기본값 순. 0 이면 기한 없음 (기존 단계별 타임아웃만 적용)
+    config = settings.GENERATION_DEADLINE
+    if not config['enabled']:
+        return None
+    raw = request.headers.get(config['header'], '').strip()
+    timeout_ms = int(raw) if raw.isdigit() else 0
+    if not timeout_ms:
+        timeout_ms = shop.generation_timeout_ms or config['default_ms']
+    if not timeout_ms:
+        return None
+    # 응답 전송 시간만큼 일찍 끝내고, 상한은 설정값
+    timeout_ms = min(timeout_ms, config['max_ms']) - config['margin_ms']
+    return Deadline(max(timeout_ms, 0))
+
+
+def deadline_response(exc: DeadlineExceeded) -> JsonResponse:
+    response = JsonResponse(
+        {'error': 'Deadline exceeded.', 'stage': exc.stage},
+        status=504,
+    )
+    response[DEADLINE_EXCEEDED_HEADER] = 'true'
+    return response
@@ -0,0 +1,185 @@
+"""Streaming CSV/JSONL exports of a shop's generations, usage periods and error logs.
+
+Rows are read with ``values_list(...).iterator(chunk_size=EXPORT['chunk_size'])`` (a server-side
+cursor on PostgreSQL) and encoded into pieces of about ``EXPORT['buffer_bytes']`` as they arrive,
+optionally through a streaming gzip compressor, so memory stays flat however large the export is.
+The same generator backs ``GET /api/shops/<shop_id>/export/<dataset>/`` and ``export_shop_data``.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from users.models import ServiceErrorLog, ShopProfile, ShopUsage
+
+from .models import GenerationErrorLog, GenerationRequest
+
+CSV = 'csv'
+JSONL = 'jsonl'
+CONTENT_TYPES = {CSV: 'text/csv; charset=utf-8', JSONL: 'application/x-ndjson'}
+GZIP_CONTENT_TYPE = 'application/gzip'
+# 스프레드시트가 수식으로 해석하는 값은 앞에 ' 를 붙임 (CSV injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+GENERATION_COLUMNS = (
+    'id',
+    'created_at',
+    'status',
+    'customer_reference',
+    'product_reference',
+    'latency_ms',
+    'used_tokens',
+    'cached_tokens',
+    'estimated_tokens',
+    'classify_model',
+    'edit_model',
+    'error_code',
+)
+
+
+class UnknownExport(ValueError):
+    pass
+
+
+def _day_range(start: date, end: date) -> tuple[datetime, datetime]:
+    # 날짜는 현재 타임존 기준, end 포함
+    return (
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+
+
+def _generation_rows(shop: ShopProfile, start: date, end: date, using: str, chunk_size: int) -> Iterator[tuple]:
+    since, until = _day_range(start, end)
+    return (
+        GenerationRequest.objects.using(using)
+        .filter(shop=shop, created_at__gte=since, created_at__lt=until)
+        .order_by('id')
+        .values_list(*GENERATION_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _usage_rows(shop: ShopProfile, start: date, end: date, using: str, chunk_size: int) -> Iterator[tuple]:
+    periods = ShopUsage.objects.using(using).filter(shop=shop, period_start__gte=start, period_start__lte=end)
+    return (
+        ShopUsage.with_shard_totals(periods)
+        .order_by('period_start', 'period_type')
+        .values_list('period_type', 'period_start', 'quota_snapshot', 'total_requests', 'total_tokens', 'last_updated_at')
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _error_rows(shop: ShopProfile, start: date, end: date, using: str, chunk_size: int) -> Iterator[tuple]:
+    since, until = _day_range(start, end)
+    service = (
+        ServiceErrorLog.objects.using(using)
+        .filter(shop=shop, timestamp__gte=since, timestamp__lt=until)
+        .order_by('timestamp', 'id')
+        .values_list('timestamp', 'level', 'err_from', 'message')
+    )
+    for row in service.iterator(chunk_size=chunk_size):
+        yield ('service', *row, None)
+    generation = (
+        GenerationErrorLog.objects.using(using)
+        .filter(request__shop=shop, timestamp__gte=since, timestamp__lt=until)
+        .order_by('timestamp', 'id')
+        .values_list('timestamp', 'level', 'err_from', 'gemini_message', 'request_id')
+    )
+    for row in generation.iterator(chunk_size=chunk_size):
+        yield ('generation', *row)
+
+
+# dataset → (열 이름, 행 생성기)
+DATASETS: dict[str, tuple[tuple[str, ...], Callable[..., Iterator[tuple]]]] = {
+    'generations': (GENERATION_COLUMNS, _generation_rows),
+    'usage': (
+        ('period_type', 'period_start', 'quota', 'used_requests', 'used_tokens', 'updated_at'),
+        _usage_rows,
+    ),
+    'errors': (
+        ('source', 'timestamp', 'level', 'err_from', 'message', 'request_id'),
+        _error_rows,
+    ),
+}
+
+
+def _csv_cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_pieces(columns: tuple[str, ...], rows: Iterable[tuple], buffer_bytes: int) -> Iterator[str]:
+    buffer = io.StringIO()
+    # Excel 이 UTF-8 (한글) 로 열도록 BOM
+    buffer.write('\ufeff')
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_csv_cell(value) for value in row])
+        if buffer.tell() >= buffer_bytes:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _jsonl_pieces(columns: tuple[str, ...], rows: Iterable[tuple], buffer_bytes: int) -> Iterator[str]:
+    lines, size = [], 0
+    for row in rows:
+        line = json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= buffer_bytes:
+            yield ''.join(lines)
+            lines, size = [], 0
+    yield ''.join(lines)
+
+
+def validate(dataset: str, fmt: str):
+    if dataset not in DATASETS:
+        raise UnknownExport(f'Unknown dataset. Choose one of: {", ".join(DATASETS)}')
+    if fmt not in CONTENT_TYPES:
+        raise UnknownExport(f'Unknown format. Choose one of: {", ".join(CONTENT_TYPES)}')
+
+
+def stream_export(
+    dataset: str,
+    shop: ShopProfile,
+    start: date,
+    end: date,
+    fmt: str = CSV,
+    compress: bool = False,
+    using: Optional[str] = None,
+) -> Iterator[bytes]:
+    """Encoded (and with ``compress``, gzipped) export of ``dataset`` for ``start``..``end`` inclusive."""
+
+    validate(dataset, fmt)
+    config = settings.EXPORT
+    columns, rows_of = DATASETS[dataset]
+    rows = rows_of(shop, start, end, using or 'default', config['chunk_size'])
+    pieces = _csv_pieces if fmt == CSV else _jsonl_pieces
+    # wbits=31: gzip 헤더/트레일러 포함 스트림
+    compressor = zlib.compressobj(config['gzip_level'], zlib.DEFLATED, 31) if compress else None
+    for piece in pieces(columns, rows, config['buffer_bytes']):
+        data = piece.encode('utf-8')
+        if compressor is not None:
+            data = compressor.compress(data)
+        if data:
+            yield data
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def export_filename(dataset: str, shop: ShopProfile, start: date, end: date, fmt: str, compress: bool) -> str:
+    return f'{shop.shop_id}-{dataset}-{start:%Y%m%d}-{end:%Y%m%d}.{fmt}' + ('.gz' if compress else '')
@@ -0,0 +1,405 @@
+"""Local stand-ins for upstream services, used by benchmarks and local development.
+
+``FakeGeminiServer`` speaks enough of the Gemini REST API (``models/*:generateContent`` and
+``cachedContents``) for ``google.genai.Client`` to talk to it when pointed at ``http_options.base_url``.
+``FakeWebhookReceiver`` stands in for shops' ``callback_url`` endpoints and checks signatures.
+"""
+
+import base64
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from typing import Optional
+
+from PIL import Image
+
+
+def parse_latency(spec: str):
+    """Build a latency sampler (seconds) from ``fixed:MS``, ``uniform:LO:HI`` or ``lognormal:MEDIAN:SIGMA``."""
+
+    kind, _, rest = (spec or 'fixed:0').partition(':')
+    params = [float(p) for p in rest.split(':') if p]
+    if kind == 'fixed':
+        value = (params[0] if params else 0.0) / 1000
+        return lambda rng: value
+    if kind == 'uniform':
+        low, high = params
+        return lambda rng: rng.uniform(low, high) / 1000
+    if kind == 'lognormal':
+        median, sigma = params
+        mu = math.log(max(median, 1e-3))
+        return lambda rng: rng.lognormvariate(mu, sigma) / 1000
+    raise ValueError(f'Unknown latency distribution: {spec}')
+
+
+def make_png(width: int, height: int, seed: int = 0) -> bytes:
+    """Noise PNG of the given size; noise keeps the encoded payload close to a real photo's size."""
+
+    rng = random.Random(seed)
+    img = Image.frombytes('RGB', (width, height), rng.randbytes(width * height * 3))
+    buf = BytesIO()
+    img.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+class _FakeGeminiHandler(BaseHTTPRequestHandler):
+    server: '_FakeHTTPServer'
+    protocol_version = 'HTTP/1.1'
+
+    _GENERATE_RE = re.compile(r'^/[^/]+/models/(?P<model>[^/:]+):generateContent$')
+    _CACHE_RE = re.compile(r'^/[^/]+/(?P<name>cachedContents(?:/[^/?]+)?)$')
+
+    def log_message(self, format, *args):  # noqa: A002 - silence default stderr logging
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        return json.loads(raw or b'{}')
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self, method: str):
+        fake = self.server.fake
+        path = self.path.split('?', 1)[0]
+        body = self._read_json() if method in ('POST', 'PATCH') else {}
+        match = self._GENERATE_RE.match(path)
+        if method == 'POST' and match:
+            status, payload = fake.handle_generate(match.group('model'), body, self.headers.get('x-goog-api-key', ''))
+        elif (cache_match := self._CACHE_RE.match(path)):
+            status, payload = fake.handle_cache(method, cache_match.group('name'), body)
+        else:
+            status, payload = 404, {'error': {'code': 404, 'message': f'Unknown path {self.path}', 'status': 'NOT_FOUND'}}
+        self._send_json(status, payload)
+
+    def do_POST(self):
+        self._route('POST')
+
+    def do_PATCH(self):
+        self._route('PATCH')
+
+    def do_GET(self):
+        self._route('GET')
+
+    def do_DELETE(self):
+        self._route('DELETE')
+
+
+class _FakeWebhookHandler(BaseHTTPRequestHandler):
+    server: '_FakeHTTPServer'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):  # noqa: A002 - silence default stderr logging
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status = self.server.fake.handle_webhook(self.path, self.headers, body)
+        self.send_response(status)
+        if status == 429:
+            self.send_header('Retry-After', '1')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+class _FakeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler, fake):
+        super().__init__(address, handler)
+        self.fake = fake
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-response; that is expected, not an error.
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeGeminiServer:
+    """In-process HTTP server emulating ``generate_content`` with configurable latency, errors and payloads."""
+
+    def __init__(
+        self,
+        *,
+        latency: str = 'fixed:0',
+        classify_latency: Optional[str] = None,
+        error_rate: float = 0.0,
+        image_size: tuple[int, int] = (1024, 1024),
+        label: str = 'top',
+        min_cache_tokens: int = 0,
+        key_rpm: int = 0,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        seed: Optional[int] = None,
+    ):
+        self.edit_latency = parse_latency(latency)
+        self.classify_latency = parse_latency(classify_latency or latency)
+        self.error_rate = error_rate
+        self.label = label
+        self.min_cache_tokens = min_cache_tokens
+        # 키별 분당 요청 한도 (초과 시 429 + RetryInfo), 0 이면 무제한
+        self.key_rpm = key_rpm
+        self._key_requests: dict[str, list[float]] = {}
+        self.key_calls: dict[str, int] = {}
+        self.caches: dict[str, dict] = {}
+        self.image_b64 = base64.b64encode(make_png(*image_size)).decode('ascii')
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._httpd = _FakeHTTPServer((host, port), _FakeGeminiHandler, self)
+        self._thread: Optional[threading.Thread] = None
+        self.calls: dict[str, int] = {}
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self) -> 'FakeGeminiServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake-gemini', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------- request handling ----------
+    def _sample(self, sampler) -> tuple[float, bool]:
+        with self._rng_lock:
+            return sampler(self._rng), self._rng.random() < self.error_rate
+
+    def _count(self, key: str):
+        with self._rng_lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    @staticmethod
+    def _not_found(name: str) -> tuple[int, dict]:
+        return 404, {'error': {'code': 404, 'message': f'CachedContent not found: {name}', 'status': 'NOT_FOUND'}}
+
+    def _cache_resource(self, name: str) -> dict:
+        entry = self.caches[name]
+        return {
+            'name': name,
+            'model': entry['model'],
+            'displayName': entry.get('displayName', ''),
+            'expireTime': entry['expires_at'].isoformat().replace('+00:00', 'Z'),
+            'usageMetadata': {'totalTokenCount': entry['tokens']},
+        }
+
+    @staticmethod
+    def _ttl(body: dict) -> timedelta:
+        return timedelta(seconds=float(str(body.get('ttl') or '3600s').rstrip('s')))
+
+    def handle_cache(self, method: str, name: str, body: dict) -> tuple[int, dict]:
+        now = datetime.now(timezone.utc)
+        with self._rng_lock:
+            for key in [k for k, v in self.caches.items() if v['expires_at'] <= now]:
+                del self.caches[key]
+            if method == 'POST' and name == 'cachedContents':
+                self.calls['cache:create'] = self.calls.get('cache:create', 0) + 1
+                tokens = self._prompt_tokens(body)
+                if tokens < self.min_cache_tokens:
+                    return 400, {'error': {
+                        'code': 400,
+                        'message': f'Cached content is too small. total_token_count={tokens}, min={self.min_cache_tokens}',
+                        'status': 'INVALID_ARGUMENT',
+                    }}
+                name = f'cachedContents/{uuid.uuid4().hex[:12]}'
+                self.caches[name] = {
+                    'model': body.get('model', ''),
+                    'displayName': body.get('displayName', ''),
+                    'tokens': tokens,
+                    'expires_at': now + self._ttl(body),
+                }
+                return 200, self._cache_resource(name)
+            if name not in self.caches:
+                return self._not_found(name)
+            if method == 'PATCH':
+                self.calls['cache:update'] = self.calls.get('cache:update', 0) + 1
+                self.caches[name]['expires_at'] = now + self._ttl(body)
+            elif method == 'DELETE':
+                del self.caches[name]
+                return 200, {}
+            return 200, self._cache_resource(name)
+
+    @staticmethod
+    def _prompt_tokens(body: dict) -> int:
+        tokens = 0
+        for content in body.get('contents', []):
+            for part in content.get('parts', []):
+                if 'inlineData' in part:
+                    tokens += 258
+                elif 'text' in part:
+                    tokens += max(1, len(part['text']) // 4)
+        instruction = body.get('systemInstruction') or {}
+        for part in instruction.get('parts', []):
+            tokens += max(1, len(part.get('text', '')) // 4)
+        return tokens
+
+    def _rate_limited(self, api_key: str) -> Optional[tuple[int, dict]]:
+        now = time.monotonic()
+        with self._rng_lock:
+            self.key_calls[api_key] = self.key_calls.get(api_key, 0) + 1
+            if not self.key_rpm:
+                return None
+            recent = [t for t in self._key_requests.get(api_key, []) if t > now - 60]
+            if len(recent) >= self.key_rpm:
+                self._key_requests[api_key] = recent
+                retry = max(int(recent[0] + 60 - now) + 1, 1)
+                return 429, {'error': {
+                    'code': 429,
+                    'message': 'Resource has been exhausted (e.g. check quota).',
+                    'status': 'RESOURCE_EXHAUSTED',
+                    'details': [{'@type': 'type.googleapis.com/google.rpc.RetryInfo', 'retryDelay': f'{retry}s'}],
+                }}
+            recent.append(now)
+            self._key_requests[api_key] = recent
+        return None
+
+    def handle_generate(self, model: str, body: dict, api_key: str = '') -> tuple[int, dict]:
+        modalities = (body.get('generationConfig') or {}).get('responseModalities') or ['TEXT']
+        wants_image = 'IMAGE' in modalities
+        limited = self._rate_limited(api_key)
+        if limited:
+            return limited
+        self._count(f'{model}:{"edit" if wants_image else "classify"}')
+
+        delay, failed = self._sample(self.edit_latency if wants_image else self.classify_latency)
+        time.sleep(delay)
+        if failed:
+            return 500, {'error': {'code': 500, 'message': 'Injected failure', 'status': 'INTERNAL'}}
+
+        prompt_tokens = self._prompt_tokens(body)
+        cached_tokens = 0
+        if body.get('cachedContent'):
+            with self._rng_lock:
+                entry = self.caches.get(body['cachedContent'])
+                if entry is None or entry['expires_at'] <= datetime.now(timezone.utc):
+                    return self._not_found(body['cachedContent'])
+                cached_tokens = entry['tokens']
+            prompt_tokens += cached_tokens
+        if wants_image:
+            part = {'inlineData': {'mimeType': 'image/png', 'data': self.image_b64}}
+            output_tokens = 1290
+        else:
+            part = {'text': self.label}
+            output_tokens = 1
+        return 200, {
+            'candidates': [{'content': {'role': 'model', 'parts': [part]}, 'finishReason': 'STOP'}],
+            'usageMetadata': {
+                'promptTokenCount': prompt_tokens,
+                'candidatesTokenCount': output_tokens,
+                'totalTokenCount': prompt_tokens + output_tokens,
+                'cachedContentTokenCount': cached_tokens,
+            },
+            'modelVersion': model,
+        }
+
+
+class FakeWebhookReceiver:
+    """In-process webhook endpoint: ``/hooks/<shop_id>`` answers 200, or an injected error status.
+
+    ``secrets`` maps shop ids to their webhook secrets; requests with a bad signature get 401
+    and are counted in ``bad_signatures``. ``max_concurrency`` records the highest number of
+    simultaneous requests seen per path, to check the dispatcher's per-endpoint limit.
+    """
+
+    def __init__(
+        self,
+        *,
+        secrets: Optional[dict[str, str]] = None,
+        latency: str = 'fixed:0',
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        seed: Optional[int] = None,
+    ):
+        self.secrets = secrets or {}
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = _FakeHTTPServer((host, port), _FakeWebhookHandler, self)
+        self._thread: Optional[threading.Thread] = None
+        self.requests = 0
+        self.failures = 0
+        self.bad_signatures = 0
+        self.events: dict[str, list[dict]] = {}
+        self.max_concurrency: dict[str, int] = {}
+        self._active: dict[str, int] = {}
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def url_for(self, shop_id: str) -> str:
+        return f'{self.url}hooks/{shop_id}'
+
+    def start(self) -> 'FakeWebhookReceiver':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake-webhooks', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def handle_webhook(self, path: str, headers, body: bytes) -> int:
+        from .webhooks import SIGNATURE_HEADER, verify
+
+        shop_id = path.rstrip('/').rsplit('/', 1)[-1]
+        with self._lock:
+            self.requests += 1
+            self._active[path] = self._active.get(path, 0) + 1
+            self.max_concurrency[path] = max(self.max_concurrency.get(path, 0), self._active[path])
+            delay = self.latency(self._rng)
+            failed = self._rng.random() < self.error_rate
+        try:
+            time.sleep(delay)
+            secret = self.secrets.get(shop_id)
+            if secret is not None and not verify(secret, headers.get(SIGNATURE_HEADER, ''), body):
+                with self._lock:
+                    self.bad_signatures += 1
+                return 401
+            if failed:
+                with self._lock:
+                    self.failures += 1
+                return self.error_status
+            payload = json.loads(body or b'{}')
+            with self._lock:
+                self.events.setdefault(shop_id, []).extend(payload.get('events') or [payload])
+            return 200
+        finally:
+            with self._lock:
+                self._active[path] -= 1
@@ -0,0 +1,286 @@
+"""``Idempotency-Key`` support for the generate endpoints.
+
+The first request with a given key (per shop) becomes the leader: it claims an
+``IdempotencyKey`` row, runs the generation and stores the response on the row. Duplicates
+that arrive meanwhile attach to it instead of starting another Gemini call — in the same
+process they wait on an in-memory event and receive the leader's response, in other
+processes they poll the row. Completed keys replay the stored response until
+``IDEMPOTENCY['ttl_seconds']``; ``purge_idempotency_keys`` deletes expired rows.
+
+Only successful responses are stored: after a failure the quota was refunded (or never
+taken), so a retry with the same key starts over. While the handler runs, a heartbeat thread
+extends the claim every ``lease_seconds / 3``, so a slow generation keeps it; a leader that
+died stops renewing and loses its claim once ``lease_seconds`` pass.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseBase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from users.models import ShopProfile
+
+from .deadlines import DEADLINE_EXCEEDED_HEADER
+from .models import IdempotencyKey, IdempotencyStatus
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+_STORED_HEADERS = ('Content-Disposition', DEADLINE_EXCEEDED_HEADER)
+
+
+def request_fingerprint(*, shop_id: str, customer_id: Optional[str], uploads: Iterable) -> str:
+    """Hash of what the request asks for, so a key reused for different input is rejected."""
+
+    digest = hashlib.sha256(f'{shop_id}\0{customer_id or ""}'.encode('utf-8'))
+    for upload in uploads:
+        upload.seek(0)
+        for chunk in iter(lambda: upload.read(1024 * 1024), b''):
+            digest.update(chunk)
+        upload.seek(0)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+@dataclass
+class StoredResponse:
+    status: int
+    content_type: str
+    body: bytes
+    headers: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_response(cls, response: HttpResponseBase) -> 'StoredResponse':
+        if isinstance(response, Response) and not getattr(response, 'is_rendered', True):
+            body = json.dumps(response.data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            content_type = 'application/json'
+        elif getattr(response, 'streaming', False):
+            body = b''.join(response.streaming_content)
+            response.close()
+            content_type = response['Content-Type']
+        else:
+            body = response.content
+            content_type = response['Content-Type']
+        headers = {name: response[name] for name in _STORED_HEADERS if response.has_header(name)}
+        return cls(status=response.status_code, content_type=content_type, body=body, headers=headers)
+
+    @classmethod
+    def from_record(cls, record: IdempotencyKey) -> 'StoredResponse':
+        return cls(
+            status=record.response_status,
+            content_type=record.response_content_type,
+            body=bytes(record.response_body or b''),
+            headers=record.response_headers,
+        )
+
+    def to_response(self, replayed: bool) -> HttpResponse:
+        response = HttpResponse(self.body, status=self.status, content_type=self.content_type)
+        for name, value in self.headers.items():
+            response[name] = value
+        if replayed:
+            response[REPLAYED_HEADER] = 'true'
+        return response
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[StoredResponse] = None
+
+
+class _LeaseRenewer:
+    """Keeps extending an in-flight key's lease from a daemon thread until stopped."""
+
+    def __init__(self, record: IdempotencyKey, lease_seconds: float):
+        self.record_pk = record.pk
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='idempotency-lease', daemon=True)
+
+    def start(self) -> '_LeaseRenewer':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self):
+        from django.db import connection
+
+        try:
+            while not self._stop.wait(self.lease_seconds / 3):
+                try:
+                    IdempotencyKey.objects.filter(pk=self.record_pk, status=IdempotencyStatus.IN_FLIGHT).update(
+                        lease_until=timezone.now() + timedelta(seconds=self.lease_seconds),
+                    )
+                except Exception:  # pylint: disable=broad-except
+                    # 다음 주기에 다시 시도 (임대 기간 안에 한 번만 성공하면 됨)
+                    pass
+        finally:
+            connection.close()
+
+
+class IdempotencyCoordinator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: dict[tuple[int, str], _InFlight] = {}
+
+    @property
+    def config(self) -> dict:
+        return settings.IDEMPOTENCY
+
+    def _claim(self, shop: ShopProfile, key: str, fingerprint: str) -> tuple[Optional[IdempotencyKey], bool]:
+        now = timezone.now()
+        lease_until = now + timedelta(seconds=self.config['lease_seconds'])
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    shop=shop,
+                    key=key,
+                    fingerprint=fingerprint,
+                    lease_until=lease_until,
+                    expires_at=now + timedelta(seconds=self.config['ttl_seconds']),
+                )
+            return record, True
+        except IntegrityError:
+            pass
+
+        record = IdempotencyKey.objects.filter(shop=shop, key=key).first()
+        if record is None:
+            return None, False
+        if record.expires_at <= now:
+            # 만료됐지만 아직 정리되지 않은 키 → 새 요청으로 취급
+            IdempotencyKey.objects.filter(pk=record.pk, expires_at__lte=now).delete()
+            return None, False
+        if (
+            record.status == IdempotencyStatus.IN_FLIGHT
+            and record.lease_until <= now
+            and record.fingerprint == fingerprint
+        ):
+            # 리더가 죽은 채로 임대 기간이 지남 → 인계
+            taken = IdempotencyKey.objects.filter(
+                pk=record.pk, status=IdempotencyStatus.IN_FLIGHT, lease_until=record.lease_until,
+            ).update(lease_until=lease_until)
+            if taken:
+                record.lease_until = lease_until
+                return record, True
+        return record, False
+
+    def _lead(self, record: IdempotencyKey, handler: Callable[[], HttpResponseBase]) -> HttpResponse:
+        slot = (record.shop_id, record.key)
+        waiter = _InFlight()
+        with self._lock:
+            self._in_flight[slot] = waiter
+        renewer = _LeaseRenewer(record, self.config['lease_seconds']).start()
+        try:
+            stored = StoredResponse.from_response(handler())
+            if status.is_success(stored.status):
+                record.status = IdempotencyStatus.COMPLETED
+                record.response_status = stored.status
+                record.response_content_type = stored.content_type
+                record.response_headers = stored.headers
+                record.response_body = stored.body
+                record.save(update_fields=[
+                    'status', 'response_status', 'response_content_type', 'response_headers', 'response_body',
+                ])
+                # 같은 프로세스의 중복 요청에는 성공 응답만 전달 (실패면 claim 부터 다시)
+                waiter.result = stored
+            else:
+                record.delete()
+            return stored.to_response(replayed=False)
+        except Exception:
+            IdempotencyKey.objects.filter(pk=record.pk, status=IdempotencyStatus.IN_FLIGHT).delete()
+            raise
+        finally:
+            renewer.stop()
+            waiter.done.set()
+            with self._lock:
+                if self._in_flight.get(slot) is waiter:
+                    del self._in_flight[slot]
+
+    def _wait(self, record: IdempotencyKey, deadline: float) -> Optional[StoredResponse]:
+        """The original's successful response, or ``None`` when it failed or vanished, its lease ran
+        out or time is up."""
+
+        with self._lock:
+            waiter = self._in_flight.get((record.shop_id, record.key))
+        if waiter is not None:
+            waiter.done.wait(timeout=max(deadline - time.monotonic(), 0))
+            return waiter.result
+
+        interval = self.config['poll_interval_seconds']
+        while time.monotonic() < deadline:
+            time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+            current = IdempotencyKey.objects.filter(pk=record.pk).first()
+            if current is None or current.lease_until <= timezone.now():
+                return None
+            if current.status == IdempotencyStatus.COMPLETED:
+                return StoredResponse.from_record(current)
+        return None
+
+    def run(
+        self,
+        *,
+        shop: ShopProfile,
+        key: str,
+        fingerprint: str,
+        handler: Callable[[], HttpResponseBase],
+    ) -> HttpResponseBase:
+        deadline = time.monotonic() + self.config['wait_seconds']
+        while True:
+            record, leader = self._claim(shop, key, fingerprint)
+            if leader:
+                return self._lead(record, handler)
+            if record is not None:
+                if record.fingerprint != fingerprint:
+                    return Response(
+                        {'error': f'{HEADER} was already used with a different request.'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                if record.status == IdempotencyStatus.COMPLETED:
+                    return StoredResponse.from_record(record).to_response(replayed=True)
+                result = self._wait(record, deadline)
+                if result is not None:
+                    return result.to_response(replayed=True)
+            if time.monotonic() >= deadline:
+                response = Response(
+                    {'error': 'A request with this Idempotency-Key is still in progress.'},
+                    status=status.HTTP_409_CONFLICT,
+                )
+                response['Retry-After'] = '5'
+                return response
+
+
+idempotency = IdempotencyCoordinator()
+
+
+def run_idempotent(
+    request,
+    *,
+    shop: ShopProfile,
+    customer_id: Optional[str],
+    uploads: Iterable,
+    handler: Callable[[], HttpResponseBase],
+) -> HttpResponseBase:
+    """Run ``handler`` under the request's ``Idempotency-Key``, or directly when it has none."""
+
+    key = request.headers.get(HEADER, '').strip()
+    if not key:
+        return handler()
+    if len(key) > MAX_KEY_LENGTH or not key.isascii() or not key.isprintable():
+        return Response(
+            {'error': f'{HEADER} must be 1-{MAX_KEY_LENGTH} printable ASCII characters.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    fingerprint = request_fingerprint(shop_id=shop.shop_id, customer_id=customer_id, uploads=uploads)
+    return idempotency.run(shop=shop, key=key, fingerprint=fingerprint, handler=handler)
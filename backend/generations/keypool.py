@@ -0,0 +1,216 @@
+"""Pool of upstream API keys, one ``genai.Client`` each, with per-key rate tracking.
+
+Keys come from ``GEMINI_KEYS`` (comma separated, ``label=key`` or just ``key``; one per project
+to add up their rate limits), falling back to ``GEMINI_KEY``. Every call goes to the key with
+the fewest calls in flight and the most headroom under ``GEMINI_KEY_POOL['rpm']``/``['tpm']``
+over the last ``window_seconds``. A 429 puts the key in cooldown (the upstream ``retryDelay``
+when given, else ``cooldown_seconds`` doubling per consecutive 429) and the call moves on to
+another key; only when every key is rate limited does the 429 reach the model router.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, TypeVar
+
+from django.conf import settings
+
+T = TypeVar('T')
+
+
+def is_rate_limited(exc: Exception) -> bool:
+    from google.genai import errors
+
+    return isinstance(exc, errors.APIError) and (exc.code == 429 or exc.status == 'RESOURCE_EXHAUSTED')
+
+
+def retry_delay(exc: Exception) -> Optional[float]:
+    """``RetryInfo.retryDelay`` (e.g. ``"13s"``) of an upstream error, if present."""
+
+    details = getattr(exc, 'details', None)
+    if isinstance(details, dict):
+        details = (details.get('error') or details).get('details')
+    for detail in details if isinstance(details, list) else []:
+        match = re.fullmatch(r'(\d+(?:\.\d+)?)s', str(detail.get('retryDelay', ''))) if isinstance(detail, dict) else None
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class KeyState:
+    def __init__(self, label: str, api_key: str):
+        self.label = label
+        self.api_key = api_key
+        self.client = None
+        self.client_pid: Optional[int] = None
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.tokens = 0
+        self.strikes = 0
+        self.cooldown_until = 0.0
+        self.last_used_at = 0.0
+        self.requests: deque = deque()
+        self.token_events: deque = deque()
+        self.window_tokens = 0
+
+    def prune(self, now: float, window: float):
+        while self.requests and self.requests[0] <= now - window:
+            self.requests.popleft()
+        while self.token_events and self.token_events[0][0] <= now - window:
+            self.window_tokens -= self.token_events.popleft()[1]
+
+    def utilization(self, rpm: int, tpm: int) -> float:
+        ratios = [0.0]
+        if rpm:
+            ratios.append(len(self.requests) / rpm)
+        if tpm:
+            ratios.append(self.window_tokens / tpm)
+        return max(ratios)
+
+    def as_dict(self, now: float, rpm: int, tpm: int) -> dict:
+        return {
+            'label': self.label,
+            'key': f'…{self.api_key[-4:]}' if self.api_key else '',
+            'in_flight': self.in_flight,
+            'requests_in_window': len(self.requests),
+            'tokens_in_window': self.window_tokens,
+            'utilization': round(self.utilization(rpm, tpm), 3),
+            'cooling_down': self.cooldown_until > now,
+            'cooldown_remaining_s': round(max(self.cooldown_until - now, 0), 1),
+            'calls': self.calls,
+            'errors': self.errors,
+            'rate_limited': self.rate_limited,
+            'tokens': self.tokens,
+        }
+
+
+class KeyPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: list[KeyState] = []
+        self._factory: Optional[Callable[[str], object]] = None
+
+    @property
+    def config(self) -> dict:
+        return settings.GEMINI_KEY_POOL
+
+    def configure(self, api_keys: list[str], factory: Callable[[str], object]):
+        """Replace the keys; ``factory(api_key)`` builds a client, lazily and once per process."""
+
+        keys = []
+        for index, entry in enumerate(api_keys, start=1):
+            label, sep, api_key = entry.partition('=')
+            keys.append(KeyState(label.strip(), api_key.strip()) if sep else KeyState(f'key{index}', entry.strip()))
+        with self._lock:
+            self._keys = keys or [KeyState('key1', '')]
+            self._factory = factory
+
+    def reset_after_fork(self):
+        # fork 이전 클라이언트의 커넥션 풀은 부모 소유이므로 버리고 다시 생성 (닫지 않음)
+        self._lock = threading.Lock()
+        for key in self._keys:
+            key.client = None
+            key.in_flight = 0
+
+    @property
+    def keys(self) -> list[KeyState]:
+        return list(self._keys)
+
+    def client_for(self, key: KeyState):
+        import os
+
+        if key.client is None or key.client_pid != os.getpid():
+            with self._lock:
+                if key.client is None or key.client_pid != os.getpid():
+                    key.client = self._factory(key.api_key)
+                    key.client_pid = os.getpid()
+        return key.client
+
+    def _acquire(self, tried: set) -> Optional[KeyState]:
+        config = self.config
+        rpm, tpm, window = config['rpm'], config['tpm'], config['window_seconds']
+        now = time.monotonic()
+        with self._lock:
+            ranked = []
+            for key in self._keys:
+                if key.label in tried:
+                    continue
+                key.prune(now, window)
+                cooling = key.cooldown_until > now
+                utilization = key.utilization(rpm, tpm)
+                ranked.append((cooling, utilization >= 1, key.in_flight, utilization, key.last_used_at, key.label, key))
+            if not ranked:
+                return None
+            ranked.sort(key=lambda row: row[:-1])
+            cooling, *_, key = ranked[0]
+            if cooling:
+                if tried:
+                    # 재시도 중인데 남은 키가 모두 쿨다운 → 마지막 429 를 그대로 전달
+                    return None
+                # 첫 시도에서 모든 키가 쿨다운이면 가장 먼저 풀리는 키로 (업스트림이 최종 판단)
+                key = min((row[-1] for row in ranked), key=lambda k: k.cooldown_until)
+            key.in_flight += 1
+            key.calls += 1
+            key.last_used_at = now
+            key.requests.append(now)
+            return key
+
+    def _release(self, key: KeyState, tokens: int = 0, failed: bool = False, rate_limited_for: Optional[float] = None):
+        now = time.monotonic()
+        with self._lock:
+            key.in_flight = max(key.in_flight - 1, 0)
+            if tokens:
+                key.tokens += tokens
+                key.window_tokens += tokens
+                key.token_events.append((now, tokens))
+            if rate_limited_for is not None:
+                key.rate_limited += 1
+                key.strikes += 1
+                key.cooldown_until = now + rate_limited_for
+            elif failed:
+                key.errors += 1
+            else:
+                key.strikes = 0
+
+    def _cooldown(self, key: KeyState, exc: Exception) -> float:
+        config = self.config
+        delay = retry_delay(exc)
+        if delay is None:
+            delay = config['cooldown_seconds'] * 2 ** key.strikes
+        return min(delay, config['max_cooldown_seconds'])
+
+    def call(self, fn: Callable[[KeyState], T], tokens_of: Callable[[T], int] = lambda _: 0) -> T:
+        """Run ``fn(key)`` on the best key, moving to another key when one answers 429."""
+
+        tried: set = set()
+        last_exc: Optional[Exception] = None
+        while True:
+            key = self._acquire(tried)
+            if key is None:
+                raise last_exc
+            try:
+                result = fn(key)
+            except Exception as exc:
+                if is_rate_limited(exc):
+                    self._release(key, rate_limited_for=self._cooldown(key, exc))
+                    tried.add(key.label)
+                    last_exc = exc
+                    continue
+                self._release(key, failed=True)
+                raise
+            self._release(key, tokens=tokens_of(result))
+            return result
+
+    def snapshot(self) -> list[dict]:
+        config = self.config
+        now = time.monotonic()
+        with self._lock:
+            for key in self._keys:
+                key.prune(now, config['window_seconds'])
+            return [key.as_dict(now, config['rpm'], config['tpm']) for key in self._keys]
+
+
+key_pool = KeyPool()
@@ -0,0 +1,143 @@
+"""Adaptive in-flight limit (load shedding) for the generate endpoints.
+
+Each worker process admits at most ``limit`` generate requests at once; the rest get an
+immediate ``503`` with a ``Retry-After`` instead of queueing behind a slow upstream until the
+gunicorn timeout. The limit follows AIMD: every completed generation faster than
+``GENERATION_LIMITER['latency_target_seconds']`` adds about one slot per ``limit`` completions
+(while the limit is actually used), and a slow or failed one (5xx) multiplies it by ``backoff``,
+at most once per ``decrease_interval_seconds`` so one burst of timeouts is a single step down.
+
+``GET /ready/`` reports this process' saturation (``snapshot``) and answers ``503`` while it is
+full or has shed requests recently, so load balancers and autoscalers react before latency does.
+"""
+
+import math
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from .deadlines import DEADLINE_EXCEEDED_HEADER
+from .idempotency import REPLAYED_HEADER
+
+# 업스트림 장애/타임아웃으로 보는 응답 코드 (감소 신호)
+FAILURE_STATUSES = {500, 502, 504}
+
+
+class AdaptiveLimiter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limit: Optional[float] = None
+        self._in_flight = 0
+        self._latency_ewma: Optional[float] = None
+        self._decreased_at = 0.0
+        self._shed_at = 0.0
+        self._shed_total = 0
+
+    @property
+    def config(self) -> dict:
+        return settings.GENERATION_LIMITER
+
+    @property
+    def limit(self) -> int:
+        if self._limit is None:
+            self._limit = float(self.config['initial_limit'] or self.config['max_limit'])
+        return max(int(self._limit), self.config['min_limit'])
+
+    def try_acquire(self) -> bool:
+        if not self.config['enabled']:
+            return True
+        with self._lock:
+            if self._in_flight >= self.limit:
+                self._shed_at = time.monotonic()
+                self._shed_total += 1
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self, latency: Optional[float] = None, failed: bool = False) -> None:
+        """Free a slot; ``latency`` (seconds) is ``None`` when the request did not reach upstream."""
+
+        if not self.config['enabled']:
+            return
+        config = self.config
+        with self._lock:
+            in_use = self._in_flight
+            self._in_flight -= 1
+            limit = float(self.limit)
+            if failed or (latency is not None and latency > config['latency_target_seconds']):
+                now = time.monotonic()
+                if now - self._decreased_at >= config['decrease_interval_seconds']:
+                    self._decreased_at = now
+                    self._limit = max(limit * config['backoff'], config['min_limit'])
+            elif latency is not None and in_use * 2 >= limit:
+                # 한도를 절반 이상 쓰고 있을 때만 증가 (한가할 때 한도가 무한정 커지지 않게)
+                self._limit = min(self._limit + 1 / limit, config['max_limit'])
+            if latency is not None:
+                alpha = config['latency_ewma_alpha']
+                self._latency_ewma = latency if self._latency_ewma is None else (
+                    alpha * latency + (1 - alpha) * self._latency_ewma
+                )
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: one average generation spread over the slots."""
+
+        latency = self._latency_ewma or self.config['latency_target_seconds']
+        seconds = math.ceil(latency / max(self.limit, 1))
+        return min(max(seconds, 1), self.config['retry_after_max_seconds'])
+
+    def saturated(self) -> bool:
+        recently_shed = time.monotonic() - self._shed_at < self.config['ready_shed_window_seconds']
+        return self._in_flight >= self.limit or (self._shed_total > 0 and recently_shed)
+
+    def snapshot(self) -> dict:
+        limit = self.limit
+        return {
+            'ready': not self.saturated(),
+            'in_flight': self._in_flight,
+            'limit': limit,
+            'limit_exact': round(self._limit, 2),
+            'max_limit': self.config['max_limit'],
+            'utilization': round(self._in_flight / limit, 3) if limit else 1.0,
+            'latency_ewma_ms': round(self._latency_ewma * 1000) if self._latency_ewma is not None else None,
+            'shed_total': self._shed_total,
+            'retry_after': self.retry_after(),
+        }
+
+    def overloaded_response(self) -> JsonResponse:
+        response = JsonResponse(
+            {'error': 'Server is busy. Please retry later.'},
+            status=503,
+        )
+        response['Retry-After'] = str(self.retry_after())
+        return response
+
+
+generation_limiter = AdaptiveLimiter()
+
+
+class GenerationLimitMixin:
+    """For the generate APIViews: admit ``POST`` through ``generation_limiter`` or shed it with 503.
+
+    The request's own duration is the latency sample; idempotent replays and other responses
+    that did not run a generation (4xx) don't move the limit, and neither does a 504 for a
+    client's own deadline.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'POST':
+            return super().dispatch(request, *args, **kwargs)
+        if not generation_limiter.try_acquire():
+            return generation_limiter.overloaded_response()
+        started_at = time.monotonic()
+        latency, failed = None, True
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            failed = response.status_code in FAILURE_STATUSES and not response.has_header(DEADLINE_EXCEEDED_HEADER)
+            if response.status_code < 300 and not response.has_header(REPLAYED_HEADER):
+                latency = time.monotonic() - started_at
+            return response
+        finally:
+            generation_limiter.release(latency, failed)
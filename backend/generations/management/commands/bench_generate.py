@@ -0,0 +1,206 @@
+import json
+import os
+import platform
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from generations.fakes import FakeGeminiServer, make_png
+from generations.keypool import key_pool
+from generations.services import GeminiAPIService
+from generations.stats import percentile
+from generations.views import GenerateImageView
+from users.models import CustomUser, PlanTier, ShopProfile
+from users.views import GenerateRequestView
+
+BENCH_EMAIL = 'bench@dressroom.local'
+BENCH_SHOP_ID = 'bench-shop'
+
+
+def current_rss_kb() -> int:
+    try:
+        with open('/proc/self/statm') as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Command(BaseCommand):
+    help = 'Benchmark both generate endpoints against a local fake Gemini server.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='1,4,16', help='Comma separated concurrency levels.')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per endpoint and concurrency level.')
+        parser.add_argument('--endpoints', default='public,member', help='Subset of: public, member.')
+        parser.add_argument('--latency', default='lognormal:8000:0.35', help='Edit latency: fixed:MS, uniform:LO:HI, lognormal:MEDIAN:SIGMA.')
+        parser.add_argument('--classify-latency', default='lognormal:900:0.3', help='Classify latency, same format as --latency.')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of upstream calls that fail with HTTP 500.')
+        parser.add_argument('--result-size', default='1024x1024', help='Size of the fake result image, WxH.')
+        parser.add_argument('--input-size', default='1024x1365', help='Size of the uploaded person/product images, WxH.')
+        parser.add_argument('--min-cache-tokens', type=int, default=0, help='Reject cached contents smaller than this, like upstream does.')
+        parser.add_argument('--keys', type=int, default=1, help='Number of fake API keys in the client pool.')
+        parser.add_argument('--key-rpm', type=int, default=0, help='Requests per minute the fake allows per key (429 above).')
+        parser.add_argument('--output', default='bench_output.json', help='Where to write machine-readable results.')
+        parser.add_argument('--seed', type=int, default=None)
+
+    @staticmethod
+    def _size(value: str) -> tuple[int, int]:
+        try:
+            width, height = (int(v) for v in value.lower().split('x'))
+        except ValueError as exc:
+            raise CommandError(f'Invalid size: {value}') from exc
+        return width, height
+
+    def _prepare_shop(self, total_requests: int) -> tuple[ShopProfile, str]:
+        user, created = CustomUser.objects.get_or_create(email=BENCH_EMAIL, defaults={'full_name': 'Benchmark'})
+        if created:
+            user.set_unusable_password()
+            user.save(update_fields=['password'])
+        shop, _ = ShopProfile.objects.get_or_create(
+            shop_id=BENCH_SHOP_ID,
+            defaults={
+                'owner': user,
+                'shop_name': 'Benchmark shop',
+                'company_name': 'Benchmark',
+                'business_registration_number': '0000000000',
+                'contact_phone': '0200000000',
+                'tier': PlanTier.ENTERPRISE,
+            },
+        )
+        shop.refresh_quota(quota=max(total_requests, 1))
+        token = str(RefreshToken.for_user(user).access_token)
+        return shop, token
+
+    def handle(self, *args, **options):
+        levels = [int(v) for v in options['concurrency'].split(',') if v]
+        endpoints = [e.strip() for e in options['endpoints'].split(',') if e.strip()]
+        unknown = set(endpoints) - {'public', 'member'}
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+        per_level = options['requests']
+
+        input_w, input_h = self._size(options['input_size'])
+        person_png = make_png(input_w, input_h, seed=1)
+        product_png = make_png(input_w, input_h, seed=2)
+
+        fake = FakeGeminiServer(
+            latency=options['latency'],
+            classify_latency=options['classify_latency'],
+            error_rate=options['error_rate'],
+            image_size=self._size(options['result_size']),
+            min_cache_tokens=options['min_cache_tokens'],
+            key_rpm=options['key_rpm'],
+            seed=options['seed'],
+        )
+        shop, token = self._prepare_shop(per_level * len(levels) * len(endpoints))
+        factory = APIRequestFactory()
+        views = {
+            'public': GenerateImageView.as_view(),
+            'member': GenerateRequestView.as_view(),
+        }
+
+        def one_request(endpoint: str) -> tuple[int, float, int]:
+            person = BytesIO(person_png)
+            person.name = 'person.png'
+            product = BytesIO(product_png)
+            product.name = 'product.png'
+            data = {'shop_id': shop.shop_id, 'customer_id': 'bench', 'person_image': person, 'product_image': product}
+            headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if endpoint == 'member' else {}
+            request = factory.post('/bench/', data, format='multipart', **headers)
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = views[endpoint](request)
+                if getattr(response, 'streaming', False):
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            return response.status_code, elapsed, len(ctx.captured_queries)
+
+        results = []
+        with fake:
+            GeminiAPIService.configure(
+                api_keys=[f'fake{i}=fake-key-{i}' for i in range(1, max(options['keys'], 1) + 1)],
+                base_url=fake.url,
+            )
+            for endpoint in endpoints:
+                for level in levels:
+                    rss_before = current_rss_kb()
+                    peak = [rss_before]
+                    stop = threading.Event()
+
+                    def sample_rss():
+                        while not stop.wait(0.05):
+                            peak[0] = max(peak[0], current_rss_kb())
+
+                    sampler = threading.Thread(target=sample_rss, daemon=True)
+                    sampler.start()
+                    started = time.perf_counter()
+                    with ThreadPoolExecutor(max_workers=level) as pool:
+                        outcomes = list(pool.map(lambda _: one_request(endpoint), range(per_level)))
+                    wall = time.perf_counter() - started
+                    stop.set()
+                    sampler.join()
+
+                    statuses: dict[str, int] = {}
+                    for code, _, _ in outcomes:
+                        statuses[str(code)] = statuses.get(str(code), 0) + 1
+                    latencies = [elapsed * 1000 for _, elapsed, _ in outcomes]
+                    queries = [count for _, _, count in outcomes]
+                    row = {
+                        'endpoint': endpoint,
+                        'concurrency': level,
+                        'requests': per_level,
+                        'ok': statuses.get('200', 0),
+                        'status_counts': statuses,
+                        'wall_s': round(wall, 3),
+                        'throughput_rps': round(per_level / wall, 3) if wall else 0.0,
+                        'latency_ms': {
+                            'p50': round(percentile(latencies, 50), 1),
+                            'p95': round(percentile(latencies, 95), 1),
+                            'p99': round(percentile(latencies, 99), 1),
+                            'mean': round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+                            'max': round(max(latencies), 1) if latencies else 0.0,
+                        },
+                        'db_queries': {
+                            'mean': round(sum(queries) / len(queries), 2) if queries else 0.0,
+                            'max': max(queries) if queries else 0,
+                        },
+                        'rss_kb': {'before': rss_before, 'after': current_rss_kb(), 'peak': peak[0]},
+                    }
+                    results.append(row)
+                    self.stdout.write(
+                        f'{endpoint:>6} c={level:<3} {row["throughput_rps"]:>8.2f} req/s  '
+                        f'p50={row["latency_ms"]["p50"]:.0f}ms p95={row["latency_ms"]["p95"]:.0f}ms '
+                        f'p99={row["latency_ms"]["p99"]:.0f}ms  queries={row["db_queries"]["mean"]}  '
+                        f'rss_peak={row["rss_kb"]["peak"]}KB  statuses={statuses}'
+                    )
+            key_stats = key_pool.snapshot()
+            GeminiAPIService.configure()
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'options': {k: options[k] for k in (
+                    'concurrency', 'requests', 'endpoints', 'latency', 'classify_latency',
+                    'error_rate', 'result_size', 'input_size', 'min_cache_tokens', 'keys', 'key_rpm', 'seed',
+                )},
+                'upstream_calls': fake.calls,
+                'upstream_calls_by_key': fake.key_calls,
+                'key_pool': key_stats,
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
@@ -0,0 +1,121 @@
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+IMPORT_WSGI = 'import config.wsgi'
+IMPORT_GENAI = 'from google import genai'
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = 'Measure cold start of the container entry point (fresh interpreters, WSGI import, gunicorn first response).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh processes per measurement.')
+        parser.add_argument('--gunicorn', action='store_true', help='Also time gunicorn until the first 200 on /.')
+        parser.add_argument('--importtime', type=int, default=15, help='Show the N slowest imports of config.wsgi (0 disables).')
+        parser.add_argument('--output', default='bench_startup.json', help='Where to write machine-readable results.')
+
+    def _env(self) -> dict:
+        env = os.environ.copy()
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+        return env
+
+    def _time_process(self, args: list[str]) -> float:
+        started = time.perf_counter()
+        subprocess.run(args, cwd=settings.BASE_DIR, env=self._env(), check=True, capture_output=True)
+        return (time.perf_counter() - started) * 1000
+
+    def _time_gunicorn(self) -> float:
+        port = _free_port()
+        env = self._env()
+        env['PORT'] = str(port)
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'config.wsgi:application'],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            deadline = started + 60
+            while time.perf_counter() < deadline:
+                try:
+                    with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1) as resp:
+                        if resp.status == 200:
+                            return (time.perf_counter() - started) * 1000
+                except OSError:
+                    time.sleep(0.02)
+            raise RuntimeError('gunicorn did not answer within 60s')
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    def _slowest_imports(self, limit: int) -> list[dict]:
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', IMPORT_WSGI],
+            cwd=settings.BASE_DIR, env=self._env(), check=True, capture_output=True, text=True,
+        )
+        rows = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            rows.append({
+                'module': name.strip(),
+                'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+            })
+        return sorted(rows, key=lambda row: row['cumulative_ms'], reverse=True)[:limit]
+
+    @staticmethod
+    def _summary(samples: list[float]) -> dict:
+        return {
+            'runs': len(samples),
+            'min_ms': round(min(samples), 1),
+            'median_ms': round(statistics.median(samples), 1),
+            'max_ms': round(max(samples), 1),
+        }
+
+    def handle(self, *args, **options):
+        runs = max(options['runs'], 1)
+        measurements = {
+            'interpreter': [sys.executable, '-c', 'pass'],
+            'import_wsgi': [sys.executable, '-c', IMPORT_WSGI],
+            'import_genai': [sys.executable, '-c', IMPORT_GENAI],
+            'manage_check': [sys.executable, 'manage.py', 'check'],
+        }
+        results = {}
+        for name, cmd in measurements.items():
+            results[name] = self._summary([self._time_process(cmd) for _ in range(runs)])
+            self.stdout.write(f'{name:>14}: median {results[name]["median_ms"]}ms (min {results[name]["min_ms"]}ms)')
+
+        if options['gunicorn']:
+            results['gunicorn_first_response'] = self._summary([self._time_gunicorn() for _ in range(runs)])
+            self.stdout.write(f'{"gunicorn":>14}: median {results["gunicorn_first_response"]["median_ms"]}ms to first 200')
+
+        report = {
+            'meta': {'created_at': timezone.now().isoformat(), 'python': sys.version.split()[0], 'runs': runs},
+            'results': results,
+        }
+        if options['importtime']:
+            report['slowest_imports'] = self._slowest_imports(options['importtime'])
+            for row in report['slowest_imports']:
+                self.stdout.write(f'    {row["cumulative_ms"]:>9.1f}ms  {row["module"]}')
+
+        with open(options['output'], 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.test.utils import override_settings
+
+from generations.management.commands.bench_generate import Command as BenchGenerateCommand
+from generations.stats import percentile
+from users.models import ShopProfile, ShopUsage
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the quota path of concurrent generate requests of one shop with different USAGE_SHARDS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', default='1,8', help='Comma separated USAGE_SHARDS values; 1 is a single hot row.')
+        parser.add_argument('--threads', default='1,8,32', help='Comma separated numbers of concurrent writers.')
+        parser.add_argument('--ops', type=int, default=200, help='Quota charges per writer.')
+        parser.add_argument(
+            '--hold-ms', type=float, default=0.0,
+            help='Time each transaction stays open after the update, like the rest of a request transaction.',
+        )
+        parser.add_argument('--output', default='bench_usage.json', help='Where to write machine-readable results.')
+
+    def handle(self, *args, **options):
+        try:
+            shard_counts = [int(v) for v in options['shards'].split(',') if v]
+            thread_counts = [int(v) for v in options['threads'].split(',') if v]
+        except ValueError as exc:
+            raise CommandError(f'Invalid list: {exc}') from exc
+        if connection.vendor == 'sqlite':
+            self.stderr.write(self.style.WARNING(
+                'SQLite locks the whole database on write; use PostgreSQL for meaningful row-lock numbers.'
+            ))
+
+        shop, _ = BenchGenerateCommand()._prepare_shop(1)
+        results = []
+        self.stdout.write(f'{"shards":>6} {"threads":>7} {"ops/s":>9} {"p50 ms":>8} {"p99 ms":>8} {"errors":>6}  check')
+        for shards in shard_counts:
+            for threads in thread_counts:
+                with override_settings(USAGE_SHARDS=shards):
+                    result = self._run(shop, threads, options['ops'], options['hold_ms'] / 1000)
+                result['shards'] = shards
+                results.append(result)
+                self.stdout.write(
+                    f'{shards:>6} {threads:>7} {result["ops_per_second"]:>9.1f} {result["p50_ms"]:>8.2f} '
+                    f'{result["p99_ms"]:>8.2f} {result["errors"]:>6}  {"ok" if result["consistent"] else "MISMATCH"}'
+                )
+
+        shop.refresh_quota()
+        with open(options['output'], 'w', encoding='utf-8') as fh:
+            json.dump({'vendor': connection.vendor, 'options': options, 'results': results}, fh, indent=2, default=str)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+
+    def _run(self, shop, threads: int, ops: int, hold: float) -> dict:
+        # 모든 차감이 성공할 만큼 쿼터를 채우고 사용량 초기화
+        quota = threads * ops
+        shop.refresh_quota(quota=quota)
+        latencies: list[float] = []
+        errors = 0
+        lock = threading.Lock()
+        start = threading.Barrier(threads)
+
+        def writer():
+            nonlocal errors
+            local, failed = [], 0
+            try:
+                start.wait()
+                for _ in range(ops):
+                    began = time.perf_counter()
+                    try:
+                        # 생성 요청의 쿼터 경로: 상점 조회 → has_quota → 조건부 차감 + 사용량 샤드 기록
+                        with transaction.atomic():
+                            request_shop = ShopProfile.objects.get(pk=shop.pk)
+                            if not (request_shop.has_quota and request_shop.decrement_quota()):
+                                failed += 1
+                                continue
+                            if hold:
+                                time.sleep(hold)
+                    except OperationalError:
+                        failed += 1
+                        continue
+                    local.append((time.perf_counter() - began) * 1000)
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(local)
+                    errors += failed
+
+        workers = [threading.Thread(target=writer) for _ in range(threads)]
+        began = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - began
+
+        total = ShopUsage.with_shard_totals(ShopUsage._current(shop, 'monthly')).values_list('total_requests', flat=True).first() or 0
+        remaining = ShopProfile.objects.values_list('count', flat=True).get(pk=shop.pk)
+        return {
+            'threads': threads,
+            'ops': len(latencies),
+            'errors': errors,
+            'elapsed_seconds': round(elapsed, 3),
+            'ops_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'remaining': remaining,
+            # 차감 누락(lost update)이나 기록 누락이 없으면 둘 다 성공 횟수와 맞음
+            'consistent': total == len(latencies) and remaining == quota - len(latencies),
+        }
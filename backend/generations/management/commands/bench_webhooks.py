@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from generations.fakes import FakeWebhookReceiver
+from generations.models import WebhookDeadLetter, WebhookEvent, WebhookEventType
+from generations.webhooks import WebhookDispatcher
+from users.models import CustomUser, ShopProfile
+
+BENCH_EMAIL = 'bench@dressroom.local'
+
+
+class Command(BaseCommand):
+    help = 'Deliver synthetic webhook events to a local fake receiver and report throughput, retries and dead letters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=20)
+        parser.add_argument('--events', type=int, default=50, help='Events per shop.')
+        parser.add_argument('--latency', default='lognormal:80:0.5', help='Receiver latency, same format as bench_generate.')
+        parser.add_argument('--error-rate', type=float, default=0.05, help='Fraction of receiver responses that are 503.')
+        parser.add_argument('--batch', type=int, default=1, help='WEBHOOKS batch_max_events.')
+        parser.add_argument('--per-endpoint', type=int, default=4, help='WEBHOOKS per_endpoint_concurrency.')
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--backoff-base', type=float, default=0.2, help='Seconds; kept small so retries finish quickly.')
+        parser.add_argument('--timeout', type=float, default=120.0, help='Give up after this many seconds.')
+        parser.add_argument('--output', default='', help='Optional path for a JSON report.')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def _prepare_shops(self, count: int, receiver: FakeWebhookReceiver) -> list[ShopProfile]:
+        owner, _ = CustomUser.objects.get_or_create(email=BENCH_EMAIL, defaults={'full_name': 'Benchmark'})
+        shops = []
+        for i in range(count):
+            shop_id = f'bench-hook-{i}'
+            shop, _ = ShopProfile.objects.get_or_create(
+                shop_id=shop_id,
+                defaults={
+                    'owner': owner,
+                    'shop_name': f'Webhook bench {i}',
+                    'company_name': 'Benchmark',
+                    'business_registration_number': f'9{i:09d}',
+                    'contact_phone': '0200000000',
+                },
+            )
+            shop.callback_url = receiver.url_for(shop_id)
+            shop.is_active = True
+            shop.save(update_fields=['callback_url', 'is_active', 'webhook_secret'])
+            receiver.secrets[shop_id] = shop.webhook_secret
+            shops.append(shop)
+        return shops
+
+    def handle(self, *args, **options):
+        receiver = FakeWebhookReceiver(latency=options['latency'], error_rate=options['error_rate'], seed=options['seed'])
+        with receiver:
+            shops = self._prepare_shops(options['shops'], receiver)
+            shop_ids = [shop.pk for shop in shops]
+            WebhookEvent.objects.filter(shop_id__in=shop_ids).delete()
+            WebhookDeadLetter.objects.filter(shop_id__in=shop_ids).delete()
+            WebhookEvent.objects.bulk_create([
+                WebhookEvent(
+                    shop=shop,
+                    event_type=WebhookEventType.GENERATION_SUCCEEDED,
+                    payload={'request_id': n, 'status': 'success'},
+                )
+                for shop in shops
+                for n in range(options['events'])
+            ])
+            total = len(shops) * options['events']
+
+            dispatcher = WebhookDispatcher(
+                batch_max_events=options['batch'],
+                per_endpoint_concurrency=options['per_endpoint'],
+                workers=options['workers'],
+                max_attempts=options['max_attempts'],
+                backoff_base_seconds=options['backoff_base'],
+                poll_interval_seconds=0.05,
+                # 수신기가 127.0.0.1 에서 돌므로
+                allow_private_hosts=True,
+            )
+            stop = threading.Event()
+            settled = [0]
+
+            def on_settled(stats):
+                settled[0] += stats.delivered + stats.dead + stats.dropped
+                if settled[0] >= total:
+                    stop.set()
+
+            timer = threading.Timer(options['timeout'], stop.set)
+            timer.start()
+            started = time.perf_counter()
+            try:
+                stats = dispatcher.run_forever(stop, on_settled=on_settled)
+            finally:
+                timer.cancel()
+                dispatcher.close()
+            wall = time.perf_counter() - started
+
+        received = sum(len(events) for events in receiver.events.values())
+        unique = sum(len({event['id'] for event in events}) for events in receiver.events.values())
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'options': {k: options[k] for k in (
+                    'shops', 'events', 'latency', 'error_rate', 'batch', 'per_endpoint',
+                    'workers', 'max_attempts', 'backoff_base', 'seed',
+                )},
+            },
+            'events': total,
+            'wall_s': round(wall, 3),
+            'events_per_s': round(stats.delivered / wall, 1) if wall else 0.0,
+            'http_requests': stats.requests,
+            'delivered': stats.delivered,
+            'retried': stats.retried,
+            'dead_letters': stats.dead,
+            'left_in_queue': WebhookEvent.objects.filter(shop_id__in=shop_ids).count(),
+            'receiver': {
+                'requests': receiver.requests,
+                'injected_failures': receiver.failures,
+                'bad_signatures': receiver.bad_signatures,
+                'events_received': received,
+                'duplicate_events': received - unique,
+                'max_concurrency_per_endpoint': max(receiver.max_concurrency.values(), default=0),
+            },
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
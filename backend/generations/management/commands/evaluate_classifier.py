@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from generations.classifier import KNNClassifier, features_from_bytes
+from generations.models import LabelSource, ProductImage
+
+
+class Command(BaseCommand):
+    help = 'Cross-validate the local product classifier against stored Gemini labels.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--folds', type=int, default=5)
+        parser.add_argument('--k', type=int, default=settings.LOCAL_CLASSIFIER['k'])
+        parser.add_argument(
+            '--thresholds', default='0.5,0.6,0.7,0.8,0.9,0.95',
+            help='Confidence thresholds to report coverage/accuracy for.',
+        )
+        parser.add_argument('--limit', type=int, default=settings.LOCAL_CLASSIFIER['max_samples'])
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='', help='Optional path for a JSON report.')
+
+    def handle(self, *args, **options):
+        rows = list(
+            ProductImage.objects.filter(label_source=LabelSource.GEMINI)
+            .order_by('-id')
+            .values_list('features', 'category')[: options['limit']]
+        )
+        folds = options['folds']
+        if len(rows) < folds * 2:
+            raise CommandError(f'Need at least {folds * 2} labelled products, found {len(rows)}.')
+
+        x = np.stack([features_from_bytes(raw) for raw, _ in rows])
+        y = np.array([label for _, label in rows])
+        order = np.random.default_rng(options['seed']).permutation(len(y))
+        predictions: list[tuple[str, str, float]] = []
+        for fold in np.array_split(order, folds):
+            train = np.setdiff1d(order, fold)
+            model = KNNClassifier(k=options['k']).fit(x[train], list(y[train]))
+            for i in fold:
+                label, confidence = model.predict(x[i])
+                predictions.append((y[i], label, confidence))
+
+        total = len(predictions)
+        correct = sum(1 for truth, label, _ in predictions if truth == label)
+        report = {
+            'samples': total,
+            'folds': folds,
+            'k': options['k'],
+            'accuracy': round(correct / total, 4),
+            'thresholds': [],
+            'confusion': {},
+        }
+        for truth, label, _ in predictions:
+            report['confusion'].setdefault(truth, {}).setdefault(label, 0)
+            report['confusion'][truth][label] += 1
+
+        self.stdout.write(f'{total} samples, {folds}-fold, k={options["k"]}: accuracy {report["accuracy"]:.3f}')
+        self.stdout.write('threshold  calls_avoided  accuracy_when_local')
+        for threshold in (float(t) for t in options['thresholds'].split(',') if t):
+            local = [(truth, label) for truth, label, conf in predictions if conf >= threshold]
+            avoided = len(local) / total
+            accuracy = sum(1 for truth, label in local if truth == label) / len(local) if local else 0.0
+            report['thresholds'].append({
+                'threshold': threshold,
+                'calls_avoided': round(avoided, 4),
+                'accuracy_when_local': round(accuracy, 4),
+            })
+            self.stdout.write(f'{threshold:>9.2f}  {avoided:>13.1%}  {accuracy:>19.1%}')
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from generations.exports import CONTENT_TYPES, CSV, DATASETS, UnknownExport, export_filename, stream_export, validate
+from users.models import ShopProfile
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV/JSONL export of one shop\'s generations, usage or error logs for a date range.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(DATASETS))
+        parser.add_argument('--shop', required=True, help='shop_id of the shop to export.')
+        parser.add_argument('--from', dest='start', help='First day, YYYY-MM-DD (default: first of this month).')
+        parser.add_argument('--to', dest='end', help='Last day, YYYY-MM-DD (default: today).')
+        parser.add_argument('--format', dest='fmt', choices=list(CONTENT_TYPES), default=CSV)
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip.')
+        parser.add_argument(
+            '--output',
+            help='File to write; a directory gets the default file name. "-" writes to stdout. Default: ./<file name>.',
+        )
+        parser.add_argument('--database', default='default', help='Database alias to read from, e.g. replica.')
+
+    def handle(self, *args, **options):
+        shop = ShopProfile.objects.filter(shop_id=options['shop']).first()
+        if shop is None:
+            raise CommandError(f'Unknown shop: {options["shop"]}')
+        today = timezone.localdate()
+        try:
+            start = parse_date(options['start']) if options['start'] else today.replace(day=1)
+            end = parse_date(options['end']) if options['end'] else today
+            validate(options['dataset'], options['fmt'])
+        except (ValueError, UnknownExport) as exc:
+            raise CommandError(str(exc)) from exc
+        if start is None or end is None or start > end:
+            raise CommandError('--from/--to must be YYYY-MM-DD dates with from <= to.')
+
+        filename = export_filename(options['dataset'], shop, start, end, options['fmt'], options['gzip'])
+        output = options['output'] or filename
+        stream = stream_export(
+            options['dataset'], shop, start, end,
+            fmt=options['fmt'], compress=options['gzip'], using=options['database'],
+        )
+        if output == '-':
+            for data in stream:
+                sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+            return
+
+        if os.path.isdir(output):
+            output = os.path.join(output, filename)
+        started = time.monotonic()
+        written = 0
+        with open(output, 'wb') as fh:
+            for data in stream:
+                fh.write(data)
+                written += len(data)
+        self.stderr.write(self.style.SUCCESS(
+            f'Wrote {written} bytes to {output} in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,29 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from generations.blobs import blob_store
+
+
+class Command(BaseCommand):
+    help = 'Mark-and-sweep the blob store: recount references and delete blobs no request uses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=settings.BLOB_STORE['gc_grace_hours'],
+            help='Keep unreferenced blobs used more recently than this.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--scan-storage', action='store_true', help='Also delete files that have no Blob row.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        stats = blob_store.collect_garbage(
+            grace=timedelta(hours=options['grace_hours']),
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            scan_storage=options['scan_storage'],
+        )
+        self.stdout.write(json.dumps(stats, indent=2))
@@ -0,0 +1,397 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from PIL import UnidentifiedImageError
+
+from generations.blobs import blob_store
+from generations.budget import token_budget
+from generations.models import GenerationErrorLog, GenerationRequest, GenerationStatus
+from generations.services import GeminiAPIResponseError, GeminiAPIService
+from generations.stats import percentile
+from users.loggers import log_service, log_service_err
+from users.models import ErrorLevel, ShopProfile
+
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+EXTENSIONS = {'image/png': 'png', 'image/jpeg': 'jpg', 'image/webp': 'webp'}
+
+
+class TokenBucket:
+    """Blocks callers so that at most ``rate`` acquisitions per second happen, with bursts up to ``burst``."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop: threading.Event | None = None) -> bool:
+        if self.rate <= 0:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait_seconds = (1 - self._tokens) / self.rate
+            # 락 밖에서 대기 (다른 스레드의 토큰 계산을 막지 않음)
+            if stop is not None:
+                if stop.wait(wait_seconds):
+                    return False
+            else:
+                time.sleep(wait_seconds)
+
+
+class RowError(Exception):
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def read_manifest(path: str) -> list[dict]:
+    """Rows of a ``.jsonl`` or ``.csv`` manifest with ``person`` and ``product`` image paths.
+
+    Optional columns: ``id`` (stable key for checkpointing and the output file name) and
+    ``product_reference``. Relative paths are resolved against the manifest's directory.
+    """
+
+    base = os.path.dirname(os.path.abspath(path))
+    try:
+        with open(path, encoding='utf-8', newline='') as fh:
+            if path.endswith('.csv'):
+                raw_rows = list(csv.DictReader(fh))
+            else:
+                raw_rows = [json.loads(line) for line in fh if line.strip()]
+    except (OSError, ValueError) as exc:
+        raise CommandError(f'Cannot read manifest {path}: {exc}') from exc
+
+    rows, seen = [], set()
+    for line_no, raw in enumerate(raw_rows, start=1):
+        person, product = (raw.get('person') or '').strip(), (raw.get('product') or '').strip()
+        if not person or not product:
+            raise CommandError(f'Manifest row {line_no}: "person" and "product" are required.')
+        row_id = str(raw.get('id') or '').strip()
+        if not row_id:
+            # id 가 없으면 입력 경로 쌍으로 고정 키 생성 (재실행 시 같은 키)
+            row_id = hashlib.sha1(f'{person}\0{product}'.encode('utf-8')).hexdigest()[:16]
+        if row_id in seen:
+            raise CommandError(f'Manifest row {line_no}: duplicate id "{row_id}".')
+        seen.add(row_id)
+        rows.append({
+            'id': row_id,
+            'person': os.path.join(base, person),
+            'product': os.path.join(base, product),
+            'product_reference': str(raw.get('product_reference') or '')[:100],
+        })
+    return rows
+
+
+def load_checkpoint(path: str) -> dict[str, dict]:
+    """Last recorded outcome per row id; a torn last line (killed mid-write) is ignored."""
+
+    outcomes = {}
+    if not os.path.exists(path):
+        return outcomes
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            outcomes[record['id']] = record
+    return outcomes
+
+
+def safe_name(row_id: str) -> str:
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', row_id).strip('._')[:120] or hashlib.sha1(row_id.encode()).hexdigest()
+
+
+class Command(BaseCommand):
+    help = 'Pre-render try-on images for a manifest of person/product pairs, resumably.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help='JSONL or CSV file with person, product[, id, product_reference].')
+        parser.add_argument('--shop', required=True, help='shop_id to charge quota and tokens to.')
+        parser.add_argument('--output-dir', required=True, help='Where result images, results.jsonl and summary.json go.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Generations in flight.')
+        parser.add_argument('--rate', type=float, default=1.0, help='Upstream generations started per second (0: unlimited).')
+        parser.add_argument('--burst', type=int, default=1, help='Generations that may start at once after an idle period.')
+        parser.add_argument('--retries', type=int, default=2, help='Retries per row after upstream errors.')
+        parser.add_argument('--backoff', type=float, default=5.0, help='Seconds before the first retry, doubled per retry.')
+        parser.add_argument('--model', default=None, help='Pin the edit model instead of tier routing.')
+        parser.add_argument('--customer-id', default='catalog-prerender', help='Customer reference of the created requests.')
+        parser.add_argument('--limit', type=int, default=0, help='Process at most this many pending rows.')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1.')
+        shop = ShopProfile.objects.filter(shop_id=options['shop'], is_active=True).first()
+        if shop is None:
+            raise CommandError(f'Unknown or inactive shop: {options["shop"]}')
+
+        rows = read_manifest(options['manifest'])
+        self.output_dir = options['output_dir']
+        os.makedirs(self.output_dir, exist_ok=True)
+        results_path = os.path.join(self.output_dir, 'results.jsonl')
+        done = {
+            row_id for row_id, record in load_checkpoint(results_path).items()
+            if record['status'] == SUCCEEDED and os.path.exists(os.path.join(self.output_dir, record['output']))
+        }
+        done = {row['id'] for row in rows} & done
+        pending = [row for row in rows if row['id'] not in done]
+        if options['limit']:
+            pending = pending[:options['limit']]
+        self.stdout.write(f'{len(rows)} rows, {len(done)} already done, {len(pending)} to render')
+
+        self.shop = shop
+        self.options = options
+        self.bucket = TokenBucket(options['rate'], options['burst'])
+        self.stop = threading.Event()
+        self.stop_reason = ''
+        # 차감 자체는 DB 에서 원자적이지만 스레드가 같은 ShopProfile 인스턴스의 count 를 고치므로 직렬화
+        self.quota_lock = threading.Lock()
+
+        outcomes: list[dict] = []
+        interrupted = False
+        started_at = time.monotonic()
+        with open(results_path, 'a', encoding='utf-8') as results, \
+                ThreadPoolExecutor(max_workers=options['concurrency'], thread_name_prefix='prerender') as pool:
+            queue = iter(pending)
+            in_flight = set()
+            try:
+                while True:
+                    # 한 번에 concurrency 개만 제출 → 중단 시 남은 행은 그대로 다음 실행으로
+                    while len(in_flight) < options['concurrency'] and not self.stop.is_set():
+                        row = next(queue, None)
+                        if row is None:
+                            break
+                        in_flight.add(pool.submit(self._process, row))
+                    if not in_flight:
+                        break
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        self._record(results, future.result(), outcomes, len(pending))
+            except KeyboardInterrupt:
+                interrupted = True
+                self.stop.set()
+                self.stop_reason = self.stop_reason or 'interrupted'
+                self.stderr.write('Interrupted; waiting for generations in flight...')
+                for future in in_flight:
+                    self._record(results, future.result(), outcomes, len(pending))
+
+        summary = self._summary(rows, done, pending, outcomes, time.monotonic() - started_at, interrupted)
+        with open(os.path.join(self.output_dir, 'summary.json'), 'w', encoding='utf-8') as fh:
+            json.dump(summary, fh, indent=2)
+        self.stdout.write(json.dumps(summary, indent=2))
+        if summary['failed']:
+            self.stdout.write(self.style.WARNING(f'{summary["failed"]} rows failed; run again to retry them.'))
+
+    def _record(self, results, outcome: dict | None, outcomes: list, total: int):
+        if outcome is None:
+            return
+        outcomes.append(outcome)
+        # 한 줄씩 flush+fsync: 강제 종료되어도 기록된 행은 다음 실행에서 건너뜀
+        results.write(json.dumps(outcome, ensure_ascii=False) + '\n')
+        results.flush()
+        os.fsync(results.fileno())
+        if outcome['status'] == FAILED:
+            self.stderr.write(f'[{len(outcomes)}/{total}] {outcome["id"]}: {outcome["error_code"]} {outcome["error"]}')
+        elif len(outcomes) % 10 == 0 or len(outcomes) == total:
+            self.stdout.write(f'[{len(outcomes)}/{total}] rendered')
+
+    # ---------- per row (worker threads) ----------
+    def _process(self, row: dict) -> dict | None:
+        try:
+            if self.stop.is_set():
+                return None
+            return self._render(row)
+        finally:
+            connection.close()
+
+    def _render(self, row: dict) -> dict | None:
+        outcome = {'id': row['id'], 'person': row['person'], 'product': row['product'], 'at': timezone.now().isoformat()}
+        charged, log = False, None
+        try:
+            with open(row['person'], 'rb') as person_fh, open(row['product'], 'rb') as product_fh:
+                person, product = File(person_fh, name=row['person']), File(product_fh, name=row['product'])
+                try:
+                    budget = token_budget.preflight(self.shop, person, [product])
+                except (UnidentifiedImageError, OSError) as exc:
+                    raise RowError('invalid_input', str(exc)) from exc
+                if not budget.allowed:
+                    raise RowError('token_budget_exceeded', f'{budget.limited_by} token limit: {budget.estimated_tokens} > {budget.limit}')
+                if not self._charge_quota():
+                    return None
+                charged = True
+
+                log = GenerationRequest.objects.create(shop=self.shop, status=GenerationStatus.STARTED)
+                log.set_customer_reference(self.options['customer_id'])
+                log.product_reference = row['product_reference']
+                log.save(update_fields=['customer_reference', 'customer_hash', 'product_reference'])
+                outcome['request_id'] = log.pk
+                result, tokens, meta, latency_ms, attempts = self._generate_with_retries(log, person, product, budget.max_side)
+
+                output = f'{safe_name(row["id"])}.{EXTENSIONS.get(meta["result_mime"], "png")}'
+                self._write_output(output, result.getvalue())
+                blob_store.attach(
+                    log,
+                    person=person,
+                    product=product,
+                    result=result,
+                    product_sha256=meta['product_sha256'],
+                    result_type=meta['result_mime'],
+                )
+                log.mark_success(
+                    latency_ms=latency_ms,
+                    tokens=tokens,
+                    classify_model=meta['classify_model'],
+                    edit_model=meta['edit_model'],
+                    cached_tokens=meta['cached_tokens'],
+                    estimated_tokens=budget.estimated_tokens,
+                )
+        except Exception as exc:  # pylint: disable=broad-except
+            # 어떤 오류든 이 행만 실패로 기록하고 실행은 계속 (다음 실행에서 재시도)
+            if isinstance(exc, RowError):
+                code, message = exc.code, str(exc)
+            elif isinstance(exc, FileNotFoundError) and not charged:
+                code, message = 'invalid_input', str(exc)
+            else:
+                code, message = 'error', f'{exc.__class__.__name__}: {exc}'
+                self._log_error(exc)
+            if charged:
+                self._settle_failure(log, code, message)
+            return {**outcome, 'status': FAILED, 'error_code': code, 'error': message[:500]}
+
+        return {
+            **outcome,
+            'status': SUCCEEDED,
+            'output': output,
+            'category': meta['category'],
+            'tokens': tokens,
+            'cached_tokens': meta['cached_tokens'],
+            'latency_ms': latency_ms,
+            'attempts': attempts,
+            'downscaled_to': budget.max_side,
+        }
+
+    def _generate_with_retries(self, log, person, product, max_side):
+        attempts = 0
+        while True:
+            attempts += 1
+            if not self.bucket.acquire(self.stop):
+                raise RowError('interrupted', 'Run stopped before the upstream call.')
+            started_at = time.monotonic()
+            try:
+                result, tokens, meta = GeminiAPIService.generate(
+                    product_image=product,
+                    person_image=person,
+                    model=self.options['model'],
+                    tier=self.shop.tier,
+                    max_side=max_side,
+                )
+                return result, tokens, meta, int((time.monotonic() - started_at) * 1000), attempts
+            except GeminiAPIResponseError as exc:
+                GenerationErrorLog.objects.create(
+                    err_from='prerender_catalog',
+                    gemini_message=exc.text,
+                    level=ErrorLevel.ERROR,
+                    request=log,
+                )
+                error = RowError('upstream_error', exc.text)
+            except Exception as exc:  # pylint: disable=broad-except
+                log_service_err(
+                    level=ErrorLevel.ERROR,
+                    err_from=exc.__class__.__name__,
+                    shop=self.shop,
+                    message=str(exc),
+                )
+                error = RowError('error', f'{exc.__class__.__name__}: {exc}')
+            if attempts > self.options['retries'] or self.stop.wait(self.options['backoff'] * 2 ** (attempts - 1)):
+                raise error
+
+    def _charge_quota(self) -> bool:
+        with self.quota_lock:
+            if not self.shop.decrement_quota(actor=None):
+                if not self.stop.is_set():
+                    self.stop_reason = 'quota_exceeded'
+                    self.stop.set()
+                return False
+            log_service(shop=self.shop, remaining=self.shop.count, note='quota decremented via prerender_catalog')
+            return True
+
+    def _refund_quota(self):
+        with self.quota_lock:
+            self.shop.increment_quota(actor=None)
+
+    def _log_error(self, exc: Exception):
+        try:
+            log_service_err(level=ErrorLevel.ERROR, err_from=exc.__class__.__name__, shop=self.shop, message=str(exc))
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def _settle_failure(self, log, code: str, message: str):
+        # 쿼터를 차감한 뒤 실패한 행: 요청은 실패로 남기고 환불
+        # DB 장애라면 이것도 실패할 수 있음 → 각 단계를 따로 시도하고 결과 기록은 막지 않음
+        if log is not None:
+            try:
+                log.mark_failure(error_code=code, error_message=message[:1000])
+            except Exception as exc:  # pylint: disable=broad-except
+                self.stderr.write(f'Could not mark request {log.pk} failed: {exc}')
+        try:
+            self._refund_quota()
+        except Exception as exc:  # pylint: disable=broad-except
+            self.stderr.write(f'Could not refund quota: {exc}')
+
+    def _write_output(self, name: str, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=self.output_dir, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, os.path.join(self.output_dir, name))
+
+    # ---------- report ----------
+    def _summary(self, rows, done, pending, outcomes, elapsed, interrupted) -> dict:
+        succeeded = [outcome for outcome in outcomes if outcome['status'] == SUCCEEDED]
+        failed = [outcome for outcome in outcomes if outcome['status'] == FAILED]
+        latencies = [outcome['latency_ms'] for outcome in succeeded]
+        return {
+            'manifest': os.path.abspath(self.options['manifest']),
+            'shop': self.shop.shop_id,
+            'finished_at': timezone.now().isoformat(),
+            'rows': len(rows),
+            'already_done': len(done),
+            'pending': len(pending),
+            'processed': len(outcomes),
+            'succeeded': len(succeeded),
+            'failed': len(failed),
+            'failures_by_code': dict(Counter(outcome['error_code'] for outcome in failed)),
+            'not_started': len(pending) - len(outcomes),
+            'stopped_reason': self.stop_reason,
+            'interrupted': interrupted,
+            'elapsed_seconds': round(elapsed, 2),
+            'throughput_per_minute': round(len(succeeded) / elapsed * 60, 2) if elapsed else 0.0,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50)),
+                'p95': round(percentile(latencies, 95)),
+                'max': max(latencies, default=0),
+            },
+            'tokens': sum(outcome['tokens'] for outcome in succeeded),
+            'cached_tokens': sum(outcome['cached_tokens'] for outcome in succeeded),
+            'retried_rows': sum(1 for outcome in succeeded if outcome['attempts'] > 1),
+            'downscaled_rows': sum(1 for outcome in succeeded if outcome['downscaled_to']),
+        }
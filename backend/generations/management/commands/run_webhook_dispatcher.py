@@ -0,0 +1,30 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from generations.webhooks import WebhookDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued webhook events to shops\' callback URLs until interrupted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Deliver one round of due events and exit.')
+
+    def handle(self, *args, **options):
+        dispatcher = WebhookDispatcher()
+        try:
+            if options['once']:
+                stats = dispatcher.run_once()
+                self.stdout.write(self.style.SUCCESS(f'{stats}'))
+                return
+
+            stop = threading.Event()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: stop.set())
+            self.stdout.write('Webhook dispatcher running.')
+            stats = dispatcher.run_forever(stop)
+            self.stdout.write(self.style.SUCCESS(f'Stopped: {stats}'))
+        finally:
+            dispatcher.close()
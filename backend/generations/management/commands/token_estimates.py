@@ -0,0 +1,28 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from generations.budget import estimate_accuracy
+
+
+class Command(BaseCommand):
+    help = 'Compare pre-flight token estimates with the usage metadata returned by Gemini.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=7, help='Look at successful requests of the last N days.')
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        report = estimate_accuracy(timezone.now() - timedelta(days=options['days']))
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        rows = [('overall', report['overall']), *report['groups'].items()]
+        self.stdout.write(f'{"":<48} {"n":>6} {"ratio":>6} {"bias%":>7} {"|err|%":>7} {"p95%":>7}')
+        for name, row in rows:
+            self.stdout.write(
+                f'{name:<48} {row["requests"]:>6} {row["ratio"] if row["ratio"] is not None else "-":>6} '
+                f'{row["mean_error_pct"]:>7} {row["mean_abs_error_pct"]:>7} {row["p95_abs_error_pct"]:>7}'
+            )
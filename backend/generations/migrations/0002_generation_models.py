@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationrequest',
+            name='classify_model',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='generationrequest',
+            name='edit_model',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generations', '0002_generation_models'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationrequest',
+            name='cached_tokens',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generations', '0003_cached_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('category', models.CharField(choices=[('top', 'Top'), ('bottom', 'Bottom'), ('set', 'Set'), ('accessory', 'Accessory')], max_length=20)),
+                ('label_source', models.CharField(choices=[('gemini', 'Gemini'), ('manual', 'Manual')], default='gemini', max_length=10)),
+                ('features', models.BinaryField()),
+                ('width', models.PositiveIntegerField(default=0)),
+                ('height', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generations', '0005_product_phash'),
+        ('users', '0003_admin_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='generationerrorlog',
+            name='timestamp',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='generationrequest',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='generationrequest',
+            index=models.Index(fields=['shop', '-created_at'], name='genreq_shop_created_idx'),
+        ),
+    ]
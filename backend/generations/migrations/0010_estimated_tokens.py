@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generations', '0009_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationrequest',
+            name='estimated_tokens',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -4,9 +4,12 @@ import hashlib
 from typing import Optional
 
 from django.db import models
+from django.urls import reverse
 from django.utils import timezone
 
-from users.models import CustomUser, ShopProfile, ErrorLevel
+from users.models import CustomUser, ShopProfile, ShopUsage, ErrorLevel
+
+from .progress import DONE, FAILED, progress
 
 
 class GenerationStatus(models.TextChoices):
@@ -16,6 +19,18 @@ class GenerationStatus(models.TextChoices):
     FAILED = 'failed', 'Failed'
 
 
+class ProductCategory(models.TextChoices):
+    TOP = 'top', 'Top'
+    BOTTOM = 'bottom', 'Bottom'
+    SET = 'set', 'Set'
+    ACCESSORY = 'accessory', 'Accessory'
+
+
+class LabelSource(models.TextChoices):
+    GEMINI = 'gemini', 'Gemini'
+    MANUAL = 'manual', 'Manual'
+
+
 class GenerationRequest(models.Model):
     shop = models.ForeignKey(
         ShopProfile,
@@ -32,9 +47,12 @@ class GenerationRequest(models.Model):
     customer_reference = models.CharField(max_length=100, blank=True)
     customer_hash = models.CharField(max_length=64, blank=True)
     product_reference = models.CharField(max_length=100, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     used_tokens = models.PositiveIntegerField(default=0)
+    cached_tokens = models.PositiveIntegerField(default=0)
+    # 사전 추정치 (캐시 전 총 토큰) → token_estimates 명령으로 실제 사용량과 비교
+    estimated_tokens = models.PositiveIntegerField(default=0)
     latency_ms = models.PositiveIntegerField(default=0)
     status = models.CharField(
         max_length=20,
@@ -46,9 +64,14 @@ class GenerationRequest(models.Model):
     person_image_path = models.CharField(max_length=255, blank=True)
     product_image_path = models.CharField(max_length=255, blank=True)
     result_image_path = models.CharField(max_length=255, blank=True)
+    classify_model = models.CharField(max_length=64, blank=True)
+    edit_model = models.CharField(max_length=64, blank=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['shop', '-created_at'], name='genreq_shop_created_idx'),
+        ]
 
     def __str__(self):
         customer = self.customer_reference or 'anonymous'
@@ -66,17 +89,36 @@ class GenerationRequest(models.Model):
         self.status = GenerationStatus.STARTED
         self.save(update_fields=['status'])
 
-    def mark_success(self, latency_ms: int, tokens: int, result_path: str = ''):
+    def mark_success(
+        self,
+        latency_ms: int,
+        tokens: int,
+        result_path: str = '',
+        classify_model: str = '',
+        edit_model: str = '',
+        cached_tokens: int = 0,
+        estimated_tokens: int = 0,
+    ):
         self.status = GenerationStatus.SUCCESS
         self.latency_ms = latency_ms
         self.used_tokens = tokens
+        self.cached_tokens = cached_tokens
+        self.estimated_tokens = estimated_tokens
         if result_path:
             self.result_image_path = result_path
+        self.classify_model = classify_model
+        self.edit_model = edit_model
         self.updated_at = timezone.now()
-        update_fields = ['status', 'latency_ms', 'used_tokens', 'updated_at']
+        update_fields = [
+            'status', 'latency_ms', 'used_tokens', 'cached_tokens', 'estimated_tokens',
+            'classify_model', 'edit_model', 'updated_at',
+        ]
         if result_path:
             update_fields.append('result_image_path')
         self.save(update_fields=update_fields)
+        ShopUsage.record_tokens(shop=self.shop, tokens=tokens)
+        WebhookEvent.enqueue_for(self, WebhookEventType.GENERATION_SUCCEEDED)
+        progress.publish(self.pk, DONE, result_url=self.result_url)
 
     def mark_failure(self, error_code: str = '', error_message: str = ''):
         self.status = GenerationStatus.FAILED
@@ -84,10 +126,20 @@ class GenerationRequest(models.Model):
         self.error_message = error_message
         self.updated_at = timezone.now()
         self.save(update_fields=['status', 'error_code', 'error_message', 'updated_at'])
+        WebhookEvent.enqueue_for(self, WebhookEventType.GENERATION_FAILED)
+        progress.publish(self.pk, FAILED, error_code=self.error_code)
+
+    @property
+    def result_url(self) -> str:
+        """API path of the stored full-size result, or ``''`` when the result was not retained."""
+
+        if not self.result_image_path.startswith('blobs/'):
+            return ''
+        return reverse('shop-result', kwargs={'shop_id': self.shop.shop_id, 'request_id': self.pk})
 
 
 class GenerationErrorLog(models.Model):
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
     level = models.CharField(max_length=10, choices=ErrorLevel.choices, default=ErrorLevel.ERROR)
     err_from = models.CharField(max_length=64, null=True, blank=True)
     gemini_message = models.CharField(max_length=500, null=True, blank=True)
@@ -101,3 +153,185 @@ class GenerationErrorLog(models.Model):
 
     def __str__(self):
         return f'[{self.timestamp}] ( {self.level} ) : {self.err_from} - Message: {self.gemini_message}'
+
+
+
+class ProductImage(models.Model):
+    """A product image seen before, with its category label and classifier features."""
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    phash = models.BigIntegerField(null=True, blank=True, db_index=True)
+    category = models.CharField(max_length=20, choices=ProductCategory.choices)
+    label_source = models.CharField(max_length=10, choices=LabelSource.choices, default=LabelSource.GEMINI)
+    features = models.BinaryField()
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.sha256[:12]} ({self.category}, {self.label_source})'
+
+    @classmethod
+    def record_label(
+        cls,
+        *,
+        sha256: str,
+        category: str,
+        features: bytes,
+        width: int,
+        height: int,
+        phash: Optional[int] = None,
+        label_source: str = LabelSource.GEMINI,
+    ) -> 'ProductImage':
+        product, _ = cls.objects.update_or_create(
+            sha256=sha256,
+            defaults={
+                'phash': phash,
+                'category': category,
+                'label_source': label_source,
+                'features': features,
+                'width': width,
+                'height': height,
+            },
+        )
+        return product
+
+
+class IdempotencyStatus(models.TextChoices):
+    IN_FLIGHT = 'in_flight', 'In flight'
+    COMPLETED = 'completed', 'Completed'
+
+
+class IdempotencyKey(models.Model):
+    """A client supplied ``Idempotency-Key`` for one shop, with the stored response once done."""
+
+    shop = models.ForeignKey(
+        ShopProfile,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys'
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=IdempotencyStatus.choices, default=IdempotencyStatus.IN_FLIGHT)
+    lease_until = models.DateTimeField()
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_content_type = models.CharField(max_length=100, blank=True)
+    response_headers = models.JSONField(default=dict, blank=True)
+    response_body = models.BinaryField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('shop', 'key')
+
+    def __str__(self):
+        return f'{self.shop_id}:{self.key} ({self.status})'
+
+    @classmethod
+    def purge_expired(cls, batch_size: int = 1000, now=None) -> int:
+        now = now or timezone.now()
+        deleted = 0
+        while True:
+            ids = list(cls.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += cls.objects.filter(pk__in=ids).delete()[0]
+
+
+class WebhookEventType(models.TextChoices):
+    GENERATION_SUCCEEDED = 'generation.succeeded', 'Generation succeeded'
+    GENERATION_FAILED = 'generation.failed', 'Generation failed'
+
+
+class WebhookEvent(models.Model):
+    """An event waiting to be POSTed to its shop's ``callback_url``; deleted once delivered."""
+
+    shop = models.ForeignKey(
+        ShopProfile,
+        on_delete=models.CASCADE,
+        related_name='webhook_events'
+    )
+    event_type = models.CharField(max_length=40, choices=WebhookEventType.choices)
+    payload = models.JSONField(default=dict)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.CharField(max_length=500, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['next_attempt_at'], name='webhook_event_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.event_type} → {self.shop_id} (attempt {self.attempts})'
+
+    @classmethod
+    def enqueue_for(cls, request: GenerationRequest, event_type: str) -> Optional['WebhookEvent']:
+        shop = request.shop
+        if not shop.callback_url:
+            return None
+        return cls.objects.create(
+            shop=shop,
+            event_type=event_type,
+            payload={
+                'request_id': request.pk,
+                'status': request.status,
+                'customer_reference': request.customer_reference,
+                'latency_ms': request.latency_ms,
+                'used_tokens': request.used_tokens,
+                'error_code': request.error_code,
+                'error_message': request.error_message,
+                'created_at': request.created_at.isoformat() if request.created_at else None,
+            },
+        )
+
+
+class WebhookDeadLetter(models.Model):
+    """A webhook event that ran out of attempts or was rejected by the receiver."""
+
+    shop = models.ForeignKey(
+        ShopProfile,
+        on_delete=models.CASCADE,
+        related_name='webhook_dead_letters'
+    )
+    event_type = models.CharField(max_length=40, choices=WebhookEventType.choices)
+    payload = models.JSONField(default=dict)
+    callback_url = models.URLField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    last_error = models.CharField(max_length=500, blank=True)
+    event_created_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'[{self.created_at}] {self.event_type} → {self.shop_id}: {self.last_error}'
+
+
+class Blob(models.Model):
+    """An image stored once under ``blobs/<sha[:2]>/<sha[2:4]>/<sha>``, however many requests use it.
+
+    ``ref_count`` is the number of ``GenerationRequest`` image path columns pointing at it. It is
+    incremented when a request attaches the blob and recomputed by ``gc_blobs``, which deletes
+    blobs nobody references once ``last_referenced_at`` is older than the grace period.
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    content_type = models.CharField(max_length=100, blank=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_referenced_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f'{self.sha256[:12]} ({self.size} bytes, refs={self.ref_count})'
+
+    @property
+    def path(self) -> str:
+        return blob_path(self.sha256)
+
+
+def blob_path(sha256: str) -> str:
+    return f'blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}'
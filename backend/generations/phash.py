@@ -0,0 +1,213 @@
+"""Perceptual hashing and a multi-index Hamming table for near-duplicate product image lookup.
+
+``dhash`` survives re-encoding, resizing and light watermarks far better than byte hashes.
+Hashes are stored on ``ProductImage.phash``; ``phash_index`` is the in-process index over
+them, built from the database in a background thread (started after the worker boots, or by
+the first lookup), extended on insert and topped up with rows written by other workers every
+``refresh_seconds``. Lookups never wait for a load: until the index is ready they report no
+near match, and the caller classifies the image another way.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from PIL import Image
+
+HASH_BITS = 64
+_SIGN_BIT = 1 << (HASH_BITS - 1)
+
+
+def dhash(img: Image.Image, size: int = 8) -> int:
+    """64-bit difference hash: brightness gradient between horizontally adjacent pixels."""
+
+    gray = img.convert('L').resize((size + 1, size), Image.LANCZOS)
+    pixels = gray.tobytes()
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def to_signed(value: int) -> int:
+    # BigIntegerField 은 signed 64bit
+    return value - (1 << HASH_BITS) if value & _SIGN_BIT else value
+
+
+def to_unsigned(value: int) -> int:
+    return value & ((1 << HASH_BITS) - 1)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class MultiIndexHash:
+    """Multi-index hashing (Norouzi et al.): the 64-bit hash is split into ``chunks`` substrings.
+
+    Two hashes within distance ``r`` must agree within ``r // chunks`` bits on at least one
+    substring, so a lookup probes each substring table with every value in that small radius
+    and verifies only the collected candidates.
+    """
+
+    def __init__(self, chunks: int = 4):
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self._mask = (1 << self.chunk_bits) - 1
+        self._tables: list[dict[int, list[int]]] = [{} for _ in range(chunks)]
+        self._items: dict[int, list] = {}
+        self.size = 0
+
+    def _parts(self, value: int) -> list[int]:
+        return [(value >> (i * self.chunk_bits)) & self._mask for i in range(self.chunks)]
+
+    def add(self, value: int, item) -> None:
+        self.size += 1
+        items = self._items.get(value)
+        if items is not None:
+            items.append(item)
+            return
+        self._items[value] = [item]
+        for table, part in zip(self._tables, self._parts(value)):
+            table.setdefault(part, []).append(value)
+
+    def _neighbours(self, part: int, radius: int):
+        yield part
+        if radius >= 1:
+            for i in range(self.chunk_bits):
+                yield part ^ (1 << i)
+        if radius >= 2:
+            for i in range(self.chunk_bits):
+                for j in range(i + 1, self.chunk_bits):
+                    yield part ^ (1 << i) ^ (1 << j)
+
+    def search(self, value: int, max_distance: int) -> list[tuple[int, object]]:
+        """All ``(distance, item)`` within ``max_distance``, closest first."""
+
+        radius = max_distance // self.chunks
+        if radius > 2:
+            raise ValueError(f'max_distance {max_distance} is too large for {self.chunks} chunks')
+        candidates = set()
+        for table, part in zip(self._tables, self._parts(value)):
+            for key in self._neighbours(part, radius):
+                bucket = table.get(key)
+                if bucket:
+                    candidates.update(bucket)
+        found = []
+        for candidate in candidates:
+            distance = hamming(value, candidate)
+            if distance <= max_distance:
+                found.extend((distance, item) for item in self._items[candidate])
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+
+class PerceptualHashIndex:
+    """Index of ``ProductImage`` (phash → (pk, category)), loaded from the database off the request path."""
+
+    def __init__(self, refresh_seconds: float = 60):
+        self.refresh_seconds = refresh_seconds
+        self._table: Optional[MultiIndexHash] = None
+        self._max_pk = 0
+        self._seen: set[int] = set()
+        self._next_load_at = 0.0
+        self._loading = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _rows_since(after_pk: int):
+        from .models import ProductImage
+
+        rows = (
+            ProductImage.objects.filter(pk__gt=after_pk, phash__isnull=False)
+            .order_by('pk')
+            .values_list('phash', 'pk', 'category')
+        )
+        return rows.iterator(chunk_size=5000)
+
+    def load(self) -> None:
+        """Build the index, or add the rows written since the last load."""
+
+        with self._lock:
+            table, after_pk = self._table, self._max_pk
+        if table is None:
+            # 처음 적재는 새 테이블에 채운 뒤 한 번에 교체 (그동안 조회는 "가까운 이미지 없음")
+            table, seen, max_pk = MultiIndexHash(), set(), 0
+            for phash, pk, category in self._rows_since(0):
+                table.add(to_unsigned(phash), (pk, category))
+                seen.add(pk)
+                max_pk = max(max_pk, pk)
+            with self._lock:
+                self._table, self._seen, self._max_pk = table, seen, max_pk
+            return
+        rows = list(self._rows_since(after_pk))
+        with self._lock:
+            for phash, pk, category in rows:
+                if pk not in self._seen:
+                    self._table.add(to_unsigned(phash), (pk, category))
+                    self._seen.add(pk)
+                self._max_pk = max(self._max_pk, pk)
+
+    def start_load(self) -> None:
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+            self._next_load_at = time.monotonic() + self.refresh_seconds
+        threading.Thread(target=self._load_in_background, name='phash-index', daemon=True).start()
+
+    def _load_in_background(self):
+        from django.db import connection
+
+        try:
+            self.load()
+        except Exception:  # pylint: disable=broad-except
+            # 실패하면 refresh_seconds 뒤 다시 시도
+            pass
+        finally:
+            self._loading = False
+            connection.close()
+
+    def _current_table(self) -> Optional[MultiIndexHash]:
+        if time.monotonic() >= self._next_load_at:
+            self.start_load()
+        return self._table
+
+    def add(self, phash: int, pk: int, category: str) -> None:
+        # 적재 전이면 건너뜀: 행은 DB 에 있으므로 적재 때 포함됨
+        with self._lock:
+            if self._table is not None and pk not in self._seen:
+                self._table.add(to_unsigned(phash), (pk, category))
+                self._seen.add(pk)
+
+    def nearest(self, phash: int, max_distance: int) -> Optional[tuple[int, int, str]]:
+        """``(distance, pk, category)`` of the closest known product within ``max_distance``."""
+
+        table = self._current_table()
+        if table is None:
+            return None
+        matches = table.search(to_unsigned(phash), max_distance)
+        if not matches:
+            return None
+        distance, (pk, category) = matches[0]
+        return distance, pk, category
+
+    @property
+    def ready(self) -> bool:
+        return self._table is not None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._table = None
+            self._max_pk = 0
+            self._seen = set()
+            self._next_load_at = 0.0
+
+    def __len__(self):
+        table = self._table
+        return table.size if table is not None else 0
+
+
+phash_index = PerceptualHashIndex()
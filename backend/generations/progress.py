@@ -0,0 +1,173 @@
+"""Stage events of in-flight generations, read by the server-sent events stream.
+
+The generating worker appends events to a short-lived list in the default cache:
+``queued`` → ``classified`` (``category``) → ``editing`` → ``done`` (``result_url``) or
+``failed``. Streams don't read the cache themselves: they subscribe to ``watchers``, a single
+per-process poller that fetches every watched key with one ``get_many`` per interval and wakes
+the streams whose value changed. ``CACHE_URL`` must point at a shared cache (e.g. Redis) when
+the stream and the generation run in different processes; without one the stream still reports
+the final state from the ``GenerationRequest`` row.
+
+Clients don't know the request id until the generate response arrives, so a request sent with
+an ``Idempotency-Key`` can also be watched by that key (see ``bind``).
+"""
+
+import asyncio
+import contextlib
+import threading
+import time
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+QUEUED = 'queued'
+CLASSIFIED = 'classified'
+EDITING = 'editing'
+DONE = 'done'
+FAILED = 'failed'
+TERMINAL_STAGES = {DONE, FAILED}
+
+
+class ProgressChannel:
+    @property
+    def config(self) -> dict:
+        return settings.GENERATION_EVENTS
+
+    def events_key(self, request_id: int) -> str:
+        return f'generation:events:{request_id}'
+
+    def alias_key(self, shop_pk: int, key: str) -> str:
+        return f'generation:key:{shop_pk}:{key}'
+
+    def publish(self, request_id: int, stage: str, **data) -> None:
+        """Append an event. Only the worker running the generation writes, so no locking is needed.
+
+        Best effort: a cache outage must not fail the generation itself.
+        """
+
+        key = self.events_key(request_id)
+        try:
+            events = cache.get(key) or []
+            events.append({'id': len(events) + 1, 'stage': stage, 'at': round(time.time(), 3), **data})
+            cache.set(key, events, self.config['ttl_seconds'])
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def bind(self, shop_pk: int, key: str, request_id: int) -> None:
+        cache.set(self.alias_key(shop_pk, key), request_id, self.config['ttl_seconds'])
+
+    def start(self, request, idempotency_key: Optional[str] = None) -> None:
+        """Publish ``queued`` for a new ``GenerationRequest`` and make it watchable by its key."""
+
+        if idempotency_key:
+            self.bind(request.shop_id, idempotency_key, request.pk)
+        self.publish(request.pk, QUEUED)
+
+    def stage_callback(self, request_id: int):
+        """``on_stage`` callback for ``GeminiAPIService.generate*``."""
+
+        return lambda stage, **data: self.publish(request_id, stage, **data)
+
+    def resolve(self, shop_pk: int, key: str) -> Optional[int]:
+        return cache.get(self.alias_key(shop_pk, key))
+
+    def events(self, request_id: int, after: int = 0) -> list[dict]:
+        return [event for event in cache.get(self.events_key(request_id)) or [] if event['id'] > after]
+
+
+class Watch:
+    """One stream's subscription to a cache key; ``value`` is the last polled value."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.value: Any = None
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+
+    def _notify(self, value: Any) -> None:
+        # 폴러 스레드에서 호출 → 값만 바꾸고 깨우기는 스트림의 이벤트 루프에서
+        self.value = value
+        try:
+            self._loop.call_soon_threadsafe(self._changed.set)
+        except RuntimeError:
+            # 루프가 이미 닫힘 (연결 종료 직후)
+            pass
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait until ``value`` changes; False on timeout."""
+
+        try:
+            await asyncio.wait_for(self._changed.wait(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            return False
+        self._changed.clear()
+        return True
+
+
+class WatcherPool:
+    """Polls the keys of all open streams in this process from one daemon thread.
+
+    The cost is one ``get_many`` per ``poll_interval_seconds`` however many streams are open, and
+    no stream holds a thread while it waits. The thread exits when the last stream closes.
+    """
+
+    def __init__(self):
+        self._watches: dict[str, set[Watch]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+
+    @contextlib.asynccontextmanager
+    async def watch(self, key: str):
+        watch = Watch(key)
+        with self._lock:
+            self._watches.setdefault(key, set()).add(watch)
+            if not self._running:
+                self._running = True
+                threading.Thread(target=self._run, name='generation-events', daemon=True).start()
+        # 새 키는 다음 주기를 기다리지 않고 바로 조회
+        self._wake.set()
+        try:
+            yield watch
+        finally:
+            with self._lock:
+                watches = self._watches.get(key, set())
+                watches.discard(watch)
+                if not watches:
+                    self._watches.pop(key, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(watches) for watches in self._watches.values())
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._watches:
+                    self._running = False
+                    return
+                keys = list(self._watches)
+            self._wake.clear()
+            self.poll(keys)
+            self._wake.wait(progress.config['poll_interval_seconds'])
+
+    def poll(self, keys: list[str]) -> None:
+        try:
+            values = cache.get_many(keys)
+        except Exception:  # pylint: disable=broad-except
+            # 캐시 장애: 다음 주기에 다시 (스트림은 DB 확인으로 최종 상태를 받음)
+            return
+        with self._lock:
+            changed = [
+                (watch, values.get(key))
+                for key in keys
+                for watch in self._watches.get(key, ())
+                if watch.value != values.get(key)
+            ]
+        for watch, value in changed:
+            watch._notify(value)
+
+
+progress = ProgressChannel()
+watchers = WatcherPool()
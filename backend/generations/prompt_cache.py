@@ -0,0 +1,148 @@
+"""Upstream cached content for the static system instructions.
+
+Each (scope, model, key) maps to one ``cachedContents/*`` resource holding a system instruction;
+the scope is the API key's label, since cached contents belong to the key's project. Only the
+system instruction is cached: cached content is a prefix of the request, and the edit prompt
+has to stay after the images (person → product → prompt). Upstream rejects cached content
+under a model-dependent minimum size, so instructions estimated below
+``GEMINI_CONTEXT_CACHE['min_tokens']`` are always sent inline. Entries are created on first use,
+have their TTL extended shortly before expiry, and are dropped when upstream reports them
+missing. Any failure means the caller sends the instruction inline as before; failed creations
+are not retried until ``retry_after_seconds``.
+
+Cached input tokens are billed at ``cached_token_rate`` of the normal price, and are charged to
+the shop's token ledger at that rate (``billed_tokens``).
+"""
+
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from django.conf import settings
+
+
+def billed_tokens(total: int, cached: int) -> int:
+    """Tokens to charge for a response: uncached ones in full, cached ones at ``cached_token_rate``."""
+
+    rate = settings.GEMINI_CONTEXT_CACHE['cached_token_rate']
+    return total - cached + math.ceil(cached * rate)
+
+
+def upstream_tokens(billed: int, cached: int) -> int:
+    """Inverse of ``billed_tokens``: the response's total token count."""
+
+    rate = settings.GEMINI_CONTEXT_CACHE['cached_token_rate']
+    return billed - math.ceil(cached * rate) + cached
+
+
+def is_cache_missing_error(exc: Exception) -> bool:
+    from google.genai import errors
+
+    if not isinstance(exc, errors.APIError):
+        return False
+    message = (exc.message or '').lower()
+    return exc.code == 404 or (exc.code in (400, 403) and 'cache' in message)
+
+
+class _Entry:
+    def __init__(self, name: str, expires_at: float):
+        self.name = name
+        self.expires_at = expires_at
+
+
+class PromptCache:
+    def __init__(self):
+        self._entries: dict[tuple[str, str, str], _Entry] = {}
+        self._failed_until: dict[tuple[str, str, str], float] = {}
+        self._locks: dict[tuple[str, str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.GEMINI_CONTEXT_CACHE['enabled']
+
+    def _key_lock(self, key: tuple[str, str, str]) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _expiry(cached, ttl_seconds: int) -> float:
+        expire_time = getattr(cached, 'expire_time', None)
+        if isinstance(expire_time, datetime):
+            return expire_time.timestamp()
+        return time.time() + ttl_seconds
+
+    def worth_caching(self, instruction_tokens: int) -> bool:
+        cfg = settings.GEMINI_CONTEXT_CACHE
+        return cfg['enabled'] and instruction_tokens >= cfg['min_tokens']
+
+    def get(
+        self, client, model: str, key: str, system_instruction: str, instruction_tokens: int, scope: str = '',
+    ) -> Optional[str]:
+        """Name of a live cached content for (scope, model, key), creating or refreshing it if needed."""
+
+        if not self.worth_caching(instruction_tokens):
+            return None
+        from google.genai import types
+
+        cfg = settings.GEMINI_CONTEXT_CACHE
+        ttl = int(cfg['ttl_seconds'])
+        cache_key = (scope, model, key)
+        entry = self._entries.get(cache_key)
+        now = time.time()
+        if entry and entry.expires_at - now > cfg['refresh_margin_seconds']:
+            return entry.name
+        if self._failed_until.get(cache_key, 0) > now:
+            return entry.name if entry and entry.expires_at > now else None
+
+        with self._key_lock(cache_key):
+            # 다른 스레드가 먼저 생성/갱신했는지 다시 확인
+            entry = self._entries.get(cache_key)
+            now = time.time()
+            if entry and entry.expires_at - now > cfg['refresh_margin_seconds']:
+                return entry.name
+            try:
+                if entry and entry.expires_at > now:
+                    cached = client.caches.update(
+                        name=entry.name,
+                        config=types.UpdateCachedContentConfig(ttl=f'{ttl}s'),
+                    )
+                else:
+                    cached = client.caches.create(
+                        model=model,
+                        config=types.CreateCachedContentConfig(
+                            display_name=f'dressroom:{key}',
+                            system_instruction=system_instruction,
+                            ttl=f'{ttl}s',
+                        ),
+                    )
+            except Exception:
+                self._failed_until[cache_key] = time.time() + cfg['retry_after_seconds']
+                if entry and entry.expires_at > now:
+                    return entry.name  # 갱신 실패: 만료 전까지는 기존 캐시 사용
+                self._entries.pop(cache_key, None)
+                return None
+            name = cached.name or (entry.name if entry else '')
+            if not name:
+                self._failed_until[cache_key] = time.time() + cfg['retry_after_seconds']
+                return None
+            self._entries[cache_key] = _Entry(name, self._expiry(cached, ttl))
+            self._failed_until.pop(cache_key, None)
+            return self._entries[cache_key].name
+
+    def invalidate(self, model: str, key: str, scope: str = ''):
+        self._entries.pop((scope, model, key), None)
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        return {
+            f'{scope}/{model}:{key}' if scope else f'{model}:{key}': {
+                'name': entry.name, 'expires_in_s': int(entry.expires_at - now),
+            }
+            for (scope, model, key), entry in list(self._entries.items())
+        }
+
+
+prompt_cache = PromptCache()
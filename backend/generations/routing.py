@@ -0,0 +1,181 @@
+"""Per-request model selection for the classify and edit stages.
+
+Candidates come from ``settings.GEMINI_MODEL_ROUTING`` (per tier, falling back to ``default``)
+and are ranked by observed latency EWMA, in-flight count and error rate. Timeouts and
+upstream overload errors fall through to the next candidate. The error rate decays with a
+``error_half_life_seconds`` half-life, so a model marked unhealthy is tried again once it has
+been left alone for a while, even though no call reaches it in the meantime. With a request ``Deadline``, each
+call's timeout is cut to the time left, and a call cut short by it doesn't count against the model.
+"""
+
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+from django.conf import settings
+
+from .deadlines import Deadline, DeadlineExceeded
+
+T = TypeVar('T')
+
+CLASSIFY = 'classify'
+EDIT = 'edit'
+
+
+def is_fallback_error(exc: Exception) -> bool:
+    """Timeouts and overload responses are worth retrying on another model; anything else is not."""
+
+    import httpx
+    from google.genai import errors
+
+    if isinstance(exc, (httpx.TimeoutException, TimeoutError)):
+        return True
+    if isinstance(exc, errors.APIError):
+        return exc.code in (429, 503, 504) or exc.status == 'DEADLINE_EXCEEDED'
+    return False
+
+
+class ModelStats:
+    def __init__(self, prior_latency_ms: float):
+        self.latency_ewma_ms = float(prior_latency_ms)
+        self.error_ewma = 0.0
+        self.error_at = time.monotonic()
+        self.in_flight = 0
+        self.calls = 0
+
+    def error_rate(self, now: float, half_life: float) -> float:
+        # 호출이 없는 동안에도 오류율이 반감기마다 절반으로 → 복구된 모델이 다시 후보가 됨
+        if not half_life:
+            return self.error_ewma
+        return self.error_ewma * 0.5 ** (max(now - self.error_at, 0.0) / half_life)
+
+    def as_dict(self, now: float, half_life: float) -> dict:
+        return {
+            'latency_ewma_ms': round(self.latency_ewma_ms, 1),
+            'error_rate': round(self.error_rate(now, half_life), 4),
+            'in_flight': self.in_flight,
+            'calls': self.calls,
+        }
+
+
+class ModelRouter:
+    def __init__(self, policy: Optional[dict] = None):
+        self._policy = policy
+        self._stats: dict[tuple[str, str], ModelStats] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def policy(self) -> dict:
+        if self._policy is None:
+            self._policy = settings.GEMINI_MODEL_ROUTING
+        return self._policy
+
+    @property
+    def error_half_life(self) -> float:
+        return float(self.policy.get('error_half_life_seconds', 0))
+
+    def timeout_ms(self, stage: str) -> int:
+        return int(self.policy['timeouts_ms'][stage])
+
+    def _stats_for(self, stage: str, model: str) -> ModelStats:
+        key = (stage, model)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = ModelStats(self.policy['prior_latency_ms'][stage])
+        return stats
+
+    def candidates(self, stage: str, tier: Optional[str] = None) -> list[str]:
+        """Order the tier's models by expected latency, pushing unhealthy ones to the back."""
+
+        tiers = self.policy.get('tiers', {})
+        models = (tiers.get(tier) or {}).get(stage) or self.policy[stage]
+        max_in_flight = self.policy.get('max_in_flight', {}).get(stage) or 0
+        max_error_rate = self.policy.get('max_error_rate', 0.5)
+        position_penalty = self.policy.get('position_penalty', 0.5)
+
+        half_life = self.error_half_life
+        ranked = []
+        with self._lock:
+            now = time.monotonic()
+            for position, model in enumerate(models):
+                stats = self._stats_for(stage, model)
+                saturated = bool(max_in_flight) and stats.in_flight >= max_in_flight
+                unhealthy = stats.error_rate(now, half_life) >= max_error_rate or saturated
+                expected = stats.latency_ewma_ms * (1 + stats.in_flight) * (1 + position_penalty * position)
+                ranked.append((unhealthy, expected, position, model))
+        ranked.sort()
+        return [model for *_, model in ranked]
+
+    def expected_ms(self, stage: str, tier: Optional[str] = None) -> float:
+        """Latency EWMA of the model the next call would go to."""
+
+        model = self.candidates(stage, tier)[0]
+        with self._lock:
+            return self._stats_for(stage, model).latency_ewma_ms
+
+    def _begin(self, stage: str, model: str):
+        with self._lock:
+            stats = self._stats_for(stage, model)
+            stats.in_flight += 1
+            stats.calls += 1
+
+    def _end(self, stage: str, model: str, latency_ms: Optional[float], failed: Optional[bool]):
+        # failed=None: 결과 불명 (요청 기한으로 끊김) → 오류율 유지
+        alpha = self.policy.get('ewma_alpha', 0.2)
+        with self._lock:
+            stats = self._stats_for(stage, model)
+            stats.in_flight = max(stats.in_flight - 1, 0)
+            if failed is not None:
+                now = time.monotonic()
+                current = stats.error_rate(now, self.error_half_life)
+                stats.error_ewma = (1 - alpha) * current + alpha * (1.0 if failed else 0.0)
+                stats.error_at = now
+            if latency_ms is not None:
+                stats.latency_ewma_ms = (1 - alpha) * stats.latency_ewma_ms + alpha * latency_ms
+
+    def call(
+        self,
+        stage: str,
+        fn: Callable[[str, int], T],
+        *,
+        tier: Optional[str] = None,
+        pinned: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> tuple[T, str]:
+        """Run ``fn(model, timeout_ms)`` on the best candidate, falling back on timeouts."""
+
+        models = [pinned] if pinned else self.candidates(stage, tier)
+        timeout_ms = self.timeout_ms(stage)
+        last_exc: Optional[Exception] = None
+        for model in models:
+            if deadline is not None:
+                deadline.check(stage)
+            self._begin(stage, model)
+            started = time.monotonic()
+            try:
+                result = fn(model, deadline.clamp_ms(timeout_ms) if deadline is not None else timeout_ms)
+            except Exception as exc:
+                if deadline is not None and (deadline.expired or isinstance(exc, DeadlineExceeded)):
+                    # 클라이언트 기한 때문에 끊긴 호출은 모델 지연/오류율에 반영하지 않음
+                    self._end(stage, model, None, failed=None)
+                    raise DeadlineExceeded(stage) from exc
+                elapsed = (time.monotonic() - started) * 1000
+                self._end(stage, model, elapsed, failed=True)
+                if not is_fallback_error(exc):
+                    raise
+                last_exc = exc
+                continue
+            self._end(stage, model, (time.monotonic() - started) * 1000, failed=False)
+            return result, model
+        raise last_exc
+
+    def snapshot(self) -> dict:
+        half_life = self.error_half_life
+        with self._lock:
+            now = time.monotonic()
+            return {
+                f'{stage}:{model}': stats.as_dict(now, half_life) for (stage, model), stats in self._stats.items()
+            }
+
+
+model_router = ModelRouter()
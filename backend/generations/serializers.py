@@ -1,7 +1,36 @@
 from rest_framework import serializers
 
+from .blobs import BLOB_PREFIX
+from .models import GenerationRequest
+
 class GenerationSerializer(serializers.Serializer):
     shop_id = serializers.CharField(max_length=50)
     customer_id = serializers.CharField(max_length=100, required=False)
     product_image = serializers.ImageField()
-    person_image = serializers.ImageField()
\ No newline at end of file
+    person_image = serializers.ImageField()
+
+
+class GenerationHistorySerializer(serializers.ModelSerializer):
+    has_result = serializers.SerializerMethodField()
+
+    def get_has_result(self, obj: GenerationRequest) -> bool:
+        return obj.result_image_path.startswith(BLOB_PREFIX)
+
+    class Meta:
+        model = GenerationRequest
+        fields = [
+            'id',
+            'created_at',
+            'status',
+            'customer_reference',
+            'product_reference',
+            'latency_ms',
+            'used_tokens',
+            'cached_tokens',
+            'estimated_tokens',
+            'classify_model',
+            'edit_model',
+            'error_code',
+            'has_result',
+        ]
+        read_only_fields = fields
@@ -1,16 +1,101 @@
 # Gemini API와 통신하는 모든 로직 (2-스텝: 분류 → 편집)
+# google.genai 는 첫 호출 시점에 import/생성 (manage.py 명령, collectstatic 등은 비용을 지불하지 않음)
+
+from __future__ import annotations
 
-from google import genai
-from google.genai import types
 from io import BytesIO
+from typing import TYPE_CHECKING
 from PIL import Image, ImageOps
 from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
 from dotenv import load_dotenv
-import os, base64
+import os, base64, hashlib, math, threading
+
+from .routing import model_router, CLASSIFY, EDIT
+from .deadlines import Deadline
+from .keypool import key_pool
+from .prompt_cache import billed_tokens, prompt_cache, is_cache_missing_error
+
+if TYPE_CHECKING:
+    from google.genai import types
 
 load_dotenv()
 GEMINI_KEY = os.environ.get('GEMINI_KEY')
+# 여러 키(프로젝트)를 쉼표로: "label=key,label=key" 또는 "key,key" → 키별 클라이언트 풀 (keypool.py)
+GEMINI_KEYS = [key.strip() for key in os.environ.get('GEMINI_KEYS', '').split(',') if key.strip()]
+GEMINI_BASE_URL = os.environ.get('GEMINI_BASE_URL')
+GEMINI_POOL_SIZE = int(os.environ.get('GEMINI_POOL_SIZE', '10'))
+GEMINI_KEEPALIVE_SECONDS = float(os.environ.get('GEMINI_KEEPALIVE_SECONDS', '120'))
+
+CLASSIFY_SYSTEM_INSTRUCTION = "Return exactly one word: top, bottom, set, or accessory. No punctuation."
+CLASSIFY_PROMPT = (
+    "Classify the product in the image into exactly one of these labels:\n"
+    "- top (jacket, blazer, coat, shirt, sweater, hoodie, cardigan, vest)\n"
+    "- bottom (pants, jeans, shorts, skirt)\n"
+    "- set (two-piece suit, tracksuit)\n"
+    "- accessory (hat, scarf, tie, belt, bag, glasses)\n"
+    "Return only one word: top, bottom, set, or accessory."
+)
+EDIT_SYSTEM_INSTRUCTION = (
+    "You are an image editor. Always EDIT the FIRST image using the SECOND image "
+    "as clothing reference. Never add or duplicate any person. "
+    "Keep identity, pose, camera angle, lighting, and background unchanged. "
+    "Always edit ONLY the region that corresponds to the product category."
+)
+OUTFIT_EDIT_SYSTEM_INSTRUCTION = (
+    "You are an image editor. Always EDIT the FIRST image using EVERY following image "
+    "as a clothing reference, all applied together in one result. Never add or duplicate any person. "
+    "Keep identity, pose, camera angle, lighting, and background unchanged. "
+    "Always edit ONLY the regions that correspond to the product categories."
+)
+PROMPT_COMMON_TAIL = (
+    "Keep face, body, pose, camera angle, lighting, and background unchanged. "
+    "Use the product image's exact color, material, texture, and silhouette. "
+    "Accept partial occlusion from arms or a seated pose. "
+    "Do not flip, mirror, crop, or recolor garments that are not shown in the product image."
+)
+# 아웃핏 프롬프트에서 상품 이미지별로 교체할 영역
+OUTFIT_REGIONS = {
+    "top": "the TOP; replace only the upper-body garment",
+    "bottom": "the BOTTOM; replace only the pants/skirt area",
+    "set": "the outfit SET; replace only the parts included in the set",
+    "accessory": "the ACCESSORY; add or replace only that item with natural scale and placement",
+}
+
+# 토큰 사전 추정 (Gemini 이미지 토큰 규칙: 양변 384px 이하는 258, 그 외는 768px 타일당 258)
+IMAGE_SMALL_PX = 384
+IMAGE_TILE_PX = 768
+TOKENS_PER_IMAGE_TILE = 258
+EDIT_OUTPUT_TOKENS = 1290  # 생성 이미지 1장
+CLASSIFY_OUTPUT_TOKENS = 2
+CHARS_PER_TOKEN = 4
+
+# 요청 기한이 짧아 Gemini 분류를 생략할 때의 카테고리/모델 표시
+DEFAULT_CATEGORY = "top"
+CLASSIFY_SKIPPED = "skipped:deadline"
+
+
+def image_tokens(width: int, height: int) -> int:
+    if width <= IMAGE_SMALL_PX and height <= IMAGE_SMALL_PX:
+        return TOKENS_PER_IMAGE_TILE
+    return math.ceil(width / IMAGE_TILE_PX) * math.ceil(height / IMAGE_TILE_PX) * TOKENS_PER_IMAGE_TILE
+
+
+def text_tokens(*texts: str) -> int:
+    return math.ceil(sum(len(text) for text in texts) / CHARS_PER_TOKEN)
+
+
+def scaled_size(size: tuple[int, int], max_side: int | None) -> tuple[int, int]:
+    # Image.thumbnail 과 같은 비율 유지 축소
+    width, height = size
+    if not max_side or max(width, height) <= max_side:
+        return width, height
+    ratio = max_side / max(width, height)
+    return max(round(width * ratio), 1), max(round(height * ratio), 1)
+
+
+def _ignore_stage(stage: str, **data):
+    pass
 
 class GeminiAPIResponseError(Exception):
     # Gemini API 응답 중 에러 발생 시
@@ -28,7 +113,57 @@ class GeminiAPIResponseError(Exception):
 
 class _GeminiAPIService:
     def __init__(self):
-        self.client = genai.Client(api_key=GEMINI_KEY)
+        self._lock = threading.Lock()
+        self.configure()
+
+    def configure(self, api_key: str | None = None, base_url: str | None = None, api_keys: list[str] | None = None):
+        # base_url 지정 시 로컬 페이크 서버 등 다른 엔드포인트로 요청을 보냄
+        # 키별 클라이언트는 다음 접근 시 새 설정으로 다시 생성됨
+        with self._lock:
+            self._base_url = base_url or GEMINI_BASE_URL
+            keys = api_keys or ([api_key] if api_key else GEMINI_KEYS or [GEMINI_KEY or ''])
+            key_pool.configure(keys, self._build_client)
+
+    def _reset_after_fork(self):
+        # fork 이전에 만든 커넥션 풀을 워커끼리 공유하지 않도록 버림 (닫지 않음: 소켓은 부모 소유)
+        self._lock = threading.Lock()
+        key_pool.reset_after_fork()
+
+    def _build_client(self, api_key: str):
+        import httpx
+        from google import genai
+        from google.genai import types
+
+        http_options = types.HttpOptions(
+            base_url=self._base_url or None,
+            client_args={
+                'limits': httpx.Limits(
+                    max_connections=GEMINI_POOL_SIZE,
+                    max_keepalive_connections=GEMINI_POOL_SIZE,
+                    keepalive_expiry=GEMINI_KEEPALIVE_SECONDS,
+                ),
+            },
+        )
+        return genai.Client(api_key=api_key, http_options=http_options)
+
+    def warmup(self, connections: int = 1):
+        # 워커 시작 직후 호출: 클라이언트 생성 + TLS/keep-alive 커넥션을 미리 열어 둠
+        # models.get 은 쿼터를 소모하지 않음. 실패해도 요청 처리에는 영향 없음
+        from concurrent.futures import ThreadPoolExecutor
+
+        keys = key_pool.keys
+        model = model_router.candidates(EDIT)[0]
+
+        def ping(index):
+            # 키마다 클라이언트를 만들고 커넥션을 나눠서 연결
+            try:
+                key_pool.client_for(keys[index % len(keys)]).models.get(model=model)
+                return True
+            except Exception:
+                return False
+
+        with ThreadPoolExecutor(max_workers=max(connections, 1)) as pool:
+            return sum(pool.map(ping, range(max(connections, 1))))
 
     # ---------- helpers ----------
     def _normalize_exif(self, img: Image.Image) -> Image.Image:
@@ -38,6 +173,14 @@ class _GeminiAPIService:
         except Exception:
             return img
         
+    def _sha256(self, upload) -> str:
+        digest = hashlib.sha256()
+        upload.seek(0)
+        for chunk in iter(lambda: upload.read(1024 * 1024), b''):
+            digest.update(chunk)
+        upload.seek(0)
+        return digest.hexdigest()
+
     def _extract_first_image_bytes(self, response: types.GenerateContentResponse) -> tuple[bytes, str]:
         # 응답에서 첫 번째 이미지 파트를 찾아 base64/bytes 모두 처리
         for cand in response.candidates or []:
@@ -59,41 +202,173 @@ class _GeminiAPIService:
                     out.append(part.text.strip())
         return " ".join(out).strip()
     
+    def _usage_tokens(self, response: types.GenerateContentResponse) -> tuple[int, int]:
+        # (과금 토큰, 캐시 토큰): 컨텍스트 캐시에서 읽은 입력 토큰은 할인율(cached_token_rate)로 과금
+        usage = response.usage_metadata
+        total = int(getattr(usage, "total_token_count", 0) or 0)
+        cached = int(getattr(usage, "cached_content_token_count", 0) or 0)
+        return billed_tokens(total, cached), cached
+
+    def _generate_with_prefix(
+            self,
+            model: str,
+            cache_key: str,
+            system_instruction: str,
+            prompt: str,
+            contents: list,
+            modality: str,
+            timeout_ms: int,
+            deadline: Deadline | None = None,
+        ) -> types.GenerateContentResponse:
+        # 고정 system_instruction 은 업스트림 컨텍스트 캐시로 (최소 크기 이상일 때만), 없으면 인라인으로 전송
+        # prompt 는 항상 이미지 뒤에 인라인 (순서: person → product → prompt)
+        from google.genai import types
+
+        instruction_tokens = text_tokens(system_instruction)
+
+        def send(key):
+            # 다른 키로 재시도할 때도 요청 기한 안에서만 (타임아웃 = 남은 시간)
+            http_options = types.HttpOptions(timeout=deadline.clamp_ms(timeout_ms) if deadline else timeout_ms)
+            # 컨텍스트 캐시는 프로젝트(키) 소유 → 키별로 따로 관리
+            client = key_pool.client_for(key)
+            cached_name = prompt_cache.get(client, model, cache_key, system_instruction, instruction_tokens, scope=key.label)
+            if cached_name:
+                try:
+                    return client.models.generate_content(
+                        model=model,
+                        contents=[*contents, prompt],
+                        config=types.GenerateContentConfig(
+                            response_modalities=[modality],
+                            cached_content=cached_name,
+                            http_options=http_options,
+                        ),
+                    )
+                except Exception as exc:
+                    if not is_cache_missing_error(exc):
+                        raise
+                    prompt_cache.invalidate(model, cache_key, scope=key.label)
+
+            return client.models.generate_content(
+                model=model,
+                contents=[*contents, prompt],
+                config=types.GenerateContentConfig(
+                    response_modalities=[modality],
+                    system_instruction=system_instruction,
+                    http_options=http_options,
+                ),
+            )
+
+        # 429 를 받은 키는 쿨다운, 다른 키로 재시도
+        return key_pool.call(send, tokens_of=lambda resp: int(getattr(resp.usage_metadata, 'total_token_count', 0) or 0))
+
     # ---------- step 1: classify product category ----------
-    def _classify_product(self, product_img: Image.Image) -> tuple[str, int]:
-        prompt = (
-            "Classify the product in the image into exactly one of these labels:\n"
-            "- top (jacket, blazer, coat, shirt, sweater, hoodie, cardigan, vest)\n"
-            "- bottom (pants, jeans, shorts, skirt)\n"
-            "- set (two-piece suit, tracksuit)\n"
-            "- accessory (hat, scarf, tie, belt, bag, glasses)\n"
-            "Return only one word: top, bottom, set, or accessory."
-        )
-        cfg = types.GenerateContentConfig(
-            response_modalities=['TEXT'],
-            system_instruction="Return exactly one word: top, bottom, set, or accessory. No punctuation."
-        )
-        resp = self.client.models.generate_content(
-            model="gemini-2.5-flash",            # 텍스트 분류용
-            contents=[product_img, prompt],
-            config=cfg
-        )
+    def _classify_product(
+            self,
+            product_img: Image.Image,
+            tier: str | None = None,
+            deadline: Deadline | None = None,
+        ) -> tuple[str, int, int, str]:
+        def call(model: str, timeout_ms: int):
+            # 텍스트 분류용 (라우터가 모델 선택)
+            return self._generate_with_prefix(
+                model, 'classify', CLASSIFY_SYSTEM_INSTRUCTION, CLASSIFY_PROMPT,
+                [product_img], 'TEXT', timeout_ms, deadline,
+            )
+
+        resp, model = model_router.call(CLASSIFY, call, tier=tier, deadline=deadline)
         text = self._extract_text(resp).lower()
-        toks = getattr(resp.usage_metadata, "total_token_count", 0)
-        if "bottom" in text: return "bottom", toks
-        if "set" in text: return "set", toks
-        if "accessory" in text: return "accessory", toks
+        toks, cached = self._usage_tokens(resp)
+        if "bottom" in text: return "bottom", toks, cached, model
+        if "set" in text: return "set", toks, cached, model
+        if "accessory" in text: return "accessory", toks, cached, model
         # 기본값(top)로 폴백
-        return "top", toks
+        return DEFAULT_CATEGORY, toks, cached, model
+
+    def _classify_fits(self, deadline: Deadline | None, tier: str | None) -> bool:
+        # 분류 예상 시간이 남은 시간의 classify_max_share 이하이고, 그 뒤에도 편집 예상 시간이 남아야 함
+        if deadline is None:
+            return True
+        return deadline.affords(
+            model_router.expected_ms(CLASSIFY, tier),
+            reserve_ms=model_router.expected_ms(EDIT, tier),
+            max_share=settings.GENERATION_DEADLINE['classify_max_share'],
+        )
     
+    def _resolve_category(
+            self,
+            product_img: Image.Image,
+            product_sha256: str,
+            tier: str | None = None,
+            deadline: Deadline | None = None,
+        ) -> tuple[str, int, int, str]:
+        known, label = self._known_category(product_img, product_sha256, tier=tier, deadline=deadline)
+        if known is not None:
+            return known
+        result = self._classify_product(product_img, tier=tier, deadline=deadline)
+        self._record_label(product_img, product_sha256, result[0], label)
+        return result
+
+    def _known_category(
+            self,
+            product_img: Image.Image,
+            product_sha256: str,
+            tier: str | None = None,
+            deadline: Deadline | None = None,
+        ) -> tuple[tuple[str, int, int, str] | None, tuple[int, object] | None]:
+        # 1) 같은 이미지(sha256) 또는 지각 해시(dHash)가 가까운 이미지로 이미 분류된 적이 있으면 재사용
+        # 2) 로컬 k-NN 분류기가 충분히 확신하면 사용
+        # 3) 아니면 (None, 라벨 저장용 (phash, 특징 벡터)) → Gemini 분류 후 _record_label
+        # 요청 기한 안에 분류+편집이 끝나기 어려우면 3) 대신 기본 카테고리 (저장하지 않음)
+        from .classifier import local_classifier, extract_features
+        from .models import ProductImage
+        from .phash import dhash, phash_index, to_signed
+
+        cfg = settings.LOCAL_CLASSIFIER
+        if not (cfg['collect'] or cfg['enabled']):
+            if self._classify_fits(deadline, tier):
+                return None, None
+            known = ProductImage.objects.filter(sha256=product_sha256).values_list('category', flat=True).first()
+            return ((known, 0, 0, 'cache:sha256') if known else (DEFAULT_CATEGORY, 0, 0, CLASSIFY_SKIPPED)), None
+
+        known = ProductImage.objects.filter(sha256=product_sha256).values_list('category', flat=True).first()
+        if known:
+            return (known, 0, 0, 'cache:sha256'), None
+
+        phash = to_signed(dhash(product_img))
+        near = phash_index.nearest(phash, settings.PHASH_MAX_DISTANCE)
+        if near:
+            return (near[2], 0, 0, 'cache:phash'), None
+
+        features = extract_features(product_img)
+        local = local_classifier.predict(features)
+        if local:
+            return (local[0], 0, 0, 'local:knn'), None
+
+        if not self._classify_fits(deadline, tier):
+            return (DEFAULT_CATEGORY, 0, 0, CLASSIFY_SKIPPED), None
+        return None, ((phash, features) if cfg['collect'] else None)
+
+    def _record_label(self, product_img: Image.Image, product_sha256: str, category: str, label) -> None:
+        # Gemini 라벨/특징 벡터/해시 저장 (로컬 분류기·중복 인덱스 학습 데이터)
+        if label is None:
+            return
+        from .classifier import features_to_bytes
+        from .models import ProductImage
+        from .phash import phash_index
+
+        phash, features = label
+        record = ProductImage.record_label(
+            sha256=product_sha256,
+            phash=phash,
+            category=category,
+            features=features_to_bytes(features),
+            width=product_img.width,
+            height=product_img.height,
+        )
+        phash_index.add(phash, record.pk, category)
+
     # ---------- step 2: build prompt by category ----------
     def _build_prompt_by_category(self, category: str) -> str:
-        common_tail = (
-            "Keep face, body, pose, camera angle, lighting, and background unchanged. "
-            "Use the product image's exact color, material, texture, and silhouette. "
-            "Accept partial occlusion from arms or a seated pose. "
-            "Do not flip, mirror, crop, or recolor garments that are not shown in the product image."
-        )
         if category == "bottom":
             head = (
                 "Edit the person image so the person is wearing the BOTTOM from the product image. "
@@ -117,55 +392,234 @@ class _GeminiAPIService:
                 "Replace ONLY the upper-body garment that corresponds to the product image. "
                 "Keep pants, shoes, and accessories unchanged. "
             )
-        return head + common_tail
+        return head + PROMPT_COMMON_TAIL
+
+    def _build_outfit_prompt(self, categories: list[str]) -> str:
+        # 상품 1개면 단일 프롬프트와 동일, 여러 개면 이미지 순서(2번째부터)대로 영역을 나열
+        if len(categories) == 1:
+            return self._build_prompt_by_category(categories[0])
+        lines = [
+            f"- Image {index}: {OUTFIT_REGIONS.get(category, OUTFIT_REGIONS['top'])}."
+            for index, category in enumerate(categories, start=2)
+        ]
+        head = (
+            "Edit the person image (image 1) so the person is wearing ALL of the following products "
+            "at once, as one coherent outfit:\n" + "\n".join(lines) + "\n"
+            "Layer them naturally (e.g. a top tucked in or over a bottom as the products suggest). "
+            "Keep every garment and accessory not listed above unchanged. "
+        )
+        return head + PROMPT_COMMON_TAIL
+
+    # ---------- step 3: edit ----------
+    def _edit(
+            self,
+            cache_key: str,
+            system_instruction: str,
+            prompt: str,
+            contents: list,
+            tier: str | None,
+            model: str | None,
+            deadline: Deadline | None = None,
+        ) -> tuple[BytesIO, int, int, str, str]:
+        # 반환: (이미지, 과금 토큰, 캐시 토큰, mime, 편집 모델)
+        if deadline is not None:
+            # 남은 시간으로 끝낼 수 없는 편집은 시작하지 않음 (토큰 낭비 방지)
+            deadline.check(EDIT, need_ms=settings.GENERATION_DEADLINE['min_edit_ms'])
+
+        def call(edit_model: str, timeout_ms: int):
+            return self._generate_with_prefix(
+                edit_model, cache_key, system_instruction, prompt,
+                contents, 'IMAGE', timeout_ms, deadline,
+            )
+
+        resp, edit_model = model_router.call(EDIT, call, tier=tier, pinned=model, deadline=deadline)
+
+        img_bytes, mime = self._extract_first_image_bytes(resp)
+        tokens_edit, cached_edit = self._usage_tokens(resp)
+        if not img_bytes:
+            raise GeminiAPIResponseError(
+                'Gemini API returned an empty response.',
+                response=resp
+            )
+        return BytesIO(img_bytes), tokens_edit, cached_edit, mime or 'image/png', edit_model
+
+    # ---------- token estimate ----------
+    def estimate_tokens(
+            self,
+            person_size: tuple[int, int],
+            product_sizes: list[tuple[int, int]],
+            max_side: int | None = None,
+        ) -> int:
+        # 업스트림 호출 전 총 토큰(캐시 적용 전) 추정: 상품별 분류 + 편집 1회
+        # 카테고리는 아직 모르므로 가장 긴 프롬프트 기준 (보수적)
+        person_size = scaled_size(person_size, max_side)
+        product_sizes = [scaled_size(size, max_side) for size in product_sizes]
+        classify = sum(
+            image_tokens(*size) + text_tokens(CLASSIFY_SYSTEM_INSTRUCTION, CLASSIFY_PROMPT) + CLASSIFY_OUTPUT_TOKENS
+            for size in product_sizes
+        )
+        if len(product_sizes) == 1:
+            system = EDIT_SYSTEM_INSTRUCTION
+            prompt = max((self._build_prompt_by_category(c) for c in OUTFIT_REGIONS), key=len)
+        else:
+            system = OUTFIT_EDIT_SYSTEM_INSTRUCTION
+            longest = max(OUTFIT_REGIONS, key=lambda c: len(OUTFIT_REGIONS[c]))
+            prompt = self._build_outfit_prompt([longest] * len(product_sizes))
+        edit = (
+            image_tokens(*person_size)
+            + sum(image_tokens(*size) for size in product_sizes)
+            + text_tokens(system, prompt)
+            + EDIT_OUTPUT_TOKENS
+        )
+        return classify + edit
 
-    # ---------- public API (unchanged signature) ----------
+    def _load(self, upload: UploadedFile, max_side: int | None) -> Image.Image:
+        img = self._normalize_exif(Image.open(upload))
+        if max_side and max(img.size) > max_side:
+            # 토큰 예산에 맞추기 위한 축소 (budget.preflight 가 결정)
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+        return img
+
+    # ---------- public API ----------
     def generate(
             self,
             product_image: UploadedFile,
             person_image: UploadedFile,
-            model='gemini-2.5-flash-image'
+            model: str | None = None,
+            tier: str | None = None,
+            on_stage=None,
+            max_side: int | None = None,
+            deadline: Deadline | None = None,
         ):
+        # model 지정 시 편집 모델을 고정, 아니면 tier/상태 기반 라우팅
+        # on_stage(stage, **data): 진행 단계 알림 (classified → editing), SSE 스트림용
+        # max_side: 지정 시 입력 이미지의 긴 변을 이 크기로 축소 (토큰 예산)
+        # deadline: 요청 기한 (업스트림 타임아웃 상한, 초과 시 DeadlineExceeded)
+        # 반환: (이미지, 과금 토큰, meta{category, classify_model, edit_model, cached_tokens, product_sha256, result_mime})
+        on_stage = on_stage or _ignore_stage
 
         # 0) load & normalize
-        person = self._normalize_exif(Image.open(person_image))
-        product = self._normalize_exif(Image.open(product_image))
+        product_sha256 = self._sha256(product_image)
+        person = self._load(person_image, max_side)
+        product = self._load(product_image, max_side)
 
         # 1) classify product
-        category, tokens_cls = self._classify_product(product)
+        category, tokens_cls, cached_cls, classify_model = self._resolve_category(
+            product, product_sha256, tier=tier, deadline=deadline,
+        )
+        on_stage('classified', category=category)
 
         # 2) build edit prompt
         prompt = self._build_prompt_by_category(category)
 
         # 3) edit (순서 중요: person → product → prompt)
-        cfg = types.GenerateContentConfig(
-            response_modalities=['IMAGE'],
-            system_instruction=(
-                "You are an image editor. Always EDIT the FIRST image using the SECOND image "
-                "as clothing reference. Never add or duplicate any person. "
-                "Keep identity, pose, camera angle, lighting, and background unchanged. "
-                "Always edit ONLY the region that corresponds to the product category."
-            )
+        on_stage('editing')
+        image, tokens_edit, cached_edit, mime, edit_model = self._edit(
+            'edit', EDIT_SYSTEM_INSTRUCTION, prompt, [person, product], tier, model, deadline,
         )
+        total_tokens = tokens_cls + tokens_edit
+
+        meta = {
+            'category': category,
+            'classify_model': classify_model,
+            'edit_model': edit_model,
+            'cached_tokens': cached_cls + cached_edit,
+            'product_sha256': product_sha256,
+            'result_mime': mime,
+        }
+        return image, total_tokens, meta
+
+    def _resolve_categories(
+            self,
+            products: list[Image.Image],
+            product_sha256s: list[str],
+            tier: str | None = None,
+            deadline: Deadline | None = None,
+        ) -> list[tuple[str, int, int, str]]:
+        # 같은 이미지는 한 번만 분류. DB 조회·라벨 저장은 요청 스레드에서 하고
+        # Gemini 분류 호출만 동시에 실행 (작업 스레드가 각자 DB 커넥션을 열지 않도록)
+        from concurrent.futures import ThreadPoolExecutor
 
-        resp = self.client.models.generate_content(
-            model=model,
-            contents=[person, product, prompt],
-            config=cfg
+        first_index = {}
+        for index, sha256 in enumerate(product_sha256s):
+            first_index.setdefault(sha256, index)
+
+        resolved, pending = {}, {}
+        for sha256, index in first_index.items():
+            known, label = self._known_category(products[index], sha256, tier=tier, deadline=deadline)
+            if known is None:
+                pending[sha256] = (index, label)
+            else:
+                resolved[sha256] = known
+
+        if len(pending) == 1:
+            sha256, (index, _) = next(iter(pending.items()))
+            resolved[sha256] = self._classify_product(products[index], tier=tier, deadline=deadline)
+        elif pending:
+            with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix='classify') as pool:
+                futures = {
+                    sha256: pool.submit(self._classify_product, products[index], tier=tier, deadline=deadline)
+                    for sha256, (index, _) in pending.items()
+                }
+            for sha256, future in futures.items():
+                resolved[sha256] = future.result()
+        for sha256, (index, label) in pending.items():
+            self._record_label(products[index], sha256, resolved[sha256][0], label)
+
+        results = []
+        for index, sha256 in enumerate(product_sha256s):
+            if index == first_index[sha256]:
+                results.append(resolved[sha256])
+            else:
+                results.append((resolved[sha256][0], 0, 0, resolved[sha256][3]))
+        return results
+
+    def generate_outfit(
+            self,
+            product_images: list[UploadedFile],
+            person_image: UploadedFile,
+            model: str | None = None,
+            tier: str | None = None,
+            on_stage=None,
+            max_side: int | None = None,
+            deadline: Deadline | None = None,
+        ):
+        # 여러 상품(상의+하의 등)을 한 번의 편집 호출로 입힘
+        # 반환은 generate 와 같음. meta['category'] 는 'top+bottom' 형식, product_sha256 은 첫 번째 상품
+        on_stage = on_stage or _ignore_stage
+        product_sha256s = [self._sha256(upload) for upload in product_images]
+        person = self._load(person_image, max_side)
+        products = [self._load(upload, max_side) for upload in product_images]
+
+        # 1) classify products concurrently
+        resolved = self._resolve_categories(products, product_sha256s, tier=tier, deadline=deadline)
+        categories = [category for category, _, _, _ in resolved]
+        classify_models = list(dict.fromkeys(model_name for _, _, _, model_name in resolved))
+
+        # 2) build composed prompt
+        prompt = self._build_outfit_prompt(categories)
+        outfit = '+'.join(categories)
+        on_stage('classified', category=outfit, categories=categories)
+
+        # 3) single edit (person → product 1..n → prompt)
+        on_stage('editing')
+        image, tokens_edit, cached_edit, mime, edit_model = self._edit(
+            'outfit', OUTFIT_EDIT_SYSTEM_INSTRUCTION, prompt, [person, *products], tier, model, deadline,
         )
+        total_tokens = sum(toks for _, toks, _, _ in resolved) + tokens_edit
 
-        img_bytes, mime = self._extract_first_image_bytes(resp)
-        tokens_edit = getattr(resp.usage_metadata, "total_token_count", 0)
-        total_tokens = int(tokens_cls) + int(tokens_edit)
+        meta = {
+            'category': outfit,
+            'classify_model': ','.join(classify_models)[:64],
+            'edit_model': edit_model,
+            'cached_tokens': sum(cached for _, _, cached, _ in resolved) + cached_edit,
+            'product_sha256': product_sha256s[0],
+            'product_sha256s': product_sha256s,
+            'result_mime': mime,
+        }
+        return image, total_tokens, meta
 
-        if img_bytes:
-            image = BytesIO(img_bytes)
-        else:
-            raise GeminiAPIResponseError(
-                'Gemini API returned an empty response.',
-                response=resp
-            )
+GeminiAPIService = _GeminiAPIService()
 
-        return image, total_tokens
-        
-GeminiAPIService = _GeminiAPIService()
\ No newline at end of file
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=GeminiAPIService._reset_after_fork)
\ No newline at end of file
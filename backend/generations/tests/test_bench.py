@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase
+
+from generations.fakes import FakeGeminiServer, parse_latency
+
+
+class FakeGeminiServerTests(SimpleTestCase):
+    def test_parse_latency(self):
+        self.assertEqual(parse_latency('fixed:250')(None), 0.25)
+        with self.assertRaises(ValueError):
+            parse_latency('gamma:1:2')
+
+    def test_key_rpm_answers_429_with_retry_delay(self):
+        with FakeGeminiServer(key_rpm=1, image_size=(8, 8)) as fake:
+            status, _ = fake.handle_generate('model', {}, api_key='a')
+            self.assertEqual(status, 200)
+            status, payload = fake.handle_generate('model', {}, api_key='a')
+            self.assertEqual(status, 429)
+            self.assertTrue(payload['error']['details'][0]['retryDelay'].endswith('s'))
+            # 다른 키는 별도 한도
+            status, _ = fake.handle_generate('model', {}, api_key='b')
+            self.assertEqual(status, 200)
+
+
+class BenchGenerateCommandTests(TransactionTestCase):
+    def test_reports_every_endpoint_and_level(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command(
+                'bench_generate',
+                requests=3,
+                concurrency='1,2',
+                latency='fixed:5',
+                classify_latency='fixed:1',
+                result_size='32x32',
+                input_size='64x64',
+                output=output,
+                stdout=open(os.devnull, 'w'),
+            )
+            with open(output, encoding='utf-8') as fh:
+                report = json.load(fh)
+
+        rows = report['results']
+        self.assertEqual([(row['endpoint'], row['concurrency']) for row in rows], [
+            ('public', 1), ('public', 2), ('member', 1), ('member', 2),
+        ])
+        for row in rows:
+            self.assertEqual(row['ok'], 3, row['status_counts'])
+            self.assertGreater(row['latency_ms']['p50'], 0)
+        # 같은 상품 이미지는 한 번만 Gemini 로 분류 (이후 sha256 캐시)
+        edits = sum(count for name, count in report['meta']['upstream_calls'].items() if name.endswith(':edit'))
+        classifies = sum(count for name, count in report['meta']['upstream_calls'].items() if name.endswith(':classify'))
+        self.assertEqual(edits, 12)
+        self.assertEqual(classifies, 1)
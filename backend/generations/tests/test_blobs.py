@@ -0,0 +1,91 @@
+import hashlib
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from generations.blobs import blob_store
+from generations.models import Blob, GenerationRequest, blob_path
+from generations.tests.utils import create_shop, png_upload
+
+BLOB_STORE = {'enabled': True, 'store_inputs': True, 'storage': 'default', 'gc_grace_hours': 24}
+
+
+@override_settings(BLOB_STORE=BLOB_STORE)
+class BlobStoreTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        storage_settings = override_settings(STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': directory}},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        })
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        self.storage = storages['default']
+        self.shop = create_shop()
+
+    def _request(self, **images) -> GenerationRequest:
+        request = GenerationRequest.objects.create(shop=self.shop)
+        blob_store.attach(request, **images)
+        return request
+
+    def _age(self, sha256: str, hours: float = 48):
+        Blob.objects.filter(sha256=sha256).update(last_referenced_at=timezone.now() - timedelta(hours=hours))
+
+    def test_same_content_is_stored_once(self):
+        data = b'product-bytes'
+        first = blob_store.put(data, 'image/png')
+        second = blob_store.put(png_upload(seed=1), 'image/png')
+        self.assertEqual(blob_store.put(data), first)
+        self.assertEqual(first, blob_path(hashlib.sha256(data).hexdigest()))
+        self.assertNotEqual(first, second)
+        self.assertEqual(Blob.objects.count(), 2)
+        with blob_store.open(first) as fh:
+            self.assertEqual(fh.read(), data)
+
+    def test_attach_counts_references(self):
+        product = png_upload(seed=2)
+        one = self._request(person=png_upload(seed=1), product=product, result=b'result-1')
+        two = self._request(person=png_upload(seed=3), product=product, result=b'result-2')
+        self.assertEqual(one.product_image_path, two.product_image_path)
+        sha256 = one.product_image_path.rsplit('/', 1)[-1]
+        self.assertEqual(Blob.objects.get(sha256=sha256).ref_count, 2)
+        self.assertEqual(Blob.objects.count(), 5)
+
+    def test_gc_deletes_only_old_unreferenced_blobs(self):
+        kept = self._request(result=b'kept').result_image_path.rsplit('/', 1)[-1]
+        old = blob_store.put(b'old').rsplit('/', 1)[-1]
+        recent = blob_store.put(b'recent').rsplit('/', 1)[-1]
+        for sha256 in (kept, old):
+            self._age(sha256)
+        Blob.objects.filter(sha256=kept).update(ref_count=9)
+
+        dry = blob_store.collect_garbage(dry_run=True)
+        self.assertEqual((dry['deleted'], dry['recounted']), (1, 1))
+        self.assertEqual(Blob.objects.count(), 3)
+
+        stats = blob_store.collect_garbage(batch_size=1)
+        self.assertEqual((stats['scanned'], stats['deleted'], stats['deleted_bytes']), (3, 1, len(b'old')))
+        self.assertEqual(set(Blob.objects.values_list('sha256', flat=True)), {kept, recent})
+        self.assertEqual(Blob.objects.get(sha256=kept).ref_count, 1)
+        self.assertFalse(self.storage.exists(blob_path(old)))
+        self.assertTrue(self.storage.exists(blob_path(kept)))
+
+    def test_put_revives_a_blob_before_sweep(self):
+        sha256 = blob_store.put(b'again').rsplit('/', 1)[-1]
+        self._age(sha256)
+        blob_store.put(b'again')
+        self.assertEqual(blob_store.collect_garbage()['deleted'], 0)
+
+    def test_scan_storage_removes_files_without_rows(self):
+        path = blob_path('ab' * 32)
+        self.storage.save(path, ContentFile(b'orphan'))
+        self.assertEqual(blob_store.collect_garbage(scan_storage=True, dry_run=True)['orphan_files'], 0)
+        stats = blob_store.collect_garbage(grace=timedelta(0), scan_storage=True)
+        self.assertEqual(stats['orphan_files'], 1)
+        self.assertFalse(self.storage.exists(path))
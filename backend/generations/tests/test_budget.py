@@ -0,0 +1,91 @@
+from datetime import timedelta
+from io import BytesIO
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from generations.budget import MONTHLY, PER_REQUEST, estimate_accuracy, token_budget
+from generations.models import GenerationRequest, GenerationStatus
+from generations.tests.utils import create_shop, upload
+from users.models import PLAN_TIER_TOKEN_BUDGETS, PlanTier, ShopUsage
+
+TOKEN_BUDGET = {'enabled': True, 'downscale': True, 'downscale_steps': [1536, 1024, 768, 384]}
+
+
+def _image(side: int):
+    # 크기만 중요 (preflight 는 헤더만 읽음)
+    buf = BytesIO()
+    Image.new('RGB', (side, side)).save(buf, format='PNG')
+    return upload(buf.getvalue())
+
+
+@override_settings(TOKEN_BUDGET=TOKEN_BUDGET)
+class PreflightTests(TestCase):
+    def setUp(self):
+        self.shop = create_shop(tier=PlanTier.BASIC)
+
+    def _preflight(self, side: int, shop=None):
+        return token_budget.preflight(shop or self.shop, _image(side), [_image(side)])
+
+    def test_small_request_passes_unchanged(self):
+        decision = self._preflight(512)
+        self.assertTrue(decision.allowed)
+        self.assertFalse(decision.downscaled)
+        self.assertEqual(decision.limited_by, '')
+
+    def test_over_per_request_cap_is_downscaled_to_largest_step_that_fits(self):
+        decision = self._preflight(2048)
+        self.assertTrue(decision.allowed)
+        self.assertEqual((decision.max_side, decision.limited_by), (1536, PER_REQUEST))
+        self.assertLessEqual(decision.estimated_tokens, PLAN_TIER_TOKEN_BUDGETS[PlanTier.BASIC]['per_request'])
+
+    def test_rejected_without_downscale(self):
+        with override_settings(TOKEN_BUDGET={**TOKEN_BUDGET, 'downscale': False}):
+            decision = self._preflight(2048)
+        self.assertFalse(decision.allowed)
+        self.assertEqual(decision.limit, PLAN_TIER_TOKEN_BUDGETS[PlanTier.BASIC]['per_request'])
+
+    def test_monthly_budget_counts_recorded_tokens(self):
+        monthly = PLAN_TIER_TOKEN_BUDGETS[PlanTier.BASIC]['monthly']
+        ShopUsage.record_tokens(shop=self.shop, tokens=monthly - 3000)
+        decision = self._preflight(1024)
+        self.assertEqual((decision.allowed, decision.max_side), (True, 768))
+        self.assertEqual((decision.limited_by, decision.limit), (MONTHLY, 3000))
+
+        ShopUsage.record_tokens(shop=self.shop, tokens=2500)
+        decision = self._preflight(1024)
+        self.assertFalse(decision.allowed)
+        self.assertEqual((decision.limited_by, decision.limit), (MONTHLY, 500))
+
+    def test_unlimited_tier_and_disabled_budget(self):
+        self.assertIsNone(self._preflight(4096, create_shop(tier=PlanTier.ADMIN)).limit)
+        with override_settings(TOKEN_BUDGET={**TOKEN_BUDGET, 'enabled': False}):
+            decision = self._preflight(4096)
+        self.assertTrue(decision.allowed)
+        self.assertFalse(decision.downscaled)
+
+
+class EstimateAccuracyTests(TestCase):
+    def test_groups_by_model_and_classify_path(self):
+        shop = create_shop()
+        rows = [
+            (1100, 1000, 'gemini-edit', 'gemini-classify'),
+            (900, 1000, 'gemini-edit', 'gemini-classify'),
+            (1500, 1000, 'gemini-edit', 'local:knn'),
+            # 추정 없음·실패는 제외
+            (0, 1000, 'gemini-edit', 'gemini-classify'),
+        ]
+        for estimated, used, edit_model, classify_model in rows:
+            GenerationRequest.objects.create(
+                shop=shop, status=GenerationStatus.SUCCESS, estimated_tokens=estimated, used_tokens=used,
+                edit_model=edit_model, classify_model=classify_model,
+            )
+        GenerationRequest.objects.create(shop=shop, status=GenerationStatus.FAILED, estimated_tokens=5000)
+
+        report = estimate_accuracy(timezone.now() - timedelta(days=1))
+        self.assertEqual(report['overall']['requests'], 3)
+        self.assertEqual(report['overall']['ratio'], 1.167)
+        upstream = report['groups']['gemini-edit / classify upstream']
+        self.assertEqual((upstream['mean_error_pct'], upstream['mean_abs_error_pct']), (0.0, 10.0))
+        self.assertEqual(report['groups']['gemini-edit / classify skipped']['p95_abs_error_pct'], 50.0)
@@ -0,0 +1,83 @@
+import time
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from generations.classifier import KNNClassifier, LocalProductClassifier, features_to_bytes
+from generations.models import ProductImage
+
+LOCAL_CLASSIFIER = {
+    'collect': True,
+    'enabled': True,
+    'min_confidence': 0.9,
+    'min_samples': 10,
+    'max_samples': 1000,
+    'k': 3,
+    'reload_seconds': 300,
+}
+
+
+def _vector(label: str, index: int) -> np.ndarray:
+    rng = np.random.default_rng(index)
+    center = 0.0 if label == 'top' else 5.0
+    return (center + rng.normal(0, 0.1, 8)).astype(np.float32)
+
+
+def _record_samples(count: int = 20):
+    for index in range(count):
+        label = 'top' if index % 2 else 'bottom'
+        ProductImage.record_label(
+            sha256=f'{index:064x}', category=label, features=features_to_bytes(_vector(label, index)), width=1, height=1,
+        )
+
+
+class KNNClassifierTests(SimpleTestCase):
+    def test_predicts_nearest_cluster(self):
+        labels = ['top' if i % 2 else 'bottom' for i in range(20)]
+        model = KNNClassifier(k=3).fit(np.stack([_vector(label, i) for i, label in enumerate(labels)]), labels)
+        label, confidence = model.predict(_vector('bottom', 99))
+        self.assertEqual(label, 'bottom')
+        self.assertGreater(confidence, 0.9)
+
+    def test_empty_model_has_no_answer(self):
+        self.assertIsNone(KNNClassifier().predict(np.zeros(8, dtype=np.float32)))
+
+
+@override_settings(LOCAL_CLASSIFIER=LOCAL_CLASSIFIER)
+class LocalProductClassifierTests(TestCase):
+    def test_request_does_not_build_the_model(self):
+        classifier = LocalProductClassifier()
+        with mock.patch.object(classifier, 'start_reload') as start_reload, self.assertNumQueries(0):
+            self.assertIsNone(classifier.predict(_vector('top', 1)))
+        start_reload.assert_called_once()
+
+    def test_reload_swaps_in_a_new_model(self):
+        classifier = LocalProductClassifier()
+        classifier._next_load_at = float('inf')
+        _record_samples(4)
+        classifier.reload()
+        # 표본 부족 → Gemini 에 맡김
+        self.assertIsNone(classifier.predict(_vector('top', 1)))
+        _record_samples(20)
+        old = classifier.model()
+        classifier.reload()
+        self.assertIsNot(classifier.model(), old)
+        self.assertEqual(classifier.predict(_vector('top', 101))[0], 'top')
+
+
+@override_settings(LOCAL_CLASSIFIER=LOCAL_CLASSIFIER)
+class BackgroundReloadTests(TransactionTestCase):
+    def test_model_is_built_in_the_background(self):
+        _record_samples(20)
+        classifier = LocalProductClassifier()
+        # 첫 호출은 적재를 시작만 함 (스레드가 먼저 끝나면 바로 결과가 나올 수도 있음)
+        classifier.predict(_vector('bottom', 100))
+        deadline = time.monotonic() + 10
+        while classifier._model is None and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(classifier.predict(_vector('bottom', 100))[0], 'bottom')
+        # 다음 재적재는 reload_seconds 뒤
+        with mock.patch.object(classifier, 'start_reload') as start_reload:
+            classifier.predict(_vector('bottom', 100))
+        start_reload.assert_not_called()
@@ -0,0 +1,95 @@
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from generations.deadlines import DEADLINE_EXCEEDED_HEADER, Deadline, DeadlineExceeded, request_deadline
+from generations.models import GenerationRequest, GenerationStatus
+from generations.routing import model_router
+from generations.services import CLASSIFY_SKIPPED, GeminiAPIService
+from generations.tests.utils import FakeGeminiMixin, create_shop, create_user, png_upload
+from users.models import ShopProfile
+
+GENERATION_DEADLINE = {
+    'enabled': True,
+    'header': 'X-Deadline-Ms',
+    'default_ms': 0,
+    'max_ms': 60000,
+    'margin_ms': 300,
+    'classify_max_share': 0.25,
+    'min_edit_ms': 3000,
+}
+
+
+@override_settings(GENERATION_DEADLINE=GENERATION_DEADLINE)
+class RequestDeadlineTests(SimpleTestCase):
+    def _timeout(self, header: str = '', shop_timeout=None):
+        request = RequestFactory().post('/', HTTP_X_DEADLINE_MS=header)
+        deadline = request_deadline(request, ShopProfile(generation_timeout_ms=shop_timeout))
+        return deadline and deadline.timeout_ms
+
+    def test_header_then_shop_then_default(self):
+        self.assertEqual(self._timeout('5000', shop_timeout=20000), 4700)
+        self.assertEqual(self._timeout('soon', shop_timeout=20000), 19700)
+        self.assertIsNone(self._timeout())
+        with override_settings(GENERATION_DEADLINE={**GENERATION_DEADLINE, 'default_ms': 10000}):
+            self.assertEqual(self._timeout(), 9700)
+        with override_settings(GENERATION_DEADLINE={**GENERATION_DEADLINE, 'enabled': False}):
+            self.assertIsNone(self._timeout('5000'))
+
+    def test_capped_at_max_and_never_negative(self):
+        self.assertEqual(self._timeout('999999'), 59700)
+        self.assertEqual(self._timeout('100'), 0)
+
+    def test_budget_arithmetic(self):
+        deadline = Deadline(10000)
+        self.assertEqual(deadline.clamp_ms(60000), int(deadline.remaining_ms()))
+        self.assertEqual(deadline.clamp_ms(500), 500)
+        self.assertTrue(deadline.affords(2000, reserve_ms=5000, max_share=0.25))
+        self.assertFalse(deadline.affords(3000, reserve_ms=5000, max_share=0.25))
+        self.assertFalse(deadline.affords(2000, reserve_ms=9000))
+        with self.assertRaises(DeadlineExceeded):
+            deadline.check('edit', need_ms=20000)
+        self.assertEqual(Deadline(0).clamp_ms(5000), 1)
+        self.assertTrue(Deadline(0).expired)
+
+
+@override_settings(GENERATION_DEADLINE=GENERATION_DEADLINE, LOCAL_CLASSIFIER={'collect': False, 'enabled': False})
+class GenerateDeadlineTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user()
+        self.shop = create_shop(owner=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _upstream(self, stage: str) -> int:
+        return sum(count for name, count in self.fake.calls.items() if name.endswith(f':{stage}'))
+
+    def test_classification_is_skipped_when_it_would_crowd_out_the_edit(self):
+        expected = {'classify': 2000, 'edit': 1000}
+        with mock.patch.object(model_router, 'expected_ms', side_effect=lambda stage, tier=None: expected[stage]):
+            _, _, meta = GeminiAPIService.generate(png_upload(seed=2), png_upload(seed=1), deadline=Deadline(6000))
+        self.assertEqual(meta['classify_model'], CLASSIFY_SKIPPED)
+        self.assertEqual((self._upstream('classify'), self._upstream('edit')), (0, 1))
+
+    def test_request_that_cannot_finish_gets_504_and_a_refund(self):
+        response = self.client.post(
+            '/api/generate/',
+            {
+                'shop_id': self.shop.shop_id,
+                'customer_id': 'customer-1',
+                'person_image': png_upload(seed=1, name='person.png'),
+                'product_image': png_upload(seed=2, name='product.png'),
+            },
+            format='multipart',
+            HTTP_X_DEADLINE_MS='2000',
+        )
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(response[DEADLINE_EXCEEDED_HEADER], 'true')
+        self.assertEqual(response.json()['stage'], 'edit')
+        # 끝낼 수 없는 편집은 시작하지 않음
+        self.assertEqual(self._upstream('edit'), 0)
+        log = GenerationRequest.objects.get(shop=self.shop)
+        self.assertEqual((log.status, log.error_code), (GenerationStatus.FAILED, 'deadline_exceeded'))
+        self.assertEqual(ShopProfile.objects.get(pk=self.shop.pk).count, self.shop.count)
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from generations.models import GenerationRequest, GenerationStatus
+from generations.progress import DONE, EDITING, progress, watchers
+from generations.tests.utils import create_shop, create_user
+
+GENERATION_EVENTS = {
+    'ttl_seconds': 60,
+    'poll_interval_seconds': 0.02,
+    'heartbeat_seconds': 15,
+    'max_stream_seconds': 10,
+    'db_check_seconds': 5,
+    'resolve_timeout_seconds': 5,
+    'retry_ms': 3000,
+}
+
+
+@override_settings(GENERATION_EVENTS=GENERATION_EVENTS)
+class GenerationEventsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = create_user()
+        self.shop = create_shop(owner=self.owner)
+        self.generation = GenerationRequest.objects.create(shop=self.shop, status=GenerationStatus.STARTED)
+        self.url = f'/api/shops/{self.shop.shop_id}/generations'
+        self.token = str(AccessToken.for_user(self.owner))
+
+    async def _read(self, path: str) -> list[str]:
+        response = await self.async_client.get(f'{self.url}/{path}', {'access_token': self.token})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = [chunk.decode() async for chunk in response.streaming_content]
+        return [line.split(': ', 1)[1] for chunk in chunks for line in chunk.splitlines() if line.startswith('event:')]
+
+    def test_wsgi_worker_refuses_the_stream(self):
+        response = self.client.get(f'{self.url}/{self.generation.pk}/events/', {'access_token': self.token})
+        self.assertEqual(response.status_code, 501)
+
+    async def test_streams_stages_until_done(self):
+        progress.publish(self.generation.pk, EDITING)
+
+        async def finish():
+            # 스트림이 구독한 뒤에 끝나는 생성
+            while not len(watchers):
+                await asyncio.sleep(0.01)
+            progress.publish(self.generation.pk, DONE, result_url='/result')
+
+        finishing = asyncio.ensure_future(finish())
+        self.assertEqual(await self._read(f'{self.generation.pk}/events/'), [EDITING, DONE])
+        await finishing
+
+    async def test_watch_by_idempotency_key(self):
+        progress.bind(self.shop.pk, 'key-1', self.generation.pk)
+        progress.publish(self.generation.pk, DONE, result_url='/result')
+        self.assertEqual(await self._read('by-key/key-1/events/'), [DONE])
+
+    async def test_one_poll_serves_every_watcher(self):
+        key = progress.events_key(self.generation.pk)
+        with mock.patch('generations.progress.cache.get_many', wraps=cache.get_many) as get_many:
+            async with watchers.watch(key) as first, watchers.watch(key) as second:
+                progress.publish(self.generation.pk, EDITING)
+                self.assertTrue(await first.wait(5))
+                self.assertTrue(await second.wait(5))
+        self.assertEqual(first.value, second.value)
+        self.assertEqual([event['stage'] for event in first.value], [EDITING])
+        # 구독자 수와 무관하게 주기마다 키 목록 한 번 조회
+        self.assertTrue(all(call.args == ([key],) for call in get_many.call_args_list))
+        # 마지막 구독이 끝나면 폴러 스레드도 종료
+        deadline = time.monotonic() + 5
+        while watchers._running and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        self.assertFalse(watchers._running)
@@ -0,0 +1,118 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from generations.exports import stream_export
+from generations.models import GenerationErrorLog, GenerationRequest, GenerationStatus
+from generations.tests.utils import add_member, copy_to_replica, create_shop, create_user
+from users.models import ErrorLevel, ServiceErrorLog, ShopMembership, ShopRole, ShopUsage
+
+# 작은 버퍼: 행 몇 개마다 조각을 내보내는지 확인
+EXPORT = {'chunk_size': 2, 'buffer_bytes': 64, 'gzip_level': 6}
+
+
+def _csv_rows(data: bytes) -> list[list[str]]:
+    text = data.decode('utf-8')
+    assert text.startswith('\ufeff')
+    return list(csv.reader(io.StringIO(text[1:])))
+
+
+@override_settings(EXPORT=EXPORT)
+class StreamExportTests(TestCase):
+    def setUp(self):
+        self.shop = create_shop()
+        self.today = timezone.localdate()
+        for index in range(5):
+            GenerationRequest.objects.create(
+                shop=self.shop, status=GenerationStatus.SUCCESS, used_tokens=index, product_reference=f'sku-{index}',
+            )
+        old = GenerationRequest.objects.create(shop=self.shop, status=GenerationStatus.FAILED)
+        GenerationRequest.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=40))
+        GenerationRequest.objects.create(shop=create_shop(), status=GenerationStatus.SUCCESS)
+
+    def _export(self, dataset: str = 'generations', **options) -> list[bytes]:
+        return list(stream_export(dataset, self.shop, self.today, self.today, **options))
+
+    def test_csv_streams_the_shop_rows_of_the_range_in_pieces(self):
+        pieces = self._export()
+        self.assertGreater(len(pieces), 2)
+        rows = _csv_rows(b''.join(pieces))
+        self.assertEqual(rows[0][:3], ['id', 'created_at', 'status'])
+        self.assertEqual([row[4] for row in rows[1:]], [f'sku-{index}' for index in range(5)])
+
+    def test_csv_escapes_formulas(self):
+        GenerationRequest.objects.create(shop=self.shop, product_reference='=HYPERLINK("x")')
+        rows = _csv_rows(b''.join(self._export()))
+        self.assertEqual(rows[-1][4], '\'=HYPERLINK("x")')
+
+    def test_jsonl_and_gzip(self):
+        plain = b''.join(self._export(fmt='jsonl'))
+        lines = [json.loads(line) for line in plain.decode('utf-8').splitlines()]
+        self.assertEqual([line['used_tokens'] for line in lines], [0, 1, 2, 3, 4])
+        self.assertEqual(gzip.decompress(b''.join(self._export(fmt='jsonl', compress=True))), plain)
+
+    def test_usage_and_error_datasets(self):
+        ShopUsage.record_usage(shop=self.shop, amount=3)
+        ShopUsage.record_tokens(shop=self.shop, tokens=100)
+        usage = _csv_rows(b''.join(stream_export(
+            'usage', self.shop, self.today.replace(day=1), self.today,
+        )))
+        self.assertEqual([row[2:5] for row in usage[1:]], [[str(self.shop.monthly_quota), '3', '100']])
+
+        ServiceErrorLog.objects.create(shop=self.shop, level=ErrorLevel.ERROR, err_from='View', message='boom')
+        request = GenerationRequest.objects.filter(shop=self.shop).first()
+        GenerationErrorLog.objects.create(request=request, level=ErrorLevel.ERROR, err_from='Gemini', gemini_message='bad')
+        errors = _csv_rows(b''.join(self._export('errors')))
+        self.assertEqual([(row[0], row[4], row[5]) for row in errors[1:]], [
+            ('service', 'boom', ''), ('generation', 'bad', str(request.pk)),
+        ])
+
+    def test_command_writes_the_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                'export_shop_data', 'generations', shop=self.shop.shop_id, start=str(self.today), end=str(self.today),
+                fmt='jsonl', gzip=True, output=directory, stderr=open(os.devnull, 'w'),
+            )
+            name = f'{self.shop.shop_id}-generations-{self.today:%Y%m%d}-{self.today:%Y%m%d}.jsonl.gz'
+            with gzip.open(os.path.join(directory, name)) as fh:
+                self.assertEqual(len(fh.read().splitlines()), 5)
+
+
+class ExportViewTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.owner = create_user()
+        self.shop = create_shop(owner=self.owner)
+        self.viewer = add_member(self.shop, ShopRole.VIEWER)
+        copy_to_replica(self.owner, self.viewer, self.shop, *ShopMembership.objects.filter(shop=self.shop))
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = f'/api/shops/{self.shop.shop_id}/export'
+
+    def test_streams_from_the_replica(self):
+        GenerationRequest(pk=1, shop=self.shop, product_reference='replica-only').save(using='replica')
+        GenerationRequest.objects.create(shop=self.shop, product_reference='primary-only')
+        response = self.client.get(f'{self.url}/generations/')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn(f'{self.shop.shop_id}-generations-', response['Content-Disposition'])
+        rows = _csv_rows(b''.join(response.streaming_content))
+        self.assertEqual([row[4] for row in rows[1:]], ['replica-only'])
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.client.get(f'{self.url}/secrets/').status_code, 400)
+        self.assertEqual(self.client.get(f'{self.url}/generations/', {'output': 'xml'}).status_code, 400)
+        self.assertEqual(
+            self.client.get(f'{self.url}/generations/', {'from': '2026-02-01', 'to': '2026-01-01'}).status_code, 400,
+        )
+        self.client.force_authenticate(self.viewer)
+        self.assertEqual(self.client.get(f'{self.url}/generations/').status_code, 403)
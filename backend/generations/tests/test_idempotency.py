@@ -0,0 +1,140 @@
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.response import Response
+
+from generations.idempotency import REPLAYED_HEADER, IdempotencyCoordinator
+from generations.models import IdempotencyKey, IdempotencyStatus
+from generations.tests.utils import create_shop
+
+IDEMPOTENCY = {
+    'ttl_seconds': 3600,
+    'lease_seconds': 180,
+    'wait_seconds': 1,
+    'poll_interval_seconds': 0.05,
+}
+
+
+@override_settings(IDEMPOTENCY=IDEMPOTENCY)
+class IdempotencyCoordinatorTests(TestCase):
+    def setUp(self):
+        self.shop = create_shop()
+        self.coordinator = IdempotencyCoordinator()
+        self.calls = 0
+
+    def _handler(self, status=200):
+        def handler():
+            self.calls += 1
+            return HttpResponse(b'result', status=status, content_type='image/png')
+
+        return handler
+
+    def _run(self, fingerprint='a', status=200):
+        return self.coordinator.run(shop=self.shop, key='k1', fingerprint=fingerprint, handler=self._handler(status))
+
+    def test_completed_key_replays_the_response(self):
+        first = self._run()
+        self.assertFalse(first.has_header(REPLAYED_HEADER))
+        second = self._run()
+        self.assertEqual((second.status_code, second.content, second['Content-Type']), (200, b'result', 'image/png'))
+        self.assertEqual(second[REPLAYED_HEADER], 'true')
+        self.assertEqual(self.calls, 1)
+
+    def test_key_reused_for_other_input_is_rejected(self):
+        self._run()
+        response = self._run(fingerprint='b')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.calls, 1)
+
+    def test_failure_is_not_stored(self):
+        self.assertEqual(self._run(status=502).status_code, 502)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self._run().status_code, 200)
+        self.assertEqual(self.calls, 2)
+
+    def test_in_flight_key_answers_conflict_after_waiting(self):
+        now = timezone.now()
+        IdempotencyKey.objects.create(
+            shop=self.shop, key='k1', fingerprint='a',
+            lease_until=now + timedelta(minutes=1), expires_at=now + timedelta(hours=1),
+        )
+        response = self._run()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.calls, 0)
+
+    def test_expired_lease_is_taken_over(self):
+        now = timezone.now()
+        IdempotencyKey.objects.create(
+            shop=self.shop, key='k1', fingerprint='a',
+            lease_until=now - timedelta(seconds=1), expires_at=now + timedelta(hours=1),
+        )
+        self.assertEqual(self._run().status_code, 200)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(IdempotencyKey.objects.get().status, IdempotencyStatus.COMPLETED)
+
+
+@override_settings(IDEMPOTENCY={**IDEMPOTENCY, 'lease_seconds': 0.3})
+class LeaseRenewalTests(TransactionTestCase):
+    def test_slow_leader_keeps_its_claim(self):
+        shop = create_shop()
+        leader = IdempotencyCoordinator()
+        # 다른 워커 프로세스 (메모리 대기열을 공유하지 않음)
+        other = IdempotencyCoordinator()
+        seen = {}
+
+        def handler():
+            time.sleep(1.0)
+            record, leads = other._claim(shop, 'k1', 'a')
+            seen['other_leads'] = leads
+            seen['lease_left'] = (record.lease_until - timezone.now()).total_seconds()
+            return Response({'ok': True})
+
+        response = leader.run(shop=shop, key='k1', fingerprint='a', handler=handler)
+        self.assertEqual(response.status_code, 200)
+        # 임대 기간(0.3s)보다 오래 걸렸지만 하트비트로 연장되어 인계되지 않음
+        self.assertFalse(seen['other_leads'])
+        self.assertGreater(seen['lease_left'], 0)
+
+
+@override_settings(IDEMPOTENCY={**IDEMPOTENCY, 'wait_seconds': 10})
+class FailedLeaderTests(TransactionTestCase):
+    def test_in_process_duplicate_retries_after_a_failed_leader(self):
+        shop = create_shop()
+        coordinator = IdempotencyCoordinator()
+        waiting = threading.Event()
+        responses = {}
+        wait = coordinator._wait
+
+        def wait_and_signal(record, deadline):
+            waiting.set()
+            return wait(record, deadline)
+
+        def duplicate():
+            try:
+                responses['duplicate'] = coordinator.run(
+                    shop=shop, key='k1', fingerprint='a', handler=lambda: HttpResponse(b'second', status=200),
+                )
+            finally:
+                connection.close()
+
+        def failing_leader():
+            thread.start()
+            self.assertTrue(waiting.wait(5))
+            return HttpResponse(b'upstream', status=502)
+
+        thread = threading.Thread(target=duplicate)
+        with mock.patch.object(coordinator, '_wait', side_effect=wait_and_signal):
+            responses['leader'] = coordinator.run(shop=shop, key='k1', fingerprint='a', handler=failing_leader)
+            thread.join(10)
+        self.assertEqual(responses['leader'].status_code, 502)
+        # 실패 응답을 재생하지 않고 claim 부터 다시 → 스스로 리더가 되어 처리
+        duplicate_response = responses['duplicate']
+        self.assertEqual((duplicate_response.status_code, duplicate_response.content), (200, b'second'))
+        self.assertFalse(duplicate_response.has_header(REPLAYED_HEADER))
+        self.assertEqual(IdempotencyKey.objects.get().status, IdempotencyStatus.COMPLETED)
@@ -0,0 +1,145 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from google.genai import errors
+
+from generations.keypool import KeyPool, retry_delay
+
+GEMINI_KEY_POOL = {
+    'rpm': 10,
+    'tpm': 1000,
+    'window_seconds': 60,
+    'cooldown_seconds': 15.0,
+    'max_cooldown_seconds': 300,
+}
+
+
+def _rate_limited(delay: str = '') -> errors.ClientError:
+    details = [{'@type': 'type.googleapis.com/google.rpc.RetryInfo', 'retryDelay': delay}] if delay else []
+    return errors.ClientError(429, {'error': {
+        'code': 429, 'message': 'Resource exhausted.', 'status': 'RESOURCE_EXHAUSTED', 'details': details,
+    }})
+
+
+@override_settings(GEMINI_KEY_POOL=GEMINI_KEY_POOL)
+class KeyPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = KeyPool()
+        self.pool.configure(['a=key-aaaa', 'b=key-bbbb', 'key-cccc'], lambda api_key: api_key)
+        self.keys = {key.label: key for key in self.pool.keys}
+
+    def _labels(self, fn) -> list[str]:
+        seen = []
+
+        def record(key):
+            seen.append(key.label)
+            return fn(key)
+
+        try:
+            self.pool.call(record)
+        except errors.APIError:
+            pass
+        return seen
+
+    def test_labels_and_least_loaded_key(self):
+        self.assertEqual(list(self.keys), ['a', 'b', 'key3'])
+        self.keys['a'].in_flight = 2
+        self.keys['b'].in_flight = 1
+        self.assertEqual(self.pool._acquire(set()).label, 'key3')
+
+    @mock.patch('generations.keypool.time.monotonic', return_value=100.0)
+    def test_least_utilized_key_among_equally_loaded(self, _):
+        for label, requests in (('a', 5), ('b', 2), ('key3', 8)):
+            self.keys[label].requests.extend([99.0] * requests)
+        self.assertEqual(self.pool._acquire(set()).label, 'b')
+
+    @mock.patch('generations.keypool.time.monotonic', return_value=100.0)
+    def test_keys_over_their_rate_or_cooling_down_go_last(self, _):
+        self.keys['a'].window_tokens = 1000
+        self.keys['a'].token_events.append((99.0, 1000))
+        self.keys['b'].cooldown_until = 200.0
+        self.assertEqual([self.pool._acquire(set()).label for _ in range(2)], ['key3', 'key3'])
+        self.assertEqual(self.pool._acquire({'key3'}).label, 'a')
+        # 재시도 중 남은 키가 쿨다운뿐이면 포기
+        self.assertIsNone(self.pool._acquire({'key3', 'a'}))
+        # 첫 시도에서 모두 쿨다운이면 가장 먼저 풀리는 키
+        self.keys['a'].cooldown_until, self.keys['key3'].cooldown_until = 300.0, 150.0
+        self.assertEqual(self.pool._acquire(set()).label, 'key3')
+
+    def test_rate_limited_key_cools_down_and_call_moves_on(self):
+        def fn(key):
+            if key.label == 'a':
+                raise _rate_limited('13s')
+            return 'ok'
+
+        with mock.patch('generations.keypool.time.monotonic', return_value=100.0):
+            self.assertEqual(self.pool.call(fn), 'ok')
+        a = self.keys['a']
+        self.assertEqual((a.rate_limited, a.strikes, a.cooldown_until, a.in_flight), (1, 1, 113.0, 0))
+        # 쿨다운 중인 키는 다음 호출에서 뒤로
+        with mock.patch('generations.keypool.time.monotonic', return_value=105.0):
+            self.assertNotEqual(self.pool._acquire(set()).label, 'a')
+
+    def test_each_key_is_tried_once_and_the_last_error_is_raised(self):
+        tried, raised = [], []
+
+        def fn(key):
+            tried.append(key.label)
+            raised.append(_rate_limited())
+            raise raised[-1]
+
+        with self.assertRaises(errors.ClientError) as caught:
+            self.pool.call(fn)
+        self.assertIs(caught.exception, raised[-1])
+        self.assertEqual(sorted(tried), ['a', 'b', 'key3'])
+        self.assertEqual([(key.rate_limited, key.in_flight) for key in self.pool.keys], [(1, 0)] * 3)
+
+    def test_other_errors_are_not_retried(self):
+        def fn(key):
+            raise errors.ServerError(503, {'error': {'code': 503, 'message': 'down', 'status': 'UNAVAILABLE'}})
+
+        self.assertEqual(len(self._labels(fn)), 1)
+        self.assertEqual(sum(key.errors for key in self.pool.keys), 1)
+        self.assertEqual(sum(key.in_flight for key in self.pool.keys), 0)
+
+    def test_cooldown_backs_off_and_is_capped(self):
+        key = self.keys['a']
+        self.assertEqual(self.pool._cooldown(key, _rate_limited()), 15.0)
+        key.strikes = 2
+        self.assertEqual(self.pool._cooldown(key, _rate_limited()), 60.0)
+        key.strikes = 10
+        self.assertEqual(self.pool._cooldown(key, _rate_limited()), 300)
+        self.assertEqual(self.pool._cooldown(key, _rate_limited('7.5s')), 7.5)
+
+    def test_retry_delay_parsing(self):
+        self.assertEqual(retry_delay(_rate_limited('13s')), 13.0)
+        self.assertEqual(retry_delay(_rate_limited('0.5s')), 0.5)
+        self.assertIsNone(retry_delay(_rate_limited()))
+        self.assertIsNone(retry_delay(_rate_limited('soon')))
+        self.assertIsNone(retry_delay(ValueError('x')))
+        plain = mock.Mock(details=[{'retryDelay': '2s'}])
+        self.assertEqual(retry_delay(plain), 2.0)
+
+    def test_snapshot(self):
+        with mock.patch('generations.keypool.time.monotonic', return_value=100.0):
+            self.pool.call(lambda key: 'ok', tokens_of=lambda _: 250)
+        with mock.patch('generations.keypool.time.monotonic', return_value=110.0):
+            snapshot = {row['label']: row for row in self.pool.snapshot()}
+        self.assertEqual(snapshot['a'], {
+            'label': 'a',
+            'key': '…aaaa',
+            'in_flight': 0,
+            'requests_in_window': 1,
+            'tokens_in_window': 250,
+            'utilization': 0.25,
+            'cooling_down': False,
+            'cooldown_remaining_s': 0,
+            'calls': 1,
+            'errors': 0,
+            'rate_limited': 0,
+            'tokens': 250,
+        })
+        # 창이 지나면 요청/토큰은 빠지고 누적치만 남음
+        with mock.patch('generations.keypool.time.monotonic', return_value=200.0):
+            row = self.pool.snapshot()[0]
+        self.assertEqual((row['requests_in_window'], row['tokens_in_window'], row['tokens']), (0, 0, 250))
@@ -0,0 +1,125 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from generations.deadlines import DEADLINE_EXCEEDED_HEADER
+from generations.idempotency import REPLAYED_HEADER
+from generations.limiter import AdaptiveLimiter, GenerationLimitMixin
+
+GENERATION_LIMITER = {
+    'enabled': True,
+    'max_limit': 4,
+    'min_limit': 1,
+    'initial_limit': 2,
+    'latency_target_seconds': 10.0,
+    'backoff': 0.5,
+    'decrease_interval_seconds': 5,
+    'latency_ewma_alpha': 0.5,
+    'retry_after_max_seconds': 60,
+    'ready_shed_window_seconds': 10,
+}
+
+
+@override_settings(GENERATION_LIMITER=GENERATION_LIMITER)
+class AdaptiveLimiterTests(SimpleTestCase):
+    def setUp(self):
+        self.limiter = AdaptiveLimiter()
+
+    def test_sheds_over_the_limit_and_reports_saturation(self):
+        self.assertTrue(self.limiter.try_acquire())
+        self.assertTrue(self.limiter.snapshot()['ready'])
+        self.assertTrue(self.limiter.try_acquire())
+        self.assertFalse(self.limiter.snapshot()['ready'])
+        self.assertFalse(self.limiter.try_acquire())
+        self.limiter.release()
+        snapshot = self.limiter.snapshot()
+        self.assertEqual((snapshot['in_flight'], snapshot['limit'], snapshot['shed_total']), (1, 2, 1))
+        # 최근에 거절했으므로 자리가 있어도 아직 ready 아님
+        self.assertFalse(snapshot['ready'])
+        with mock.patch('generations.limiter.time.monotonic', return_value=self.limiter._shed_at + 11):
+            self.assertTrue(self.limiter.snapshot()['ready'])
+
+    def test_fast_completions_raise_the_limit_while_it_is_used(self):
+        self.limiter._limit = 3.0
+        for _ in range(4):
+            self.limiter.try_acquire()
+            self.limiter.release(latency=1.0)
+        # 한도의 절반 미만만 쓰면 늘지 않음
+        self.assertEqual(self.limiter.limit, 3)
+        for _ in range(20):
+            self.limiter.try_acquire()
+            self.limiter.try_acquire()
+            self.limiter.release(latency=1.0)
+            self.limiter.release(latency=1.0)
+        self.assertEqual(self.limiter.limit, 4)
+
+    def test_slow_or_failed_completions_back_off_once_per_interval(self):
+        self.limiter._limit = 4.0
+        for failed, latency in ((True, None), (False, 20.0)):
+            self.limiter.try_acquire()
+            self.limiter.release(latency=latency, failed=failed)
+        self.assertEqual(self.limiter.limit, 2)
+        with mock.patch('generations.limiter.time.monotonic', return_value=self.limiter._decreased_at + 5):
+            for _ in range(3):
+                self.limiter.try_acquire()
+                self.limiter.release(failed=True)
+        self.assertEqual((self.limiter.limit, self.limiter._limit), (1, 1.0))
+
+    def test_retry_after_spreads_latency_over_slots(self):
+        self.assertEqual(self.limiter.retry_after(), 5)
+        self.limiter.try_acquire()
+        self.limiter.release(latency=8.0)
+        self.assertEqual((self.limiter.limit, self.limiter.retry_after()), (2, 4))
+        response = self.limiter.overloaded_response()
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '4'))
+
+    def test_disabled_admits_everything(self):
+        with override_settings(GENERATION_LIMITER={**GENERATION_LIMITER, 'enabled': False}):
+            self.assertTrue(all(self.limiter.try_acquire() for _ in range(10)))
+        self.assertEqual(self.limiter._in_flight, 0)
+
+
+class _View(GenerationLimitMixin, APIView):
+    authentication_classes = []
+    permission_classes = []
+    response: Response = None
+
+    def post(self, request):
+        return self.response
+
+
+@override_settings(GENERATION_LIMITER=GENERATION_LIMITER)
+class GenerationLimitMixinTests(SimpleTestCase):
+    def setUp(self):
+        self.limiter = AdaptiveLimiter()
+        patcher = mock.patch('generations.limiter.generation_limiter', self.limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limiter._limit = 4.0
+
+    def _post(self, status: int, headers: dict = None):
+        response = Response(status=status, headers=headers)
+        return _View.as_view(response=response)(APIRequestFactory().post('/'))
+
+    def test_only_upstream_failures_move_the_limit(self):
+        self._post(400)
+        self._post(504, {DEADLINE_EXCEEDED_HEADER: '1'})
+        self._post(200, {REPLAYED_HEADER: 'true'})
+        self.assertEqual((self.limiter.limit, self.limiter._latency_ewma), (4, None))
+        self._post(200)
+        self.assertIsNotNone(self.limiter._latency_ewma)
+        self._post(502)
+        self.assertEqual(self.limiter.limit, 2)
+        self.assertEqual(self.limiter._in_flight, 0)
+
+    def test_full_limiter_sheds_with_503(self):
+        self.limiter._limit = 1.0
+        self.limiter.try_acquire()
+        response = self._post(200)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        with mock.patch('generations.views.generation_limiter', self.limiter):
+            self.assertEqual(self.client.get('/ready/').status_code, 503)
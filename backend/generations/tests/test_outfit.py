@@ -0,0 +1,82 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from generations.models import ProductImage
+from generations.phash import phash_index
+from generations.services import GeminiAPIService
+from generations.tests.utils import FakeGeminiMixin, png_upload
+
+
+class OutfitPromptTests(SimpleTestCase):
+    def test_lists_products_in_image_order(self):
+        prompt = GeminiAPIService._build_outfit_prompt(['top', 'bottom', 'unknown'])
+        self.assertIn('- Image 2: the TOP', prompt)
+        self.assertIn('- Image 3: the BOTTOM', prompt)
+        # 모르는 카테고리는 상의로
+        self.assertIn('- Image 4: the TOP', prompt)
+        self.assertLess(prompt.index('Image 2'), prompt.index('Image 3'))
+
+    def test_single_product_uses_the_single_prompt(self):
+        self.assertEqual(
+            GeminiAPIService._build_outfit_prompt(['bottom']),
+            GeminiAPIService._build_prompt_by_category('bottom'),
+        )
+
+
+@override_settings(LOCAL_CLASSIFIER={'collect': True, 'enabled': False})
+class GenerateOutfitTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # 백그라운드 적재 없이 빈 인덱스로 시작
+        phash_index.reset()
+        phash_index.load()
+        phash_index._next_load_at = float('inf')
+        self.addCleanup(phash_index.reset)
+        self.bodies = []
+        handle_generate = self.fake.handle_generate
+
+        def record(model, body, api_key=''):
+            self.bodies.append(body)
+            return handle_generate(model, body, api_key)
+
+        self.fake.handle_generate = record
+        self.addCleanup(setattr, self.fake, 'handle_generate', handle_generate)
+
+    def test_classifies_each_distinct_product_once(self):
+        known = png_upload(seed=2)
+        ProductImage.record_label(
+            sha256=GeminiAPIService._sha256(known), category='bottom', features=b'', width=64, height=64,
+        )
+        products = [known, png_upload(seed=3), png_upload(seed=4), png_upload(seed=3)]
+        db_threads = set()
+        known_category = GeminiAPIService._known_category
+        record_label = ProductImage.record_label
+
+        def on_thread(fn):
+            def wrapper(*args, **kwargs):
+                db_threads.add(threading.current_thread().name)
+                return fn(*args, **kwargs)
+            return wrapper
+
+        with mock.patch.object(GeminiAPIService, '_known_category', on_thread(known_category)), \
+                mock.patch.object(ProductImage, 'record_label', on_thread(record_label)):
+            _, tokens, meta = GeminiAPIService.generate_outfit(products, png_upload(seed=1))
+
+        # 같은 업로드(seed=3 두 번)는 한 번만, 이미 라벨이 있는 상품은 Gemini 없이
+        classify_calls = sum(count for name, count in self.fake.calls.items() if name.endswith(':classify'))
+        self.assertEqual(classify_calls, 2)
+        self.assertEqual(meta['category'], 'bottom+top+top+top')
+        self.assertEqual(len(meta['product_sha256s']), 4)
+        self.assertEqual(ProductImage.objects.count(), 3)
+        self.assertGreater(tokens, 0)
+        # DB 조회·저장은 요청 스레드에서만 (분류 작업 스레드는 업스트림 호출만)
+        self.assertEqual(db_threads, {threading.current_thread().name})
+
+        edit = next(body for body in self.bodies if 'IMAGE' in body['generationConfig']['responseModalities'])
+        parts = [part for content in edit['contents'] for part in content['parts']]
+        self.assertEqual(['image' if 'inlineData' in part else 'text' for part in parts], ['image'] * 5 + ['text'])
+        prompt = parts[-1]['text']
+        self.assertIn('- Image 2: the BOTTOM', prompt)
+        self.assertIn('- Image 5: the TOP', prompt)
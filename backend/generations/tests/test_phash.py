@@ -0,0 +1,71 @@
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from generations.models import ProductImage
+from generations.phash import MultiIndexHash, PerceptualHashIndex, to_signed
+
+
+def _record(index: int, phash: int, category: str = 'top') -> ProductImage:
+    return ProductImage.record_label(
+        sha256=f'{index:064x}', phash=to_signed(phash), category=category, features=b'', width=1, height=1,
+    )
+
+
+class MultiIndexHashTests(SimpleTestCase):
+    def test_finds_neighbours_within_distance(self):
+        table = MultiIndexHash()
+        table.add(0b1011, 'a')
+        table.add(0xFFFF_0000_0000_0000, 'b')
+        self.assertEqual(table.search(0b1001, 2), [(1, 'a')])
+        self.assertEqual(table.search(0b0100_0000, 2), [])
+
+
+class PerceptualHashIndexTests(TestCase):
+    def test_lookup_does_not_load_on_the_request_thread(self):
+        _record(1, 0b1011)
+        index = PerceptualHashIndex()
+        with mock.patch.object(index, 'start_load') as start_load, self.assertNumQueries(0):
+            self.assertIsNone(index.nearest(0b1011, 4))
+        start_load.assert_called_once()
+        self.assertEqual(len(index), 0)
+
+    def test_load_then_top_up(self):
+        first = _record(1, 0b1011)
+        index = PerceptualHashIndex()
+        index._next_load_at = float('inf')
+        index.load()
+        self.assertEqual(index.nearest(0b1001, 2), (1, first.pk, 'top'))
+        # 다른 워커가 저장한 행은 다음 적재 때 추가
+        second = _record(2, 0xFFFF_0000_0000_0000, 'bottom')
+        self.assertIsNone(index.nearest(0xFFFF_0000_0000_0001, 2))
+        index.load()
+        self.assertEqual(index.nearest(0xFFFF_0000_0000_0001, 2), (1, second.pk, 'bottom'))
+        self.assertEqual(len(index), 2)
+
+    def test_add_before_load_is_picked_up_from_the_database(self):
+        index = PerceptualHashIndex()
+        index._next_load_at = float('inf')
+        record = _record(1, 0b1011)
+        index.add(0b1011, record.pk, 'top')
+        self.assertFalse(index.ready)
+        index.load()
+        index.add(0b1011, record.pk, 'top')
+        self.assertEqual(len(index), 1)
+
+
+class BackgroundLoadTests(TransactionTestCase):
+    def test_index_is_built_in_the_background(self):
+        record = _record(1, 0b1011)
+        index = PerceptualHashIndex(refresh_seconds=60)
+        # 첫 조회는 적재를 시작만 함 (스레드가 먼저 끝날 수도 있으므로 결과는 확인하지 않음)
+        index.nearest(0b1011, 0)
+        deadline = time.monotonic() + 10
+        while not index.ready and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(index.nearest(0b1011, 0), (0, record.pk, 'top'))
+        # 다음 적재는 refresh_seconds 뒤
+        with mock.patch.object(index, 'start_load') as start_load:
+            index.nearest(0b1011, 0)
+        start_load.assert_not_called()
@@ -0,0 +1,175 @@
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from io import BytesIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from generations.fakes import make_png
+from generations.management.commands.prerender_catalog import Command, read_manifest
+from generations.models import GenerationRequest, GenerationStatus
+from generations.phash import phash_index
+from generations.stats import percentile
+from generations.tests.utils import FakeGeminiMixin, create_shop
+from users.models import ShopProfile
+
+
+class PercentileTests(SimpleTestCase):
+    def test_interpolates_between_ranks(self):
+        self.assertEqual(percentile([], 50), 0.0)
+        self.assertEqual(percentile([30, 10, 20], 50), 20)
+        self.assertEqual(percentile([10, 20], 95), 19.5)
+
+
+@override_settings(BLOB_STORE={'enabled': False, 'store_inputs': False, 'storage': 'default', 'gc_grace_hours': 24})
+class PrerenderCatalogTests(FakeGeminiMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        # 근접 중복 인덱스는 프로세스 전역 → 다른 테스트에 라벨이 남지 않도록
+        phash_index.reset()
+        self.addCleanup(phash_index.reset)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.output_dir = os.path.join(self.directory, 'out')
+        self.shop = create_shop()
+        self.quota = self.shop.count
+        for seed in (1, 2, 3):
+            with open(os.path.join(self.directory, f'{seed}.png'), 'wb') as fh:
+                fh.write(make_png(64, 64, seed=seed))
+
+    def _manifest(self, rows: list[dict]) -> str:
+        path = os.path.join(self.directory, 'manifest.jsonl')
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.writelines(json.dumps(row) + '\n' for row in rows)
+        return path
+
+    def _run(self, manifest: str) -> dict:
+        # 테스트 DB(SQLite)는 동시 쓰기에서 database is locked → 한 번에 한 행씩
+        call_command(
+            'prerender_catalog', manifest, shop=self.shop.shop_id, output_dir=self.output_dir,
+            concurrency=1, rate=0, retries=0, backoff=0,
+            stdout=open(os.devnull, 'w'), stderr=open(os.devnull, 'w'),
+        )
+        with open(os.path.join(self.output_dir, 'summary.json'), encoding='utf-8') as fh:
+            return json.load(fh)
+
+    def _count(self) -> int:
+        return ShopProfile.objects.get(pk=self.shop.pk).count
+
+    def test_renders_and_resumes(self):
+        manifest = self._manifest([
+            {'id': 'a', 'person': '1.png', 'product': '2.png'},
+            {'id': 'b', 'person': '1.png', 'product': '3.png'},
+            {'id': 'missing', 'person': '1.png', 'product': 'nope.png'},
+        ])
+        self.assertEqual(read_manifest(manifest)[0]['person'], os.path.join(self.directory, '1.png'))
+        summary = self._run(manifest)
+        self.assertEqual((summary['succeeded'], summary['failed']), (2, 1))
+        self.assertEqual(summary['failures_by_code'], {'invalid_input': 1})
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'a.png')))
+        # 입력 파일이 없는 행은 쿼터를 쓰지 않음
+        self.assertEqual(self._count(), self.quota - 2)
+
+        summary = self._run(manifest)
+        self.assertEqual((summary['already_done'], summary['pending']), (2, 1))
+        self.assertEqual(self._count(), self.quota - 2)
+
+    def test_unexpected_error_after_charging_fails_the_row_and_refunds(self):
+        manifest = self._manifest([
+            {'id': 'a', 'person': '1.png', 'product': '2.png'},
+            {'id': 'b', 'person': '1.png', 'product': '3.png'},
+        ])
+        with mock.patch.object(Command, '_write_output', side_effect=OSError('disk full')):
+            summary = self._run(manifest)
+        # 첫 오류에서 실행이 멈추지 않고 모든 행을 처리
+        self.assertEqual((summary['processed'], summary['failed']), (2, 2))
+        self.assertEqual(summary['failures_by_code'], {'error': 2})
+        self.assertEqual(self._count(), self.quota)
+        self.assertEqual(set(GenerationRequest.objects.values_list('status', 'error_code')), {(GenerationStatus.FAILED, 'error')})
+        with open(os.path.join(self.output_dir, 'results.jsonl'), encoding='utf-8') as fh:
+            self.assertEqual([json.loads(line)['error'] for line in fh], ['OSError: disk full'] * 2)
+
+
+@override_settings(BLOB_STORE={'enabled': False, 'store_inputs': False, 'storage': 'default', 'gc_grace_hours': 24})
+class ConcurrentPrerenderTests(TransactionTestCase):
+    """Several rows in flight at once. SQLite cannot take concurrent writes, so the quota calls and
+    the request rows are stubbed; what is checked is the command's own bookkeeping."""
+
+    ROWS = 8
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.output_dir = os.path.join(self.directory, 'out')
+        self.shop = create_shop()
+        self.lock = threading.Lock()
+        self.rendered, self.quota = Counter(), Counter()
+        self.active = self.max_active = 0
+        rows = []
+        for seed in range(self.ROWS):
+            with open(os.path.join(self.directory, f'{seed}.png'), 'wb') as fh:
+                fh.write(make_png(32, 32, seed=seed))
+            rows.append({'id': f'row-{seed}', 'person': '0.png', 'product': f'{seed}.png'})
+        self.manifest = os.path.join(self.directory, 'manifest.jsonl')
+        with open(self.manifest, 'w', encoding='utf-8') as fh:
+            fh.writelines(json.dumps(row) + '\n' for row in rows)
+
+    def _generate(self, product_image, person_image, **kwargs):
+        name = os.path.basename(product_image.name)
+        with self.lock:
+            self.rendered[name] += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(0.05)
+            if name == '3.png':
+                raise RuntimeError('upstream exploded')
+            meta = {
+                'result_mime': 'image/png', 'product_sha256': name, 'classify_model': 'm', 'edit_model': 'm',
+                'cached_tokens': 0, 'category': 'top',
+            }
+            return BytesIO(make_png(8, 8, seed=1)), 10, meta
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def _count(self, name: str):
+        def stub(command):
+            with self.lock:
+                self.quota[name] += 1
+            return True
+
+        return stub
+
+    def test_every_row_is_rendered_and_checkpointed_once(self):
+        ids = itertools.count(1)
+        prefix = 'generations.management.commands.prerender_catalog'
+        with mock.patch.object(Command, '_charge_quota', self._count('charged')), \
+                mock.patch.object(Command, '_refund_quota', self._count('refunded')), \
+                mock.patch(f'{prefix}.GeminiAPIService.generate', side_effect=self._generate), \
+                mock.patch(f'{prefix}.log_service_err'), \
+                mock.patch(f'{prefix}.GenerationRequest') as requests:
+            requests.objects.create.side_effect = lambda **kwargs: mock.Mock(pk=next(ids))
+            call_command(
+                'prerender_catalog', self.manifest, shop=self.shop.shop_id, output_dir=self.output_dir,
+                concurrency=4, rate=0, retries=0, backoff=0,
+                stdout=open(os.devnull, 'w'), stderr=open(os.devnull, 'w'),
+            )
+
+        self.assertGreater(self.max_active, 1)
+        self.assertEqual(self.rendered, Counter({f'{seed}.png': 1 for seed in range(self.ROWS)}))
+        with open(os.path.join(self.output_dir, 'results.jsonl'), encoding='utf-8') as fh:
+            records = [json.loads(line) for line in fh]
+        self.assertEqual(sorted(record['id'] for record in records), [f'row-{seed}' for seed in range(self.ROWS)])
+        self.assertEqual([record['id'] for record in records if record['status'] == 'failed'], ['row-3'])
+        self.assertEqual(len(os.listdir(self.output_dir)), self.ROWS - 1 + 2)
+        # 성공한 행만큼 차감, 실패한 행은 환불
+        self.assertEqual(self.quota, Counter(charged=self.ROWS, refunded=1))
+        self.assertEqual(requests.objects.create.call_count, self.ROWS)
@@ -0,0 +1,65 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from generations.prompt_cache import billed_tokens, prompt_cache, upstream_tokens
+from generations.services import EDIT_SYSTEM_INSTRUCTION, GeminiAPIService, text_tokens
+from generations.tests.utils import FakeGeminiMixin, png_upload
+
+CONTEXT_CACHE = {
+    'enabled': True,
+    'min_tokens': 1024,
+    'cached_token_rate': 0.25,
+    'ttl_seconds': 3600,
+    'refresh_margin_seconds': 300,
+    'retry_after_seconds': 600,
+}
+
+
+class BilledTokensTests(SimpleTestCase):
+    @override_settings(GEMINI_CONTEXT_CACHE=CONTEXT_CACHE)
+    def test_cached_tokens_are_charged_at_the_discounted_rate(self):
+        self.assertEqual(billed_tokens(1000, 0), 1000)
+        self.assertEqual(billed_tokens(1000, 400), 700)
+        self.assertEqual(upstream_tokens(700, 400), 1000)
+
+
+@override_settings(LOCAL_CLASSIFIER={'collect': False, 'enabled': False})
+class ContextCacheOrderTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        prompt_cache._entries.clear()
+        self.bodies = []
+        handle_generate = self.fake.handle_generate
+
+        def record(model, body, api_key=''):
+            self.bodies.append(body)
+            return handle_generate(model, body, api_key)
+
+        self.fake.handle_generate = record
+        self.addCleanup(setattr, self.fake, 'handle_generate', handle_generate)
+
+    def _edit_body(self) -> dict:
+        GeminiAPIService.generate(product_image=png_upload(seed=2), person_image=png_upload(seed=1))
+        return next(body for body in self.bodies if 'IMAGE' in body['generationConfig']['responseModalities'])
+
+    def _parts(self, body: dict) -> list[str]:
+        return ['image' if 'inlineData' in part else 'text' for content in body['contents'] for part in content['parts']]
+
+    @override_settings(GEMINI_CONTEXT_CACHE=CONTEXT_CACHE)
+    def test_short_instructions_are_sent_inline(self):
+        self.assertLess(text_tokens(EDIT_SYSTEM_INSTRUCTION), CONTEXT_CACHE['min_tokens'])
+        body = self._edit_body()
+        self.assertNotIn('cachedContent', body)
+        self.assertIn('systemInstruction', body)
+        self.assertEqual(self._parts(body), ['image', 'image', 'text'])
+        self.assertNotIn('cache:create', self.fake.calls)
+
+    @override_settings(GEMINI_CONTEXT_CACHE={**CONTEXT_CACHE, 'min_tokens': 1})
+    def test_cached_instruction_keeps_prompt_after_images(self):
+        body = self._edit_body()
+        self.assertIn('cachedContent', body)
+        self.assertNotIn('systemInstruction', body)
+        self.assertEqual(self._parts(body), ['image', 'image', 'text'])
+        self.assertIn('Edit the person image', body['contents'][-1]['parts'][-1]['text'])
+        # 캐시에는 system instruction 만 (프롬프트 없음)
+        cache = next(entry for entry in self.fake.caches.values() if entry['displayName'] == 'dressroom:edit')
+        self.assertEqual(cache['tokens'], max(1, len(EDIT_SYSTEM_INSTRUCTION) // 4))
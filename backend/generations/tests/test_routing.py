@@ -0,0 +1,101 @@
+import httpx
+from django.test import SimpleTestCase
+
+from generations.deadlines import Deadline, DeadlineExceeded
+from generations.routing import CLASSIFY, EDIT, ModelRouter
+
+POLICY = {
+    'classify': ['flash', 'flash-lite'],
+    'edit': ['image-a', 'image-b'],
+    'tiers': {'enterprise': {'edit': ['image-b', 'image-a']}},
+    'timeouts_ms': {'classify': 1000, 'edit': 5000},
+    'prior_latency_ms': {'classify': 100, 'edit': 1000},
+    'max_in_flight': {'classify': 0, 'edit': 0},
+    'max_error_rate': 0.5,
+    'error_half_life_seconds': 30,
+    'ewma_alpha': 0.5,
+    'position_penalty': 0.5,
+}
+
+
+class ModelRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ModelRouter(POLICY)
+
+    def test_candidates_follow_tier_order(self):
+        self.assertEqual(self.router.candidates(EDIT), ['image-a', 'image-b'])
+        self.assertEqual(self.router.candidates(EDIT, 'enterprise'), ['image-b', 'image-a'])
+        self.assertEqual(self.router.candidates(EDIT, 'unknown-tier'), ['image-a', 'image-b'])
+
+    def test_timeout_falls_back_to_next_model(self):
+        calls = []
+
+        def fn(model, timeout_ms):
+            calls.append((model, timeout_ms))
+            if model == 'flash':
+                raise httpx.ReadTimeout('slow')
+            return 'ok'
+
+        result, model = self.router.call(CLASSIFY, fn)
+        self.assertEqual((result, model), ('ok', 'flash-lite'))
+        self.assertEqual(calls, [('flash', 1000), ('flash-lite', 1000)])
+        stats = self.router.snapshot()
+        self.assertAlmostEqual(stats['classify:flash']['error_rate'], 0.5, places=2)
+        self.assertEqual(stats['classify:flash-lite']['error_rate'], 0.0)
+
+    def test_other_errors_are_not_retried(self):
+        def fn(model, timeout_ms):
+            raise ValueError('bad request')
+
+        with self.assertRaises(ValueError):
+            self.router.call(CLASSIFY, fn)
+        self.assertEqual(self.router.snapshot()['classify:flash']['calls'], 1)
+        self.assertEqual(self.router.snapshot()['classify:flash-lite']['calls'], 0)
+
+    def test_pinned_model_is_the_only_candidate(self):
+        result, model = self.router.call(EDIT, lambda model, timeout_ms: model, pinned='image-b')
+        self.assertEqual((result, model), ('image-b', 'image-b'))
+
+    def test_unhealthy_model_recovers_without_calls(self):
+        for _ in range(2):
+            self.router._end(EDIT, 'image-a', None, failed=True)
+        self.assertEqual(self.router.candidates(EDIT), ['image-b', 'image-a'])
+
+        # 반감기 두 번이 지나면 0.75 → 0.19: 다시 첫 후보 (그 사이 image-a 호출 없음)
+        stats = self.router._stats[(EDIT, 'image-a')]
+        stats.error_at -= 60
+        self.assertEqual(self.router.candidates(EDIT), ['image-a', 'image-b'])
+        self.assertLess(self.router.snapshot()['edit:image-a']['error_rate'], 0.2)
+
+        # 다시 실패하면 감쇠된 값에서 이어서 계산
+        self.router._end(EDIT, 'image-a', None, failed=True)
+        self.assertAlmostEqual(stats.error_ewma, 0.75 / 4 * 0.5 + 0.5, places=2)
+
+    def test_decay_off_keeps_error_rate(self):
+        router = ModelRouter({**POLICY, 'error_half_life_seconds': 0})
+        router._end(EDIT, 'image-a', None, failed=True)
+        router._stats[(EDIT, 'image-a')].error_at -= 3600
+        self.assertEqual(router.candidates(EDIT), ['image-b', 'image-a'])
+
+    def test_deadline_cuts_timeout_and_does_not_penalise(self):
+        deadline = Deadline(200)
+        seen = []
+
+        def fn(model, timeout_ms):
+            seen.append(timeout_ms)
+            deadline.expires_at = 0
+            raise httpx.ReadTimeout('cut by deadline')
+
+        with self.assertRaises(DeadlineExceeded):
+            self.router.call(EDIT, fn, deadline=deadline)
+        self.assertLessEqual(seen[0], 200)
+        self.assertEqual(self.router.snapshot()['edit:image-a']['error_rate'], 0.0)
+        self.assertEqual(self.router.snapshot()['edit:image-a']['in_flight'], 0)
+
+    def test_expected_ms_tracks_latency(self):
+        self.assertEqual(self.router.expected_ms(CLASSIFY), 100)
+        self.router._end(CLASSIFY, 'flash', 120, failed=False)
+        self.assertEqual(self.router.expected_ms(CLASSIFY), 110)
+        # 느려지면 다음 후보(flash-lite: 100ms × 위치 벌점 1.5)가 앞섬
+        self.router._end(CLASSIFY, 'flash', 500, failed=False)
+        self.assertEqual(self.router.expected_ms(CLASSIFY), 100)
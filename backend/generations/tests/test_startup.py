@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from generations.keypool import KeyPool, key_pool
+from generations.services import GeminiAPIService
+
+# WSGI 앱과 URLconf(→ views → services) 를 모두 불러와도 SDK 는 아직 import 되지 않아야 함
+IMPORT_CHECK = (
+    'import sys, config.wsgi; '
+    'from django.urls import get_resolver; get_resolver().url_patterns; '
+    'print("google.genai" in sys.modules)'
+)
+
+
+class LazyImportTests(SimpleTestCase):
+    def test_wsgi_import_does_not_load_the_sdk(self):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'config.settings_test'}
+        result = subprocess.run(
+            [sys.executable, '-c', IMPORT_CHECK], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(result.stdout.strip(), 'False', result.stderr)
+
+
+class LazyClientTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = mock.Mock(side_effect=lambda api_key: mock.Mock(name=f'client-{api_key}'))
+        self.pool = KeyPool()
+        self.pool.configure(['a=k1', 'b=k2'], self.factory)
+
+    def test_client_is_built_on_first_use_once_per_process(self):
+        self.factory.assert_not_called()
+        key = self.pool.keys[0]
+        client = self.pool.client_for(key)
+        self.assertIs(self.pool.client_for(key), client)
+        self.factory.assert_called_once_with('k1')
+
+        # fork 후 (pid 변경) 에는 부모의 클라이언트를 쓰지 않고 새로 생성
+        with mock.patch('os.getpid', return_value=os.getpid() + 1):
+            self.assertIsNot(self.pool.client_for(key), client)
+        self.assertEqual(self.factory.call_count, 2)
+
+    def test_reset_after_fork_drops_clients_and_key_state(self):
+        self.addCleanup(GeminiAPIService.configure)
+        key_pool.configure(['a=k1', 'b=k2'], self.factory)
+        for key in key_pool.keys:
+            key_pool.client_for(key)
+            key.in_flight = 3
+        lock = key_pool._lock
+
+        GeminiAPIService._reset_after_fork()
+        self.assertIsNot(key_pool._lock, lock)
+        self.assertEqual([(key.client, key.in_flight) for key in key_pool.keys], [(None, 0), (None, 0)])
+        key_pool.client_for(key_pool.keys[0])
+        self.assertEqual(self.factory.call_count, 3)
+
+    def test_warmup_can_run_more_than_once(self):
+        self.addCleanup(GeminiAPIService.configure)
+        key_pool.configure(['a=k1', 'b=k2'], self.factory)
+        self.assertEqual(GeminiAPIService.warmup(connections=4), 4)
+        self.assertEqual(GeminiAPIService.warmup(connections=4), 4)
+        # 키마다 클라이언트는 한 번만 생성, 핑은 호출마다 연결 수만큼
+        self.assertEqual(self.factory.call_count, 2)
+        self.assertEqual(sum(key.client.models.get.call_count for key in key_pool.keys), 8)
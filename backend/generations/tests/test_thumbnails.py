@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+
+from generations.blobs import blob_store
+from generations.fakes import make_png
+from generations.thumbnails import DiskLRU, ThumbnailService, UnknownVariant, render_thumbnail
+
+THUMBNAILS = {
+    'variants': {'sm': 16, 'md': 32},
+    'format': 'PNG',
+    'quality': 80,
+    'max_bytes': 1024 * 1024,
+    'workers': 1,
+    'wait_seconds': 5,
+    'prewarm': [],
+}
+
+
+def _tempdir(test) -> str:
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+    return directory
+
+
+class DiskLRUTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = DiskLRU(_tempdir(self), max_bytes=20)
+        cache.put('a', b'x' * 8)
+        cache.put('b', b'x' * 8)
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('c', b'x' * 8)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertEqual(cache.total_bytes, 16)
+
+    def test_render_keeps_aspect_ratio(self):
+        data = render_thumbnail(make_png(64, 32), 16, 'PNG', 80)
+        self.assertEqual(Image.open(BytesIO(data)).size, (16, 8))
+
+
+class ThumbnailServiceTests(TestCase):
+    def setUp(self):
+        settings_override = override_settings(THUMBNAILS={**THUMBNAILS, 'cache_dir': _tempdir(self)})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.service = ThumbnailService()
+        self.addCleanup(lambda: self.service._executor and self.service._executor.shutdown())
+        self.sha256 = blob_store.put(make_png(64, 64, seed=5), 'image/png').rsplit('/', 1)[-1]
+
+    def test_renders_once_and_serves_from_cache(self):
+        with mock.patch('generations.thumbnails.render_thumbnail', wraps=render_thumbnail) as render:
+            first = self.service.get_path(self.sha256, 'sm')
+            second = self.service.get_path(self.sha256, 'sm')
+        self.assertEqual(first, second)
+        render.assert_called_once()
+        with self.assertRaises(UnknownVariant):
+            self.service.get_path(self.sha256, 'xl')
+
+    def test_open_renders_again_after_eviction(self):
+        get_path = self.service.get_path
+        calls = []
+
+        def evicting_get_path(sha256, variant):
+            path = get_path(sha256, variant)
+            calls.append(path)
+            if len(calls) == 1:
+                # 다른 워커의 LRU 삭제가 get_path 와 open 사이에 끼어듦
+                os.remove(path)
+            return path
+
+        with mock.patch.object(self.service, 'get_path', evicting_get_path), self.service.open(self.sha256, 'md') as fh:
+            self.assertEqual(Image.open(fh).size, (32, 32))
+        self.assertEqual(len(calls), 2)
+
+    def test_missing_blob_is_not_found(self):
+        with self.assertRaises(FileNotFoundError):
+            self.service.open('0' * 64, 'sm')
@@ -0,0 +1,190 @@
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from generations.fakes import FakeWebhookReceiver
+from generations.models import WebhookDeadLetter, WebhookEvent, WebhookEventType
+from generations.tests.utils import create_shop
+from generations.webhooks import UnsafeCallbackURL, WebhookDispatcher, check_callback_url, sign, verify
+
+WEBHOOKS = {
+    'timeout_seconds': 5.0,
+    'max_connections': 4,
+    'per_endpoint_concurrency': 2,
+    'batch_max_events': 1,
+    'workers': 2,
+    'claim_size': 50,
+    'lease_seconds': 60,
+    'max_attempts': 3,
+    'backoff_base_seconds': 10,
+    'backoff_max_seconds': 3600,
+    'poll_interval_seconds': 0.05,
+    'allow_private_hosts': False,
+}
+
+
+class SignatureTests(SimpleTestCase):
+    def test_verify_checks_body_and_age(self):
+        now = int(time.time())
+        header = sign('secret', now, b'{"a":1}')
+        self.assertTrue(verify('secret', header, b'{"a":1}'))
+        self.assertFalse(verify('secret', header, b'{"a":2}'))
+        self.assertFalse(verify('other', header, b'{"a":1}'))
+        self.assertFalse(verify('secret', sign('secret', now - 3600, b'{}'), b'{}'))
+        self.assertFalse(verify('secret', 'garbage', b'{}'))
+
+
+@override_settings(WEBHOOKS=WEBHOOKS)
+class CallbackURLTests(SimpleTestCase):
+    def test_internal_hosts_are_rejected(self):
+        for url in (
+            'http://127.0.0.1/hook',
+            'http://localhost:8000/hook',
+            'http://10.1.2.3/hook',
+            'http://169.254.169.254/latest/meta-data',
+            'http://[::1]/hook',
+            'http://[::ffff:192.168.0.1]/hook',
+            'ftp://93.184.215.14/hook',
+        ):
+            with self.subTest(url=url), self.assertRaises(UnsafeCallbackURL):
+                check_callback_url(url)
+
+    def test_public_host_is_accepted(self):
+        check_callback_url('https://93.184.215.14/hook')
+
+    @override_settings(WEBHOOKS={**WEBHOOKS, 'allow_private_hosts': True})
+    def test_private_hosts_can_be_allowed(self):
+        check_callback_url('http://127.0.0.1:8000/hook')
+
+
+@override_settings(WEBHOOKS=WEBHOOKS)
+class WebhookDispatcherTests(TestCase):
+    def setUp(self):
+        self.receiver = FakeWebhookReceiver(seed=1).start()
+        self.addCleanup(self.receiver.stop)
+        self.shop = create_shop()
+        self.shop.callback_url = self.receiver.url_for(self.shop.shop_id)
+        self.shop.save(update_fields=['callback_url'])
+        self.receiver.secrets[self.shop.shop_id] = self.shop.webhook_secret
+        self.dispatcher = WebhookDispatcher(allow_private_hosts=True)
+        self.addCleanup(self.dispatcher.close)
+
+    def _event(self) -> WebhookEvent:
+        return WebhookEvent.objects.create(
+            shop=self.shop, event_type=WebhookEventType.GENERATION_SUCCEEDED, payload={'request_id': 1},
+        )
+
+    def test_delivers_signed_event(self):
+        event = self._event()
+        stats = self.dispatcher.run_once()
+        self.assertEqual((stats.requests, stats.delivered), (1, 1))
+        self.assertEqual(self.receiver.bad_signatures, 0)
+        received = self.receiver.events[self.shop.shop_id]
+        self.assertEqual(received[0]['id'], f'evt_{event.pk}')
+        self.assertEqual(received[0]['data'], {'request_id': 1})
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_bad_signature_is_dead_lettered(self):
+        self.receiver.secrets[self.shop.shop_id] = 'not-the-secret'
+        self._event()
+        self.assertEqual(self.dispatcher.run_once().dead, 1)
+        self.assertEqual(WebhookDeadLetter.objects.get().last_status, 401)
+
+    def test_server_error_is_retried_with_backoff(self):
+        self.receiver.error_rate = 1.0
+        event = self._event()
+        before = timezone.now()
+        self.assertEqual(self.dispatcher.run_once().retried, 1)
+        event.refresh_from_db()
+        self.assertEqual((event.attempts, event.last_error, event.locked_until), (1, 'HTTP 503', None))
+        # 1회차 지연은 base/2 ~ base
+        self.assertGreaterEqual(event.next_attempt_at, before + timedelta(seconds=5))
+        self.assertLessEqual(event.next_attempt_at, timezone.now() + timedelta(seconds=10))
+        # 아직 때가 아니므로 다시 가져가지 않음
+        self.assertEqual(self.dispatcher.run_once().requests, 0)
+
+    def test_backoff_grows_and_honours_retry_after(self):
+        self.assertLessEqual(self.dispatcher.backoff_seconds(1), 10)
+        self.assertGreaterEqual(self.dispatcher.backoff_seconds(4), 40)
+        self.assertLessEqual(self.dispatcher.backoff_seconds(30), 3600)
+        self.assertGreaterEqual(self.dispatcher.backoff_seconds(1, retry_after=120), 120)
+
+    def test_event_is_dead_lettered_after_max_attempts(self):
+        self.receiver.error_rate = 1.0
+        event = self._event()
+        for attempt in range(WEBHOOKS['max_attempts']):
+            WebhookEvent.objects.filter(pk=event.pk).update(next_attempt_at=timezone.now())
+            self.dispatcher.run_once()
+        self.assertFalse(WebhookEvent.objects.exists())
+        dead = WebhookDeadLetter.objects.get()
+        self.assertEqual((dead.attempts, dead.last_status, dead.callback_url), (3, 503, self.shop.callback_url))
+        self.assertEqual(self.receiver.requests, 3)
+
+    def test_client_error_is_not_retried(self):
+        self.receiver.error_rate = 1.0
+        self.receiver.error_status = 400
+        self._event()
+        self.assertEqual(self.dispatcher.run_once().dead, 1)
+        self.assertEqual(WebhookDeadLetter.objects.get().attempts, 1)
+
+    def test_private_host_is_refused_at_send_time(self):
+        self._event()
+        dispatcher = WebhookDispatcher()
+        self.addCleanup(dispatcher.close)
+        self.assertEqual(dispatcher.run_once().dead, 1)
+        self.assertEqual(self.receiver.requests, 0)
+        self.assertIn('non-public', WebhookDeadLetter.objects.get().last_error)
+
+    def test_per_endpoint_limit_is_enforced_without_blocking_the_pool(self):
+        slow_shop = create_shop()
+        slow_shop.callback_url = self.receiver.url_for(slow_shop.shop_id)
+        slow_shop.save(update_fields=['callback_url'])
+        for _ in range(5):
+            WebhookEvent.objects.create(shop=slow_shop, event_type=WebhookEventType.GENERATION_SUCCEEDED, payload={})
+        other = self._event()
+        dispatcher = WebhookDispatcher(allow_private_hosts=True, per_endpoint_concurrency=1, workers=2)
+        self.addCleanup(dispatcher.close)
+
+        # 느린 상점은 한 번에 하나만 보내고 나머지는 임대를 풀어 둠 → 남은 스레드는 다른 상점 몫
+        stats = dispatcher.run_once()
+        self.assertEqual((stats.delivered, stats.deferred), (2, 4))
+        self.assertFalse(WebhookEvent.objects.filter(pk=other.pk).exists())
+        self.assertFalse(WebhookEvent.objects.filter(locked_until__isnull=False).exists())
+
+        settled = []
+        stop = threading.Event()
+
+        def on_settled(round_stats):
+            settled.append(round_stats.delivered)
+            if sum(settled) >= 4:
+                stop.set()
+
+        timer = threading.Timer(10, stop.set)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        dispatcher.run_forever(stop, on_settled=on_settled)
+        self.assertFalse(WebhookEvent.objects.exists())
+        self.assertEqual(self.receiver.max_concurrency[f'/hooks/{slow_shop.shop_id}'], 1)
+        self.assertEqual(dispatcher._active, {})
+
+    def test_signature_is_made_after_resolving_the_host(self):
+        self._event()
+        order = []
+
+        def resolve(*args, **kwargs):
+            order.append('resolve')
+            return ['127.0.0.1']
+
+        def signed(*args):
+            order.append('sign')
+            return sign(*args)
+
+        with mock.patch('generations.webhooks.resolve_callback_host', side_effect=resolve), \
+                mock.patch('generations.webhooks.sign', side_effect=signed):
+            self.assertEqual(self.dispatcher.run_once().delivered, 1)
+        # 이후의 sign 은 수신기의 verify
+        self.assertEqual(order[:2], ['resolve', 'sign'])
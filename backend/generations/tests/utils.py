@@ -0,0 +1,82 @@
+"""Fixtures shared by the generations and users tests."""
+
+from itertools import count
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import Model
+
+from generations.fakes import FakeGeminiServer, make_png
+from generations.routing import model_router
+from generations.services import GeminiAPIService
+from users.models import CustomUser, PlanTier, ShopMembership, ShopProfile, ShopRole
+
+_sequence = count(1)
+
+
+def upload(data: bytes, name: str = 'image.png', content_type: str = 'image/png') -> SimpleUploadedFile:
+    return SimpleUploadedFile(name, data, content_type=content_type)
+
+
+def png_upload(size: tuple[int, int] = (64, 64), seed: int = 0, name: str = 'image.png') -> SimpleUploadedFile:
+    return upload(make_png(*size, seed=seed), name=name)
+
+
+def create_user(email: str = '', **fields) -> CustomUser:
+    number = next(_sequence)
+    user = CustomUser.objects.create_user(email or f'user{number}@dressroom.test', password='password', **fields)
+    return user
+
+
+def create_shop(owner: CustomUser = None, **fields) -> ShopProfile:
+    number = next(_sequence)
+    values = {
+        'shop_id': f'shop-{number}',
+        'shop_name': f'Shop {number}',
+        'company_name': 'Dressroom Test',
+        'business_registration_number': f'{number:010d}',
+        'contact_phone': '0200000000',
+        'tier': PlanTier.BASIC,
+    }
+    values.update(fields)
+    return ShopProfile.objects.create(owner=owner or create_user(), **values)
+
+
+def add_member(shop: ShopProfile, role: str = ShopRole.VIEWER, user: CustomUser = None) -> CustomUser:
+    user = user or create_user()
+    ShopMembership.objects.create(shop=shop, user=user, role=role)
+    return user
+
+
+def copy_to_replica(*objects: Model) -> None:
+    """Insert the rows as they are into the (independent) test ``replica`` database.
+
+    A raw save skips ``save()`` overrides and ``auto_now`` fields, so timestamps are copied too.
+    """
+
+    for obj in objects:
+        obj.save_base(raw=True, force_insert=True, using='replica')
+        obj._state.db = 'default'
+
+
+class FakeGeminiMixin:
+    """Runs one ``FakeGeminiServer`` per test class and points ``GeminiAPIService`` at it."""
+
+    fake_options: dict = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fake = FakeGeminiServer(**{'image_size': (64, 64), **cls.fake_options}).start()
+        GeminiAPIService.configure(api_key='test-key', base_url=cls.fake.url)
+
+    @classmethod
+    def tearDownClass(cls):
+        GeminiAPIService.configure()
+        cls.fake.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        # 이전 테스트의 모델 지연/오류율이 후보 순서를 바꾸지 않도록
+        model_router._stats.clear()
+        self.fake.calls.clear()
@@ -0,0 +1,214 @@
+"""Thumbnails of stored result images, generated on first use and cached on local disk.
+
+Variants are keyed by the blob's SHA-256, so a cached file never goes stale and can be
+served with an immutable, year-long ``Cache-Control``. Resizing runs on a small thread pool,
+off the request thread where possible (results are pre-warmed when they are stored), and
+concurrent requests for the same variant share one resize. The cache directory is kept under
+``THUMBNAILS['max_bytes']`` by evicting the least recently used files; recency is the file
+mtime, so it survives restarts and is shared by the workers using the same directory.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from typing import Optional
+
+from django.conf import settings
+from PIL import Image
+
+from .blobs import BLOB_PREFIX, blob_store
+from .models import blob_path
+
+CONTENT_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+
+
+class UnknownVariant(ValueError):
+    pass
+
+
+def render_thumbnail(data: bytes, max_side: int, fmt: str, quality: int) -> bytes:
+    img = Image.open(BytesIO(data))
+    # JPEG 는 디코딩 단계에서 축소 (전체 해상도 디코딩 생략)
+    img.draft('RGB', (max_side, max_side))
+    img = img.convert('RGBA' if fmt in ('WEBP', 'PNG') and 'A' in img.getbands() else 'RGB')
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+    out = BytesIO()
+    img.save(out, format=fmt, quality=quality)
+    return out.getvalue()
+
+
+class DiskLRU:
+    """Files in ``directory`` with a total size budget; least recently used files are evicted first."""
+
+    def __init__(self, directory: str, max_bytes: int, rescan_seconds: float = 60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rescan_seconds = rescan_seconds
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()
+        self._total = 0
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        # 다른 워커가 추가/삭제한 파일도 반영하도록 주기적으로 디렉터리를 다시 읽음
+        found = []
+        os.makedirs(self.directory, exist_ok=True)
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith('.'):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name, stat.st_size))
+        found.sort()
+        self._entries = OrderedDict((name, size) for _, name, size in found)
+        self._total = sum(size for _, _, size in found)
+        self._scanned_at = time.monotonic()
+
+    def _ensure_scanned(self):
+        if time.monotonic() - self._scanned_at > self.rescan_seconds:
+            self._scan()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def get(self, name: str) -> Optional[str]:
+        path = self.path(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                if name in self._entries:
+                    self._total -= self._entries.pop(name)
+            return None
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+        return path
+
+    def put(self, name: str, data: bytes) -> str:
+        path = self.path(name)
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._ensure_scanned()
+            self._total -= self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._total += len(data)
+            self._evict()
+        return path
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+
+class ThumbnailService:
+    def __init__(self):
+        self._cache: Optional[DiskLRU] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def config(self) -> dict:
+        return settings.THUMBNAILS
+
+    @property
+    def cache(self) -> DiskLRU:
+        if self._cache is None:
+            with self._lock:
+                if self._cache is None:
+                    self._cache = DiskLRU(self.config['cache_dir'], self.config['max_bytes'])
+        return self._cache
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.config['workers'], thread_name_prefix='thumbnail')
+        return self._executor
+
+    @property
+    def content_type(self) -> str:
+        return CONTENT_TYPES[self.config['format']]
+
+    def name(self, sha256: str, variant: str) -> str:
+        if variant not in self.config['variants']:
+            raise UnknownVariant(variant)
+        return f'{sha256}-{variant}.{self.config["format"].lower()}'
+
+    def _render(self, sha256: str, variant: str, name: str) -> str:
+        with blob_store.open(blob_path(sha256)) as fh:
+            data = fh.read()
+        thumbnail = render_thumbnail(data, self.config['variants'][variant], self.config['format'], self.config['quality'])
+        return self.cache.put(name, thumbnail)
+
+    def _submit(self, sha256: str, variant: str) -> tuple[str, Future]:
+        name = self.name(sha256, variant)
+        executor = self.executor
+        with self._lock:
+            future = self._pending.get(name)
+            created = future is None
+            if created:
+                # 같은 썸네일을 동시에 요청해도 리사이즈는 한 번만
+                future = executor.submit(self._render, sha256, variant, name)
+                self._pending[name] = future
+        if created:
+            # 이미 끝난 future 면 콜백이 바로 실행되므로 락 밖에서 등록
+            future.add_done_callback(lambda _: self._forget(name, future))
+        return name, future
+
+    def _forget(self, name: str, future: Future):
+        with self._lock:
+            if self._pending.get(name) is future:
+                del self._pending[name]
+
+    def get_path(self, sha256: str, variant: str) -> str:
+        """Path of the cached variant, rendering it (once, however many callers) if needed."""
+
+        name = self.name(sha256, variant)
+        path = self.cache.get(name)
+        if path is not None:
+            return path
+        _, future = self._submit(sha256, variant)
+        return future.result(timeout=self.config['wait_seconds'])
+
+    def open(self, sha256: str, variant: str):
+        """The cached variant opened for reading, rendered again if it was evicted before the open."""
+
+        try:
+            return open(self.get_path(sha256, variant), 'rb')
+        except FileNotFoundError:
+            # get_path 와 open 사이에 다른 워커가 LRU 에서 삭제했을 수 있음 → 한 번만 다시 렌더링
+            # (원본 blob 이 없으면 다시 FileNotFoundError)
+            return open(self.get_path(sha256, variant), 'rb')
+
+    def prewarm(self, sha256: str) -> None:
+        """Render ``THUMBNAILS['prewarm']`` variants in the background; errors are ignored."""
+
+        for variant in self.config['prewarm']:
+            if self.cache.get(self.name(sha256, variant)) is None:
+                self._submit(sha256, variant)
+
+    def prewarm_result(self, request) -> None:
+        if request.result_image_path.startswith(BLOB_PREFIX) and self.config['prewarm']:
+            self.prewarm(request.result_image_path.rsplit('/', 1)[-1])
+
+
+thumbnails = ThumbnailService()
@@ -1,19 +1,35 @@
+import asyncio
+import json
 import time
+from typing import Optional
 
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
 from .serializers import GenerationSerializer
+from .blobs import blob_store
+from .budget import token_budget
+from .deadlines import DeadlineExceeded, deadline_response, request_deadline
+from .thumbnails import thumbnails
+from .idempotency import run_idempotent
+from .limiter import GenerationLimitMixin, generation_limiter
+from .progress import DONE, FAILED, TERMINAL_STAGES, progress, watchers
 from .models import GenerationRequest, GenerationErrorLog, GenerationStatus
 from .services import GeminiAPIService, GeminiAPIResponseError
 
-from django.http import FileResponse
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
 
 from users.models import ShopProfile, ErrorLevel
 from users.loggers import log_service, log_service_err
+from users.tokens import MembershipClaimsJWTAuthentication, token_shop_role
 
-class GenerateImageView(APIView):
+class GenerateImageView(GenerationLimitMixin, APIView):
     def post(self, request):
         serializer = GenerationSerializer(data=request.data)
         if not serializer.is_valid():
@@ -34,31 +50,81 @@ class GenerateImageView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        deadline = request_deadline(request, shop)
+        return run_idempotent(
+            request,
+            shop=shop,
+            customer_id=customer_id,
+            uploads=(person_image, product_image),
+            handler=lambda: self._generate(shop, customer_id, person_image, product_image, deadline),
+        )
+
+    def _generate(self, shop, customer_id, person_image, product_image, deadline=None):
         if not shop.has_quota:
             return Response(
                 {'error': 'Usage limit exceeded.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        budget = token_budget.preflight(shop, person_image, [product_image])
+        if not budget.allowed:
+            return Response(
+                {
+                    'error': 'Token budget exceeded.',
+                    'limit': budget.limited_by,
+                    'estimated_tokens': budget.estimated_tokens,
+                    'available_tokens': budget.limit,
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         log = GenerationRequest.objects.create(
             shop=shop,
             status=GenerationStatus.STARTED,
         )
         log.set_customer_reference(customer_id)
         log.save(update_fields=['customer_reference', 'customer_hash'])
+        progress.start(log, self.request.headers.get('Idempotency-Key'))
 
-        shop.decrement_quota(actor=None)
+        if not shop.decrement_quota(actor=None):
+            # has_quota 확인 뒤 동시 요청이 마지막 쿼터를 가져감
+            log.mark_failure(error_message='Usage limit exceeded')
+            return Response(
+                {'error': 'Usage limit exceeded.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         log_service(shop=shop, remaining=shop.count, note='quota decremented via public generate view')
 
         try:
             started_at = time.monotonic()
-            result, tokens = GeminiAPIService.generate(
+            result, tokens, meta = GeminiAPIService.generate(
                 product_image=product_image,
-                person_image=person_image
+                person_image=person_image,
+                tier=shop.tier,
+                on_stage=progress.stage_callback(log.pk),
+                max_side=budget.max_side,
+                deadline=deadline,
             )
 
             latency_ms = int((time.monotonic() - started_at) * 1000)
-            log.mark_success(latency_ms=latency_ms, tokens=tokens, result_path='')
+            blob_store.attach(
+                log,
+                person=person_image,
+                product=product_image,
+                result=result,
+                product_sha256=meta['product_sha256'],
+                result_type=meta['result_mime'],
+            )
+            thumbnails.prewarm_result(log)
+            log.mark_success(
+                latency_ms=latency_ms,
+                tokens=tokens,
+                result_path='',
+                classify_model=meta['classify_model'],
+                edit_model=meta['edit_model'],
+                cached_tokens=meta['cached_tokens'],
+                estimated_tokens=budget.estimated_tokens,
+            )
 
             response = FileResponse(
                 result,
@@ -68,6 +134,11 @@ class GenerateImageView(APIView):
             response['Content-Disposition'] = 'attachment; filename="generated_image.png"'
             return response
 
+        except DeadlineExceeded as e:
+            # 클라이언트가 이미 포기한 요청 → 남은 작업 중단, 쿼터 환불
+            log.mark_failure(error_code='deadline_exceeded', error_message=str(e))
+            shop.increment_quota(actor=None)
+            return deadline_response(e)
         except GeminiAPIResponseError as e:
             GenerationErrorLog.objects.create(
                 err_from='_GeminiAPIService.generate',
@@ -96,3 +167,158 @@ class GenerateImageView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+
+
+def ready(request):
+    # 로드밸런서/오토스케일러용: 이 워커가 포화(한도 가득 또는 최근 거절)면 503
+    snapshot = generation_limiter.snapshot()
+    response = JsonResponse(snapshot, status=200 if snapshot['ready'] else 503)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+SSE_CONTENT_TYPE = 'text/event-stream'
+
+
+def _sse(event_id, stage: str, data: dict) -> str:
+    return f'id: {event_id}\nevent: {stage}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+def _iterate_sync(stream):
+    # WSGI(runserver 등)에서는 비동기 제너레이터를 전용 이벤트 루프에서 한 단계씩 실행 (버퍼링 없이 전송)
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(stream.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(stream.aclose())
+        loop.close()
+
+
+@sync_to_async
+def _authenticate(request):
+    auth = MembershipClaimsJWTAuthentication()
+    header = auth.get_header(request)
+    raw = auth.get_raw_token(header) if header else None
+    if raw is None and request.GET.get('access_token'):
+        # 브라우저 EventSource 는 Authorization 헤더를 보낼 수 없음
+        raw = request.GET['access_token'].encode('utf-8')
+    if raw is None:
+        return None
+    try:
+        return auth.get_user(auth.get_validated_token(raw))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+@sync_to_async
+def _watchable_shop(user, shop_id: str) -> Optional[ShopProfile]:
+    role = token_shop_role(user, shop_id)
+    if role == '':
+        return None
+    shops = ShopProfile.objects.filter(shop_id=shop_id, is_active=True)
+    if role is None:
+        shops = shops.filter(memberships__user=user, memberships__is_active=True)
+    return shops.first()
+
+
+class GenerationEventsView(View):
+    """Server-sent events for one generation: ``queued``, ``classified``, ``editing``, then ``done`` or ``failed``.
+
+    Watch by request id (``generations/<id>/events/``) or by the ``Idempotency-Key`` the generate
+    request was sent with (``generations/by-key/<key>/events/``), which works before the response
+    with the id arrives. ``Last-Event-ID`` resumes after a reconnect.
+
+    Served under ASGI only: a WSGI worker would give each watcher a thread for the whole stream.
+    ``DEBUG`` (``runserver``) is the exception.
+    """
+
+    async def get(self, request, shop_id: str, request_id: Optional[int] = None, key: Optional[str] = None):
+        if not isinstance(request, ASGIRequest) and not settings.DEBUG:
+            return JsonResponse(
+                {'error': 'Generation events are served by the ASGI service only.'},
+                status=501,
+            )
+        user = await _authenticate(request)
+        if user is None:
+            return JsonResponse({'error': 'Authentication credentials were not provided or are invalid.'}, status=401)
+        shop = await _watchable_shop(user, shop_id)
+        if shop is None:
+            return JsonResponse({'error': 'Shop not found.'}, status=404)
+        if request_id is not None and not await GenerationRequest.objects.filter(pk=request_id, shop=shop).aexists():
+            return JsonResponse({'error': 'Generation not found.'}, status=404)
+
+        last_id = request.headers.get('Last-Event-ID', '')
+        stream = self._stream(shop, request_id, key, int(last_id) if last_id.isdigit() else 0)
+        if not isinstance(request, ASGIRequest):
+            stream = _iterate_sync(stream)
+        response = StreamingHttpResponse(stream, content_type=SSE_CONTENT_TYPE)
+        response['Cache-Control'] = 'no-cache'
+        # nginx 등 프록시 버퍼링 해제
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def _final_event(self, shop: ShopProfile, request_id: int) -> Optional[tuple[str, dict]]:
+        # 캐시에 이벤트가 없을 때(다른 프로세스 locmem, 만료) DB 상태로 최종 결과만 알림
+        generation = await GenerationRequest.objects.select_related('shop').filter(pk=request_id).afirst()
+        if generation is None:
+            return None
+        if generation.status == GenerationStatus.SUCCESS:
+            return DONE, {'result_url': generation.result_url}
+        if generation.status == GenerationStatus.FAILED:
+            return FAILED, {'error_code': generation.error_code}
+        return None
+
+    async def _stream(self, shop: ShopProfile, request_id: Optional[int], key: Optional[str], last_id: int):
+        config = progress.config
+        started = time.monotonic()
+        ends_at = started + config['max_stream_seconds']
+        last_write = last_db_check = started
+        yield f'retry: {config["retry_ms"]}\n\n'
+
+        def heartbeat_due(now: float) -> bool:
+            nonlocal last_write
+            if now - last_write < config['heartbeat_seconds']:
+                return False
+            last_write = now
+            return True
+
+        if request_id is None:
+            resolve_until = min(started + config['resolve_timeout_seconds'], ends_at)
+            async with watchers.watch(progress.alias_key(shop.pk, key)) as watch:
+                while watch.value is None:
+                    now = time.monotonic()
+                    if now >= resolve_until:
+                        yield _sse(last_id + 1, 'not_found', {'key': key})
+                        return
+                    if heartbeat_due(now):
+                        # 주석 줄: 클라이언트에는 이벤트로 보이지 않지만 프록시의 유휴 타임아웃을 막음
+                        yield ': ping\n\n'
+                    await watch.wait(min(resolve_until, last_write + config['heartbeat_seconds']) - now)
+                request_id = watch.value
+
+        # 캐시 조회는 프로세스 공용 폴러가 하고, 여기서는 값이 바뀌거나 할 일이 생길 때까지 대기만
+        async with watchers.watch(progress.events_key(request_id)) as watch:
+            while (now := time.monotonic()) < ends_at:
+                events = [event for event in watch.value or [] if event['id'] > last_id]
+                for event in events:
+                    last_id = event['id']
+                    data = {name: value for name, value in event.items() if name not in ('id', 'stage')}
+                    yield _sse(last_id, event['stage'], {'request_id': request_id, **data})
+                    last_write = now
+                    if event['stage'] in TERMINAL_STAGES:
+                        return
+                if not events and now - last_db_check >= config['db_check_seconds']:
+                    last_db_check = now
+                    final = await self._final_event(shop, request_id)
+                    if final is not None:
+                        yield _sse(last_id + 1, final[0], {'request_id': request_id, **final[1]})
+                        return
+                if heartbeat_due(now):
+                    yield ': ping\n\n'
+                wake_at = min(ends_at, last_write + config['heartbeat_seconds'], last_db_check + config['db_check_seconds'])
+                await watch.wait(wake_at - now)
+        # 최대 시간 초과 → 연결 종료, 클라이언트는 Last-Event-ID 로 재연결
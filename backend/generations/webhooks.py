@@ -0,0 +1,357 @@
+"""Delivery of ``WebhookEvent`` rows to ``ShopProfile.callback_url``.
+
+Requests are signed like ``X-Dressroom-Signature: t=<unix time>,v1=<hex HMAC-SHA256>`` where
+the MAC is over ``"<t>." + body`` with the shop's ``webhook_secret``. With
+``WEBHOOKS['batch_max_events'] == 1`` the body is one event document, otherwise it is
+``{"events": [...]}`` with up to that many events of one shop.
+
+``WebhookDispatcher`` runs in its own process (``run_webhook_dispatcher``): it claims due
+events with a lease, POSTs them from a thread pool over one pooled keep-alive client and
+settles the results from the main thread —
+delivered events are deleted, failed ones are rescheduled with exponential backoff, and
+events that run out of attempts (or get a non-retryable 4xx) move to ``WebhookDeadLetter``.
+The main thread also enforces ``per_endpoint_concurrency``: it counts requests in flight per
+callback URL, doesn't claim events of URLs at their limit and releases claimed batches beyond
+it, so a slow receiver never ties up pool threads that other shops could use.
+
+Callback URLs must point at public addresses (``check_callback_url``): the shop serializer
+rejects private, loopback and link-local hosts on save, and every delivery resolves the host
+again, refuses non-public answers and connects to the checked address (so a DNS answer that
+changes after the check can't redirect the request). Redirects are not followed.
+``WEBHOOKS['allow_private_hosts']`` lifts the restriction for local receivers.
+"""
+
+import hashlib
+import hmac
+import ipaddress
+import json
+import random
+import socket
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+
+import httpx
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from users.models import ShopProfile
+
+from .models import WebhookDeadLetter, WebhookEvent
+
+SIGNATURE_HEADER = 'X-Dressroom-Signature'
+EVENT_HEADER = 'X-Dressroom-Event'
+USER_AGENT = 'Dressroom-Webhooks/1.0'
+SIGNATURE_TOLERANCE_SECONDS = 300
+_RETRYABLE_STATUS = {408, 425, 429}
+
+
+class UnsafeCallbackURL(ValueError):
+    pass
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def resolve_callback_host(url: str, allow_private: bool = False) -> list[str]:
+    """Addresses ``url``'s host resolves to; ``UnsafeCallbackURL`` if any of them is not public.
+
+    ``socket.gaierror`` (an ``OSError``) propagates when the name doesn't resolve.
+    """
+
+    parsed = httpx.URL(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.host:
+        raise UnsafeCallbackURL('Callback URL must be an http(s) URL.')
+    infos = socket.getaddrinfo(parsed.host, parsed.port or (443 if parsed.scheme == 'https' else 80), type=socket.SOCK_STREAM)
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    if not allow_private:
+        blocked = [address for address in addresses if not _is_public(address)]
+        if blocked:
+            raise UnsafeCallbackURL(f'Callback host {parsed.host} resolves to a non-public address ({blocked[0]}).')
+    return addresses
+
+
+def check_callback_url(url: str) -> None:
+    """Save-time check of a shop's ``callback_url`` (raises ``UnsafeCallbackURL``)."""
+
+    try:
+        resolve_callback_host(url, allow_private=settings.WEBHOOKS['allow_private_hosts'])
+    except OSError as exc:
+        raise UnsafeCallbackURL(f'Callback host could not be resolved: {exc}') from exc
+
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    mac = hmac.new(secret.encode('utf-8'), f'{timestamp}.'.encode('ascii') + body, hashlib.sha256)
+    return f't={timestamp},v1={mac.hexdigest()}'
+
+
+def verify(secret: str, header: str, body: bytes, now: Optional[float] = None) -> bool:
+    """Receiver side check of ``SIGNATURE_HEADER``, including the replay window."""
+
+    try:
+        parts = dict(item.split('=', 1) for item in header.split(','))
+        timestamp = int(parts['t'])
+    except (KeyError, ValueError):
+        return False
+    if abs((now or time.time()) - timestamp) > SIGNATURE_TOLERANCE_SECONDS:
+        return False
+    return hmac.compare_digest(sign(secret, timestamp, body), header)
+
+
+def event_document(event: WebhookEvent) -> dict:
+    return {
+        'id': f'evt_{event.pk}',
+        'type': event.event_type,
+        'created_at': event.created_at.isoformat(),
+        'shop_id': event.shop.shop_id,
+        'data': event.payload,
+    }
+
+
+@dataclass
+class DispatchStats:
+    requests: int = 0
+    delivered: int = 0
+    retried: int = 0
+    dead: int = 0
+    dropped: int = 0
+    deferred: int = 0
+
+    def add(self, other: 'DispatchStats'):
+        for name in self.__dataclass_fields__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+@dataclass
+class _Attempt:
+    status: Optional[int]
+    error: str
+    retry_after: Optional[float]
+    # 재시도해도 소용없는 실패 (차단된 주소 등) → 바로 dead letter
+    final: bool = False
+
+
+class WebhookDispatcher:
+    def __init__(self, **overrides):
+        self.config = {**settings.WEBHOOKS, **overrides}
+        self._client: Optional[httpx.Client] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # 콜백 URL 별 전송 중인 요청 수 (메인 스레드에서만 변경)
+        self._active: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    timeout=self.config['timeout_seconds'],
+                    limits=httpx.Limits(
+                        max_connections=self.config['max_connections'],
+                        max_keepalive_connections=self.config['max_connections'],
+                    ),
+                    headers={'User-Agent': USER_AGENT},
+                )
+            return self._client
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.config['workers'], thread_name_prefix='webhook')
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def backoff_seconds(self, attempts: int, retry_after: Optional[float] = None) -> float:
+        ceiling = min(self.config['backoff_base_seconds'] * 2 ** max(attempts - 1, 0), self.config['backoff_max_seconds'])
+        delay = random.uniform(ceiling / 2, ceiling)
+        return max(delay, retry_after or 0.0)
+
+    # ---------- queue ----------
+    def claim(self, limit: int) -> list[WebhookEvent]:
+        if limit <= 0:
+            return []
+        now = timezone.now()
+        with transaction.atomic():
+            due = WebhookEvent.objects.filter(
+                Q(locked_until__isnull=True) | Q(locked_until__lte=now),
+                next_attempt_at__lte=now,
+            ).order_by('next_attempt_at')
+            saturated = [url for url, count in self._active.items() if count >= self.config['per_endpoint_concurrency']]
+            if saturated:
+                # 한도까지 보내는 중인 URL 의 이벤트는 가져가지 않음 (다른 상점 몫의 claim 을 차지하지 않도록)
+                due = due.exclude(shop__callback_url__in=saturated)
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True, of=('self',))
+            ids = list(due.values_list('pk', flat=True)[:limit])
+            if not ids:
+                return []
+            WebhookEvent.objects.filter(pk__in=ids).update(
+                locked_until=now + timedelta(seconds=self.config['lease_seconds'])
+            )
+        return list(WebhookEvent.objects.filter(pk__in=ids).select_related('shop').order_by('next_attempt_at', 'pk'))
+
+    def _batches(self, events: list[WebhookEvent]) -> list[list[WebhookEvent]]:
+        size = max(self.config['batch_max_events'], 1)
+        by_shop: dict[int, list[WebhookEvent]] = {}
+        for event in events:
+            by_shop.setdefault(event.shop_id, []).append(event)
+        return [group[i:i + size] for group in by_shop.values() for i in range(0, len(group), size)]
+
+    # ---------- delivery ----------
+    def _body(self, batch: list[WebhookEvent]) -> tuple[bytes, str]:
+        if self.config['batch_max_events'] <= 1:
+            return json.dumps(event_document(batch[0])).encode('utf-8'), batch[0].event_type
+        documents = [event_document(event) for event in batch]
+        return json.dumps({'events': documents}).encode('utf-8'), 'batch'
+
+    def post(self, shop: ShopProfile, batch: list[WebhookEvent]) -> _Attempt:
+        body, event_type = self._body(batch)
+        try:
+            addresses = resolve_callback_host(shop.callback_url, allow_private=self.config['allow_private_hosts'])
+        except UnsafeCallbackURL as exc:
+            return _Attempt(status=None, error=str(exc)[:500], retry_after=None, final=True)
+        except OSError as exc:
+            return _Attempt(status=None, error=f'DNS: {exc}'[:500], retry_after=None)
+        # 검사한 주소로 접속 (검사 뒤 DNS 응답이 바뀌어도 내부망으로 가지 않도록), Host/SNI 는 원래 이름
+        url = httpx.URL(shop.callback_url)
+        headers = {
+            'Content-Type': 'application/json',
+            'Host': url.netloc.decode('ascii'),
+            EVENT_HEADER: event_type,
+            # 서명 시각은 DNS 조회 뒤 보내기 직전 (수신 측 허용 오차를 대기 시간에 쓰지 않도록)
+            SIGNATURE_HEADER: sign(shop.webhook_secret, int(time.time()), body),
+        }
+        try:
+            response = self.client.post(
+                url.copy_with(host=addresses[0]),
+                content=body,
+                headers=headers,
+                extensions={'sni_hostname': url.host},
+            )
+        except httpx.HTTPError as exc:
+            return _Attempt(status=None, error=f'{exc.__class__.__name__}: {exc}'[:500], retry_after=None)
+        retry_after = None
+        if response.headers.get('Retry-After', '').isdigit():
+            retry_after = float(response.headers['Retry-After'])
+        error = '' if response.is_success else f'HTTP {response.status_code}'
+        return _Attempt(status=response.status_code, error=error, retry_after=retry_after)
+
+    def settle(self, batch: list[WebhookEvent], attempt: _Attempt, stats: DispatchStats):
+        stats.requests += 1
+        ids = [event.pk for event in batch]
+        if attempt.status is not None and 200 <= attempt.status < 300:
+            WebhookEvent.objects.filter(pk__in=ids).delete()
+            stats.delivered += len(batch)
+            return
+
+        retryable = not attempt.final and (
+            attempt.status is None or attempt.status >= 500 or attempt.status in _RETRYABLE_STATUS
+        )
+        now = timezone.now()
+        dead = []
+        for event in batch:
+            event.attempts += 1
+            if retryable and event.attempts < self.config['max_attempts']:
+                event.next_attempt_at = now + timedelta(seconds=self.backoff_seconds(event.attempts, attempt.retry_after))
+                event.locked_until = None
+                event.last_error = attempt.error
+                event.save(update_fields=['attempts', 'next_attempt_at', 'locked_until', 'last_error'])
+                stats.retried += 1
+            else:
+                dead.append(event)
+        if dead:
+            with transaction.atomic():
+                WebhookDeadLetter.objects.bulk_create([
+                    WebhookDeadLetter(
+                        shop_id=event.shop_id,
+                        event_type=event.event_type,
+                        payload=event.payload,
+                        callback_url=event.shop.callback_url,
+                        attempts=event.attempts,
+                        last_status=attempt.status,
+                        last_error=attempt.error,
+                        event_created_at=event.created_at,
+                    )
+                    for event in dead
+                ])
+                WebhookEvent.objects.filter(pk__in=[event.pk for event in dead]).delete()
+            stats.dead += len(dead)
+
+    def _submit(self, events: list[WebhookEvent], stats: DispatchStats) -> dict[Future, list[WebhookEvent]]:
+        futures = {}
+        deferred = []
+        for batch in self._batches(events):
+            shop = batch[0].shop
+            if not shop.is_active or not shop.callback_url:
+                # 콜백 URL 이 지워졌거나 비활성 상점 → 보낼 곳이 없으므로 폐기
+                WebhookEvent.objects.filter(pk__in=[event.pk for event in batch]).delete()
+                stats.dropped += len(batch)
+                continue
+            if self._active[shop.callback_url] >= self.config['per_endpoint_concurrency']:
+                # 풀 스레드에서 기다리지 않도록 한도를 넘는 묶음은 임대를 풀어 다음 claim 으로 미룸
+                deferred.extend(event.pk for event in batch)
+                stats.deferred += len(batch)
+                continue
+            self._active[shop.callback_url] += 1
+            futures[self.executor.submit(self.post, shop, batch)] = batch
+        if deferred:
+            WebhookEvent.objects.filter(pk__in=deferred).update(locked_until=None)
+        return futures
+
+    def _finish(self, batch: list[WebhookEvent], attempt: _Attempt, stats: DispatchStats):
+        url = batch[0].shop.callback_url
+        self._active[url] -= 1
+        if self._active[url] <= 0:
+            del self._active[url]
+        self.settle(batch, attempt, stats)
+
+    def run_once(self) -> DispatchStats:
+        """Claim one round of due events and wait until the ones sent are settled.
+
+        Batches over the per-endpoint limit are released for a later round (``stats.deferred``).
+        """
+
+        stats = DispatchStats()
+        events = self.claim(self.config['claim_size'])
+        for future, batch in self._submit(events, stats).items():
+            self._finish(batch, future.result(), stats)
+        return stats
+
+    def run_forever(self, stop: threading.Event, on_settled=None) -> DispatchStats:
+        """Keep up to ``workers`` requests in flight, claiming more as earlier ones finish."""
+
+        total = DispatchStats()
+        in_flight: dict[Future, list[WebhookEvent]] = {}
+        while not stop.is_set() or in_flight:
+            if not stop.is_set():
+                free = self.config['workers'] - len(in_flight)
+                claimed = self.claim(min(free * max(self.config['batch_max_events'], 1), self.config['claim_size']))
+                in_flight.update(self._submit(claimed, total))
+            if not in_flight:
+                stop.wait(self.config['poll_interval_seconds'])
+                continue
+            done, _ = wait(in_flight, timeout=self.config['poll_interval_seconds'], return_when=FIRST_COMPLETED)
+            for future in done:
+                round_stats = DispatchStats()
+                self._finish(in_flight.pop(future), future.result(), round_stats)
+                total.add(round_stats)
+                if on_settled:
+                    on_settled(round_stats)
+        return total
@@ -0,0 +1,55 @@
+# Gunicorn 설정 (Dockerfile CMD 에서 사용)
+# Cloud Run 은 PORT 환경변수로 포트를 전달
+
+import os
+import threading
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+# config/db.py 가 같은 환경변수로 워커당 DB 커넥션 수를 계산
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# uvicorn 워커(예: uvicorn_worker.UvicornWorker)는 ASGI 앱으로 실행 → SSE 진행 스트림 전용 서비스
+wsgi_app = 'config.asgi:application' if worker_class.startswith('uvicorn') else 'config.wsgi:application'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+
+# 마스터에서 Django 를 한 번만 로드하고 워커는 fork 로 공유 (콜드 스타트 단축)
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def pre_fork(server, worker):
+    # 마스터가 preload 중 DB 에 연결했다면 워커에 소켓이 공유되지 않도록 닫아 둠
+    if not preload_app:
+        return
+    from django.db import connections
+
+    for conn in connections.all(initialized_only=True):
+        conn.close()
+        if conn.alias in getattr(conn, '_connection_pools', {}):
+            conn.close_pool()
+
+
+def post_worker_init(worker):
+    # Gemini 클라이언트는 워커(pid)마다 새로 만들고 keep-alive 커넥션을 미리 연결
+    # 첫 요청을 막지 않도록 백그라운드에서 실행
+    from generations.services import GeminiAPIService
+
+    def warmup():
+        try:
+            opened = GeminiAPIService.warmup(connections=min(threads, 4))
+            worker.log.info('Gemini client warmed up (%s connection(s))', opened)
+        except Exception as exc:  # pylint: disable=broad-except
+            worker.log.warning('Gemini client warmup failed: %s', exc)
+
+    threading.Thread(target=warmup, name='gemini-warmup', daemon=True).start()
+
+    # 로컬 분류기 모델·지각 해시 인덱스도 첫 요청 전에 백그라운드에서 적재 (요청은 기다리지 않음)
+    from django.conf import settings
+
+    from generations.classifier import local_classifier
+    from generations.phash import phash_index
+
+    if settings.LOCAL_CLASSIFIER['enabled']:
+        local_classifier.start_reload()
+    if settings.LOCAL_CLASSIFIER['collect'] or settings.LOCAL_CLASSIFIER['enabled']:
+        phash_index.start_load()
@@ -6,6 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
+    if sys.argv[1:2] == ['test']:
+        # 테스트는 로컬 SQLite/캐시/임시 디렉터리 설정으로 (config/settings_test.py)
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings_test')
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
     try:
         from django.core.management import execute_from_command_line
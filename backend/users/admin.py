@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 from django.utils.translation import gettext_lazy as _
 
+from .admin_tools import BoundedChangeListMixin
 from .models import (
     CustomUser,
     UserProfile,
@@ -113,24 +114,47 @@ class ShopUsageAdmin(admin.ModelAdmin):
         'shop',
         'period_type',
         'period_start',
-        'used_requests',
+        'total_requests',
+        'total_tokens',
         'quota_snapshot',
         'updated_by',
-        'updated_at',
+        'last_updated_at',
     )
     list_filter = ('period_type', 'period_start')
     search_fields = ('shop__shop_name', 'shop__company_name', 'shop__shop_id')
 
+    def get_queryset(self, request):
+        # 사용량은 기간 행 + 샤드 행 합계
+        return ShopUsage.with_shard_totals(super().get_queryset(request))
+
+    @admin.display(description='Used requests', ordering='total_requests')
+    def total_requests(self, obj):
+        return obj.total_requests
+
+    @admin.display(description='Used tokens', ordering='total_tokens')
+    def total_tokens(self, obj):
+        return obj.total_tokens
+
+    @admin.display(description='Updated at', ordering='last_updated_at')
+    def last_updated_at(self, obj):
+        return obj.last_updated_at
+
 
 @admin.register(ServiceLog)
-class ServiceLogAdmin(admin.ModelAdmin):
+class ServiceLogAdmin(BoundedChangeListMixin, admin.ModelAdmin):
     list_display = ('timestamp', 'shop', 'requests_remaining', 'note')
-    search_fields = ('shop__shop_name', 'shop__company_name', 'shop__shop_id')
-    list_filter = ('timestamp',)
+    list_select_related = ('shop',)
+    raw_id_fields = ('shop',)
+    date_hierarchy = 'timestamp'
+    # exact matches only: substring search over millions of rows can't use an index
+    search_fields = ('=shop__shop_id',)
 
 
 @admin.register(ServiceErrorLog)
-class ServiceErrorLogAdmin(admin.ModelAdmin):
+class ServiceErrorLogAdmin(BoundedChangeListMixin, admin.ModelAdmin):
     list_display = ('timestamp', 'level', 'shop', 'err_from')
-    list_filter = ('level', 'timestamp')
-    search_fields = ('shop__shop_name', 'shop__company_name', 'err_from', 'message')
+    list_filter = ('level',)
+    list_select_related = ('shop',)
+    raw_id_fields = ('shop',)
+    date_hierarchy = 'timestamp'
+    search_fields = ('=shop__shop_id', '=err_from')
@@ -0,0 +1,125 @@
+"""Shared ModelAdmin helpers for very large log/request tables."""
+
+from datetime import timedelta
+
+from django.contrib.admin.views.main import ERROR_FLAG, IGNORED_PARAMS, PAGE_VAR, SEARCH_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from config.routers import use_replica
+
+
+class EstimatedCountPaginator(Paginator):
+    """Avoids ``COUNT(*)`` over the whole table.
+
+    With ``estimate`` (the changelist passes it when the user applied no filter or search; by
+    default, when the queryset has no WHERE clause) PostgreSQL tables use the planner's
+    ``reltuples`` estimate. Anything else is counted up to ``exact_limit + 1`` rows, so the count
+    query is bounded too; ``capped`` tells the template the real count may be larger.
+    """
+
+    exact_limit = 10000
+
+    def __init__(self, *args, estimate: bool | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        query = getattr(self.object_list, 'query', None)
+        self.estimate = (query is not None and not query.where) if estimate is None else estimate
+        self.estimated = False
+
+    def _reltuples(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return row and row[0]
+
+    @cached_property
+    def count(self):
+        if getattr(self.object_list, 'query', None) is None:
+            return super().count
+        if self.estimate:
+            estimate = self._reltuples()
+            if estimate and estimate > self.exact_limit:
+                self.estimated = True
+                return int(estimate)
+        return self.object_list[: self.exact_limit + 1].count()
+
+    @property
+    def capped(self) -> bool:
+        return not self.estimated and self.count > self.exact_limit
+
+
+ALL_VAR = 'all'
+
+
+class BoundedChangeList(ChangeList):
+    """ChangeList that keeps ``?all=1`` in its links but does not treat it as a field lookup."""
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(ALL_VAR, None)
+        return lookup_params
+
+
+class BoundedChangeListMixin:
+    """Large-table changelist defaults: estimated counts and a recent-rows window.
+
+    Unless the user drills into ``date_hierarchy`` (or passes ``?all=1``), the changelist only
+    shows rows from the last ``default_window_days`` days, which keeps the ordered scan on the
+    indexed date column short. GET requests read from the replica when one is configured.
+    """
+
+    paginator = EstimatedCountPaginator
+    change_list_template = 'admin/bounded_change_list.html'
+    show_full_result_count = False
+    list_per_page = 50
+    default_window_days = 7
+
+    def _bounded(self, request) -> bool:
+        field = self.date_hierarchy
+        if not field or request.GET.get(ALL_VAR) == '1':
+            return False
+        return not any(key.startswith(f'{field}__') for key in request.GET)
+
+    def _filtered(self, request) -> bool:
+        # 사용자가 고른 필터/검색/날짜만 (정렬, 페이지, all=1 과 기본 기간은 제외)
+        ignored = {*IGNORED_PARAMS, PAGE_VAR, ERROR_FLAG, ALL_VAR}
+        return bool(request.GET.get(SEARCH_VAR)) or any(key not in ignored for key in request.GET)
+
+    def changelist_view(self, request, extra_context=None):
+        request._bounded_changelist = self._bounded(request)
+        # 기간 안내는 메시지 대신 목록 위 안내문으로 (메시지는 요청마다 쌓임)
+        extra_context = {
+            **(extra_context or {}),
+            'bounded_window_days': self.default_window_days if request._bounded_changelist else None,
+        }
+        if request.method == 'GET':
+            # 조회만 하는 목록 화면은 레플리카에서 (일괄 작업 POST 는 primary)
+            with use_replica():
+                return super().changelist_view(request, extra_context=extra_context)
+        return super().changelist_view(request, extra_context=extra_context)
+
+    def get_changelist(self, request, **kwargs):
+        # all=1 은 request.GET 에 그대로 두어 페이지/정렬 링크와 preserved filters 에 유지
+        return BoundedChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        # 기본 기간 필터는 WHERE 를 붙이지만 사용자 필터가 없으면 추정치를 그대로 사용
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page, estimate=not self._filtered(request),
+        )
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if getattr(request, '_bounded_changelist', False):
+            since = timezone.now() - timedelta(days=self.default_window_days)
+            queryset = queryset.filter(**{f'{self.date_hierarchy}__gte': since})
+        return queryset
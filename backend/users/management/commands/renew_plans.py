@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.renewals import renew_due_plans
+
+
+class Command(BaseCommand):
+    help = 'Renew monthly quotas of every active shop whose plan_renews_at has passed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Shops per transaction.')
+        parser.add_argument('--max-chunks', type=int, default=None, help='Stop after this many chunks; rerun to resume.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be renewed.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            report = renew_due_plans(
+                chunk_size=options['chunk_size'],
+                max_chunks=options['max_chunks'],
+                dry_run=options['dry_run'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        if options['json']:
+            self.stdout.write(json.dumps(report.as_dict(), indent=2))
+            return
+
+        verb = 'Would renew' if report.dry_run else 'Renewed'
+        self.stdout.write(f'{verb} {report.renewed} shop(s) in {report.chunks} chunk(s) as of {report.now:%Y-%m-%d %H:%M}')
+        for tier, count in sorted(report.by_tier.items()):
+            self.stdout.write(f'  {tier:<12} {count}')
+        if report.oldest_due:
+            self.stdout.write(f'  oldest due: {report.oldest_due:%Y-%m-%d %H:%M}')
+        if not report.dry_run:
+            self.stdout.write(self.style.SUCCESS(
+                f'ShopUsage periods: {report.usage_created} created, {report.usage_reset} reset'
+            ))
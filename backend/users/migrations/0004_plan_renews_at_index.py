@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shopprofile',
+            name='plan_renews_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
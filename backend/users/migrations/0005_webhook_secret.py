@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:26
+
+import secrets
+
+from django.db import migrations, models
+
+
+def fill_webhook_secrets(apps, schema_editor):
+    ShopProfile = apps.get_model('users', 'ShopProfile')
+    for shop in ShopProfile.objects.filter(webhook_secret='').only('pk').iterator():
+        ShopProfile.objects.filter(pk=shop.pk).update(webhook_secret=secrets.token_hex(32))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_plan_renews_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shopprofile',
+            name='webhook_secret',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.RunPython(fill_webhook_secrets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_webhook_secret'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shopusage',
+            name='used_tokens',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_shopusage_used_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopUsageShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_type', models.CharField(choices=[('daily', 'Daily'), ('monthly', 'Monthly')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('used_requests', models.IntegerField(default=0)),
+                ('used_tokens', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_shards', to='users.shopprofile')),
+                ('updated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('shop', 'period_type', 'period_start', 'shard')},
+            },
+        ),
+    ]
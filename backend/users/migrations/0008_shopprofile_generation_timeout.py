@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_shopusageshard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shopprofile',
+            name='generation_timeout_ms',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
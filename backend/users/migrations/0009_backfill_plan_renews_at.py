@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:10
+
+from datetime import timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+# users.models.PLAN_RENEWAL_PERIOD (마이그레이션은 당시 값으로 고정)
+RENEWAL_PERIOD_DAYS = 30
+
+
+def backfill_plan_renews_at(apps, schema_editor):
+    # plan_renews_at 이 비어 있는 가게는 가입일 기준 주기의 다음 갱신일로 채움
+    ShopProfile = apps.get_model('users', 'ShopProfile')
+    now = timezone.now()
+    period = timedelta(days=RENEWAL_PERIOD_DAYS)
+    shops = []
+    rows = ShopProfile.objects.filter(plan_renews_at__isnull=True).only('pk', 'created_at')
+    for shop in rows.iterator(chunk_size=1000):
+        periods = max(0, (now - shop.created_at) // period) + 1
+        shop.plan_renews_at = shop.created_at + periods * period
+        shops.append(shop)
+        if len(shops) >= 1000:
+            ShopProfile.objects.bulk_update(shops, ['plan_renews_at'])
+            shops = []
+    ShopProfile.objects.bulk_update(shops, ['plan_renews_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_shopprofile_generation_timeout'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_plan_renews_at, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,17 @@
+import random
+import secrets
 from typing import Optional
 
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
+from django.core.cache import cache
 from django.core.validators import RegexValidator
 from django.utils import timezone
-from django.db.models import F
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest, Least
 
-from datetime import date
+from datetime import date, timedelta
 
 
 class PlanTier(models.TextChoices):
@@ -23,6 +28,16 @@ PLAN_TIER_QUOTAS = {
     PlanTier.ADMIN: 0,
 }
 
+# 토큰 예산 (0 = 제한 없음): monthly 는 플랜 주기당 과금 토큰, per_request 는 요청 1건의 추정 토큰 상한
+PLAN_TIER_TOKEN_BUDGETS = {
+    PlanTier.BASIC: {'monthly': 3_000_000, 'per_request': 8_000},
+    PlanTier.PRO: {'monthly': 20_000_000, 'per_request': 12_000},
+    PlanTier.ENTERPRISE: {'monthly': 70_000_000, 'per_request': 24_000},
+    PlanTier.ADMIN: {'monthly': 0, 'per_request': 0},
+}
+
+PLAN_RENEWAL_PERIOD = timedelta(days=30)
+
 
 PHONE_VALIDATOR = RegexValidator(
     regex=r'^010-?\d{4}-?\d{4}$',
@@ -54,7 +69,30 @@ class ShopRole(models.TextChoices):
     VIEWER = 'viewer', 'Viewer'
 
 
-class CustomUserManager(BaseUserManager):
+def generate_webhook_secret() -> str:
+    return secrets.token_hex(32)
+
+
+def membership_version_cache_key(user_id) -> str:
+    return f'users:membership-version:{user_id}'
+
+
+# 토큰 클레임(staff)·인증 가능 여부에 영향 → 바뀌면 membership_version 증가로 기존 토큰 무효화
+TOKEN_CLAIM_FIELDS = frozenset({'is_staff', 'is_superuser', 'is_active'})
+
+
+class CustomUserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        if not TOKEN_CLAIM_FIELDS.intersection(kwargs) or 'membership_version' in kwargs:
+            return super().update(**kwargs)
+        user_ids = list(self.values_list('pk', flat=True))
+        kwargs['membership_version'] = F('membership_version') + 1
+        rows = self.model.objects.filter(pk__in=user_ids).update(**kwargs)
+        cache.delete_many([membership_version_cache_key(uid) for uid in user_ids])
+        return rows
+
+
+class CustomUserManager(BaseUserManager.from_queryset(CustomUserQuerySet)):
     use_in_migrations = True
 
     def _create_user(self, email: str, password: Optional[str], **extra_fields):
@@ -93,6 +131,7 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     date_joined = models.DateTimeField(default=timezone.now)
+    membership_version = models.PositiveIntegerField(default=0)
 
     objects = CustomUserManager()
 
@@ -102,6 +141,28 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        claims_changed = False
+        update_fields = kwargs.get('update_fields')
+        if not self._state.adding and (update_fields is None or TOKEN_CLAIM_FIELDS.intersection(update_fields)):
+            previous = CustomUser.objects.filter(pk=self.pk).values('membership_version', *TOKEN_CLAIM_FIELDS).first()
+            if previous:
+                claims_changed = any(previous[name] != getattr(self, name) for name in TOKEN_CLAIM_FIELDS)
+                # 버전은 bump_membership_version(F 증가)로만 바뀜: 오래된 인스턴스 저장으로 되돌리지 않음
+                self.membership_version = previous['membership_version']
+        super().save(*args, **kwargs)
+        if claims_changed:
+            CustomUser.bump_membership_version([self.pk])
+
+    @classmethod
+    def bump_membership_version(cls, user_ids):
+        # 멤버십 변경 시 버전 증가 → 이전 멤버십 클레임을 가진 토큰 무효화
+        user_ids = [uid for uid in set(user_ids) if uid]
+        if not user_ids:
+            return
+        cls.objects.filter(pk__in=user_ids).update(membership_version=F('membership_version') + 1)
+        cache.delete_many([membership_version_cache_key(uid) for uid in user_ids])
+
 
 class UserProfile(models.Model):
     user = models.OneToOneField(
@@ -154,9 +215,12 @@ class ShopProfile(models.Model):
     )
     monthly_quota = models.PositiveIntegerField(default=PLAN_TIER_QUOTAS[PlanTier.BASIC])
     count = models.PositiveIntegerField(default=PLAN_TIER_QUOTAS[PlanTier.BASIC])
-    plan_renews_at = models.DateTimeField(null=True, blank=True)
+    plan_renews_at = models.DateTimeField(null=True, blank=True, db_index=True)
     callback_url = models.URLField(blank=True)
+    webhook_secret = models.CharField(max_length=64, blank=True)
     product_feed_url = models.URLField(blank=True)
+    # 생성 요청 기한 기본값 (X-Deadline-Ms 헤더가 없을 때), 비우면 GENERATION_DEADLINE_MS
+    generation_timeout_ms = models.PositiveIntegerField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -176,9 +240,15 @@ class ShopProfile(models.Model):
             self.business_registration_number = self.business_registration_number.replace('-', '').strip()
         if self.contact_phone:
             self.contact_phone = self.contact_phone.replace('-', '').strip()
+        if not self.webhook_secret:
+            self.webhook_secret = generate_webhook_secret()
+        active_changed = False
+        tier_changed = False
         if not creating:
-            previous = ShopProfile.objects.filter(pk=self.pk).values('tier').first()
+            previous = ShopProfile.objects.filter(pk=self.pk).values('tier', 'is_active').first()
+            active_changed = bool(previous) and previous['is_active'] != self.is_active
             if previous and previous['tier'] != self.tier:
+                tier_changed = True
                 tier_quota = _default_plan_quota(self.tier)
                 self.monthly_quota = tier_quota
                 self.count = min(self.count, tier_quota)
@@ -186,6 +256,9 @@ class ShopProfile(models.Model):
             self.monthly_quota = tier_quota
         if self.count is None:
             self.count = tier_quota
+        if creating and self.plan_renews_at is None:
+            # 갱신 주기는 가입 시점 기준
+            self.plan_renews_at = timezone.now() + PLAN_RENEWAL_PERIOD
         super().save(*args, **kwargs)
         if creating:
             ShopMembership.objects.get_or_create(
@@ -193,32 +266,62 @@ class ShopProfile(models.Model):
                 user=self.owner,
                 defaults={'role': ShopRole.OWNER, 'is_active': True}
             )
+        if active_changed:
+            CustomUser.bump_membership_version(self.memberships.values_list('user_id', flat=True))
+        if tier_changed:
+            # 사용량 기록은 샤드 행에만 쌓이므로 현재 기간의 쿼터 스냅샷은 여기서 갱신
+            ShopUsage._current(self, UsagePeriod.MONTHLY).update(quota_snapshot=self.monthly_quota)
+
+    def delete(self, *args, **kwargs):
+        member_ids = list(self.memberships.values_list('user_id', flat=True))
+        result = super().delete(*args, **kwargs)
+        CustomUser.bump_membership_version(member_ids)
+        return result
 
     def refresh_quota(self, quota: Optional[int] = None, actor: Optional['CustomUser'] = None):
         target_quota = quota or _default_plan_quota(self.tier)
         self.monthly_quota = target_quota
         self.count = target_quota
-        self.plan_renews_at = timezone.now() + timezone.timedelta(days=30)
+        self.plan_renews_at = timezone.now() + PLAN_RENEWAL_PERIOD
         self.save(update_fields=['monthly_quota', 'count', 'plan_renews_at'])
         ShopUsage.reset_current_period(shop=self, actor=actor)
 
-    def decrement_quota(self, amount: int = 1, actor: Optional['CustomUser'] = None):
+    def decrement_quota(self, amount: int = 1, actor: Optional['CustomUser'] = None) -> bool:
+        """Take ``amount`` from ``count`` if that much is left; False (nothing taken) otherwise.
+
+        One conditional UPDATE, so concurrent requests neither overwrite each other's decrement
+        nor take the last unit twice. On success ``count`` is lowered locally by ``amount`` (other
+        requests' changes show up on the next load); it is reloaded only when nothing was taken.
+        """
+
         if amount < 0:
             raise ValueError('Amount must be positive')
+        taken = ShopProfile.objects.filter(pk=self.pk, count__gte=amount).update(count=F('count') - amount)
+        if not taken:
+            self.refresh_from_db(fields=['count'])
+            return False
         self.count = max(self.count - amount, 0)
-        self.save(update_fields=['count'])
         ShopUsage.record_usage(shop=self, amount=amount, actor=actor)
-        return self.count
+        return True
 
     @property
     def has_quota(self) -> bool:
         return self.count > 0
 
+    @property
+    def token_budget(self) -> dict:
+        try:
+            return PLAN_TIER_TOKEN_BUDGETS[PlanTier(self.tier)]
+        except ValueError:
+            return PLAN_TIER_TOKEN_BUDGETS[PlanTier.BASIC]
+
     def increment_quota(self, amount: int = 1, actor: Optional['CustomUser'] = None):
         if amount < 0:
             raise ValueError('Amount must be positive')
+        # 읽고 쓰지 않고 DB 에서 더함 (동시 환불·차감이 서로 덮어쓰지 않음)
+        ShopProfile.objects.filter(pk=self.pk).update(count=Least(F('count') + amount, F('monthly_quota')))
+        # 다시 읽지 않고 같은 식으로 계산
         self.count = min(self.count + amount, self.monthly_quota)
-        self.save(update_fields=['count'])
         ShopUsage.record_usage(shop=self, amount=-amount, actor=actor)
         return self.count
 
@@ -249,9 +352,19 @@ class ShopMembership(models.Model):
     def __str__(self):
         return f'{self.user.email} → {self.shop.shop_name} ({self.role})'
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        CustomUser.bump_membership_version([self.user_id])
+
+    def delete(self, *args, **kwargs):
+        user_id = self.user_id
+        result = super().delete(*args, **kwargs)
+        CustomUser.bump_membership_version([user_id])
+        return result
+
 
 class ServiceErrorLog(models.Model):
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
     level = models.CharField(max_length=10, choices=ErrorLevel.choices, default=ErrorLevel.WARN)
     shop = models.ForeignKey(
         ShopProfile,
@@ -268,7 +381,7 @@ class ServiceErrorLog(models.Model):
 
 
 class ServiceLog(models.Model):
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
     shop = models.ForeignKey(
         ShopProfile,
         on_delete=models.CASCADE,
@@ -299,6 +412,8 @@ class ShopUsage(models.Model):
     )
     period_start = models.DateField()
     used_requests = models.IntegerField(default=0)
+    # 과금 토큰 원장 (컨텍스트 캐시 토큰은 cached_token_rate 로 할인 적용)
+    used_tokens = models.PositiveBigIntegerField(default=0)
     quota_snapshot = models.PositiveIntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -324,6 +439,38 @@ class ShopUsage(models.Model):
             return today.replace(day=1)
         return today
 
+    @classmethod
+    def _current(cls, shop: ShopProfile, period_type: str) -> models.QuerySet:
+        return cls.objects.filter(shop=shop, period_type=period_type, period_start=cls._period_start(period_type))
+
+    @classmethod
+    def with_shard_totals(cls, queryset: Optional[models.QuerySet] = None) -> models.QuerySet:
+        """Annotate ``total_requests`` / ``total_tokens`` (row + shards), ``last_updated_at`` and ``last_updated_by_id``."""
+
+        queryset = cls.objects.all() if queryset is None else queryset
+        shards = ShopUsageShard.objects.filter(
+            shop_id=OuterRef('shop_id'),
+            period_type=OuterRef('period_type'),
+            period_start=OuterRef('period_start'),
+        )
+
+        def shard_sum(field: str):
+            total = shards.order_by().values('shop_id').annotate(total=Sum(field)).values('total')
+            return Coalesce(Subquery(total, output_field=models.BigIntegerField()), 0)
+
+        latest = shards.order_by('-updated_at')
+        return queryset.annotate(
+            total_requests=F('used_requests') + shard_sum('used_requests'),
+            total_tokens=F('used_tokens') + shard_sum('used_tokens'),
+            last_updated_at=Greatest(
+                'updated_at',
+                Coalesce(Subquery(latest.values('updated_at')[:1]), 'updated_at'),
+            ),
+            last_updated_by_id=Coalesce(
+                Subquery(latest.values('updated_by_id')[:1]), 'updated_by_id', output_field=models.BigIntegerField(),
+            ),
+        )
+
     @classmethod
     def record_usage(
         cls,
@@ -332,26 +479,11 @@ class ShopUsage(models.Model):
         amount: int,
         actor: Optional[CustomUser] = None,
         period_type: str = UsagePeriod.MONTHLY,
-    ) -> 'ShopUsage':
+    ) -> None:
         if amount == 0:
-            return cls.reset_current_period(shop=shop, actor=actor, period_type=period_type)
-
-        period_start = cls._period_start(period_type)
-        usage, created = cls.objects.get_or_create(
-            shop=shop,
-            period_type=period_type,
-            period_start=period_start,
-            defaults={'quota_snapshot': shop.monthly_quota, 'updated_by': actor},
-        )
-        update_fields = ['used_requests', 'quota_snapshot', 'updated_at']
-        usage.used_requests = F('used_requests') + amount
-        usage.quota_snapshot = shop.monthly_quota
-        if actor and usage.updated_by_id != actor.id:
-            usage.updated_by = actor
-            update_fields.append('updated_by')
-        usage.save(update_fields=update_fields)
-        usage.refresh_from_db()
-        return usage
+            cls.reset_current_period(shop=shop, actor=actor, period_type=period_type)
+            return
+        ShopUsageShard.add(shop=shop, period_type=period_type, requests=amount, actor=actor)
 
     @classmethod
     def reset_current_period(
@@ -369,8 +501,97 @@ class ShopUsage(models.Model):
             defaults={'quota_snapshot': shop.monthly_quota, 'updated_by': actor},
         )
         usage.used_requests = 0
+        usage.used_tokens = 0
         usage.quota_snapshot = shop.monthly_quota
         if actor:
             usage.updated_by = actor
         usage.save()
+        ShopUsageShard.objects.filter(shop=shop, period_type=period_type, period_start=period_start).delete()
         return usage
+
+    @classmethod
+    def record_tokens(
+        cls,
+        *,
+        shop: ShopProfile,
+        tokens: int,
+        period_type: str = UsagePeriod.MONTHLY,
+    ) -> None:
+        if tokens <= 0:
+            return
+        ShopUsageShard.add(shop=shop, period_type=period_type, tokens=tokens)
+
+    @classmethod
+    def tokens_used(cls, shop: ShopProfile, period_type: str = UsagePeriod.MONTHLY) -> int:
+        return cls.with_shard_totals(cls._current(shop, period_type)).values_list('total_tokens', flat=True).first() or 0
+
+
+class ShopUsageShard(models.Model):
+    """Counter increments of one ``ShopUsage`` period, spread over ``USAGE_SHARDS`` rows.
+
+    Every generate and refund adds to a random shard instead of the period row, so concurrent
+    requests of one shop rarely wait on the same row lock. Totals are the period row's own
+    counters (what renewals/resets write) plus the sum of its shards
+    (``ShopUsage.with_shard_totals``).
+    """
+
+    shop = models.ForeignKey(
+        ShopProfile,
+        on_delete=models.CASCADE,
+        related_name='usage_shards'
+    )
+    period_type = models.CharField(max_length=10, choices=UsagePeriod.choices)
+    period_start = models.DateField()
+    shard = models.PositiveSmallIntegerField()
+    # 환불(-1)이 다른 샤드로 갈 수 있으므로 샤드 값은 음수일 수 있음
+    used_requests = models.IntegerField(default=0)
+    used_tokens = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    updated_by = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+
+    class Meta:
+        unique_together = ('shop', 'period_type', 'period_start', 'shard')
+
+    def __str__(self):
+        return f'{self.shop_id} {self.period_type} {self.period_start} #{self.shard}: {self.used_requests}'
+
+    @classmethod
+    def add(
+        cls,
+        *,
+        shop: ShopProfile,
+        period_type: str,
+        requests: int = 0,
+        tokens: int = 0,
+        actor: Optional[CustomUser] = None,
+        shard: Optional[int] = None,
+    ) -> None:
+        period_start = ShopUsage._period_start(period_type)
+        if shard is None:
+            shard = random.randrange(max(settings.USAGE_SHARDS, 1))
+        changes = {'updated_at': timezone.now()}
+        if requests:
+            changes['used_requests'] = F('used_requests') + requests
+        if tokens:
+            changes['used_tokens'] = F('used_tokens') + tokens
+        if actor is not None:
+            changes['updated_by'] = actor
+        rows = cls.objects.filter(shop=shop, period_type=period_type, period_start=period_start, shard=shard)
+        # 대부분 샤드 행이 이미 있으므로 UPDATE 한 번 (조회/refresh 없음)
+        if rows.update(**changes):
+            return
+        # 기간의 첫 기록: 기간 행과 샤드 행을 만든 뒤 다시 UPDATE (동시 생성은 get_or_create 가 흡수)
+        ShopUsage.objects.get_or_create(
+            shop=shop,
+            period_type=period_type,
+            period_start=period_start,
+            defaults={'quota_snapshot': shop.monthly_quota, 'updated_by': actor},
+        )
+        cls.objects.get_or_create(shop=shop, period_type=period_type, period_start=period_start, shard=shard)
+        rows.update(**changes)
@@ -0,0 +1,161 @@
+"""Set-based monthly plan renewal driven by ``ShopProfile.plan_renews_at``.
+
+Due shops are processed in chunks of ``chunk_size`` primary keys. Each chunk is one
+transaction: per-tier ``UPDATE``s reset ``monthly_quota``/``count`` and push
+``plan_renews_at`` forward by one period (a late run keeps the shop's billing day; a shop
+more than a period behind starts a new cycle from ``now``), then the monthly ``ShopUsage`` rows are reset (and their
+``ShopUsageShard`` rows deleted) or created with ``bulk_create``. Every statement re-checks
+``plan_renews_at <= now``, so an interrupted run can simply be started again — renewed shops
+are no longer due and are never renewed twice.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import (
+    PLAN_RENEWAL_PERIOD,
+    ServiceLog,
+    ShopProfile,
+    ShopUsage,
+    ShopUsageShard,
+    UsagePeriod,
+    _default_plan_quota,
+)
+
+
+@dataclass
+class RenewalReport:
+    now: datetime
+    dry_run: bool
+    renewed: int = 0
+    chunks: int = 0
+    by_tier: dict[str, int] = field(default_factory=dict)
+    usage_created: int = 0
+    usage_reset: int = 0
+    oldest_due: Optional[datetime] = None
+
+    def as_dict(self) -> dict:
+        return {
+            'now': self.now.isoformat(),
+            'dry_run': self.dry_run,
+            'renewed': self.renewed,
+            'chunks': self.chunks,
+            'by_tier': self.by_tier,
+            'usage_created': self.usage_created,
+            'usage_reset': self.usage_reset,
+            'oldest_due': self.oldest_due.isoformat() if self.oldest_due else None,
+        }
+
+
+def due_shops(now: datetime):
+    return ShopProfile.objects.filter(is_active=True, plan_renews_at__lte=now)
+
+
+def _renew_chunk(now: datetime, chunk_size: int, report: RenewalReport) -> int:
+    period_start = ShopUsage._period_start(UsagePeriod.MONTHLY)
+    with transaction.atomic():
+        due = due_shops(now).order_by('plan_renews_at', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            # 동시에 도는 다른 작업자와 같은 행을 잡지 않도록
+            due = due.select_for_update(skip_locked=True)
+        rows = list(due.values_list('pk', 'tier')[:chunk_size])
+        if not rows:
+            return 0
+
+        shop_ids_by_tier: dict[str, list[int]] = {}
+        for pk, tier in rows:
+            shop_ids_by_tier.setdefault(tier, []).append(pk)
+
+        renewed = 0
+        usages = []
+        logs = []
+        for tier, shop_ids in shop_ids_by_tier.items():
+            quota = _default_plan_quota(tier)
+            updated = due_shops(now).filter(pk__in=shop_ids, tier=tier).update(
+                monthly_quota=quota,
+                count=quota,
+                plan_renews_at=F('plan_renews_at') + PLAN_RENEWAL_PERIOD,
+                updated_at=now,
+            )
+            renewed += updated
+            report.by_tier[tier] = report.by_tier.get(tier, 0) + updated
+
+            report.usage_reset += ShopUsage.objects.filter(
+                shop_id__in=shop_ids,
+                period_type=UsagePeriod.MONTHLY,
+                period_start=period_start,
+            ).update(used_requests=0, used_tokens=0, quota_snapshot=quota, updated_at=now)
+            ShopUsageShard.objects.filter(
+                shop_id__in=shop_ids,
+                period_type=UsagePeriod.MONTHLY,
+                period_start=period_start,
+            ).delete()
+            usages.extend(
+                ShopUsage(
+                    shop_id=pk,
+                    period_type=UsagePeriod.MONTHLY,
+                    period_start=period_start,
+                    used_requests=0,
+                    quota_snapshot=quota,
+                )
+                for pk in shop_ids
+            )
+            logs.extend(
+                ServiceLog(shop_id=pk, requests_remaining=quota, note='plan renewed')
+                for pk in shop_ids
+            )
+
+        # 한 주기 넘게 밀린 가게(비활성 기간 등)는 지금부터 새 주기: 같은 실행에서 두 번 갱신되지 않도록
+        ShopProfile.objects.filter(pk__in=[pk for pk, _ in rows], plan_renews_at__lte=now).update(
+            plan_renews_at=now + PLAN_RENEWAL_PERIOD,
+        )
+
+        existing = set(
+            ShopUsage.objects.filter(
+                shop_id__in=[pk for pk, _ in rows],
+                period_type=UsagePeriod.MONTHLY,
+                period_start=period_start,
+            ).values_list('shop_id', flat=True)
+        )
+        created = ShopUsage.objects.bulk_create(
+            [usage for usage in usages if usage.shop_id not in existing],
+            ignore_conflicts=True,
+        )
+        report.usage_created += len(created)
+        ServiceLog.objects.bulk_create(logs)
+    report.chunks += 1
+    report.renewed += renewed
+    return len(rows)
+
+
+def renew_due_plans(
+    *,
+    now: Optional[datetime] = None,
+    chunk_size: int = 500,
+    max_chunks: Optional[int] = None,
+    dry_run: bool = False,
+) -> RenewalReport:
+    """Renew every active shop whose ``plan_renews_at`` has passed."""
+
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be positive')
+    now = now or timezone.now()
+    report = RenewalReport(now=now, dry_run=dry_run)
+    report.oldest_due = due_shops(now).order_by('plan_renews_at').values_list('plan_renews_at', flat=True).first()
+
+    if dry_run:
+        tiers = due_shops(now).order_by().values('tier').annotate(total=Count('pk'))
+        report.by_tier = {row['tier']: row['total'] for row in tiers}
+        report.renewed = sum(report.by_tier.values())
+        report.chunks = -(-report.renewed // chunk_size)
+        return report
+
+    while max_chunks is None or report.chunks < max_chunks:
+        if not _renew_chunk(now, chunk_size, report):
+            break
+    return report
@@ -1,10 +1,13 @@
 from typing import Any
 
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
 
+from generations.webhooks import UnsafeCallbackURL, check_callback_url
+
 from .models import (
     CustomUser,
     ShopMembership,
@@ -32,6 +35,14 @@ class UserRequestSerializer(serializers.Serializer):
             )
         return value
 
+class UserOutfitRequestSerializer(UserRequestSerializer):
+    product_image = None
+    product_images = serializers.ListField(
+        child=serializers.ImageField(),
+        min_length=2,
+        max_length=settings.OUTFIT_MAX_PRODUCTS,
+    )
+
 class UserRegisterationSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True, style={'input_type': 'password'})
@@ -135,7 +146,11 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class ShopUsageSerializer(serializers.ModelSerializer):
-    updated_by = serializers.PrimaryKeyRelatedField(read_only=True)
+    # ShopUsage.with_shard_totals() 로 조회한 행 (행 + 샤드 합계)
+    used_requests = serializers.IntegerField(source='total_requests', read_only=True)
+    used_tokens = serializers.IntegerField(source='total_tokens', read_only=True)
+    updated_at = serializers.DateTimeField(source='last_updated_at', read_only=True)
+    updated_by = serializers.IntegerField(source='last_updated_by_id', read_only=True)
 
     class Meta:
         model = ShopUsage
@@ -144,6 +159,7 @@ class ShopUsageSerializer(serializers.ModelSerializer):
             'period_type',
             'period_start',
             'used_requests',
+            'used_tokens',
             'quota_snapshot',
             'updated_at',
             'updated_by',
@@ -182,7 +198,9 @@ class ShopProfileSerializer(serializers.ModelSerializer):
             'count',
             'plan_renews_at',
             'callback_url',
+            'webhook_secret',
             'product_feed_url',
+            'generation_timeout_ms',
             'is_active',
             'created_at',
             'updated_at',
@@ -192,6 +210,7 @@ class ShopProfileSerializer(serializers.ModelSerializer):
             'monthly_quota',
             'count',
             'plan_renews_at',
+            'webhook_secret',
             'is_active',
             'created_at',
             'updated_at',
@@ -200,17 +219,45 @@ class ShopProfileSerializer(serializers.ModelSerializer):
             'company_name': {'required': True},
             'business_registration_number': {'required': True},
             'contact_phone': {'required': True},
+            # 요청 시에는 GENERATION_DEADLINE_MAX_MS 로 다시 제한
+            'generation_timeout_ms': {'min_value': 1000},
         }
 
     def get_tier_display(self, obj: ShopProfile) -> str:
         return obj.get_tier_display()
 
+    def to_representation(self, instance: ShopProfile) -> dict[str, Any]:
+        data = super().to_representation(instance)
+        if not self._can_manage(instance):
+            # 웹훅 서명 키는 OWNER/MANAGER 에게만
+            data.pop('webhook_secret', None)
+        return data
+
+    def _can_manage(self, shop: ShopProfile) -> bool:
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return False
+        if shop.owner_id == user.pk:
+            return True
+        managers = (ShopRole.OWNER, ShopRole.MANAGER)
+        roles = getattr(user, 'shop_roles', None)
+        if roles is not None:
+            return roles.get(shop.shop_id) in managers
+        # 목록 응답이면 상점마다 조회하지 않도록 한 번만 읽어 둠
+        if '_managed_shop_ids' not in self.context:
+            self.context['_managed_shop_ids'] = set(
+                ShopMembership.objects.filter(user=user, is_active=True, role__in=managers)
+                .values_list('shop__shop_id', flat=True)
+            )
+        return shop.shop_id in self.context['_managed_shop_ids']
+
     def get_current_month_usage(self, obj: ShopProfile) -> dict:
         period_start = timezone.now().date().replace(day=1)
-        usage = obj.usage_records.filter(
+        usage = ShopUsage.with_shard_totals(obj.usage_records.filter(
             period_type=UsagePeriod.MONTHLY,
             period_start=period_start,
-        ).first()
+        )).first()
         if not usage:
             return {
                 'used_requests': 0,
@@ -218,10 +265,10 @@ class ShopProfileSerializer(serializers.ModelSerializer):
                 'period_start': period_start,
             }
         return {
-            'used_requests': usage.used_requests,
+            'used_requests': usage.total_requests,
             'quota_snapshot': usage.quota_snapshot,
             'period_start': usage.period_start,
-            'updated_at': usage.updated_at,
+            'updated_at': usage.last_updated_at,
         }
 
     def create(self, validated_data: dict[str, Any]) -> ShopProfile:
@@ -270,3 +317,12 @@ class ShopProfileSerializer(serializers.ModelSerializer):
         clean = (value or '').strip()
         BUSINESS_PHONE_VALIDATOR(clean)
         return clean.replace('-', '')
+
+    def validate_callback_url(self, value: str) -> str:
+        # 서버가 POST 하는 주소이므로 내부망(사설/루프백/링크로컬)은 거부
+        if value:
+            try:
+                check_callback_url(value)
+            except UnsafeCallbackURL as exc:
+                raise serializers.ValidationError(str(exc))
+        return value
@@ -0,0 +1,64 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from generations.tests.utils import copy_to_replica, create_user
+from users.admin_tools import EstimatedCountPaginator
+from users.models import ServiceErrorLog
+
+
+class BoundedChangeListTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.client.force_login(create_user(is_staff=True, is_superuser=True))
+        self.url = reverse('admin:users_serviceerrorlog_changelist')
+        self.recent = ServiceErrorLog.objects.create(err_from='recent')
+        self.old = ServiceErrorLog.objects.create(err_from='old')
+        ServiceErrorLog.objects.filter(pk=self.old.pk).update(timestamp=timezone.now() - timedelta(days=30))
+        # 목록 화면은 레플리카에서 읽음
+        copy_to_replica(*ServiceErrorLog.objects.all())
+
+    def _rows(self, response) -> set[str]:
+        return {row.err_from for row in response.context['cl'].result_list}
+
+    def test_default_window_hides_old_rows(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._rows(response), {'recent'})
+
+    def test_all_is_kept_in_links(self):
+        response = self.client.get(self.url, {'all': '1', 'level': 'warn'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._rows(response), {'recent', 'old'})
+        cl = response.context['cl']
+        self.assertIn('all=1', cl.get_query_string({'p': 1}))
+        self.assertIn('all=1', cl.get_query_string({'o': '1'}))
+        self.assertIn('all%3D1', response.context['preserved_filters'])
+
+    def test_window_note_does_not_pile_up_messages(self):
+        for _ in range(2):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Showing the last 7 days.', count=1)
+        self.assertEqual(list(response.context['messages']), [])
+        self.assertNotContains(self.client.get(self.url, {'all': '1'}), 'Showing the last 7 days.')
+
+    def test_estimate_is_used_without_user_filters(self):
+        with mock.patch.object(EstimatedCountPaginator, '_reltuples', return_value=50000) as reltuples:
+            # 기본 기간 필터(WHERE) 가 있어도 추정치 사용
+            response = self.client.get(self.url)
+            self.assertEqual(response.context['cl'].result_count, 50000)
+            self.assertContains(response, 'About 50000 rows')
+            response = self.client.get(self.url, {'level': 'warn'})
+            self.assertEqual(reltuples.call_count, 1)
+        self.assertFalse(response.context['cl'].paginator.estimated)
+
+    def test_capped_count_shows_a_notice(self):
+        with mock.patch.object(EstimatedCountPaginator, 'exact_limit', 1):
+            response = self.client.get(self.url, {'all': '1'})
+            self.assertTrue(response.context['cl'].paginator.capped)
+        self.assertContains(response, 'Showing the first 1 matching rows.')
+        self.assertNotContains(self.client.get(self.url), 'matching rows')
@@ -0,0 +1,101 @@
+import os
+import runpy
+from unittest import mock
+
+import environ
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import SimpleTestCase
+
+from config.db import ConnectionStats, configure_database, connection_stats, connections_per_worker
+
+POSTGRES = 'django.db.backends.postgresql'
+
+
+class ConnectionsPerWorkerTests(SimpleTestCase):
+    def test_threads_or_serialized_async(self):
+        self.assertEqual(connections_per_worker(workers=2, threads=8, worker_class='gthread'), 8)
+        self.assertEqual(connections_per_worker(workers=2, threads=0, worker_class='sync'), 1)
+        # uvicorn 워커의 ORM 호출은 한 스레드에서 직렬 실행
+        self.assertEqual(connections_per_worker(workers=2, threads=8, worker_class='uvicorn_worker.UvicornWorker'), 2)
+
+    def test_budget_is_shared_between_workers(self):
+        self.assertEqual(connections_per_worker(workers=4, threads=8, worker_class='gthread', budget=20), 5)
+        self.assertEqual(connections_per_worker(workers=4, threads=2, worker_class='gthread', budget=20), 2)
+        self.assertEqual(connections_per_worker(workers=8, threads=4, worker_class='gthread', budget=4), 1)
+        self.assertEqual(connections_per_worker(workers=0, threads=4, worker_class='gthread', budget=3), 3)
+
+
+class ConfigureDatabaseTests(SimpleTestCase):
+    def _configure(self, engine: str = POSTGRES, **environment) -> dict:
+        with mock.patch.dict(os.environ, environment):
+            return configure_database({'ENGINE': engine}, environ.Env())
+
+    def test_pool_sized_per_worker(self):
+        database = self._configure(
+            DB_POOL='true', WEB_CONCURRENCY='4', GUNICORN_THREADS='8', DB_MAX_CONNECTIONS='24',
+        )
+        pool = database['OPTIONS']['pool']
+        self.assertEqual((pool['min_size'], pool['max_size']), (2, 6))
+        # 풀을 쓰면 요청마다 반납 → 지속 커넥션은 끔
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertNotIn('CONN_HEALTH_CHECKS', database)
+        self.assertEqual(database['OPTIONS']['connect_timeout'], 5)
+
+    def test_persistent_connections_with_health_checks(self):
+        database = self._configure(DB_POOL='false', CONN_MAX_AGE='120')
+        self.assertEqual((database['CONN_MAX_AGE'], database['CONN_HEALTH_CHECKS']), (120, True))
+        self.assertNotIn('pool', database['OPTIONS'])
+
+    def test_other_engines_only_get_conn_max_age(self):
+        database = self._configure('django.db.backends.sqlite3', DB_POOL='true')
+        self.assertEqual(database, {'ENGINE': 'django.db.backends.sqlite3', 'CONN_MAX_AGE': 0})
+
+
+class ConnectionStatsTests(SimpleTestCase):
+    def test_counts_connections_and_requests_from_signals(self):
+        before = connection_stats.snapshot()
+        connection_created.send(sender=type(connection), connection=connection)
+        for _ in range(3):
+            request_finished.send(sender=None)
+        after = connection_stats.snapshot()
+        self.assertEqual(after['connections_opened'] - before['connections_opened'], 1)
+        self.assertEqual(after['requests'] - before['requests'], 3)
+        self.assertEqual(after['vendor'], 'sqlite')
+
+    def test_requests_per_connection_and_pool_stats(self):
+        stats = ConnectionStats()
+        self.assertIsNone(stats.snapshot()['requests_per_connection'])
+        stats.connections_opened, stats.requests = 2, 9
+        pool = mock.Mock(get_stats=mock.Mock(return_value={
+            'pool_max': 4, 'pool_size': 4, 'pool_available': 1, 'requests_num': 10, 'requests_wait_ms': 25,
+        }))
+        wrapper = mock.Mock(vendor='postgresql', settings_dict={'CONN_MAX_AGE': 0}, pool=pool)
+        with mock.patch('config.db.connections', {'default': wrapper}):
+            snapshot = stats.snapshot()
+        self.assertEqual(snapshot['requests_per_connection'], 4.5)
+        self.assertEqual(
+            {name: snapshot['pool'][name] for name in ('in_use', 'utilization', 'avg_wait_ms', 'waiting_now')},
+            {'in_use': 3, 'utilization': 0.75, 'avg_wait_ms': 2.5, 'waiting_now': 0},
+        )
+
+
+class PreForkTests(SimpleTestCase):
+    def _conn(self, alias: str, pooled: bool):
+        conn = mock.Mock(alias=alias)
+        conn._connection_pools = {alias: object()} if pooled else {}
+        return conn
+
+    def test_master_connections_and_pools_are_closed_before_fork(self):
+        pooled, plain = self._conn('default', True), self._conn('replica', False)
+        with mock.patch.dict(os.environ, {'GUNICORN_PRELOAD': '1'}):
+            config = runpy.run_path(os.path.join(settings.BASE_DIR, 'gunicorn.conf.py'))
+        with mock.patch('django.db.connections.all', return_value=[pooled, plain]) as all_connections:
+            config['pre_fork'](server=None, worker=None)
+        all_connections.assert_called_once_with(initialized_only=True)
+        pooled.close.assert_called_once_with()
+        pooled.close_pool.assert_called_once_with()
+        plain.close.assert_called_once_with()
+        plain.close_pool.assert_not_called()
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from config.profiling import CAPTURE_FILES, RequestProfilingMiddleware, profile_store
+from generations.tests.utils import create_user
+from users.tokens import MembershipTokenObtainPairSerializer
+
+PROFILE_ID = 'X-Profile-Id'
+
+
+def _bearer(user) -> str:
+    return f'Bearer {MembershipTokenObtainPairSerializer.get_token(user).access_token}'
+
+
+class ProfilingDisabledTests(TestCase):
+    def test_middleware_drops_out(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestProfilingMiddleware(lambda request: None)
+        self.assertFalse(self.client.get('/', HTTP_X_PROFILE='1').has_header(PROFILE_ID))
+
+
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        override = override_settings(REQUEST_PROFILING={
+            **settings.REQUEST_PROFILING, 'enabled': True, 'sample_rate': 0.0, 'dir': directory, 'max_captures': 2,
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+        self.directory = directory
+        self.staff = create_user(is_staff=True)
+        self.member = create_user()
+
+    def _files(self) -> list[str]:
+        return sorted(os.listdir(self.directory))
+
+
+class RequestProfilingMiddlewareTests(ProfilingTestCase):
+    def test_only_staff_with_the_header_are_captured(self):
+        self.assertFalse(self.client.get('/', HTTP_X_PROFILE='1').has_header(PROFILE_ID))
+        self.assertFalse(self.client.get('/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=_bearer(self.member)).has_header(PROFILE_ID))
+        self.assertFalse(self.client.get('/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION='Bearer not-a-token').has_header(PROFILE_ID))
+        self.assertFalse(self.client.get('/', HTTP_AUTHORIZATION=_bearer(self.staff)).has_header(PROFILE_ID))
+        self.assertEqual(self._files(), [])
+
+        response = self.client.get('/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=_bearer(self.staff))
+        capture_id = response[PROFILE_ID]
+        self.assertEqual(self._files(), sorted(f'{capture_id}.{kind}' for kind in CAPTURE_FILES))
+        capture = profile_store.list()[0]
+        self.assertEqual((capture['id'], capture['path'], capture['status'], capture['reason']), (capture_id, '/', 200, 'header'))
+
+    def test_captures_are_pruned_to_the_limit(self):
+        ids = [
+            self.client.get('/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=_bearer(self.staff))[PROFILE_ID]
+            for _ in range(3)
+        ]
+        self.assertEqual(len(set(ids)), 3)
+        self.assertEqual(len(self._files()), 2 * len(CAPTURE_FILES))
+        self.assertEqual(len(profile_store.list()), 2)
+
+        # id 가 시각순이므로 오래된 것부터 삭제
+        for capture_id in ('20260101-000000-0000000a', '20260101-000001-0000000b'):
+            open(profile_store.path(capture_id, 'json'), 'w').close()
+        profile_store.prune()
+        remaining = {name.split('.', 1)[0] for name in self._files()}
+        self.assertNotIn('20260101-000000-0000000a', remaining)
+        self.assertEqual(len(remaining), 2)
+
+
+class ProfileCaptureViewTests(ProfilingTestCase):
+    def setUp(self):
+        super().setUp()
+        response = self.client.get('/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=_bearer(self.staff))
+        self.capture_id = response[PROFILE_ID]
+        self.api = APIClient()
+
+    def test_staff_only(self):
+        urls = ['/api/ops/profiles/', f'/api/ops/profiles/{self.capture_id}/json/']
+        for url in urls:
+            self.assertEqual(self.api.get(url).status_code, 401)
+        self.api.force_authenticate(self.member)
+        for url in urls:
+            self.assertEqual(self.api.get(url).status_code, 403)
+
+        self.api.force_authenticate(self.staff)
+        self.assertEqual([row['id'] for row in self.api.get(urls[0]).json()['results']], [self.capture_id])
+        response = self.api.get(urls[1])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'{self.capture_id}.json', response['Content-Disposition'])
+        response.close()
+
+    def test_capture_name_cannot_leave_the_directory(self):
+        self.api.force_authenticate(self.staff)
+        for capture_id, kind in (('..', 'json'), ('..%2Fsecret', 'json'), ('%2E%2E', 'json'), (self.capture_id, 'py')):
+            with self.subTest(capture_id=capture_id, kind=kind):
+                self.assertEqual(self.api.get(f'/api/ops/profiles/{capture_id}/{kind}/').status_code, 404)
+        for capture_id in ('../secret', '/etc/passwd', f'{self.capture_id}/../x'):
+            with self.subTest(capture_id=capture_id), self.assertRaises(FileNotFoundError):
+                profile_store.path(capture_id, 'json')
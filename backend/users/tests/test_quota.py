@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from generations.tests.utils import create_shop
+from users.models import ShopProfile, ShopUsage, UsagePeriod
+
+
+def _used(shop) -> int:
+    rows = ShopUsage.with_shard_totals(ShopUsage._current(shop, UsagePeriod.MONTHLY))
+    return rows.values_list('total_requests', flat=True).first() or 0
+
+
+class QuotaTests(TestCase):
+    def setUp(self):
+        self.shop = create_shop()
+        ShopProfile.objects.filter(pk=self.shop.pk).update(count=2, monthly_quota=3)
+        self.shop.refresh_from_db()
+
+    def test_concurrent_decrements_are_not_lost(self):
+        # 같은 행을 읽은 두 요청 (예전에는 둘 다 count=1 을 저장)
+        first, second = ShopProfile.objects.get(pk=self.shop.pk), ShopProfile.objects.get(pk=self.shop.pk)
+        self.assertTrue(first.decrement_quota())
+        self.assertTrue(second.decrement_quota())
+        # 각 인스턴스는 자기 차감만 반영 (다시 읽지 않음), DB 에는 둘 다 반영
+        self.assertEqual((first.count, second.count), (1, 1))
+        self.assertEqual(ShopProfile.objects.get(pk=self.shop.pk).count, 0)
+        self.assertEqual(_used(self.shop), 2)
+
+    def test_last_unit_is_taken_once(self):
+        stale = ShopProfile.objects.get(pk=self.shop.pk)
+        self.assertTrue(self.shop.decrement_quota(amount=2))
+        self.assertTrue(stale.has_quota)
+        self.assertFalse(stale.decrement_quota())
+        self.assertEqual(stale.count, 0)
+        self.assertEqual(_used(self.shop), 2)
+
+    def test_successful_update_does_not_reload_the_shop(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.shop.decrement_quota())
+            self.assertEqual(self.shop.increment_quota(), 2)
+        table = ShopProfile._meta.db_table
+        self.assertFalse([query['sql'] for query in queries if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql']])
+        self.assertEqual(ShopProfile.objects.get(pk=self.shop.pk).count, 2)
+
+    def test_increment_is_capped_at_the_monthly_quota(self):
+        stale = ShopProfile.objects.get(pk=self.shop.pk)
+        self.shop.decrement_quota()
+        self.assertEqual(stale.increment_quota(amount=5), 3)
+        self.assertEqual(_used(self.shop), 1 - 5)
+        with self.assertRaises(ValueError):
+            stale.decrement_quota(amount=-1)
+
+
+class BenchUsageCommandTests(TransactionTestCase):
+    def test_whole_quota_path_stays_consistent(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command('bench_usage', shards='1,4', threads='1,2', ops=5, output=output,
+                         stdout=open(os.devnull, 'w'), stderr=open(os.devnull, 'w'))
+            with open(output, encoding='utf-8') as fh:
+                results = json.load(fh)['results']
+        self.assertEqual([(row['shards'], row['threads']) for row in results], [(1, 1), (1, 2), (4, 1), (4, 2)])
+        for row in results:
+            self.assertTrue(row['consistent'], row)
+            self.assertEqual(row['ops'] + row['errors'], row['threads'] * 5)
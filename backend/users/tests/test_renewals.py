@@ -0,0 +1,70 @@
+from datetime import timedelta
+from importlib import import_module
+
+from django.apps import apps
+from django.test import TestCase
+from django.utils import timezone
+
+from generations.tests.utils import create_shop
+from users.models import PLAN_RENEWAL_PERIOD, PLAN_TIER_QUOTAS, PlanTier, ServiceLog, ShopProfile, ShopUsage, UsagePeriod
+from users.renewals import renew_due_plans
+
+backfill = import_module('users.migrations.0009_backfill_plan_renews_at')
+
+
+class PlanRenewalTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+
+    def _shop(self, renews_at, **fields) -> ShopProfile:
+        shop = create_shop(**fields)
+        ShopProfile.objects.filter(pk=shop.pk).update(plan_renews_at=renews_at, count=3)
+        return shop
+
+    def test_new_shop_gets_a_renewal_date(self):
+        shop = create_shop()
+        self.assertAlmostEqual(shop.plan_renews_at, timezone.now() + PLAN_RENEWAL_PERIOD, delta=timedelta(minutes=1))
+
+    def test_renewal_keeps_the_billing_day(self):
+        due_at = self.now - timedelta(hours=5)
+        shop = self._shop(due_at)
+        ShopUsage.record_usage(shop=shop, amount=2)
+
+        report = renew_due_plans(now=self.now, chunk_size=1)
+        self.assertEqual(report.renewed, 1)
+        shop.refresh_from_db()
+        # 실행이 늦어도 다음 갱신일은 now 가 아니라 예정일 기준
+        self.assertEqual(shop.plan_renews_at, due_at + PLAN_RENEWAL_PERIOD)
+        self.assertEqual(shop.count, PLAN_TIER_QUOTAS[PlanTier.BASIC])
+        usage = ShopUsage.with_shard_totals(ShopUsage._current(shop, UsagePeriod.MONTHLY)).get()
+        self.assertEqual(usage.total_requests, 0)
+        self.assertTrue(ServiceLog.objects.filter(shop=shop, note='plan renewed').exists())
+
+        # 다시 실행해도 두 번 갱신되지 않음
+        self.assertEqual(renew_due_plans(now=self.now).renewed, 0)
+
+    def test_lapsed_shop_starts_a_new_cycle(self):
+        shop = self._shop(self.now - 3 * PLAN_RENEWAL_PERIOD)
+        self.assertEqual(renew_due_plans(now=self.now).renewed, 1)
+        shop.refresh_from_db()
+        self.assertEqual(shop.plan_renews_at, self.now + PLAN_RENEWAL_PERIOD)
+
+    def test_only_active_due_shops_are_renewed(self):
+        self._shop(self.now + timedelta(days=1))
+        self._shop(self.now - timedelta(days=1), is_active=False)
+        due = self._shop(self.now - timedelta(days=1), tier=PlanTier.PRO)
+
+        dry = renew_due_plans(now=self.now, dry_run=True)
+        self.assertEqual((dry.renewed, dry.by_tier), (1, {PlanTier.PRO: 1}))
+        self.assertEqual(ShopProfile.objects.get(pk=due.pk).count, 3)
+
+        self.assertEqual(renew_due_plans(now=self.now).renewed, 1)
+        self.assertEqual(ShopProfile.objects.get(pk=due.pk).count, PLAN_TIER_QUOTAS[PlanTier.PRO])
+
+    def test_backfill_follows_the_signup_cycle(self):
+        shop = self._shop(None)
+        created_at = self.now - timedelta(days=45)
+        ShopProfile.objects.filter(pk=shop.pk).update(created_at=created_at)
+        backfill.backfill_plan_renews_at(apps, None)
+        shop.refresh_from_db()
+        self.assertEqual(shop.plan_renews_at, created_at + 2 * PLAN_RENEWAL_PERIOD)
@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from config.routers import use_replica
+from generations.models import GenerationRequest, GenerationStatus
+from generations.tests.utils import copy_to_replica, create_shop, create_user
+from users.models import ShopMembership, ShopProfile, ShopUsage, UsagePeriod
+
+
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.owner = create_user()
+        self.shop = create_shop(owner=self.owner)
+        copy_to_replica(self.owner, self.shop, ShopMembership.objects.get(shop=self.shop))
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = f'/api/shops/{self.shop.shop_id}'
+
+    def _request(self, using: str, pk: int, created_at) -> GenerationRequest:
+        record = GenerationRequest(pk=pk, shop=self.shop, status=GenerationStatus.SUCCESS)
+        record.save(using=using)
+        GenerationRequest.objects.using(using).filter(pk=pk).update(created_at=created_at)
+        return record
+
+    def test_history_reads_from_replica(self):
+        now = timezone.now()
+        self._request('default', 100, now)
+        for pk in (1, 2, 3):
+            self._request('replica', pk, now - timedelta(minutes=pk))
+        response = self.client.get(f'{self.url}/history/', {'limit': 2})
+        self.assertEqual([row['id'] for row in response.data['results']], [1, 2])
+        self.assertEqual(response.data['next_before'], 2)
+
+    def test_history_pages_follow_created_at_order(self):
+        now = timezone.now()
+        # id 순서와 created_at 순서가 다른 행 (예: 늦게 커밋된 요청)
+        self._request('replica', 5, now - timedelta(minutes=3))
+        self._request('replica', 4, now - timedelta(minutes=1))
+        self._request('replica', 6, now - timedelta(minutes=2))
+        self._request('replica', 7, now - timedelta(minutes=2))
+        seen, before = [], None
+        while True:
+            params = {'limit': 2, **({'before': before} if before else {})}
+            data = self.client.get(f'{self.url}/history/', params).data
+            seen += [row['id'] for row in data['results']]
+            before = data['next_before']
+            if before is None:
+                break
+        self.assertEqual(seen, [4, 7, 6, 5])
+
+    def test_usage_reads_from_replica(self):
+        period_start = ShopUsage._period_start(UsagePeriod.MONTHLY)
+        ShopUsage.objects.using('replica').create(shop_id=self.shop.pk, period_start=period_start, used_requests=7)
+        response = self.client.get(f'{self.url}/usage/')
+        self.assertEqual([row['used_requests'] for row in response.data], [7])
+
+    def test_writes_and_quota_stay_on_primary(self):
+        response = self.client.post(f'{self.url}/adjust_quota/', {'amount': -2}, format='json')
+        self.assertEqual(response.data['count'], self.shop.monthly_quota - 2)
+        self.assertEqual(ShopProfile.objects.using('default').get(pk=self.shop.pk).count, self.shop.monthly_quota - 2)
+        self.assertEqual(ShopProfile.objects.using('replica').get(pk=self.shop.pk).count, self.shop.monthly_quota)
+
+    def test_reads_after_a_write_use_primary(self):
+        with use_replica():
+            self.assertEqual(ShopProfile.objects.get(pk=self.shop.pk)._state.db, 'replica')
+            ShopProfile.objects.filter(pk=self.shop.pk).update(count=1)
+            shop = ShopProfile.objects.get(pk=self.shop.pk)
+        self.assertEqual((shop._state.db, shop.count), ('default', 1))
+        # use_replica() 밖에서는 항상 primary
+        self.assertEqual(ShopProfile.objects.get(pk=self.shop.pk)._state.db, 'default')
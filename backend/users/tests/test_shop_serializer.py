@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+from django.test import TestCase, override_settings
+
+from generations.tests.test_webhooks import WEBHOOKS
+from generations.tests.utils import add_member, create_shop, create_user
+from users.models import ShopRole
+from users.serializers import ShopProfileSerializer
+
+
+@override_settings(WEBHOOKS=WEBHOOKS)
+class ShopProfileSerializerTests(TestCase):
+    def setUp(self):
+        self.owner = create_user()
+        self.shop = create_shop(owner=self.owner)
+
+    def _data(self, user, shops=None):
+        context = {'request': SimpleNamespace(user=user)}
+        if shops is not None:
+            return ShopProfileSerializer(shops, many=True, context=context).data
+        return ShopProfileSerializer(self.shop, context=context).data
+
+    def test_webhook_secret_is_for_managers_only(self):
+        manager = add_member(self.shop, ShopRole.MANAGER)
+        viewer = add_member(self.shop, ShopRole.VIEWER)
+        self.assertEqual(self._data(self.owner)['webhook_secret'], self.shop.webhook_secret)
+        self.assertEqual(self._data(manager)['webhook_secret'], self.shop.webhook_secret)
+        self.assertNotIn('webhook_secret', self._data(viewer))
+
+    def test_token_roles_decide_without_query(self):
+        viewer = add_member(self.shop, ShopRole.VIEWER)
+        viewer.shop_roles = {self.shop.shop_id: ShopRole.VIEWER}
+        # 이번 달 사용량 조회뿐 (멤버십 조회 없음)
+        with self.assertNumQueries(1):
+            self.assertNotIn('webhook_secret', self._data(viewer))
+
+    def test_list_looks_up_roles_once(self):
+        other = create_shop()
+        manager = add_member(self.shop, ShopRole.MANAGER)
+        add_member(other, ShopRole.VIEWER, user=manager)
+        with self.assertNumQueries(1 + 2):
+            # 역할 1회 + 상점별 이번 달 사용량
+            rows = self._data(manager, shops=[self.shop, other])
+        self.assertIn('webhook_secret', rows[0])
+        self.assertNotIn('webhook_secret', rows[1])
+
+    def test_internal_callback_url_is_rejected(self):
+        for url in ('http://127.0.0.1:8000/hook', 'http://169.254.169.254/'):
+            serializer = ShopProfileSerializer(self.shop, data={'callback_url': url}, partial=True)
+            self.assertFalse(serializer.is_valid())
+            self.assertIn('callback_url', serializer.errors)
+        serializer = ShopProfileSerializer(self.shop, data={'callback_url': 'https://93.184.215.14/hook'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from generations.tests.utils import add_member, create_shop, create_user
+from users.models import CustomUser, ShopRole
+from users.tokens import MembershipClaimsJWTAuthentication, MembershipTokenObtainPairSerializer
+
+
+@override_settings(JWT_MEMBERSHIP_CLAIMS=True)
+class MembershipClaimsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.shop = create_shop(owner=self.user)
+        self.auth = MembershipClaimsJWTAuthentication()
+
+    def _authenticate(self, user=None):
+        access = MembershipTokenObtainPairSerializer.get_token(user or self.user).access_token
+        return self.auth.get_validated_token(str(access))
+
+    def test_claims_authorize_without_user_query(self):
+        token = self._authenticate()
+        with self.assertNumQueries(1):
+            user = self.auth.get_user(token)
+        self.assertEqual(user.shop_roles, {self.shop.shop_id: ShopRole.OWNER})
+        self.assertFalse(user.is_staff)
+        # 버전은 캐시됨
+        with self.assertNumQueries(0):
+            self.auth.get_user(token)
+
+    def test_membership_change_revokes_token(self):
+        viewer = create_user()
+        token = self._authenticate(viewer)
+        self.auth.get_user(token)
+        add_member(self.shop, ShopRole.VIEWER, user=viewer)
+        with self.assertRaises(InvalidToken):
+            self.auth.get_user(token)
+        self.assertEqual(self.auth.get_user(self._authenticate(viewer)).shop_roles, {self.shop.shop_id: ShopRole.VIEWER})
+
+    def test_staff_change_on_save_revokes_token(self):
+        token = self._authenticate()
+        self.auth.get_user(token)
+        self.user.is_staff = True
+        self.user.save()
+        with self.assertRaises(InvalidToken):
+            self.auth.get_user(token)
+        self.assertTrue(self.auth.get_user(self._authenticate()).is_staff)
+
+    def test_staff_change_on_queryset_update_revokes_token(self):
+        token = self._authenticate()
+        self.auth.get_user(token)
+        CustomUser.objects.filter(pk=self.user.pk).update(is_staff=True)
+        with self.assertRaises(InvalidToken):
+            self.auth.get_user(token)
+
+    def test_deactivation_rejects_token(self):
+        token = self._authenticate()
+        self.auth.get_user(token)
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(token)
+
+    def test_unrelated_changes_keep_token(self):
+        token = self._authenticate()
+        version = CustomUser.objects.get(pk=self.user.pk).membership_version
+        self.user.full_name = 'Renamed'
+        self.user.save()
+        CustomUser.objects.filter(pk=self.user.pk).update(onboarding_completed=True)
+        self.assertEqual(CustomUser.objects.get(pk=self.user.pk).membership_version, version)
+        self.auth.get_user(token)
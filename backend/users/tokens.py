@@ -0,0 +1,105 @@
+"""JWT mode that carries shop memberships as signed claims.
+
+With ``JWT_MEMBERSHIP_CLAIMS`` enabled, login embeds ``{shop_id: role}`` for the user's active
+memberships plus the user's ``membership_version``. ``MembershipClaimsJWTAuthentication`` then
+authorizes shop access from the claims alone; the only lookup left is the (cached) version check,
+which rejects tokens issued before a membership change or a change of the user's ``is_staff``,
+``is_superuser`` or ``is_active`` (``save()`` and queryset ``update()`` both bump the version).
+The version is cached for ``JWT_MEMBERSHIP_VERSION_CACHE_SECONDS`` and a bump deletes the cached
+value, so the cache must be shared by all workers; settings refuse a process-local cache outside DEBUG.
+"""
+
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import CustomUser, ShopMembership, membership_version_cache_key
+
+SHOPS_CLAIM = 'shops'
+VERSION_CLAIM = 'mv'
+STAFF_CLAIM = 'staff'
+
+
+def current_membership_version(user_id) -> Optional[int]:
+    """Membership version of an active user, or ``None`` if the user is gone or inactive."""
+
+    key = membership_version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        row = CustomUser.objects.filter(pk=user_id, is_active=True).values_list('membership_version', flat=True).first()
+        version = -1 if row is None else row
+        cache.set(key, version, settings.JWT_MEMBERSHIP_VERSION_CACHE_SECONDS)
+    return None if version < 0 else version
+
+
+def add_membership_claims(token, user_id) -> None:
+    memberships = ShopMembership.objects.filter(
+        user_id=user_id,
+        is_active=True,
+        shop__is_active=True,
+    ).values_list('shop__shop_id', 'role')
+    user = CustomUser.objects.filter(pk=user_id).values('membership_version', 'is_staff').first() or {}
+    token[SHOPS_CLAIM] = dict(memberships)
+    token[VERSION_CLAIM] = user.get('membership_version', 0)
+    token[STAFF_CLAIM] = user.get('is_staff', False)
+
+
+def token_shop_role(user, shop_id: str) -> Optional[str]:
+    """Role from the token claims, ``''`` when the claims say "not a member", ``None`` when there are no claims."""
+
+    roles = getattr(user, 'shop_roles', None)
+    if roles is None:
+        return None
+    return roles.get(shop_id, '')
+
+
+class MembershipTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        if settings.JWT_MEMBERSHIP_CLAIMS:
+            add_membership_claims(token, user.pk)
+        return token
+
+
+class MembershipTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        if settings.JWT_MEMBERSHIP_CLAIMS:
+            # Claims copied from the refresh token may be stale; rebuild them on every refresh.
+            access = AccessToken(data['access'])
+            add_membership_claims(access, access[api_settings.USER_ID_CLAIM])
+            data['access'] = str(access)
+        return data
+
+
+class MembershipClaimsJWTAuthentication(JWTAuthentication):
+    """Skips the user row lookup for tokens with membership claims; plain tokens go the usual way."""
+
+    def get_user(self, validated_token):
+        if SHOPS_CLAIM not in validated_token or VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken('Token contained no recognizable user identification') from exc
+
+        version = current_membership_version(user_id)
+        if version is None:
+            raise AuthenticationFailed('User not found or inactive', code='user_inactive')
+        if version != validated_token[VERSION_CLAIM]:
+            raise InvalidToken('Shop memberships changed, refresh the token')
+
+        # Unsaved-looking instance carrying only the pk: usable as FK/actor without a query.
+        user = CustomUser(pk=user_id, is_active=True, is_staff=bool(validated_token.get(STAFF_CLAIM, False)))
+        user._state.adding = False
+        user._state.db = CustomUser.objects.db
+        user.shop_roles = dict(validated_token[SHOPS_CLAIM])
+        return user
@@ -5,8 +5,14 @@ from .views import (
     UserRegisterView,
     WhoAmIAPIView,
     GenerateRequestView,
+    GenerateOutfitView,
     ShopProfileViewSet,
+    DatabaseStatsView,
+    GeminiStatsView,
+    ProfileCaptureListView,
+    ProfileCaptureView,
 )
+from generations.views import GenerationEventsView
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -17,9 +23,24 @@ router.register(r'shops', ShopProfileViewSet, basename='shop')
 
 urlpatterns = [
     path('generate/', GenerateRequestView.as_view(), name='generate'),
+    path('generate/outfit/', GenerateOutfitView.as_view(), name='generate-outfit'),
     # path('register/', UserRegisterView.as_view(), name='register'),
     path('login/', TokenObtainPairView.as_view(), name='login'),
     path('login/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
     path('whoami/', WhoAmIAPIView.as_view(), name='whoami'),
+    path('ops/db/', DatabaseStatsView.as_view(), name='ops-db'),
+    path('ops/gemini/', GeminiStatsView.as_view(), name='ops-gemini'),
+    path('ops/profiles/', ProfileCaptureListView.as_view(), name='ops-profiles'),
+    path('ops/profiles/<str:capture_id>/<str:kind>/', ProfileCaptureView.as_view(), name='ops-profile-capture'),
+    path(
+        'shops/<str:shop_id>/generations/<int:request_id>/events/',
+        GenerationEventsView.as_view(),
+        name='generation-events',
+    ),
+    path(
+        'shops/<str:shop_id>/generations/by-key/<str:key>/events/',
+        GenerationEventsView.as_view(),
+        name='generation-events-by-key',
+    ),
     path('', include(router.urls)),
 ]
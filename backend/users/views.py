@@ -7,17 +7,24 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.request import Request
 
-from django.http import FileResponse
+from django.db import router as db_router
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 from rest_framework.decorators import api_view, action
 from rest_framework import generics, viewsets
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
+from rest_framework.authentication import SessionAuthentication
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied
 
-from .models import ErrorLevel, ShopProfile, ShopRole, UsagePeriod
+from .models import ErrorLevel, ShopMembership, ShopProfile, ShopRole, ShopUsage, UsagePeriod
 from .serializers import (
     UserRequestSerializer,
+    UserOutfitRequestSerializer,
     UserSerializer,
     UserRegisterationSerializer,
     ShopProfileSerializer,
@@ -25,17 +32,50 @@ from .serializers import (
     ShopQuotaAdjustmentSerializer,
 )
 from .loggers import log_service_err, log_service
+from .tokens import MembershipClaimsJWTAuthentication, token_shop_role
 from .models import CustomUser
+from config.db import connection_stats
+from config.profiling import CAPTURE_FILES, profile_store
+from config.routers import ReplicaReadMixin
+from generations.blobs import BLOB_PREFIX, blob_store
+from generations.budget import token_budget
+from generations.deadlines import DeadlineExceeded, deadline_response, request_deadline
+from generations.exports import CONTENT_TYPES, CSV, GZIP_CONTENT_TYPE, UnknownExport, export_filename, stream_export, validate as validate_export
+from generations.idempotency import run_idempotent
+from generations.keypool import key_pool
 from generations.loggers import log_generation_request
-from generations.models import GenerationStatus, GenerationErrorLog
+from generations.models import Blob, GenerationRequest, GenerationStatus, GenerationErrorLog, blob_path
+from generations.limiter import GenerationLimitMixin
+from generations.progress import progress
+from generations.prompt_cache import prompt_cache
+from generations.routing import model_router
+from generations.serializers import GenerationHistorySerializer
 from generations.services import GeminiAPIService, GeminiAPIResponseError
+from generations.thumbnails import UnknownVariant, thumbnails
 
-class GenerateRequestView(APIView):
-    authentication_classes = [JWTAuthentication]
+# 내용 주소 기반 결과/썸네일은 바뀌지 않으므로 재검증 없이 장기 캐시
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+class GenerateRequestView(GenerationLimitMixin, APIView):
+    authentication_classes = [MembershipClaimsJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    serializer_class = UserRequestSerializer
+
+    def _product_images(self, validated_data: dict) -> list:
+        return [validated_data['product_image']]
+
+    def _run_generation(self, product_images: list, person_image, tier: str, on_stage=None, max_side=None, deadline=None):
+        return GeminiAPIService.generate(
+            product_image=product_images[0],
+            person_image=person_image,
+            tier=tier,
+            on_stage=on_stage,
+            max_side=max_side,
+            deadline=deadline,
+        )
 
     def post(self, request: Request):
-        serializer = UserRequestSerializer(data=request.data)
+        serializer = self.serializer_class(data=request.data)
         if not serializer.is_valid():
             return Response(
                 serializer.errors,
@@ -45,31 +85,45 @@ class GenerateRequestView(APIView):
         shop_id = serializer.validated_data['shop_id']
         customer_id = serializer.validated_data['customer_id']
         person_image = serializer.validated_data['person_image']
-        product_image = serializer.validated_data['product_image']
+        product_images = self._product_images(serializer.validated_data)
 
-        try:
+        role = token_shop_role(request.user, shop_id)
+        if role is None:
             shop_profile = ShopProfile.objects.filter(
                 shop_id=shop_id,
                 memberships__user=request.user,
                 memberships__is_active=True,
                 is_active=True,
             ).select_related('owner').first()
+        else:
+            # 토큰 클레임으로 멤버십 확인 완료 → 조인 없이 상점만 조회
+            shop_profile = ShopProfile.objects.filter(shop_id=shop_id, is_active=True).first() if role else None
 
-            if not shop_profile:
-                raise ShopProfile.DoesNotExist()
-
-            log = log_generation_request(
-                user=request.user,
-                shop=shop_profile,
-                customer_id=customer_id,
-                status=GenerationStatus.PENDING,
-            )
-
-        except ShopProfile.DoesNotExist:
+        if not shop_profile:
             return Response({
                 'error': f'ShopProfile for shop [ {shop_id} ] not found. This shouldn\'t be happen, please contact support.'
             }, status=status.HTTP_404_NOT_FOUND)
 
+        # 요청 기한 (X-Deadline-Ms 또는 상점 기본값): 업스트림 타임아웃 상한
+        deadline = request_deadline(request, shop_profile)
+        return run_idempotent(
+            request,
+            shop=shop_profile,
+            customer_id=customer_id,
+            uploads=(person_image, *product_images),
+            handler=lambda: self._generate(request, shop_profile, customer_id, person_image, product_images, deadline),
+        )
+
+    def _generate(self, request: Request, shop_profile: ShopProfile, customer_id, person_image, product_images, deadline=None):
+        log = log_generation_request(
+            user=request.user,
+            shop=shop_profile,
+            customer_id=customer_id,
+            status=GenerationStatus.PENDING,
+        )
+        # SSE 진행 스트림: Idempotency-Key 로도 구독 가능
+        progress.start(log, request.headers.get('Idempotency-Key'))
+
         if not shop_profile.has_quota:
             log.mark_failure(error_message='Usage limit exceeded')
             return Response(
@@ -77,7 +131,27 @@ class GenerateRequestView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        shop_profile.decrement_quota(actor=request.user)
+        # 업스트림 호출 전 토큰 추정 → 예산 초과면 축소 또는 거절 (쿼터 차감 없음)
+        budget = token_budget.preflight(shop_profile, person_image, product_images)
+        if not budget.allowed:
+            log.mark_failure(error_code='token_budget_exceeded', error_message=f'{budget.limited_by} token limit')
+            return Response(
+                {
+                    'error': 'Token budget exceeded.',
+                    'limit': budget.limited_by,
+                    'estimated_tokens': budget.estimated_tokens,
+                    'available_tokens': budget.limit,
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not shop_profile.decrement_quota(actor=request.user):
+            # has_quota 확인 뒤 동시 요청이 마지막 쿼터를 가져감
+            log.mark_failure(error_message='Usage limit exceeded')
+            return Response(
+                {'error': 'Usage limit exceeded.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         log_service(
             shop=shop_profile,
             remaining=shop_profile.count,
@@ -87,13 +161,30 @@ class GenerateRequestView(APIView):
         try:
             log.mark_started()
             started_at = time.monotonic()
-            result, tokens = GeminiAPIService.generate(
-                product_image=product_image,
-                person_image=person_image
+            result, tokens, meta = self._run_generation(
+                product_images, person_image, shop_profile.tier,
+                on_stage=progress.stage_callback(log.pk), max_side=budget.max_side, deadline=deadline,
             )
             latency_ms = int((time.monotonic() - started_at) * 1000)
-
-            log.mark_success(latency_ms=latency_ms, tokens=tokens)
+            blob_store.attach(
+                log,
+                person=person_image,
+                # 요청 행의 상품 경로 칸은 하나 → 아웃핏은 첫 번째 상품만 보관
+                product=product_images[0],
+                result=result,
+                product_sha256=meta['product_sha256'],
+                result_type=meta['result_mime'],
+            )
+            thumbnails.prewarm_result(log)
+
+            log.mark_success(
+                latency_ms=latency_ms,
+                tokens=tokens,
+                classify_model=meta['classify_model'],
+                edit_model=meta['edit_model'],
+                cached_tokens=meta['cached_tokens'],
+                estimated_tokens=budget.estimated_tokens,
+            )
 
             result.seek(0)
 
@@ -105,6 +196,12 @@ class GenerateRequestView(APIView):
             response['Content-Disposition'] = 'attachment; filename="generated_image.png"'
             return response
 
+        except DeadlineExceeded as e:
+            # 클라이언트가 이미 포기한 요청 → 남은 작업 중단, 쿼터 환불
+            log.mark_failure(error_code='deadline_exceeded', error_message=str(e))
+            shop_profile.increment_quota(actor=request.user)
+            return deadline_response(e)
+
         except GeminiAPIResponseError as e:
             exc_type, exc_obj, exc_tb = sys.exc_info()
             fname = traceback.extract_tb(exc_tb)[-1].name
@@ -143,6 +240,23 @@ class GenerateRequestView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+class GenerateOutfitView(GenerateRequestView):
+    # 상의+하의 등 여러 상품을 한 번의 편집 호출로 (분류는 상품별 동시 실행)
+    serializer_class = UserOutfitRequestSerializer
+
+    def _product_images(self, validated_data: dict) -> list:
+        return validated_data['product_images']
+
+    def _run_generation(self, product_images: list, person_image, tier: str, on_stage=None, max_side=None, deadline=None):
+        return GeminiAPIService.generate_outfit(
+            product_images=product_images,
+            person_image=person_image,
+            tier=tier,
+            on_stage=on_stage,
+            max_side=max_side,
+            deadline=deadline,
+        )
+
 class UserRegisterView(generics.CreateAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = UserRegisterationSerializer
@@ -157,12 +271,68 @@ class WhoAmIAPIView(APIView):
         serializer = UserSerializer(user)
         return Response(serializer.data)
 
-class ShopProfileViewSet(viewsets.ModelViewSet):
+class DatabaseStatsView(APIView):
+    """Connection pool / persistent connection numbers of the worker process serving this request."""
+
+    authentication_classes = [MembershipClaimsJWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request):
+        return Response(connection_stats.snapshot())
+
+class GeminiStatsView(APIView):
+    """Per-key rates/cooldowns, model routing stats and context caches of the serving worker process."""
+
+    authentication_classes = [MembershipClaimsJWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request):
+        return Response({
+            'keys': key_pool.snapshot(),
+            'models': model_router.snapshot(),
+            'context_caches': prompt_cache.snapshot(),
+        })
+
+class ProfileCaptureListView(APIView):
+    """Request profiles captured by this instance (``REQUEST_PROFILING``), newest first."""
+
+    authentication_classes = [MembershipClaimsJWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request):
+        return Response({'results': profile_store.list(), 'kinds': list(CAPTURE_FILES)})
+
+class ProfileCaptureView(APIView):
+    """Download one file of a capture: ``json`` summary, ``prof`` (pstats) or ``collapsed`` stacks."""
+
+    authentication_classes = [MembershipClaimsJWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request, capture_id: str, kind: str):
+        try:
+            # 캡처는 각 인스턴스의 로컬 디스크에만 있음
+            return FileResponse(
+                open(profile_store.path(capture_id, kind), 'rb'),
+                content_type=CAPTURE_FILES[kind],
+                as_attachment=True,
+                filename=f'{capture_id}.{kind}',
+            )
+        except FileNotFoundError:
+            raise NotFound('No such profile capture on this instance.')
+
+class ShopProfileViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = ShopProfileSerializer
+    authentication_classes = [MembershipClaimsJWTAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
     lookup_field = 'shop_id'
+    # 조회 전용 액션은 레플리카에서 (쿼터 변경·생성 경로는 primary 고정)
+    # result/thumbnail 은 done 이벤트 직후에 열리므로 지연된 레플리카에서는 404 → primary
+    replica_actions = ('list', 'retrieve', 'usage', 'history', 'export')
 
     def get_queryset(self):
+        roles = getattr(self.request.user, 'shop_roles', None)
+        if roles is not None:
+            return ShopProfile.objects.select_related('owner').filter(shop_id__in=list(roles), is_active=True)
         return self.request.user.shops.select_related('owner').filter(
             is_active=True,
             memberships__user=self.request.user,
@@ -172,18 +342,22 @@ class ShopProfileViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
-    def _get_membership(self, shop: ShopProfile, user: CustomUser):
-        return shop.memberships.filter(user=user, is_active=True).first()
+    def _get_role(self, shop: ShopProfile, user: CustomUser) -> str:
+        role = token_shop_role(user, shop.shop_id)
+        if role is not None:
+            return role
+        return ShopMembership.objects.filter(
+            shop=shop, user=user, is_active=True
+        ).values_list('role', flat=True).first() or ''
 
     def _ensure_manage_permission(self, shop: ShopProfile, user: CustomUser):
-        membership = self._get_membership(shop, user)
-        if not membership or membership.role not in (ShopRole.OWNER, ShopRole.MANAGER):
+        if self._get_role(shop, user) not in (ShopRole.OWNER, ShopRole.MANAGER):
             raise PermissionDenied('상점을 관리할 권한이 없습니다.')
 
     @action(detail=True, methods=['get'])
     def usage(self, request: Request, shop_id=None, *args, **kwargs):
         shop = self.get_object()
-        if not self._get_membership(shop, request.user):
+        if not self._get_role(shop, request.user):
             raise PermissionDenied('상점에 접근할 권한이 없습니다.')
         limit = request.query_params.get('limit')
         try:
@@ -191,12 +365,137 @@ class ShopProfileViewSet(viewsets.ModelViewSet):
         except ValueError:
             limit = 12
         limit = max(1, min(limit, 60))
-        usage_qs = shop.usage_records.filter(period_type=UsagePeriod.MONTHLY).order_by('-period_start')
+        usage_qs = ShopUsage.with_shard_totals(
+            shop.usage_records.filter(period_type=UsagePeriod.MONTHLY).order_by('-period_start')
+        )
         serializer = ShopUsageSerializer(usage_qs[:limit], many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def history(self, request: Request, shop_id=None, *args, **kwargs):
+        shop = self.get_object()
+        if not self._get_role(shop, request.user):
+            raise PermissionDenied('상점에 접근할 권한이 없습니다.')
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 50)), 200))
+        except ValueError:
+            limit = 50
+        history_qs = GenerationRequest.objects.filter(shop=shop).order_by('-created_at', '-id')
+        before = request.query_params.get('before')
+        if before and before.isdigit():
+            # 키셋 페이지네이션: 정렬 키 (created_at, id) 전체로 이전 페이지 마지막 행 다음부터
+            # (id 만 비교하면 created_at 순서와 id 순서가 다를 때 행이 빠지거나 겹침)
+            before = int(before)
+            last_created_at = GenerationRequest.objects.filter(shop=shop, pk=before).values_list(
+                'created_at', flat=True,
+            ).first()
+            if last_created_at is None:
+                history_qs = history_qs.filter(id__lt=before)
+            else:
+                history_qs = history_qs.filter(
+                    Q(created_at__lt=last_created_at) | Q(created_at=last_created_at, id__lt=before)
+                )
+        rows = list(history_qs[:limit])
+        return Response({
+            'results': GenerationHistorySerializer(rows, many=True).data,
+            'next_before': rows[-1].id if len(rows) == limit else None,
+        })
+
+    def _stored_result_sha256(self, request: Request, request_id) -> str:
+        shop = self.get_object()
+        if not self._get_role(shop, request.user):
+            raise PermissionDenied('상점에 접근할 권한이 없습니다.')
+        result_path = get_object_or_404(
+            GenerationRequest.objects.values_list('result_image_path', flat=True),
+            pk=request_id, shop=shop,
+        )
+        if not result_path.startswith(BLOB_PREFIX):
+            raise NotFound('No stored result for this request.')
+        return result_path.rsplit('/', 1)[-1]
+
+    @action(detail=True, methods=['get'], url_path=r'results/(?P<request_id>\d+)/image')
+    def result(self, request: Request, shop_id=None, request_id=None, *args, **kwargs):
+        sha256 = self._stored_result_sha256(request, request_id)
+        etag = f'"{sha256}"'
+        headers = {'Cache-Control': IMMUTABLE_CACHE_CONTROL, 'ETag': etag}
+        if request.headers.get('If-None-Match') == etag:
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        blob = Blob.objects.filter(sha256=sha256).values_list('content_type', flat=True).first()
+        try:
+            response = FileResponse(blob_store.open(blob_path(sha256)), content_type=blob or 'image/png')
+        except FileNotFoundError:
+            raise NotFound('No stored result for this request.')
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    @action(detail=True, methods=['get'], url_path=r'results/(?P<request_id>\d+)/thumbnail/(?P<variant>\w+)')
+    def thumbnail(self, request: Request, shop_id=None, request_id=None, variant=None, *args, **kwargs):
+        sha256 = self._stored_result_sha256(request, request_id)
+        etag = f'"{sha256}-{variant}"'
+        headers = {'Cache-Control': IMMUTABLE_CACHE_CONTROL, 'ETag': etag}
+        if request.headers.get('If-None-Match') == etag:
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        try:
+            # 다른 워커가 막 삭제(LRU)한 경우는 thumbnails.open 이 한 번 다시 렌더링
+            response = FileResponse(thumbnails.open(sha256, variant), content_type=thumbnails.content_type)
+        except UnknownVariant:
+            return Response(
+                {'error': f'Unknown variant. Choose one of: {", ".join(thumbnails.config["variants"])}'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        except FileNotFoundError:
+            return Response({'error': 'No stored result for this request.'}, status=status.HTTP_404_NOT_FOUND)
+        except TimeoutError:
+            return Response(
+                {'error': 'Thumbnail is being generated. Please retry.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '2'},
+            )
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    @action(detail=True, methods=['get'], url_path=r'export/(?P<dataset>\w+)')
+    def export(self, request: Request, shop_id=None, dataset=None, *args, **kwargs):
+        # 원시 데이터 내보내기: 서버 측 커서로 읽으며 바로 전송 (전체를 메모리에 올리지 않음)
+        shop = self.get_object()
+        self._ensure_manage_permission(shop, request.user)
+        # format 은 DRF 의 렌더러 선택 파라미터라 output 사용
+        fmt = request.query_params.get('output', CSV)
+        compress = request.query_params.get('gzip', '') in ('1', 'true')
+        try:
+            validate_export(dataset, fmt)
+        except UnknownExport as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 기본 기간: 이번 달 1일 ~ 오늘 (양 끝 포함)
+        today = timezone.localdate()
+        params = request.query_params
+        try:
+            start = parse_date(params['from']) if params.get('from') else today.replace(day=1)
+            end = parse_date(params['to']) if params.get('to') else today
+        except ValueError:
+            start = end = None
+        if start is None or end is None or start > end:
+            return Response(
+                {'error': 'from/to must be YYYY-MM-DD dates with from <= to.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # 스트림은 dispatch 가 끝난 뒤 읽히므로 레플리카 선택을 지금 고정
+        using = db_router.db_for_read(GenerationRequest)
+        response = StreamingHttpResponse(
+            stream_export(dataset, shop, start, end, fmt=fmt, compress=compress, using=using),
+            content_type=GZIP_CONTENT_TYPE if compress else CONTENT_TYPES[fmt],
+        )
+        filename = export_filename(dataset, shop, start, end, fmt, compress)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['Cache-Control'] = 'no-store'
+        return response
+
     @action(detail=True, methods=['post'])
-    def adjust_quota(self, request: Request, pk=None):
+    def adjust_quota(self, request: Request, shop_id=None, *args, **kwargs):
         shop = self.get_object()
         self._ensure_manage_permission(shop, request.user)
         serializer = ShopQuotaAdjustmentSerializer(data=request.data)
@@ -219,12 +518,13 @@ class ShopProfileViewSet(viewsets.ModelViewSet):
                     'monthly_quota': shop.monthly_quota,
                 })
             decrement = min(shop.count, desired)
-            shop.decrement_quota(amount=decrement, actor=request.user)
-            log_service(
-                shop=shop,
-                remaining=shop.count,
-                note=note or f'manual quota decrement {decrement}',
-            )
+            # 그 사이 생성 요청이 쿼터를 써서 모자라면 차감하지 않고 현재 값을 응답
+            if shop.decrement_quota(amount=decrement, actor=request.user):
+                log_service(
+                    shop=shop,
+                    remaining=shop.count,
+                    note=note or f'manual quota decrement {decrement}',
+                )
 
         return Response({
             'count': shop.count,